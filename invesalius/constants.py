@@ -30,6 +30,9 @@ from invesalius.i18n import tr as _
 INVESALIUS_VERSION = "3.1.99998"
 
 INVESALIUS_ACTUAL_FORMAT_VERSION = 1.1
+# Memory-map the mask data files of uncompressed projects from the .inv3 file
+# instead of extracting them when opening a project.
+PROJECT_LAZY_OPEN = True
 
 # ---------------
 
@@ -365,6 +368,15 @@ SURFACE_QUALITY = {
 DEFAULT_SURFACE_QUALITY = _("Optimal *")
 SURFACE_QUALITY_LIST = [_("Low"), _("Medium"), _("High"), _("Optimal *")]
 
+# Maximum number of worker processes kept alive to create surfaces
+SURFACE_POOL_MAX_PROCESSES = 8
+# The volume is split in pieces of slices to create the surface in parallel:
+# about SURFACE_PIECES_PER_PROCESS pieces per worker, each one with at least
+# SURFACE_PIECE_MIN_SLICES slices and at most SURFACE_PIECE_MAX_BYTES of image.
+SURFACE_PIECES_PER_PROCESS = 2
+SURFACE_PIECE_MIN_SLICES = 8
+SURFACE_PIECE_MAX_BYTES = 128 * 1024 * 1024
+
 
 # Surface properties
 SURFACE_TRANSPARENCY = 0.0
@@ -1045,8 +1057,120 @@ SLEEP_COORDINATES = 0.1
 # median filtering. See: https://github.com/invesalius/invesalius3/issues/380
 SLEEP_BETWEEN_TRACKER_SAMPLES = 0.01
 
+# The navigation threads pass the poses through ring buffers of the last
+# POSE_BUFFER_SIZE timestamped samples, waking the next thread on each new one.
+# POSE_WAIT_TIMEOUT (seconds) is how long they wait for a sample before checking
+# if the navigation was stopped.
+POSE_BUFFER_SIZE = 64
+POSE_WAIT_TIMEOUT = 0.1
+
+# The last samples of each navigation stage used to compute its rate and latency
+# percentiles (see navigation/latency.py).
+NAVIGATION_LATENCY_SAMPLES = 1000
+
+# The coordinate recorder keeps up to RECORD_CHUNK_SIZE poses in memory and
+# writes them to its file when the chunk is full or every RECORD_FLUSH_INTERVAL
+# seconds, so at most that is lost if InVesalius crashes.
+RECORD_CHUNK_SIZE = 4096
+RECORD_FLUSH_INTERVAL = 1.0
+
+# The coregistered poses can be smoothed by a One-Euro or a Kalman filter, and
+# predicted ahead with their velocity to the time they are expected to be
+# rendered, at most POSE_PREDICTION_MAX seconds. The orientations are filtered
+# as quaternions scaled by POSE_FILTER_ROTATION_SCALE (mm), roughly the motion
+# of a point 100 mm from the coil center, so the same parameters suit the
+# positions (mm) and orientations. The filter of an object restarts when it
+# wasn't seen for POSE_FILTER_RESET seconds.
+POSE_FILTER_NONE = "none"
+POSE_FILTER_ONE_EURO = "one_euro"
+POSE_FILTER_KALMAN = "kalman"
+POSE_FILTERS = {
+    POSE_FILTER_NONE: _("None"),
+    POSE_FILTER_ONE_EURO: _("One-Euro"),
+    POSE_FILTER_KALMAN: _("Kalman"),
+}
+POSE_FILTER = POSE_FILTER_NONE
+POSE_PREDICTION = False
+POSE_PREDICTION_MAX = 0.15
+POSE_FILTER_ROTATION_SCALE = 200.0
+POSE_FILTER_RESET = 0.5
+# One-Euro: the cutoff (Hz) when still, how much it rises with the speed (per
+# mm/s), and the cutoff (Hz) of the speed.
+ONE_EURO_MIN_CUTOFF = 1.0
+ONE_EURO_BETA = 0.1
+ONE_EURO_D_CUTOFF = 1.0
+# Kalman: the acceleration noise density (mm/s^2/sqrt(Hz)) and the standard
+# deviation of the tracker noise (mm).
+KALMAN_PROCESS_NOISE = 100.0
+KALMAN_MEASUREMENT_NOISE = 0.3
+
 BRAIN_OPACITY = 0.6
 N_CPU = psutil.cpu_count()
+
+# Threads used to parse the DICOM files when scanning a directory, and how many
+# files per thread may be parsed ahead of the grouper.
+DICOM_SCAN_WORKERS = min(N_CPU or 1, 8)
+DICOM_SCAN_QUEUE_FACTOR = 4
+# Read only the DICOM headers when scanning (thumbnails are created when shown)
+# and keep them in a per-directory index in inv_paths.USER_DICOM_INDEX_DIR.
+DICOM_SCAN_HEADER_ONLY = True
+# Threads used to decode the DICOM slices into the image matrix.
+DICOM_LOAD_WORKERS = min(N_CPU or 1, 8)
+# Bytes of the NIfTI/Analyze images read at once when importing them.
+IMAGE_IMPORT_SLAB_BYTES = 64 * 1024 * 1024
+
+# Threads and slab size (bytes of image per thread) used when thresholding the
+# whole volume into a mask.
+THRESHOLD_THREADS = min(N_CPU or 1, 8)
+THRESHOLD_SLAB_BYTES = 4 * 1024 * 1024
+
+# Threads and slab size (bytes of image per slab, without the halo) used to
+# filter the image.
+IMAGE_FILTER_THREADS = min(N_CPU or 1, 8)
+IMAGE_FILTER_SLAB_BYTES = 16 * 1024 * 1024
+
+# Bytes of disk used by the filtered image versions computed from their recipe,
+# the least recently used are discarded (and computed again when needed).
+IMAGE_VERSIONS_BUDGET = 1024 * 1024 * 1024
+
+# The watershed is computed only around the markers (their bounding box plus
+# this margin, in voxels) when it's set to crop to the markers. The 3D image is
+# prepared (mapped to the window, gradient) by this number of threads.
+WATERSHED_CROP_MARGIN = 16
+WATERSHED_THREADS = min(N_CPU or 1, 8)
+
+# The mask edition history is kept zlib compressed in memory, the oldest states
+# are spilled to temporary files when it uses more than the budget (in bytes).
+MASK_HISTORY_COMPRESSION_LEVEL = 1
+MASK_HISTORY_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Minimum interval, in seconds, between updates of the mask 3D preview while
+# brushing the mask in 3D (it's updated at the end of each stroke).
+MASK_3D_EDIT_PREVIEW_INTERVAL = 0.1
+
+# Compressed projects are gzip compressed in blocks by several threads.
+PROJECT_COMPRESSION_THREADS = min(N_CPU or 1, 8)
+PROJECT_COMPRESSION_BLOCK_SIZE = 4 * 1024 * 1024
+PROJECT_COMPRESSION_LEVEL = 6
+# Size of the chunks of the data files compared to rewrite only the changed
+# ones in the incremental saves (auto-backup).
+PROJECT_ARCHIVE_CHUNK_SIZE = 4 * 1024 * 1024
+
+# The slices already shown are cached (up to the budget, in bytes) and the
+# next slices in the scroll direction are computed in background.
+SLICE_CACHE_MEMORY_BUDGET = 256 * 1024 * 1024
+SLICE_PREFETCH_SLICES = 4
+# Rotated slices are previewed, while rotating, with at most this number of
+# pixels on their largest side.
+RESLICE_PREVIEW_SIZE = 256
+
+# Projects exported to HDF5 are written in chunked, compressed datasets. The
+# chunks are compressed by several threads.
+HDF5_EXPORT_CHUNK_SHAPE = (16, 128, 128)
+HDF5_EXPORT_COMPRESSION = "gzip"
+HDF5_EXPORT_COMPRESSION_LEVEL = 4
+HDF5_EXPORT_THREADS = min(N_CPU or 1, 8)
+
 # the max_sampling_step can be set to something different as well. Above 100 is probably not necessary
 TREKKER_CONFIG = {
     "seed_max": 1,
@@ -31,6 +31,7 @@ import invesalius.data.imagedata_utils as image_utils
 import invesalius.data.measures as measures
 import invesalius.data.slice_ as sl
 import invesalius.data.surface as srf
+import invesalius.data.threshold as thr
 import invesalius.data.transformations as tr
 import invesalius.data.volume as volume
 import invesalius.data.vtk_utils as vtk_utils
@@ -1271,6 +1272,7 @@ class Controller:
 
         # imagedata = None
 
+        statistics = None
         if dicom.image.number_of_frames == 1:
             sx, sy = size
             n_slices = len(filelist)
@@ -1292,8 +1294,9 @@ class Controller:
 
             xyspacing = xyspacing[0] / resolution_percentage, xyspacing[1] / resolution_percentage
 
+            statistics = thr.ImageStatistics()
             self.matrix, scalar_range, self.filename = image_utils.dcm2memmap(
-                filelist, size, orientation, resolution_percentage
+                filelist, size, orientation, resolution_percentage, statistics
             )
 
             if orientation == "AXIAL":
@@ -1308,7 +1311,7 @@ class Controller:
             )
 
         self.Slice = sl.Slice()
-        self.Slice.matrix = self.matrix
+        self.Slice.set_matrix(self.matrix, statistics)
         self.Slice.matrix_filename = self.filename
 
         if gui and (spacing[0] == 0.0 or spacing[1] == 0.0 or spacing[2] == 0.0):
@@ -1336,7 +1339,13 @@ class Controller:
         self.Slice.window_level = wl
         self.Slice.window_width = ww
 
-        scalar_range = int(self.matrix.min()), int(self.matrix.max())
+        if tilt_value or statistics is None:
+            # The gantry tilt fix interpolates the image, changing its values.
+            if tilt_value:
+                self.Slice.update_value_index(self.matrix)
+            scalar_range = int(self.matrix.min()), int(self.matrix.max())
+        else:
+            scalar_range = int(scalar_range[0]), int(scalar_range[1])
 
         Publisher.sendMessage("Update threshold limits list", threshold_range=scalar_range)
 
@@ -1344,14 +1353,15 @@ class Controller:
 
     def OpenOtherFiles(self, group):
         # Retreaving matrix from image data
-        self.matrix, scalar_range, self.filename = image_utils.img2memmap(group)
+        statistics = thr.ImageStatistics()
+        self.matrix, scalar_range, self.filename = image_utils.img2memmap(group, statistics)
 
         hdr = group.header
         hdr.set_data_dtype("int16")
 
         # Calculate the 2% and 98% percentile
-        percentile_2 = np.percentile(self.matrix, 2)
-        percentile_98 = np.percentile(self.matrix, 98)
+        percentile_2 = statistics.get_percentile(2)
+        percentile_98 = statistics.get_percentile(98)
 
         # define ww and wl based on 2-98 percentiles saturates
         # the high pixel intensities that usually cause the image to
@@ -1368,7 +1378,7 @@ class Controller:
         # ww = float((scalar_range[1] - scalar_range[0]))
 
         self.Slice = sl.Slice()
-        self.Slice.matrix = self.matrix
+        self.Slice.set_matrix(self.matrix, statistics)
         self.Slice.matrix_filename = self.filename
         # even though the axes 0 and 2 are swapped when creating self.matrix
         # the spacing should be kept the original, as it is modified somewhere later
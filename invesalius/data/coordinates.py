@@ -18,10 +18,11 @@
 # --------------------------------------------------------------------------
 
 import threading
+from collections import deque
 from math import cos, sin
 from random import uniform
-from time import sleep
-from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Any, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import wx
@@ -29,6 +30,7 @@ import wx
 import invesalius.constants as const
 import invesalius.data.transformations as tr
 import invesalius.session as ses
+from invesalius.navigation import latency
 from invesalius.pubsub import pub as Publisher
 
 if TYPE_CHECKING:
@@ -41,10 +43,81 @@ def _safe_call_after(func, *args, **kwargs):
         wx.CallAfter(func, *args, **kwargs)
 
 
+class PoseSample(NamedTuple):
+    seq: int
+    # When the tracker pose it comes from was read (time.perf_counter).
+    timestamp: float
+    value: Any
+    # The times it passed the navigation stages (see navigation/latency.py).
+    stamps: "latency.Stamps" = ()
+
+
+class PoseRingBuffer:
+    """
+    The last samples written by a navigation thread (e.g. the tracker poses),
+    numbered and timestamped. Writing a sample wakes the threads waiting for
+    it, which always read the latest one instead of polling a queue.
+    """
+
+    def __init__(self, size: int = const.POSE_BUFFER_SIZE):
+        self._samples: "deque[PoseSample]" = deque(maxlen=size)
+        self._seq = 0
+        self._clears = 0
+        self._condition = threading.Condition()
+
+    def put(
+        self, value, timestamp: Optional[float] = None, stamps: "latency.Stamps" = ()
+    ) -> PoseSample:
+        if timestamp is None:
+            timestamp = perf_counter()
+        with self._condition:
+            self._seq += 1
+            sample = PoseSample(self._seq, timestamp, value, stamps)
+            self._samples.append(sample)
+            self._condition.notify_all()
+        return sample
+
+    def latest(self) -> Optional[PoseSample]:
+        with self._condition:
+            return self._samples[-1] if self._samples else None
+
+    def samples(self, since: int = 0) -> List[PoseSample]:
+        """
+        Return the samples kept that are newer than the sample since.
+        """
+        with self._condition:
+            return [sample for sample in self._samples if sample.seq > since]
+
+    def wait_newer(self, seq: int, timeout: Optional[float] = None) -> Optional[PoseSample]:
+        """
+        Return the latest sample if it's newer than seq, waiting for it up to
+        timeout seconds. Return None on timeout or if the buffer was cleared.
+        """
+        with self._condition:
+            clears = self._clears
+            self._condition.wait_for(
+                lambda: self._samples and self._samples[-1].seq > seq or self._clears != clears,
+                timeout,
+            )
+            if self._samples and self._samples[-1].seq > seq:
+                return self._samples[-1]
+            return None
+
+    def clear(self) -> None:
+        """
+        Remove the samples, waking the waiting threads (e.g. to stop them).
+        """
+        with self._condition:
+            self._samples.clear()
+            self._clears += 1
+            self._condition.notify_all()
+
+
 class TrackerCoordinates:
     def __init__(self):
         self.coord: Optional[np.ndarray] = None
         self.marker_visibilities = [False, False, False]
+        self.buffer = PoseRingBuffer()
         self.previous_marker_visibilities = self.marker_visibilities
         self.nav_status = False
         self._pending_pose_update = False
@@ -59,12 +132,19 @@ class TrackerCoordinates:
     def OnUpdateNavigationStatus(self, nav_status: bool, vis_status) -> None:
         self.nav_status = nav_status
 
-    def SetCoordinates(self, coord, marker_visibilities: List[bool]) -> None:
+    def SetCoordinates(
+        self,
+        coord,
+        marker_visibilities: List[bool],
+        timestamp: Optional[float] = None,
+        stamps: "latency.Stamps" = (),
+    ) -> None:
         self.coord = coord
         self.marker_visibilities = marker_visibilities
         if self.coord is None:
             return
 
+        self.buffer.put((coord, marker_visibilities), timestamp, stamps)
         self._pose_update_data = (
             self.coord.tolist(),
             list(self.marker_visibilities),
@@ -83,6 +163,13 @@ class TrackerCoordinates:
     def GetCoordinates(self) -> Tuple[Optional[np.ndarray], List[bool]]:
         return self.coord, self.marker_visibilities
 
+    def WaitCoordinates(self, seq: int, timeout: Optional[float] = None) -> Optional[PoseSample]:
+        """
+        Wait for coordinates newer than the sample seq, returning the sample
+        with the (coord, marker_visibilities) or None on timeout.
+        """
+        return self.buffer.wait_newer(seq, timeout)
+
     def _dispatch_pose_update(self) -> None:
         self._pending_pose_update = False
         if self._pose_update_data is None:
@@ -775,6 +862,7 @@ class ReceiveCoordinates(threading.Thread):
         self.tracker_id = tracker_id
         self.event = event
         self.TrackerCoordinates = TrackerCoordinates
+        self.monitor = latency.LatencyMonitor()
 
     def __bind_events(self) -> None:
         Publisher.subscribe(self.UpdateCoordSleep, "Update coord sleep")
@@ -784,8 +872,14 @@ class ReceiveCoordinates(threading.Thread):
 
     def run(self) -> None:
         while not self.event.is_set():
+            start = perf_counter()
             coord_raw, marker_visibilities = GetCoordinatesForThread(
                 self.tracker_connection, self.tracker_id, const.DEFAULT_REF_MODE
             )
-            self.TrackerCoordinates.SetCoordinates(coord_raw, marker_visibilities)
-            sleep(self.sleep_coord)
+            timestamp = perf_counter()
+            stamps = self.monitor.record(latency.STAGE_TRACKER, (("read", start),), timestamp)
+            self.TrackerCoordinates.SetCoordinates(
+                coord_raw, marker_visibilities, timestamp, stamps
+            )
+            # Read the tracker every sleep_coord seconds, however long reading takes.
+            sleep(max(self.sleep_coord - (timestamp - start), 0.0))
@@ -19,7 +19,7 @@
 
 import queue
 import threading
-from time import sleep
+from time import perf_counter
 
 import numpy as np
 
@@ -27,6 +27,11 @@ import invesalius.constants as const
 import invesalius.data.bases as bases
 import invesalius.data.coordinates as dco
 import invesalius.data.transformations as tr
+from invesalius.navigation import latency
+from invesalius.navigation.pose_filter import PoseFilter
+
+# As in transformations.py
+_EPS = np.finfo(float).eps * 4.0
 
 # TODO: Replace the use of degrees by radians in every part of the navigation pipeline
 
@@ -290,6 +295,55 @@ def compute_marker_transformation(coord_raw, obj_id):
     return m_probe
 
 
+def marker_transformations(coord_raw):
+    """
+    Return the transformation matrices (n x 4 x 4) of all the markers in
+    coord_raw, the same as compute_marker_transformation for each of them.
+    """
+    coord_raw = np.asarray(coord_raw, dtype=np.float64)
+    # The rzyx sequence is sxyz with the first and last angles swapped
+    # (see transformations.euler_matrix).
+    ak, aj, ai = np.radians(coord_raw[:, 3:]).T
+    si, sj, sk = np.sin(ai), np.sin(aj), np.sin(ak)
+    ci, cj, ck = np.cos(ai), np.cos(aj), np.cos(ak)
+    cc, cs = ci * ck, ci * sk
+    sc, ss = si * ck, si * sk
+
+    m = np.zeros((len(coord_raw), 4, 4))
+    m[:, 0, 0] = cj * ck
+    m[:, 0, 1] = sj * sc - cs
+    m[:, 0, 2] = sj * cc + ss
+    m[:, 1, 0] = cj * sk
+    m[:, 1, 1] = sj * ss + cc
+    m[:, 1, 2] = sj * cs - sc
+    m[:, 2, 0] = -sj
+    m[:, 2, 1] = cj * si
+    m[:, 2, 2] = cj * ci
+    m[:, :3, 3] = coord_raw[:, :3]
+    m[:, 3, 3] = 1.0
+    return m
+
+
+def matrices_to_coordinates(matrices):
+    """
+    Return the positions and the sxyz Euler angles in degrees (n x 6) of the
+    transformation matrices (n x 4 x 4), as tr.euler_from_matrix.
+    """
+    m = matrices
+    cy = np.sqrt(m[:, 0, 0] * m[:, 0, 0] + m[:, 1, 0] * m[:, 1, 0])
+    regular = cy > _EPS
+    ax = np.where(regular, np.arctan2(m[:, 2, 1], m[:, 2, 2]), np.arctan2(-m[:, 1, 2], m[:, 1, 1]))
+    ay = np.arctan2(-m[:, 2, 0], cy)
+    az = np.where(regular, np.arctan2(m[:, 1, 0], m[:, 0, 0]), 0.0)
+
+    coords = np.empty((len(m), 6))
+    coords[:, :3] = m[:, :3, 3]
+    coords[:, 3] = np.degrees(ax)
+    coords[:, 4] = np.degrees(ay)
+    coords[:, 5] = np.degrees(az)
+    return coords
+
+
 def apply_icp(m_img, icp):
     use_icp, m_icp = icp
     if use_icp:
@@ -298,6 +352,102 @@ def apply_icp(m_img, icp):
     return m_img
 
 
+class BatchCorregistration:
+    """
+    Coregistration of the probe and the coils of obj_datas from the same
+    tracker coordinates at once. The matrices of the markers, the
+    coregistration of the coils and the angles of all the poses are computed
+    on stacked arrays, with the invariants of the coils computed beforehand,
+    so the time per sample barely grows with the number of coils.
+
+    The poses are the same as the ones of corregistrate_probe and
+    corregistrate_object_dynamic (or _static if ref_mode_id is 0).
+    """
+
+    def __init__(self, m_change, r_stylus, obj_datas, ref_mode_id, icp=(None, None)):
+        self.m_change = m_change
+        self.ref_mode_id = ref_mode_id
+        self.use_icp, self.m_icp = icp
+
+        if r_stylus is None:
+            r_stylus = np.eye(3)
+            r_stylus[0] = -r_stylus[0]  # Flip over vtk x-axis
+        # Rotate from trk system where stylus points in x-axis to vtk-system where stylus points in y-axis
+        probe_rot = tr.euler_matrix(*np.radians([0, 0, -90]), axes="rxyz")[:3, :3]
+        self._probe_rot_left = r_stylus @ probe_rot
+        self._probe_rot_right = np.linalg.inv(probe_rot)
+
+        self.coil_names = list(obj_datas)
+        self._coil_index = {coil_name: n for n, coil_name in enumerate(self.coil_names)}
+        datas = [obj_datas[coil_name] for coil_name in self.coil_names]
+        self.obj_ids = np.array([obj_data[0] for obj_data in datas], dtype=int)
+        t_obj_raw, s0_raw, r_s0_raw, s0_dyn, m_obj_raw, r_obj_img = (
+            np.array([obj_data[i] for obj_data in datas], dtype=np.float64).reshape(-1, 4, 4)
+            for i in range(1, 7)
+        )
+        self._t_obj = t_obj_raw[:, :, 3]
+        self._r_s0_raw_inv = np.linalg.inv(r_s0_raw)
+        self._s0_raw = s0_raw
+        self._s0_raw_inv = np.linalg.inv(s0_raw)
+        self._r_obj = r_obj_img @ np.linalg.inv(m_obj_raw) @ np.linalg.inv(s0_dyn)
+        self._m_obj_raw = m_obj_raw
+
+    def corregistrate(self, coord_raw, coil_names=None):
+        """
+        Return the coordinates and the matrices in image space, by name, of the
+        probe and the coils coil_names (all if None).
+        """
+        if coil_names is None:
+            coil_names = self.coil_names
+        coils = np.array([self._coil_index[coil_name] for coil_name in coil_names], dtype=int)
+        markers = marker_transformations(coord_raw)
+
+        m_probes = np.empty((len(coils) + 1, 4, 4))
+        m_probes[0] = markers[0]
+        if len(coils):
+            # Move each coil marker to the coil center.
+            r_probe = markers[self.obj_ids[coils]]
+            t_probe_raw = np.broadcast_to(np.identity(4), r_probe.shape).copy()
+            t_probe_raw[:, :3, 3] = r_probe[:, :3, 3]
+            r_probe[:, :3, 3] = 0.0
+            t_offset = np.broadcast_to(np.identity(4), r_probe.shape).copy()
+            t_offset[:, :, 3] = np.einsum(
+                "cij,cjk,ck->ci", self._r_s0_raw_inv[coils], r_probe, self._t_obj[coils]
+            )
+            m_probes[1:] = (
+                self._s0_raw[coils] @ t_offset @ self._s0_raw_inv[coils] @ t_probe_raw @ r_probe
+            )
+
+        # Transform to the reference marker if dynamic ref_mode.
+        if self.ref_mode_id:
+            m_probes = np.linalg.inv(markers[1]) @ m_probes
+
+        # invert y coordinate
+        m_probes[:, 2, 3] = -m_probes[:, 2, 3]
+
+        m_imgs = self.m_change @ m_probes
+        m_imgs[0, :3, :3] = self._probe_rot_left @ m_probes[0, :3, :3] @ self._probe_rot_right
+        if len(coils):
+            r_obj = self._r_obj[coils] @ m_probes[1:] @ self._m_obj_raw[coils]
+            m_imgs[1:, :3, :3] = r_obj[:, :3, :3]
+
+        if self.use_icp:
+            # As bases.transform_icp, for the positions of all the poses.
+            positions = np.ones((len(m_imgs), 4))
+            positions[:, :3] = m_imgs[:, :3, 3]
+            positions[:, 1] = -positions[:, 1]
+            positions = positions @ np.asarray(self.m_icp).T
+            m_imgs[:, :3, 3] = positions[:, :3]
+            m_imgs[:, 1, 3] = -m_imgs[:, 1, 3]
+
+        coords = matrices_to_coordinates(m_imgs)
+        names = ["probe"] + list(coil_names)
+        return (
+            {name: tuple(coord) for name, coord in zip(names, coords)},
+            {name: m_img for name, m_img in zip(names, m_imgs)},
+        )
+
+
 def ComputeRelativeDistanceToTarget(target_coord=None, img_coord=None, m_target=None, m_img=None):
     if m_target is None:
         m_target = dco.coordinates_to_transformation_matrix(
@@ -339,7 +489,6 @@ class CoordinateCorregistrate(threading.Thread):
         view_tracts,
         queues,
         event,
-        sle,
         tracker_id,
         target,
         icp,
@@ -351,39 +500,29 @@ class CoordinateCorregistrate(threading.Thread):
         self.tracker = tracker
         self.coreg_data = coreg_data
         self.obj_datas = obj_datas
-        self.coord_queue = queues[0]
+        # The coregistered poses, for the scene and the e-field threads.
+        self.coord_buffer = queues[0]
         self.coord_tracts_queue = queues[1]
         self.view_tracts = view_tracts
         self.object_at_target_queue = queues[2]
-        self.efield_queue = queues[3]
+        self.efield_buffer = queues[3]
         self.e_field_loaded = e_field_loaded
         self.navigation = navigation
         self.event = event
-        self.sle = sle
-        self._loop_sleep = max(self.sle, 1.0 / 120.0)
+        self.monitor = latency.LatencyMonitor()
         self.use_icp = icp.use_icp
         self.m_icp = icp.m_icp
         self.last_coord = None
         self.tracker_id = tracker_id
         self.target = target
         self.target_flag = False
-        self._obj_cache = {}
-        for obj_data in obj_datas.values():
-            obj_id, t_obj_raw, s0_raw, r_s0_raw, s0_dyn, m_obj_raw, r_obj_img = obj_data
-            m_obj_raw_inv = np.linalg.inv(m_obj_raw)
-            s0_dyn_inv = np.linalg.inv(s0_dyn)
-            self._obj_cache[obj_id] = {
-                "obj_id": obj_id,
-                "t_obj_raw": t_obj_raw,
-                "s0_raw": s0_raw,
-                "s0_raw_inv": np.linalg.inv(s0_raw),
-                "r_s0_raw_inv": np.linalg.inv(r_s0_raw),
-                "m_obj_raw": m_obj_raw,
-                "m_obj_raw_inv": m_obj_raw_inv,
-                "s0_dyn_inv": s0_dyn_inv,
-                "r_obj_img": r_obj_img,
-                "r_obj_img_m_obj_raw_inv_s0_dyn_inv": r_obj_img @ m_obj_raw_inv @ s0_dyn_inv,
-            }
+        self.corregistration = BatchCorregistration(
+            coreg_data[0], coreg_data[1], obj_datas, ref_mode_id, (self.use_icp, self.m_icp)
+        )
+        self.pose_filter = PoseFilter(navigation.pose_filter, navigation.pose_prediction)
+        # How far ahead (seconds) the poses are predicted, updated every second.
+        self.horizon = 0.0
+        self._horizon_time = 0.0
 
         if self.target is not None:
             self.target = np.array(self.target)
@@ -394,56 +533,68 @@ class CoordinateCorregistrate(threading.Thread):
             #
             self.target[1] = -self.target[1]
 
+    def filter_poses(self, m_imgs, timestamp):
+        """
+        Filter the poses of the objects read at timestamp, returning the
+        filtered poses, and the poses predicted to when they are expected to
+        be rendered, each as the coordinates and the matrices by name.
+        """
+        now = perf_counter()
+        if now - self._horizon_time >= 1.0:
+            # The poses are rendered this long after the tracker was read.
+            self.horizon = self.monitor.latency(latency.STAGE_RENDER) or 0.0
+            self._horizon_time = now
+
+        names = list(m_imgs)
+        filtered = [
+            self.pose_filter.filter(name, m_imgs[name], timestamp, self.horizon) for name in names
+        ]
+        poses = []
+        for matrices in zip(*filtered):
+            matrices = np.array(matrices)
+            coords = matrices_to_coordinates(matrices)
+            poses.append(
+                (
+                    {name: tuple(coord) for name, coord in zip(names, coords)},
+                    {name: m_img for name, m_img in zip(names, matrices)},
+                )
+            )
+        return poses[0], poses[1]
+
     def run(self):
-        m_change, r_stylus = self.coreg_data
         obj_datas = self.obj_datas
 
-        icp = (self.use_icp, self.m_icp)
-        r_stylus_eff = r_stylus
-        if r_stylus_eff is None:
-            r_stylus_eff = np.eye(3)
-            r_stylus_eff[0] = -r_stylus_eff[0]  # Flip over vtk x-axis
-        probe_rot = tr.euler_matrix(*np.radians([0, 0, -90]), axes="rxyz")[:3, :3]
-        probe_rot_inv = np.linalg.inv(probe_rot)
+        last_seq = 0
         while not self.event.is_set():
+            # Coregister each new tracker pose as soon as it's read.
+            sample = self.tracker.TrackerCoordinates.WaitCoordinates(
+                last_seq, const.POSE_WAIT_TIMEOUT
+            )
+            if sample is None:
+                continue
+            if last_seq:
+                self.monitor.drop(latency.STAGE_COREGISTRATION, sample.seq - last_seq - 1)
+            last_seq = sample.seq
+
             try:
                 if not self.object_at_target_queue.empty():
                     self.target_flag = self.object_at_target_queue.get_nowait()
 
-                can_push_coord = not self.coord_queue.full()
                 can_push_tracts = self.view_tracts and not self.coord_tracts_queue.full()
-                can_push_efield = self.e_field_loaded and not self.efield_queue.full()
-                if not (can_push_coord or can_push_tracts or can_push_efield):
-                    sleep(self._loop_sleep)
-                    continue
-
-                coord_raw, marker_visibilities = self.tracker.TrackerCoordinates.GetCoordinates()
-                coord_probe, m_img_probe = self._corregistrate_probe(
-                    m_change,
-                    r_stylus_eff,
-                    coord_raw,
-                    self.ref_mode_id,
-                    icp,
-                    probe_rot,
-                    probe_rot_inv,
-                )
-
-                coords = {"probe": coord_probe}
-                m_imgs = {"probe": m_img_probe}
 
+                coord_raw, marker_visibilities = sample.value
                 main_coil = self.navigation.main_coil
                 if main_coil not in obj_datas:
                     main_coil = next(iter(obj_datas))
-                for coil_name, obj_data in obj_datas.items():
-                    if coil_name != main_coil:
-                        obj_id = obj_data[0]
-                        if obj_id < len(marker_visibilities) and not marker_visibilities[obj_id]:
-                            continue
-                    coord_coil, m_img_coil = self._corregistrate_object_cached(
-                        m_change, obj_data, coord_raw, icp
-                    )
-                    coords[coil_name] = coord_coil
-                    m_imgs[coil_name] = m_img_coil
+                # The main coil and the other visible ones.
+                coil_names = [
+                    coil_name
+                    for coil_name, obj_data in obj_datas.items()
+                    if coil_name == main_coil
+                    or obj_data[0] >= len(marker_visibilities)
+                    or marker_visibilities[obj_data[0]]
+                ]
+                coords, m_imgs = self.corregistration.corregistrate(coord_raw, coil_names)
                 coord = coords[main_coil]
                 m_img = m_imgs[main_coil]
 
@@ -466,8 +617,24 @@ class CoordinateCorregistrate(threading.Thread):
                     m_imgs[main_coil] = tr.compose_matrix(angles=angles, translate=translate)
                     m_img = m_imgs[main_coil]
 
-                if can_push_coord:
-                    self.coord_queue.put_nowait([coords, marker_visibilities, m_imgs])
+                # The poses predicted to when they are rendered are only used
+                # to show them, the recording and the target and e-field logic
+                # use the filtered ones.
+                scene_coords, scene_m_imgs = coords, m_imgs
+                if self.pose_filter.enabled:
+                    (coords, m_imgs), (scene_coords, scene_m_imgs) = self.filter_poses(
+                        m_imgs, sample.timestamp
+                    )
+                    coord = coords[main_coil]
+                    m_img = m_imgs[main_coil]
+
+                # Keep the time of the tracker pose, the poses are as old as it.
+                stamps = self.monitor.record(latency.STAGE_COREGISTRATION, sample.stamps)
+                self.coord_buffer.put(
+                    [coords, marker_visibilities, m_imgs, scene_coords, scene_m_imgs],
+                    sample.timestamp,
+                    stamps,
+                )
 
                 # Compute data for efield/tracts
                 if can_push_tracts:
@@ -476,101 +643,9 @@ class CoordinateCorregistrate(threading.Thread):
 
                 if can_push_tracts and not self.e_field_loaded:
                     self.coord_tracts_queue.put_nowait(m_img_flip)
-                if can_push_efield:
-                    self.efield_queue.put_nowait([m_img, coord, self.navigation.e_field_revision])
+                if self.e_field_loaded:
+                    self.efield_buffer.put(
+                        [m_img, coord, self.navigation.e_field_revision], sample.timestamp, stamps
+                    )
             except queue.Full:
                 pass
-
-            # The sleep has to be in both threads
-            sleep(self._loop_sleep)
-
-    def _corregistrate_probe(
-        self, m_change, r_stylus_eff, coord_raw, ref_mode_id, icp, probe_rot, probe_rot_inv
-    ):
-        m_probe = compute_marker_transformation(coord_raw, 0)
-
-        # transform probe to reference system if dynamic ref_mode
-        if ref_mode_id:
-            m_probe_ref = object_to_reference(coord_raw, m_probe)
-        else:
-            m_probe_ref = m_probe
-
-        # invert y coordinate
-        m_probe_ref[2, -1] = -m_probe_ref[2, -1]
-
-        # translate m_probe_ref from tracker to image space
-        m_img = m_change @ m_probe_ref
-        m_img = apply_icp(m_img, icp)
-
-        # rotate m_probe_ref from tracker to image space
-        r_img = r_stylus_eff @ probe_rot @ m_probe_ref[:3, :3] @ probe_rot_inv
-        m_img[:3, :3] = r_img[:3, :3]
-
-        # compute rotation angles
-        angles = np.degrees(tr.euler_from_matrix(m_img, axes="sxyz"))
-
-        # create output coordinate list
-        coord = (
-            m_img[0, -1],
-            m_img[1, -1],
-            m_img[2, -1],
-            angles[0],
-            angles[1],
-            angles[2],
-        )
-
-        return coord, m_img
-
-    def _object_marker_to_center_cached(self, coord_raw, obj_cache):
-        obj_id = obj_cache["obj_id"]
-        as1, bs1, gs1 = np.radians(coord_raw[obj_id, 3:])
-        r_probe = tr.euler_matrix(as1, bs1, gs1, "rzyx")
-        t_probe_raw = tr.translation_matrix(coord_raw[obj_id, :3])
-        t_offset_aux = obj_cache["r_s0_raw_inv"] @ r_probe @ obj_cache["t_obj_raw"]
-        t_offset = np.identity(4)
-        t_offset[:, -1] = t_offset_aux[:, -1]
-        t_probe = obj_cache["s0_raw"] @ t_offset @ obj_cache["s0_raw_inv"] @ t_probe_raw
-        m_probe = tr.concatenate_matrices(t_probe, r_probe)
-        return m_probe
-
-    def _corregistrate_object_cached(self, m_change, obj_data, coord_raw, icp):
-        obj_id = obj_data[0]
-        obj_cache = self._obj_cache.get(obj_id)
-        if obj_cache is None:
-            return (
-                corregistrate_object_dynamic(m_change, obj_data, coord_raw, icp)
-                if self.ref_mode_id
-                else corregistrate_object_static(m_change, obj_data, coord_raw, icp)
-            )
-
-        m_probe = self._object_marker_to_center_cached(coord_raw, obj_cache)
-
-        if self.ref_mode_id:
-            m_probe_ref = object_to_reference(coord_raw, m_probe)
-            m_probe_ref[2, -1] = -m_probe_ref[2, -1]
-            m_img = m_change @ m_probe_ref
-            r_obj = (
-                obj_cache["r_obj_img_m_obj_raw_inv_s0_dyn_inv"]
-                @ m_probe_ref
-                @ obj_cache["m_obj_raw"]
-            )
-        else:
-            m_probe[2, -1] = -m_probe[2, -1]
-            m_img = m_change @ m_probe
-            r_obj = (
-                obj_cache["r_obj_img_m_obj_raw_inv_s0_dyn_inv"] @ m_probe @ obj_cache["m_obj_raw"]
-            )
-
-        m_img[:3, :3] = r_obj[:3, :3]
-        m_img = apply_icp(m_img, icp)
-
-        angles = np.degrees(tr.euler_from_matrix(m_img, axes="sxyz"))
-        coord = (
-            m_img[0, -1],
-            m_img[1, -1],
-            m_img[2, -1],
-            angles[0],
-            angles[1],
-            angles[2],
-        )
-        return coord, m_img
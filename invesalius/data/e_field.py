@@ -1,12 +1,13 @@
 import queue
 import threading
-import time
 
 import numpy as np
 from vtkmodules.vtkCommonCore import vtkIdList
 
+import invesalius.constants as const
 import invesalius.data.imagedata_utils as imagedata_utils
 import invesalius.data.transformations as tr
+from invesalius.navigation import latency
 
 
 def Get_coil_position(coords):
@@ -42,17 +43,15 @@ def Get_coil_position(coords):
 
 
 class Visualize_E_field_Thread(threading.Thread):
-    def __init__(self, queues, event, sle, neuronavigation_api, debug_efield_enorm, plot_vectors):
+    def __init__(self, queues, event, neuronavigation_api, debug_efield_enorm, plot_vectors):
         threading.Thread.__init__(self, name="Visualize_E_field_Thread")
-        # self.inp = inp #list of inputs
-        self.efield_queue = queues[0]
+        # The coregistered coil poses, woken on each new one.
+        self.efield_buffer = queues[0]
         self.e_field_norms_queue = queues[1]
         self.e_field_IDs_queue = queues[2]
-        # self.tracts_queue = queues[1]
-        # self.visualization_queue = visualization_queue
         self.event = event
-        self.sle = sle
         self.neuronavigation_api = neuronavigation_api
+        self.monitor = latency.LatencyMonitor()
         self.ID_list = vtkIdList()
         if isinstance(debug_efield_enorm, np.ndarray):
             self.enorm_debug = debug_efield_enorm
@@ -64,55 +63,49 @@ class Visualize_E_field_Thread(threading.Thread):
         self.revision_old = None
 
     def run(self):
+        last_seq = 0
         while not self.event.is_set():
-            if not self.e_field_IDs_queue.empty():
+            sample = self.efield_buffer.wait_newer(last_seq, const.POSE_WAIT_TIMEOUT)
+            if sample is None:
+                continue
+            if last_seq:
+                self.monitor.drop(latency.STAGE_E_FIELD, sample.seq - last_seq - 1)
+            last_seq = sample.seq
+
+            # The IDs of the cortex around the coil, sent by the scene after
+            # each pose; the last ones are used until new ones arrive.
+            try:
+                self.ID_list = self.e_field_IDs_queue.get_nowait()
+                self.e_field_IDs_queue.task_done()
+            except queue.Empty:
+                pass
+            if self.ID_list.GetNumberOfIds() == 0:
+                continue
+            id_list = [self.ID_list.GetId(h) for h in range(self.ID_list.GetNumberOfIds())]
+
+            _m_img, coord, revision = sample.value
+            if (
+                self.coord_old is None
+                or not np.array_equal(self.coord_old, coord)
+                or self.revision_old != revision
+            ):
+                [T_rot, cp] = Get_coil_position(coord)
+                if self.debug:
+                    enorm = self.enorm_debug
+                else:
+                    enorm = self.neuronavigation_api.update_efield_vectorROIMax(
+                        position=cp,
+                        orientation=coord[3:],
+                        T_rot=T_rot,
+                        id_list=id_list,
+                    )
+                self.monitor.record(latency.STAGE_E_FIELD, sample.stamps)
                 try:
-                    self.ID_list = self.e_field_IDs_queue.get_nowait()
-                    self.e_field_IDs_queue.task_done()
-                    id_list = []
-                    for h in range(self.ID_list.GetNumberOfIds()):
-                        id_list.append(self.ID_list.GetId(h))
-                except queue.Empty:
-                    continue
-
-                if not self.efield_queue.empty():
-                    try:
-                        efield_payload = self.efield_queue.get_nowait()
-                        self.efield_queue.task_done()
-                    except queue.Empty:
-                        continue
-
-                    if len(efield_payload) == 3:
-                        _m_img, coord, revision = efield_payload
-                    else:
-                        _m_img, coord = efield_payload
-                        revision = None
-
-                    if self.ID_list.GetNumberOfIds() != 0:
-                        if (
-                            self.coord_old is None
-                            or not np.array_equal(self.coord_old, coord)
-                            or self.revision_old != revision
-                        ):
-                            [T_rot, cp] = Get_coil_position(coord)
-                            if self.debug:
-                                enorm = self.enorm_debug
-                            else:
-                                enorm = self.neuronavigation_api.update_efield_vectorROIMax(
-                                    position=cp,
-                                    orientation=coord[3:],
-                                    T_rot=T_rot,
-                                    id_list=id_list,
-                                )
-                            try:
-                                self.e_field_norms_queue.put_nowait(
-                                    [T_rot, cp, coord, enorm, id_list, revision]
-                                )
-
-                            except queue.Full:
-                                pass
-
-                            self.coord_old = np.array(coord)
-                            self.revision_old = revision
-
-            time.sleep(self.sle)
+                    self.e_field_norms_queue.put_nowait(
+                        [T_rot, cp, coord, enorm, id_list, revision]
+                    )
+                except queue.Full:
+                    pass
+
+                self.coord_old = np.array(coord)
+                self.revision_old = revision
@@ -1,15 +1,26 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import numpy as np
 import scipy.ndimage as ndimage
 
+import invesalius.constants as const
+
+# scipy.ndimage gaussian kernels are truncated at this many sigmas.
+GAUSSIAN_TRUNCATE = 4.0
+
 
 def gaussian_blur_filter(matrix: np.ndarray, sigma: float) -> np.ndarray:
     return ndimage.gaussian_filter(matrix, sigma=sigma)
 
 
+def _median_size(value: float) -> int:
+    return max(3, min(int(2 * value + 1), 5))
+
+
 def median_blur_filter(matrix: np.ndarray, value: float) -> np.ndarray:
     # Median Filter (3D, capped at size 5)
-    size = max(3, min(int(2 * value + 1), 5))
-    return ndimage.median_filter(matrix, size=size)
+    return ndimage.median_filter(matrix, size=_median_size(value))
 
 
 def mean_blur_filter(matrix: np.ndarray, value: float) -> np.ndarray:
@@ -18,10 +29,14 @@ def mean_blur_filter(matrix: np.ndarray, value: float) -> np.ndarray:
     return ndimage.uniform_filter(matrix, size=size).astype(matrix.dtype)
 
 
-def sharpening_filter(matrix: np.ndarray, value: float) -> np.ndarray:
-    # Sharpen via Unsharp Masking
+def sharpening_filter(
+    matrix: np.ndarray, value: float, value_range: tuple[float, float] | None = None
+) -> np.ndarray:
+    # Sharpen via Unsharp Masking, clipped to value_range (the matrix range by default)
     dtype = matrix.dtype
-    min_val, max_val = matrix.min(), matrix.max()
+    if value_range is None:
+        value_range = matrix.min(), matrix.max()
+    min_val, max_val = value_range
     float_matrix = matrix.astype(float)
     blurred = ndimage.gaussian_filter(float_matrix, sigma=1.0)
     detail = float_matrix - blurred
@@ -43,6 +58,18 @@ def border_detection_filter(
     Uses 'value' as the sigma for the pre-smoothing step to control noise sensitivity.
     """
     dtype = matrix.dtype
+    magnitude = border_magnitude(matrix, value)
+
+    if not normalize:
+        return magnitude.astype(dtype)
+
+    value_range = float(matrix.min()), float(matrix.max())
+    magnitude_range = magnitude.min(), magnitude.max()
+    return normalize_magnitude(magnitude, magnitude_range, value_range, dtype)
+
+
+def border_magnitude(matrix: np.ndarray, value: float = 1.0) -> np.ndarray:
+    """Sobel gradient magnitude (float) of matrix pre-smoothed with sigma 'value'."""
     # Pre-smooth to reduce noise in edges (using the 'kernel size' parameter)
     float_matrix = ndimage.gaussian_filter(matrix.astype(float), sigma=value)
 
@@ -50,17 +77,181 @@ def border_detection_filter(
     sy = ndimage.sobel(float_matrix, axis=1)
     if float_matrix.ndim == 3:
         sz = ndimage.sobel(float_matrix, axis=2)
-        magnitude = np.sqrt(sx**2 + sy**2 + sz**2)
-    else:
-        magnitude = np.sqrt(sx**2 + sy**2)
+        return np.sqrt(sx**2 + sy**2 + sz**2)
+    return np.sqrt(sx**2 + sy**2)
 
-    if not normalize:
-        return magnitude.astype(dtype)
 
-    min_val, max_val = float(matrix.min()), float(matrix.max())
-    mag_min = magnitude.min()
-    mag_range = magnitude.max() - mag_min
+def normalize_magnitude(magnitude, magnitude_range, value_range, dtype) -> np.ndarray:
+    """Map the magnitude from magnitude_range to value_range, cast to dtype."""
+    mag_min, mag_max = magnitude_range
+    min_val, max_val = value_range
+    mag_range = mag_max - mag_min
 
     if mag_range > 0:
         magnitude = (magnitude - mag_min) / mag_range * (max_val - min_val) + min_val
     return magnitude.astype(dtype)
+
+
+def _gaussian_radius(sigma: float) -> int:
+    return int(GAUSSIAN_TRUNCATE * float(sigma) + 0.5)
+
+
+# The filters applied by Slice, by filter type, and the radius of their
+# kernel (the halo the slabs need so the result is the same of the volume).
+FILTERS = {
+    0: (gaussian_blur_filter, _gaussian_radius),
+    1: (median_blur_filter, lambda value: _median_size(value) // 2),
+    2: (mean_blur_filter, lambda value: int(2 * value + 1) // 2),
+    3: (sharpening_filter, lambda value: _gaussian_radius(1.0)),
+    4: (despeckle_filter, _gaussian_radius),
+    5: (border_detection_filter, lambda value: _gaussian_radius(value) + 1),
+}
+
+
+def _get_slab(matrix, axis, start, stop):
+    slab = [slice(None)] * matrix.ndim
+    slab[axis] = slice(start, stop)
+    return matrix[tuple(slab)]
+
+
+def apply_tiled(
+    function,
+    matrix,
+    out,
+    halo=0,
+    axis=0,
+    slab_bytes=None,
+    n_workers=None,
+    progress=None,
+    cancel=None,
+):
+    """
+    Apply function to matrix slab by slab along axis, writing the results
+    into out (e.g. a memmap) by n_workers threads. Each slab is read with
+    halo more slices on both sides, halo must be at least the radius of the
+    function kernel so the result is the same of applying it to the whole
+    matrix.
+
+    progress(done, total) is called after each slab is done. If cancel (a
+    threading.Event) is set the remaining slabs are not processed and False
+    is returned.
+    """
+    if slab_bytes is None:
+        slab_bytes = const.IMAGE_FILTER_SLAB_BYTES
+    if n_workers is None:
+        n_workers = const.IMAGE_FILTER_THREADS
+
+    n_slices = matrix.shape[axis]
+    slice_bytes = max(matrix.nbytes // max(n_slices, 1), 1)
+    slab_size = max(slab_bytes // slice_bytes, 2 * halo, 1)
+    starts = range(0, n_slices, slab_size)
+
+    def run(start):
+        if cancel is not None and cancel.is_set():
+            return
+        stop = min(start + slab_size, n_slices)
+        block_start = max(start - halo, 0)
+        block = np.asarray(_get_slab(matrix, axis, block_start, min(stop + halo, n_slices)))
+        result = function(block)
+        result = _get_slab(result, axis, start - block_start, stop - block_start)
+        _get_slab(out, axis, start, stop)[:] = result
+
+    with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="image_filter") as executor:
+        futures = [executor.submit(run, start) for start in starts]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if progress is not None:
+                progress(done, len(futures))
+
+    return cancel is None or not cancel.is_set()
+
+
+def _apply_by_slice(function, block, axis):
+    result = np.empty_like(block)
+    for n in range(block.shape[axis]):
+        _get_slab(result, axis, n, n + 1)[:] = np.expand_dims(function(block.take(n, axis)), axis)
+    return result
+
+
+def apply_filter(
+    filter_type,
+    matrix,
+    value,
+    out,
+    dimension="3D",
+    axis=0,
+    n_workers=None,
+    progress=None,
+    cancel=None,
+):
+    """
+    Apply the filter of filter_type (a key of FILTERS) to matrix, writing the
+    result into out, slab by slab (see apply_tiled). In 2D the filter is
+    applied to each slice along axis. progress(fraction) is called as the
+    slabs are done. Returns False if it was cancelled.
+    """
+    function, get_radius = FILTERS[filter_type]
+    kwargs = {"n_workers": n_workers, "cancel": cancel}
+
+    def step_progress(offset, scale):
+        if progress is None:
+            return None
+        return lambda done, total: progress(offset + scale * done / total)
+
+    if dimension == "2D":
+        return apply_tiled(
+            lambda block: _apply_by_slice(lambda s: function(s, value), block, axis),
+            matrix,
+            out,
+            axis=axis,
+            progress=step_progress(0.0, 1.0),
+            **kwargs,
+        )
+
+    halo = get_radius(value)
+    if filter_type == 3:
+        # The range of the whole matrix, not of each slab.
+        value_range = matrix.min(), matrix.max()
+        return apply_tiled(
+            lambda block: sharpening_filter(block, value, value_range),
+            matrix,
+            out,
+            halo,
+            progress=step_progress(0.0, 1.0),
+            **kwargs,
+        )
+
+    if filter_type == 5:
+        # The magnitude is normalized by its range in the whole matrix, so it's
+        # computed into a temporary file first.
+        value_range = float(matrix.min()), float(matrix.max())
+        with tempfile.TemporaryFile() as f:
+            magnitude = np.memmap(f, dtype=np.float64, mode="w+", shape=matrix.shape)
+            if not apply_tiled(
+                lambda block: border_magnitude(block, value),
+                matrix,
+                magnitude,
+                halo,
+                progress=step_progress(0.0, 0.8),
+                **kwargs,
+            ):
+                return False
+            magnitude_range = magnitude.min(), magnitude.max()
+            return apply_tiled(
+                lambda block: normalize_magnitude(
+                    block, magnitude_range, value_range, matrix.dtype
+                ),
+                magnitude,
+                out,
+                progress=step_progress(0.8, 0.2),
+                **kwargs,
+            )
+
+    return apply_tiled(
+        lambda block: function(block, value),
+        matrix,
+        out,
+        halo,
+        progress=step_progress(0.0, 1.0),
+        **kwargs,
+    )
@@ -0,0 +1,140 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Writing of large (memmapped) volumes into chunked, compressed HDF5 datasets.
+
+The volume is read slab by slab, so it's never copied whole into memory. With
+gzip compression the chunks are compressed by numpy/zlib in worker threads
+and written with write_direct_chunk, because HDF5 itself runs the filters
+serially holding the h5py lock.
+"""
+
+import collections
+import itertools
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def get_chunk_shape(shape, chunks):
+    """
+    Return chunks clipped to the dataset shape (HDF5 doesn't accept chunks
+    larger than a fixed size dataset).
+    """
+    return tuple(max(1, min(int(c), int(s))) for c, s in zip(chunks, shape))
+
+
+def _shuffle(data, itemsize):
+    """
+    The HDF5 shuffle filter: the first bytes of all the items, then the second
+    bytes and so on.
+    """
+    if itemsize == 1:
+        return data
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _compress_slab(array, start, chunks, level, shuffle):
+    """
+    Return the (offset, data) of the compressed chunks of the slab of array
+    starting in start (on the first axis).
+    """
+    slab = np.asarray(array[start : start + chunks[0]])
+    itemsize = slab.dtype.itemsize
+    compressed = []
+    for offset in itertools.product(*(range(0, n, c) for n, c in zip(slab.shape[1:], chunks[1:]))):
+        block = slab[(slice(None),) + tuple(slice(o, o + c) for o, c in zip(offset, chunks[1:]))]
+        if block.shape != chunks:
+            # The chunks in the border are stored with the full chunk shape.
+            padded = np.zeros(chunks, dtype=slab.dtype)
+            padded[tuple(slice(0, n) for n in block.shape)] = block
+            block = padded
+        data = np.ascontiguousarray(block).tobytes()
+        if shuffle:
+            data = _shuffle(data, itemsize)
+        compressed.append(((start,) + offset, zlib.compress(data, level)))
+    return compressed
+
+
+def write_dataset(
+    group,
+    name,
+    array,
+    chunks,
+    compression="gzip",
+    compression_opts=None,
+    shuffle=None,
+    n_threads=1,
+):
+    """
+    Create the dataset name in group (an h5py File or Group) with the data of
+    array, chunked and compressed.
+
+    compression and compression_opts are the ones of h5py create_dataset,
+    compression_opts being the gzip level and ignored by the others. The
+    shuffle filter is used by default for compressed datasets with items of
+    more than one byte. The gzip chunks are compressed by n_threads threads.
+    """
+    chunks = get_chunk_shape(array.shape, chunks)
+    if shuffle is None:
+        shuffle = compression is not None and array.dtype.itemsize > 1
+    if compression != "gzip":
+        # Only gzip takes a level, h5py rejects options for None or lzf.
+        compression_opts = None
+    elif compression_opts is None:
+        compression_opts = 4
+
+    dataset = group.create_dataset(
+        name,
+        shape=array.shape,
+        dtype=array.dtype,
+        chunks=chunks,
+        compression=compression,
+        compression_opts=compression_opts,
+        shuffle=shuffle,
+    )
+
+    slab_starts = range(0, array.shape[0], chunks[0])
+    if compression != "gzip":
+        for start in slab_starts:
+            dataset[start : start + chunks[0]] = array[start : start + chunks[0]]
+        return dataset
+
+    def write_chunks(compressed):
+        for offset, data in compressed:
+            dataset.id.write_direct_chunk(offset, data)
+
+    if n_threads <= 1 or len(slab_starts) <= 1:
+        for start in slab_starts:
+            write_chunks(_compress_slab(array, start, chunks, compression_opts, shuffle))
+        return dataset
+
+    # At most 2 * n_threads slabs in memory, the chunks are written in order.
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="hdf5") as executor:
+        for start in slab_starts:
+            if len(pending) >= 2 * n_threads:
+                write_chunks(pending.popleft().result())
+            pending.append(
+                executor.submit(_compress_slab, array, start, chunks, compression_opts, shuffle)
+            )
+        while pending:
+            write_chunks(pending.popleft().result())
+    return dataset
@@ -0,0 +1,338 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+The image versions of a project: the original image and the ones filtered
+from it.
+
+A filtered version is recorded as its recipe, the filters applied to the
+original image to get it. Its matrix is only computed (into a temporary
+file) when it's used, and the least recently used matrices are discarded
+when they take more than a budget, to be computed again if needed.
+"""
+
+import itertools
+import os
+import tempfile
+
+import numpy as np
+
+import invesalius.constants as const
+from invesalius.data import filters
+
+ORIGINAL = "original"
+
+# The axis of the 2D filters by orientation.
+FILTER_AXES = {"Axial": 0, "Coronal": 1, "Sagittal": 2}
+FILTER_ORIENTATIONS = {axis: orientation for orientation, axis in FILTER_AXES.items()}
+
+
+class FilterStep:
+    """
+    A filter applied to an image (see filters.apply_filter).
+    """
+
+    def __init__(self, filter_type, value, dimension="3D", orientation="Axial"):
+        self.filter_type = filter_type
+        self.value = value
+        self.dimension = dimension
+        self.orientation = orientation
+
+    def __eq__(self, other):
+        return isinstance(other, FilterStep) and self.as_dict() == other.as_dict()
+
+    def as_dict(self):
+        return {
+            "filter_type": self.filter_type,
+            "value": self.value,
+            "dimension": self.dimension,
+            "orientation": self.orientation,
+        }
+
+    def apply(self, matrix, out, progress=None, cancel=None):
+        return filters.apply_filter(
+            self.filter_type,
+            matrix,
+            self.value,
+            out,
+            self.dimension,
+            FILTER_AXES.get(self.orientation, 0),
+            progress=progress,
+            cancel=cancel,
+        )
+
+
+class ImageVersion:
+    def __init__(self, label, matrix=None, parent=None, steps=None, filename=None):
+        self.label = label
+        self.matrix = matrix
+        # The version it was filtered from, and the filters applied to the
+        # original image to get it. Versions without steps can't be computed
+        # again (e.g. the original image or ones opened from old projects).
+        self.parent = parent
+        self.steps = steps
+        # The temporary file of the computed matrix, owned by the store.
+        self.filename = filename
+        self.last_used = 0
+
+    @property
+    def is_recomputable(self):
+        return bool(self.steps)
+
+    def discard_matrix(self):
+        self.matrix = None
+        if self.filename is not None:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
+            self.filename = None
+
+
+class ImageVersionStore:
+    """
+    The image versions, in the order they were added. It's also a sequence of
+    (label, matrix) tuples, computing the matrices when they're accessed; use
+    labels() and get() to not compute them all.
+
+    The computed matrices of the filtered versions are discarded, the least
+    recently used first, when they take more than budget bytes. The active
+    version (the one shown) is never discarded.
+    """
+
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = const.IMAGE_VERSIONS_BUDGET
+        self.budget = budget
+        self.active = ORIGINAL
+        self._versions: list[ImageVersion] = []
+        self._clock = itertools.count(1)
+
+    def __len__(self):
+        return len(self._versions)
+
+    def __contains__(self, label):
+        return self._find(label) is not None
+
+    def __iter__(self):
+        for version in list(self._versions):
+            yield version.label, self.get(version.label)
+
+    def __getitem__(self, index):
+        version = self._versions[index]
+        return version.label, self.get(version.label)
+
+    def __setitem__(self, index, item):
+        label, matrix = item
+        version = self._versions[index]
+        if label != version.label:
+            self.rename(version.label, label)
+        if matrix is not version.matrix:
+            self.set_matrix(label, matrix)
+
+    def _find(self, label):
+        for version in self._versions:
+            if version.label == label:
+                return version
+        return None
+
+    def labels(self):
+        return [version.label for version in self._versions]
+
+    def get_version(self, label):
+        return self._find(label)
+
+    def is_computed(self, label):
+        version = self._find(label)
+        return version is not None and version.matrix is not None
+
+    def append(self, item):
+        """
+        Add the (label, matrix) version, that can't be computed again.
+        """
+        label, matrix = item
+        self._versions.append(ImageVersion(label, matrix))
+
+    def add_original(self, matrix):
+        """
+        Add the original image as the first version, if it's not there.
+        """
+        if ORIGINAL not in self:
+            self._versions.insert(0, ImageVersion(ORIGINAL, matrix))
+
+    def add(self, label, parent, step, matrix=None, filename=None):
+        """
+        Add the version label, the parent version filtered by step (a
+        FilterStep). matrix, if it's already computed, is in the temporary
+        file filename that's now owned by the store.
+        """
+        parent_version = self._find(parent)
+        parent_steps = parent_version.steps if parent_version is not None else None
+        if parent != ORIGINAL and not parent_steps:
+            # The parent can't be computed again, so neither can this one.
+            steps = None
+        else:
+            steps = (parent_steps or []) + [step]
+        return self.add_recipe(label, parent, steps, matrix, filename)
+
+    def add_recipe(self, label, parent, steps, matrix=None, filename=None):
+        """
+        Add the version label, the original image filtered by steps (e.g. a
+        version opened from a project, its matrix is computed when used).
+        """
+        version = ImageVersion(label, matrix, parent, steps, filename)
+        version.last_used = next(self._clock)
+        self._versions.append(version)
+        self._enforce_budget(keep=version)
+        return version
+
+    def get(self, label, default=None):
+        """
+        Return the matrix of the version label, computing it if needed, or
+        default if there is no such version.
+        """
+        version = self._find(label)
+        if version is None:
+            return default
+        version.last_used = next(self._clock)
+        if version.matrix is None:
+            self._compute(version)
+            self._enforce_budget(keep=version)
+        return version.matrix
+
+    def _compute(self, version):
+        parent = self._find(version.parent)
+        if parent is not None and (parent.matrix is not None or parent.is_recomputable):
+            matrix = self.get(parent.label)
+            steps = version.steps[-1:]
+        else:
+            matrix = self.get(ORIGINAL)
+            steps = version.steps
+        if matrix is None:
+            raise KeyError(f"The original image of {version.label} is not available")
+
+        for step in steps:
+            fd, filename = tempfile.mkstemp(suffix=".dat")
+            os.close(fd)
+            out = np.memmap(filename, shape=matrix.shape, dtype=matrix.dtype, mode="w+")
+            step.apply(matrix, out)
+            out.flush()
+            if version.filename is not None:
+                # An intermediate step.
+                del matrix
+                os.remove(version.filename)
+            matrix = out
+            version.filename = filename
+        version.matrix = matrix
+
+    def _enforce_budget(self, keep=None):
+        """
+        Discard the least recently used computed matrices (that can be
+        computed again) while they take more than the budget.
+        """
+        computed = [v for v in self._versions if v.matrix is not None and v.is_recomputable]
+        used = sum(v.matrix.nbytes for v in computed)
+        for version in sorted(computed, key=lambda v: v.last_used):
+            if used <= self.budget:
+                break
+            if version is keep or version.label == self.active:
+                continue
+            used -= version.matrix.nbytes
+            version.discard_matrix()
+
+    def discard_computed(self, keep=()):
+        """
+        Discard the computed matrices that can be computed again, except the
+        ones in keep (e.g. after the original image was changed, flipped or
+        had its axes swapped).
+        """
+        for version in self._versions:
+            if version.is_recomputable and version.matrix is not None:
+                if not any(version.matrix is matrix for matrix in keep):
+                    version.discard_matrix()
+
+    def computed(self):
+        """
+        Return the (label, matrix) of the versions whose matrix is computed.
+        """
+        return [(v.label, v.matrix) for v in self._versions if v.matrix is not None]
+
+    def set_matrix(self, label, matrix):
+        """
+        Replace the matrix of the version label, it's not computed from its
+        recipe anymore.
+        """
+        version = self._find(label)
+        if version.matrix is not matrix:
+            version.discard_matrix()
+        version.matrix = matrix
+        version.steps = None
+
+    def replace_matrix(self, label, matrix):
+        """
+        Replace the matrix of the version label by the same image in another
+        array (e.g. with its axes swapped), keeping its recipe.
+        """
+        version = self._find(label)
+        is_owned = version.filename is not None
+        version.discard_matrix()
+        version.matrix = matrix
+        if is_owned:
+            version.filename = matrix.filename
+
+    def swap_axes(self, axis0, axis1):
+        """
+        Update the recipes after the axes of the original image were swapped:
+        the 2D filters are applied along the swapped axes.
+        """
+        swap = {axis0: axis1, axis1: axis0}
+        # The steps of a version are shared with the versions filtered from it.
+        steps = {id(step): step for version in self._versions for step in version.steps or []}
+        for step in steps.values():
+            if step.dimension == "2D":
+                axis = FILTER_AXES.get(step.orientation, 0)
+                step.orientation = FILTER_ORIENTATIONS[swap.get(axis, axis)]
+
+    def rename(self, label, new_label):
+        self._find(label).label = new_label
+        for version in self._versions:
+            if version.parent == label:
+                version.parent = new_label
+        if self.active == label:
+            self.active = new_label
+
+    def pop(self, index=-1):
+        """
+        Remove the version at index, returning its (label, matrix); the matrix
+        is None if it wasn't computed. Its temporary file is removed.
+        """
+        version = self._versions.pop(index)
+        matrix = version.matrix
+        version.discard_matrix()
+        return version.label, matrix
+
+    def remove(self, label):
+        return self.pop(self._versions.index(self._find(label)))
+
+    def clear(self):
+        while self._versions:
+            self.pop()
+
+    def __del__(self):
+        for version in self._versions:
+            version.discard_matrix()
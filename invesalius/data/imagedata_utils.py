@@ -20,6 +20,7 @@
 import math
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import gdcm
 import imageio
@@ -35,9 +36,11 @@ from vtkmodules.vtkImagingGeneral import vtkImageGaussianSmooth
 from vtkmodules.vtkInteractionImage import vtkImageViewer
 from vtkmodules.vtkIOXML import vtkXMLImageDataReader, vtkXMLImageDataWriter
 
+import invesalius.constants as const
 import invesalius.data.converters as converters
 import invesalius.data.coordinates as dco
 import invesalius.data.slice_ as sl
+import invesalius.data.threshold as thr
 import invesalius.gui.dialogs as dlg
 import invesalius.reader.bitmap_reader as bitmap_reader
 from invesalius.data import vtk_utils as vtk_utils
@@ -416,11 +419,23 @@ def bitmap2memmap(files, slice_size, orientation, spacing, resolution_percentage
     return matrix, scalar_range, temp_file
 
 
-def dcm2memmap(files, slice_size, orientation, resolution_percentage):
+def dcm2memmap(
+    files, slice_size, orientation, resolution_percentage, statistics=None, n_workers=None
+):
     """
     From a list of dicom files it creates memmap file in the temp folder and
     returns it and its related filename.
+
+    The slices are decoded by n_workers threads (const.DICOM_LOAD_WORKERS if
+    None), each one written in its position in the memmap. The scalar range is
+    computed while the slices are loaded, and the values are counted in
+    statistics (a threshold.ImageStatistics) if given.
     """
+    if n_workers is None:
+        n_workers = const.DICOM_LOAD_WORKERS
+    if statistics is None:
+        statistics = thr.ImageStatistics()
+
     if len(files) > 1:
         message = _("Generating multiplanar visualization...")
         update_progress = vtk_utils.ShowProgress(len(files) - 1)
@@ -438,8 +453,13 @@ def dcm2memmap(files, slice_size, orientation, resolution_percentage):
         shape = len(files), slice_size[1], slice_size[0]
 
     matrix = np.memmap(temp_file, mode="w+", dtype="int16", shape=shape)
-    for n, f in enumerate(files):
-        im_array = read_dcm_slice_as_np2(f, resolution_percentage)[::-1]
+
+    def load_slice(n):
+        if n == 0:
+            im_array = first_slice[::-1]
+        else:
+            im_array = read_dcm_slice_as_np2(files[n], resolution_percentage)[::-1]
+        im_array = np.asarray(im_array, dtype=matrix.dtype)
 
         if orientation == "CORONAL":
             matrix[:, shape[1] - n - 1, :] = im_array
@@ -450,11 +470,21 @@ def dcm2memmap(files, slice_size, orientation, resolution_percentage):
             matrix[:, :, n] = im_array
         else:
             matrix[n] = im_array
-        if len(files) > 1:
-            update_progress(n, message)
+        statistics.add(im_array)
+
+    if n_workers > 1 and len(files) > 1:
+        # gdcm, zoom and numpy do most of the work without the GIL.
+        with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="dicom_load") as executor:
+            for n, _result in enumerate(executor.map(load_slice, range(len(files)))):
+                update_progress(n, message)
+    else:
+        for n in range(len(files)):
+            load_slice(n)
+            if len(files) > 1:
+                update_progress(n, message)
 
     matrix.flush()
-    scalar_range = matrix.min(), matrix.max()
+    scalar_range = statistics.scalar_range
     os.close(temp_fd)
 
     return matrix, scalar_range, temp_file
@@ -495,43 +525,89 @@ def dcmmf2memmap(dcm_file, orientation):
     return matrix, scalar_range, spacing, temp_file
 
 
-def img2memmap(group):
+def _read_image_slabs(dataobj, slab_size):
+    """
+    Yield the (start, data) slabs of slab_size slices (on the last, z, axis)
+    of a nibabel image data, scaled but in its native dtype when not scaled.
+    """
+    for start in range(0, dataobj.shape[2], slab_size):
+        yield start, np.asarray(dataobj[:, :, start : start + slab_size])
+
+
+def _write_image_slab(matrix, start, data, statistics):
+    """
+    Write the RAS+ slab data in matrix, in the default InVesalius orientation
+    ZYX, counting its values in statistics.
+    """
+    out = matrix[start : start + data.shape[2]]
+    out[:] = np.swapaxes(data, 0, 2)[:, ::-1]
+    statistics.add(out)
+
+
+def img2memmap(group, statistics=None, slab_bytes=None):
     """
     From a nibabel image data creates a memmap file in the temp folder and
     returns it and its related filename.
+
+    The image data is read in slabs of about slab_bytes bytes
+    (const.IMAGE_IMPORT_SLAB_BYTES if None), reoriented and written in the
+    memmap slab by slab, so the whole volume is never loaded in memory. The
+    scalar range is computed while the slabs are written, and the values are
+    counted in statistics (a threshold.ImageStatistics) if given.
     """
+    if statistics is None:
+        statistics = thr.ImageStatistics()
+    if slab_bytes is None:
+        slab_bytes = const.IMAGE_IMPORT_SLAB_BYTES
+
+    dataobj = group.dataobj
+    nx, ny, nz = dataobj.shape
+    # Room for the slab scaled to float64.
+    slab_size = max(1, slab_bytes // (nx * ny * 8))
 
     temp_fd, temp_file = tempfile.mkstemp()
+    matrix = np.memmap(temp_file, mode="w+", dtype=np.int16, shape=(nz, ny, nx))
 
-    data = group.get_fdata()
+    data_min = data_max = None
+    for start, data in _read_image_slabs(dataobj, slab_size):
+        slab_min, slab_max = data.min(), data.max()
+        if data_min is None:
+            data_min, data_max = slab_min, slab_max
+        else:
+            data_min, data_max = min(data_min, slab_min), max(data_max, slab_max)
+        _write_image_slab(matrix, start, data, statistics)
 
     # if scalar range is larger than uint16 maximum number, the image needs
     # to be rescalaed so that no negative values are created when converting to int16
     # maximum of 10000 was selected arbitrarily by testing with one MRI example
     # alternatively could test if "data.dtype == 'float64'" but maybe it is too specific
-    if np.ptp(data) > (2**16 / 2 - 1):
-        data = image_normalize(data, min_=0, max_=10000, output_dtype=np.int16)
+    output_range = None
+    if float(data_max) - float(data_min) > (2**16 / 2 - 1):
+        output_range = 0, 10000
         dlg.WarningRescalePixelValues()
 
     # images can have pixel intensities in small float numbers which after int conversion will
     # have to be binary (0, 1). To prevent that, rescale pixel values from 0-255
-    elif data.max() < (2**3):
-        data_temp = image_normalize(data, min_=0, max_=255, output_dtype=np.int16)
-        status = dlg.DialogRescalePixelIntensity(data.max(), np.unique(data_temp).size)
+    elif data_max < (2**3):
+        rescaled_values = np.zeros(256, dtype=bool)
+        for start, data in _read_image_slabs(dataobj, slab_size):
+            data = image_normalize(data, 0, 255, np.int16, image_range=(data_min, data_max))
+            rescaled_values[np.unique(data)] = True
+        status = dlg.DialogRescalePixelIntensity(data_max, np.count_nonzero(rescaled_values))
 
         if status:
-            data = data_temp
+            output_range = 0, 255
             # dlg.WarningRescalePixelValues()
 
-    # Convert RAS+ to default InVesalius orientation ZYX
-    data = np.swapaxes(data, 0, 2)
-    data = np.fliplr(data)
+    if output_range is not None:
+        statistics.reset()
+        for start, data in _read_image_slabs(dataobj, slab_size):
+            data = image_normalize(data, *output_range, np.int16, image_range=(data_min, data_max))
+            _write_image_slab(matrix, start, data, statistics)
 
-    matrix = np.memmap(temp_file, mode="w+", dtype=np.int16, shape=data.shape)
-    matrix[:] = data[:]
     matrix.flush()
 
-    scalar_range = np.amin(matrix), np.amax(matrix)
+    scalar_range = statistics.scalar_range
     os.close(temp_fd)
 
     return matrix, scalar_range, temp_file
@@ -552,6 +628,21 @@ def get_LUT_value_255(data, window, level):
     return data
 
 
+def get_LUT_value_255_range(t0, t1, window, level, value_range, dtype="int16"):
+    """
+    Return the (minimum, maximum) of the integer values in value_range whose
+    get_LUT_value_255 is inside [t0, t1], or None if there is none. The LUT
+    is monotonic, so thresholding the image by this range is the same as
+    thresholding its LUT values without computing them for the whole image.
+    """
+    values = np.arange(int(value_range[0]), int(value_range[1]) + 1).astype(dtype)
+    lut = get_LUT_value_255(values, window, level)
+    inside = np.flatnonzero((lut >= t0) & (lut <= t1))
+    if not inside.size:
+        return None
+    return values[inside[0]], values[inside[-1]]
+
+
 def get_LUT_value(data: np.ndarray, window: int, level: int) -> np.ndarray:
     shape = data.shape
     data_ = data.ravel()
@@ -577,9 +668,16 @@ def get_LUT_value_normalized(img, a_min, a_max, b_min=0.0, b_max=1.0, clip=True)
     return img
 
 
-def image_normalize(image, min_=0.0, max_=1.0, output_dtype=np.int16):
+def image_normalize(image, min_=0.0, max_=1.0, output_dtype=np.int16, image_range=None):
+    """
+    Linearly map the values of image from image_range (the image minimum and
+    maximum if None) to [min_, max_].
+    """
     output = np.empty(shape=image.shape, dtype=output_dtype)
-    imin, imax = image.min(), image.max()
+    if image_range is None:
+        imin, imax = image.min(), image.max()
+    else:
+        imin, imax = image_range
     if imin == imax:
         output[:] = min_
         return output
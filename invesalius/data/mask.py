@@ -24,6 +24,7 @@ import shutil
 import tempfile
 import time
 import weakref
+import zlib
 
 import numpy as np
 from scipy import ndimage
@@ -37,21 +38,99 @@ from invesalius.data.volume_mask import VolumeMask
 from invesalius.pubsub import pub as Publisher
 
 
+def get_changed_bbox(array, p_array):
+    """
+    Return the bounding box (a tuple of slices) of the voxels which differ
+    between array and p_array, or None if they are equal.
+    """
+    changed = array != p_array
+    bbox = []
+    for axis in range(changed.ndim):
+        other_axes = tuple(a for a in range(changed.ndim) if a != axis)
+        indexes = np.flatnonzero(changed.any(axis=other_axes))
+        if not len(indexes):
+            return None
+        bbox.append(slice(int(indexes[0]), int(indexes[-1]) + 1))
+    return tuple(bbox)
+
+
 class EditionHistoryNode:
-    def __init__(self, index, orientation, array, clean=False):
+    """
+    A state of a mask slice (or of the whole mask, when orientation is
+    "VOLUME") kept compressed in memory. When base is given, only the
+    bounding box of the voxels that differ from the base node is stored.
+    The compressed data may be spilled to a temporary file to free memory.
+
+    A "VOLUME" state may be of only a region (a tuple of slices) of the mask.
+    """
+
+    def __init__(
+        self, index, orientation, array, clean=False, base=None, base_array=None, region=None
+    ):
         self.index = index
         self.orientation = orientation
-        self.fd, self.filename = tempfile.mkstemp(suffix=".npy")
         self.clean = clean
+        self.region = region
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self.filename = None
+
+        self.base = base
+        self.bbox = None
+        if base is not None:
+            if base_array is None:
+                base_array = base.get_array()
+            self.bbox = get_changed_bbox(array, base_array)
+            array = array[self.bbox] if self.bbox is not None else array[:0]
+
+        self._data = zlib.compress(
+            np.ascontiguousarray(array), const.MASK_HISTORY_COMPRESSION_LEVEL
+        )
+        print("Saving history", self.index, self.orientation, len(self._data), self.clean)
 
-        self._save_array(array)
+    @property
+    def nbytes(self):
+        """
+        Memory used by the compressed data, 0 when it's spilled to disk.
+        """
+        if self._data is None:
+            return 0
+        return len(self._data)
+
+    def spill(self):
+        if self._data is None:
+            return
+        fd, filename = tempfile.mkstemp(suffix=".hist")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._data)
+        self.filename = filename
+        self._data = None
+
+    def _load_data(self):
+        if self._data is not None:
+            return self._data
+        with open(self.filename, "rb") as f:
+            return f.read()
+
+    def get_array(self):
+        if self.base is None:
+            shape = self.shape
+        elif self.bbox is None:
+            return self.base.get_array()
+        else:
+            shape = tuple(s.stop - s.start for s in self.bbox)
 
-    def _save_array(self, array):
-        np.save(self.filename, array)
-        print("Saving history", self.index, self.orientation, self.filename, self.clean)
+        array = np.frombuffer(zlib.decompress(self._load_data()), dtype=self.dtype)
+        array = array.reshape(shape)
+        if self.base is None:
+            return array
+
+        full_array = self.base.get_array().copy()
+        full_array[self.bbox] = array
+        return full_array
 
     def commit_history(self, mvolume):
-        array = np.load(self.filename)
+        array = self.get_array()
         if self.orientation == "AXIAL":
             mvolume[self.index + 1, 1:, 1:] = array
             if self.clean:
@@ -65,32 +144,44 @@ class EditionHistoryNode:
             if self.clean:
                 mvolume[0, 0, self.index + 1] = 1
         elif self.orientation == "VOLUME":
-            mvolume[:] = array
+            if self.region is None:
+                mvolume[:] = array
+            else:
+                mvolume[self.region] = array
 
         print("applying to", self.orientation, "at slice", self.index)
 
     def __del__(self):
-        print("Removing", self.filename)
-        os.close(self.fd)
-        os.remove(self.filename)
+        if self.filename is not None:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
 
 
 class EditionHistory:
-    def __init__(self, size=50):
+    def __init__(self, size=50, memory_budget=None):
         self.history = []
         self.index = -1
         self.size = size * 2
+        if memory_budget is None:
+            memory_budget = const.MASK_HISTORY_MEMORY_BUDGET
+        self.memory_budget = memory_budget
 
         Publisher.sendMessage("Enable undo", value=False)
         Publisher.sendMessage("Enable redo", value=False)
 
-    def new_node(self, index, orientation, array, p_array, clean):
-        # Saving the previous state, used to undo/redo correctly.
-        p_node = EditionHistoryNode(index, orientation, p_array, clean)
+    def new_node(self, index, orientation, array, p_array, clean, region=None):
+        # Saving the previous state, used to undo/redo correctly. The new
+        # state is stored as the voxels changed from the previous one.
+        p_node = EditionHistoryNode(index, orientation, p_array, clean, region=region)
         self.add(p_node)
 
-        node = EditionHistoryNode(index, orientation, array, clean)
+        node = EditionHistoryNode(
+            index, orientation, array, clean, base=p_node, base_array=p_array, region=region
+        )
         self.add(node)
+        self._enforce_memory_budget()
 
     def add(self, node):
         if self.index == self.size:
@@ -106,6 +197,18 @@ class EditionHistory:
         Publisher.sendMessage("Enable undo", value=True)
         Publisher.sendMessage("Enable redo", value=False)
 
+    def _enforce_memory_budget(self):
+        """
+        Spill the oldest nodes to disk while the history uses more memory than
+        the budget. The last two nodes (the last edition) are kept in memory.
+        """
+        used = sum(node.nbytes for node in self.history)
+        for node in self.history[:-2]:
+            if used <= self.memory_budget:
+                break
+            used -= node.nbytes
+            node.spill()
+
     def undo(self, mvolume, actual_slices=None):
         h = self.history
         if self.index > 0:
@@ -138,7 +241,7 @@ class EditionHistory:
 
         if self.index == 0:
             Publisher.sendMessage("Enable undo", value=False)
-        print("AT", self.index, len(self.history), self.history[self.index].filename)
+        print("AT", self.index, len(self.history))
 
     def redo(self, mvolume, actual_slices=None):
         h = self.history
@@ -173,7 +276,7 @@ class EditionHistory:
 
         if self.index == len(h) - 1:
             Publisher.sendMessage("Enable redo", value=False)
-        print("AT", self.index, len(h), h[self.index].filename)
+        print("AT", self.index, len(h))
 
     def _reload_slice(self, index):
         Publisher.sendMessage(
@@ -209,6 +312,9 @@ class Mask:
     def __init__(self):
         Mask.general_index += 1
         self.index = Mask.general_index
+        self._temp_file = None
+        # Set when the matrix is a copy-on-write map of a project file.
+        self._archive_filename = None
         self.matrix = None
         self.spacing = (1.0, 1.0, 1.0)
         self.imagedata = None
@@ -264,8 +370,13 @@ class Mask:
             self.volume.set_colour(colour)
             Publisher.sendMessage("Render volume viewer")
 
-    def save_history(self, index, orientation, array, p_array, clean=False):
-        self.history.new_node(index, orientation, array, p_array, clean)
+    def save_history(self, index, orientation, array, p_array, clean=False, region=None):
+        """
+        Save an edition of the mask: p_array is the state before it, array
+        the one after it. For "VOLUME" editions, region is the tuple of
+        slices of the matrix the arrays are of (the whole matrix if None).
+        """
+        self.history.new_node(index, orientation, array, p_array, clean, region)
 
     def undo_history(self, actual_slices):
         self.history.undo(self.matrix, actual_slices)
@@ -316,8 +427,8 @@ class Mask:
         mask = {}
         filename = f"mask_{self.index}"
         mask_filename = f"{filename}.dat"
-        # Map the live mask data file into the archive — never add to save_temp_files
-        filelist[self.temp_file] = mask_filename
+        # Map the live mask data into the archive — never add to save_temp_files
+        filelist[self.data_source] = mask_filename
 
         mask["index"] = self.index
         mask["name"] = self.name
@@ -345,7 +456,7 @@ class Mask:
 
         return plist_filename
 
-    def OpenPList(self, filename):
+    def OpenPList(self, filename, archive=None):
         with open(filename, "r+b") as f:
             mask = plistlib.load(f, fmt=plistlib.FMT_XML)
 
@@ -363,7 +474,11 @@ class Mask:
 
         dirpath = os.path.abspath(os.path.split(filename)[0])
         path = os.path.join(dirpath, mask_file)
-        self._open_mask(path, tuple(shape))
+        offset = archive.get_offset(mask_file) if archive is not None else None
+        if offset is not None and not os.path.exists(path):
+            self._open_mask_from_archive(archive.filename, offset, tuple(shape))
+        else:
+            self._open_mask(path, tuple(shape))
 
     def OnFlipVolume(self, axis):
         # Note: slice_.py's OnFlipVolume already zeros matrix[:] and clears
@@ -400,6 +515,61 @@ class Mask:
         self.temp_file = filename
         self.matrix = np.memmap(filename, shape=shape, dtype=dtype, mode="r+")
 
+    def _open_mask_from_archive(self, filename, offset, shape, dtype="uint8"):
+        """
+        Map the mask data stored at offset of the project file. The map is
+        copy-on-write: the project file is never changed and the data is only
+        read from it when accessed. The mask gets its own temp file when one is
+        needed (see temp_file).
+        """
+        self._archive_filename = filename
+        self.matrix = np.memmap(filename, shape=shape, dtype=dtype, mode="c", offset=offset)
+
+    @property
+    def temp_file(self):
+        if self._archive_filename is not None:
+            self._copy_to_temp_file()
+        return self._temp_file
+
+    @temp_file.setter
+    def temp_file(self, value):
+        self._temp_file = value
+
+    @property
+    def data_source(self):
+        """
+        The source of the mask data saved in project files: its temp file or,
+        while it's mapped from a project file, its matrix, which is saved from
+        memory without a temp file.
+        """
+        if self._archive_filename is not None:
+            from invesalius.project import ArraySource
+
+            return ArraySource(self.matrix)
+        return self._temp_file
+
+    def _copy_to_temp_file(self):
+        """
+        Write the mask mapped from a project file, with its changes, to a temp
+        file and use it from now on.
+        """
+        temp_fd, temp_file = tempfile.mkstemp()
+        matrix = np.memmap(temp_file, mode="w+", dtype=self.matrix.dtype, shape=self.matrix.shape)
+        matrix[:] = self.matrix
+        matrix.flush()
+
+        self.temp_fd = temp_fd
+        self._temp_file = temp_file
+        self._archive_filename = None
+        self.matrix = matrix
+
+        # The 3D preview was built on the old matrix.
+        if self.imagedata is not None:
+            self.imagedata = self.as_vtkimagedata()
+            if self.volume:
+                self.volume.change_imagedata()
+                Publisher.sendMessage("Render volume viewer")
+
     def _set_class_index(self, index):
         Mask.general_index = index
 
@@ -574,4 +744,6 @@ class Mask:
         except AttributeError:
             pass
 
-        os.remove(self.temp_file)
+        # Masks still mapped from the project file have no temp file.
+        if self._temp_file is not None:
+            os.remove(self._temp_file)
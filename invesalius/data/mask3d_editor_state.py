@@ -1,3 +1,4 @@
+import time
 from dataclasses import dataclass, field
 from typing import Any
 
@@ -8,12 +9,42 @@ from vtkmodules.vtkRenderingCore import vtkCoordinate
 import invesalius.constants as const
 import invesalius.data.slice_ as slc
 import invesalius.session as ses
+from invesalius.data.mask import get_changed_bbox
 from invesalius.data.polygon_select import PolygonSelectCanvas
 from invesalius.pubsub import pub as Publisher
 from invesalius.utils import vtkarray_to_numpy
 from invesalius_rs import brush_mask_rs, mask_cut, polygon2mask_rs
 
 
+def get_brush_bbox(shape, spacing, center, radius):
+    """
+    Return the bounding box (a tuple of (z, y, x) slices) of the voxels of a
+    volume of the given shape that can be inside the sphere brush, or None if
+    no voxel can be.
+    """
+    bbox = []
+    for n, s, c in zip(shape, spacing[::-1], center[::-1]):
+        start = max(int(np.floor((c - radius) / s)), 0)
+        stop = min(int(np.ceil((c + radius) / s)) + 1, n)
+        if start >= stop:
+            return None
+        bbox.append(slice(start, stop))
+    return tuple(bbox)
+
+
+def union_bbox(bbox1, bbox2):
+    """
+    Return the bounding box of the bounding boxes bbox1 and bbox2 (any may be None).
+    """
+    if bbox1 is None:
+        return bbox2
+    if bbox2 is None:
+        return bbox1
+    return tuple(
+        slice(min(s1.start, s2.start), max(s1.stop, s2.stop)) for s1, s2 in zip(bbox1, bbox2)
+    )
+
+
 @dataclass
 class Mask3DEditorState:
     """State manager for the 3D Mask Editor.
@@ -33,6 +64,14 @@ class Mask3DEditorState:
     has_set_mask_preview: bool = False
     base_mask_data: npt.NDArray | None = field(default=None, init=False)
     has_cleared_for_crop: bool = field(default=False, init=False)
+    # The (bbox, values before) of each region changed by the brush stroke.
+    stroke_changes: list[tuple[tuple[slice, ...], npt.NDArray]] = field(
+        default_factory=list, init=False
+    )
+    # The modified_time of the current mask when mask_data was a copy of it.
+    mask_data_time: float | None = field(default=None, init=False)
+    preview_update_time: float = field(default=0.0, init=False)
+    is_preview_outdated: bool = field(default=False, init=False)
 
     resolution: tuple[int, int] = field(init=False)
     world_to_screen: npt.NDArray | None = field(default=None, init=False)
@@ -72,7 +111,7 @@ class Mask3DEditorState:
             Publisher.sendMessage("Enable mask 3D preview")
 
         if slc.Slice().current_mask:
-            self.mask_data = slc.Slice().current_mask.matrix.copy()
+            self._copy_mask_data()
 
         if not self.has_set_mask_preview:
             Publisher.sendMessage("Render volume viewer")
@@ -151,9 +190,11 @@ class Mask3DEditorState:
         self.resolution = size
 
     def OnRestoreInitMask(self):
-        if self.mask_data is not None:
-            _mat = self.mask_data[1:, 1:, 1:].copy()
-            self.update_views(_mat)
+        cur_mask = slc.Slice().current_mask
+        if self.mask_data is not None and cur_mask is not None:
+            bbox = get_changed_bbox(self.mask_data[1:, 1:, 1:], cur_mask.matrix[1:, 1:, 1:])
+            if bbox is not None:
+                self.update_views(bbox)
 
     def get_filters(self) -> list[npt.NDArray]:
         w, h = self.resolution
@@ -199,7 +240,7 @@ class Mask3DEditorState:
         if self.edit_mode == const.MASK_3D_EDIT_INCLUDE:
             np.logical_not(filter, out=filter)
 
-        _mat = self.mask_data[1:, 1:, 1:].copy()
+        _mat = self.mask_data[1:, 1:, 1:]
         out = _mat.copy()
 
         slice = slc.Slice()
@@ -221,7 +262,11 @@ class Mask3DEditorState:
         mask_cut(_mat, sx, sy, sz, depth, filter, wts, wtc, out, self.edit_mode)  # type: ignore
 
         self.mask_data[1:, 1:, 1:] = out
-        self.update_views(out)
+        cur_mask = slice.current_mask
+        if cur_mask is not None:
+            bbox = get_changed_bbox(out, cur_mask.matrix[1:, 1:, 1:])
+            if bbox is not None:
+                self.update_views(bbox)
 
     def brush_stroke(self, world_coord):
         if self.mask_data is None:
@@ -249,36 +294,56 @@ class Mask3DEditorState:
         rust_cy = -wy - sy
         rust_cz = wz + sz
 
+        # Only the bounding box of the brush is edited, copied back and updated.
+        bbox = get_brush_bbox(_mat.shape, (sx, sy, sz), (rust_cx, rust_cy, rust_cz), radius)
+        if bbox is None:
+            return
+        z0, y0, x0 = (s.start for s in bbox)
+        center = (rust_cx - x0 * sx, rust_cy - y0 * sy, rust_cz - z0 * sz)
+
         # Apply the high-performance Rust sphere brush
         orig_mat = None
         if self.edit_mode == 0 and self.base_mask_data is not None:
-            orig_mat = self.base_mask_data[1:, 1:, 1:]
-        elif hasattr(self, "original_mask_data"):
-            orig_mat = self.original_mask_data[1:, 1:, 1:]
+            orig_mat = self.base_mask_data[1:, 1:, 1:][bbox]
 
-        brush_mask_rs(
-            _mat, orig_mat, (sx, sy, sz), (rust_cx, rust_cy, rust_cz), radius, self.edit_mode
-        )
+        self.stroke_changes.append((bbox, _mat[bbox].copy()))
+        brush_mask_rs(_mat[bbox], orig_mat, (sx, sy, sz), center, radius, self.edit_mode)
 
         # After Rust modifies the array in-place, we update the viewer
-        self.update_views(_mat)
+        self.update_views(bbox, update_preview=False)
 
     def OnMaskChanged(self, index: int):
         cur_mask = slc.Slice().current_mask
         if cur_mask is not None:
-            self.mask_data = cur_mask.matrix.copy()
+            self._copy_mask_data()
             self.has_cleared_for_crop = False
 
-    def update_views(self, _mat):
-        # Notify the 2D views that the mask changed.
+    def _copy_mask_data(self):
+        cur_mask = slc.Slice().current_mask
+        self.mask_data = cur_mask.matrix.copy()
+        self.mask_data_time = cur_mask.modified_time
+
+    def update_views(self, bbox, update_preview=True):
+        """
+        Copy the bbox region ((z, y, x) slices) of mask_data, the region that
+        was edited, to the current mask and update the views showing it. The
+        3D preview is updated at most once per MASK_3D_EDIT_PREVIEW_INTERVAL
+        unless update_preview.
+        """
         _cur_mask = slc.Slice().current_mask
-        slc.Slice().discard_all_buffers()
         if _cur_mask is not None:
-            _cur_mask.matrix[1:, 1:, 1:] = self.mask_data[1:, 1:, 1:]
+            _cur_mask.matrix[1:, 1:, 1:][bbox] = self.mask_data[1:, 1:, 1:][bbox]
             _cur_mask.was_edited = True
+            # Notify the 2D views that the mask changed.
+            slc.Slice().discard_mask_region(bbox)
 
-            if _cur_mask.volume is not None and ses.Session().mask_3d_preview:
-                _cur_mask._update_imagedata(update_volume_viewer=True)
+            now = time.monotonic()
+            if update_preview or now - self.preview_update_time >= (
+                const.MASK_3D_EDIT_PREVIEW_INTERVAL
+            ):
+                self._update_preview(_cur_mask)
+            else:
+                self.is_preview_outdated = True
 
         # Publisher.sendMessage("Render volume viewer") is already handled by _update_imagedata
         Publisher.sendMessage("Reload actual slice")
@@ -287,20 +352,53 @@ class Mask3DEditorState:
     def start_brush_stroke(self):
         cur_mask = slc.Slice().current_mask
         if cur_mask is not None:
-            self.mask_data = cur_mask.matrix.copy()
-            self.original_mask_data = cur_mask.matrix.copy()
+            # mask_data is only copied again if the mask was changed elsewhere.
+            if self.mask_data is None or self.mask_data_time != cur_mask.modified_time:
+                self._copy_mask_data()
+            self.stroke_changes = []
             if self.edit_mode == 0:
                 if not self.has_cleared_for_crop or (
                     self.base_mask_data is not None
-                    and np.array_equal(self.mask_data, self.base_mask_data)
+                    and np.array_equal(cur_mask.matrix, self.base_mask_data)
                 ):
                     self.base_mask_data = cur_mask.matrix.copy()
                     self.mask_data[:] = 0
                     self.has_cleared_for_crop = True
+                    bbox = tuple(slice(0, n - 1) for n in self.mask_data.shape)
+                    self.stroke_changes.append((bbox, self.base_mask_data[1:, 1:, 1:]))
+                    self.update_views(bbox)
 
     def end_brush_stroke(self):
         cur_mask = slc.Slice().current_mask
-        if cur_mask is not None:
-            cur_mask.save_history(0, "VOLUME", self.original_mask_data, self.mask_data)
-            self.mask_data = cur_mask.matrix.copy()
-            cur_mask.modified(all_volume=True)
+        if cur_mask is None:
+            return
+
+        # Only the region edited by the stroke is saved in the history. Its
+        # state before the stroke is restored undoing the changes from the last.
+        bbox = None
+        for change_bbox, _ in self.stroke_changes:
+            bbox = union_bbox(bbox, change_bbox)
+        if bbox is not None:
+            array = self.mask_data[1:, 1:, 1:][bbox].copy()
+            p_array = array.copy()
+            for change_bbox, values in reversed(self.stroke_changes):
+                p_array[
+                    tuple(
+                        slice(s.start - b.start, s.stop - b.start)
+                        for s, b in zip(change_bbox, bbox)
+                    )
+                ] = values
+            region = tuple(slice(s.start + 1, s.stop + 1) for s in bbox)
+            cur_mask.save_history(0, "VOLUME", array, p_array, region=region)
+        self.stroke_changes = []
+
+        cur_mask.modified(all_volume=True)
+        self.mask_data_time = cur_mask.modified_time
+        if self.is_preview_outdated:
+            self._update_preview(cur_mask)
+
+    def _update_preview(self, cur_mask):
+        self.preview_update_time = time.monotonic()
+        self.is_preview_outdated = False
+        if cur_mask.volume is not None and ses.Session().mask_3d_preview:
+            cur_mask._update_imagedata(update_volume_viewer=True)
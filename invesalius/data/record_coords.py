@@ -17,67 +17,156 @@
 #    detalhes.
 # --------------------------------------------------------------------------
 
+"""
+Record the coregistered poses of the probe and the coils during navigation.
+"""
+
+import json
+import os
 import threading
 import time
+from time import perf_counter
+
+import numpy as np
 
-import wx
-from numpy import array, asarray, hstack, savetxt, vstack
+import invesalius.constants as const
 
-import invesalius.gui.dialogs as dlg
-from invesalius.i18n import tr as _
-from invesalius.pubsub import pub as Publisher
+POSE_COLUMNS = ("x", "y", "z", "a", "b", "g")
 
 
 class Record(threading.Thread):
     """
-    Thread created to save obj coords with software during neuronavigation
+    Thread that records the poses written to the navigation pose buffer (see
+    coordinates.PoseRingBuffer) into filename, with the time each one was
+    read from the tracker, relative to the start of the recording.
+
+    Each row has the time, the sample number and, for each object (name,
+    marker index), its pose and if its marker was visible; the poses of the
+    objects not coregistered in a sample are NaN. The file is CSV, or binary
+    float64 rows if it ends with .bin, whose columns are written to the
+    filename + ".json" file.
+
+    The rows are kept in a preallocated chunk and appended to the file when
+    it's full or every flush_interval seconds, so the recording takes the
+    same time however long it is, and a crash loses at most the last chunk.
     """
 
-    def __init__(self, nav_id, timestamp):
-        threading.Thread.__init__(self)
-        self.nav_id = nav_id
-        self.coord = None
-        self.timestamp = timestamp
-        self.coord_list = array([])
-        self.__bind_events()
-        self._pause_ = False
-        self.start()
+    def __init__(
+        self,
+        coord_buffer,
+        filename,
+        objects,
+        chunk_size=const.RECORD_CHUNK_SIZE,
+        flush_interval=const.RECORD_FLUSH_INTERVAL,
+    ):
+        threading.Thread.__init__(self, name="RecordCoords")
+        self.coord_buffer = coord_buffer
+        self.filename = filename
+        self.objects = list(objects)
+        self.binary = filename.lower().endswith(".bin")
+        self.flush_interval = flush_interval
+        self.columns = ["time", "seq"]
+        for name, _ in self.objects:
+            self.columns += [f"{name}_{c}" for c in POSE_COLUMNS] + [f"{name}_visible"]
+        self.n_rows = 0
+        # The samples replaced in the pose buffer before they were recorded.
+        self.lost = 0
 
-    def __bind_events(self) -> None:
-        # Publisher.subscribe(self.UpdateCurrentCoords, 'Co-registered points')
-        Publisher.subscribe(self.UpdateCurrentCoords, "Set cross focal point")
+        self._chunk = np.empty((chunk_size, len(self.columns)), dtype=np.float64)
+        self._n = 0
+        self._stop_event = threading.Event()
+        self._start_time = perf_counter()
+        latest = self.coord_buffer.latest()
+        self._last_seq = latest.seq if latest is not None else 0
+        self._file = self._open()
 
-    def UpdateCurrentCoords(self, position) -> None:
-        self.coord = asarray(position)
+    def _open(self):
+        if self.binary:
+            with open(self.filename + ".json", "w") as f:
+                json.dump({"columns": self.columns, "dtype": "float64", "start": time.time()}, f)
+            return open(self.filename, "wb")
+        f = open(self.filename, "w")
+        f.write(",".join(self.columns) + "\n")
+        return f
 
     def stop(self) -> None:
-        self._pause_ = True
-        # save coords dialog
-        filename = dlg.ShowLoadSaveDialog(
-            message=_("Save coords as..."),
-            wildcard=_("Coordinates files (*.csv)|*.csv"),
-            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
-            default_filename="coords.csv",
-            save_ext="csv",
-        )
-        if filename:
-            savetxt(
-                filename,
-                self.coord_list,
-                delimiter=",",
-                fmt="%.4f",
-                header="time, x, y, z, a, b, g",
-                comments="",
-            )
+        """
+        Stop recording, writing the remaining rows and closing the file.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        elif not self._file.closed:
+            self.record(self.coord_buffer.samples(self._last_seq))
+            self._close()
 
     def run(self):
-        initial_time = time.time()
-        while self.nav_id:
-            relative_time = asarray(time.time() - initial_time)
-            time.sleep(self.timestamp)
-            if self.coord_list.size == 0:
-                self.coord_list = hstack((relative_time, self.coord))
+        last_flush = perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                self.coord_buffer.wait_newer(self._last_seq, const.POSE_WAIT_TIMEOUT)
+                self.record(self.coord_buffer.samples(self._last_seq))
+                if self._n and perf_counter() - last_flush >= self.flush_interval:
+                    self.flush()
+                    last_flush = perf_counter()
+            self.record(self.coord_buffer.samples(self._last_seq))
+        finally:
+            self._close()
+
+    def record(self, samples) -> None:
+        if not samples:
+            return
+        if self._last_seq and samples[0].seq > self._last_seq + 1:
+            self.lost += samples[0].seq - self._last_seq - 1
+        for sample in samples:
+            if self._n == len(self._chunk):
+                self.flush()
+            self._fill_row(self._chunk[self._n], sample)
+            self._n += 1
+        self._last_seq = samples[-1].seq
+
+    def _fill_row(self, row, sample) -> None:
+        coords, marker_visibilities = sample.value[:2]
+        row[0] = sample.timestamp - self._start_time
+        row[1] = sample.seq
+        for n, (name, marker) in enumerate(self.objects):
+            start = 2 + n * (len(POSE_COLUMNS) + 1)
+            pose = coords.get(name)
+            row[start : start + len(POSE_COLUMNS)] = np.nan if pose is None else pose
+            visible = marker < len(marker_visibilities) and marker_visibilities[marker]
+            row[start + len(POSE_COLUMNS)] = visible
+
+    def flush(self) -> None:
+        """
+        Append the rows in the chunk to the file.
+        """
+        if self._n:
+            rows = self._chunk[: self._n]
+            if self.binary:
+                self._file.write(rows.tobytes())
             else:
-                self.coord_list = vstack((self.coord_list, hstack((relative_time, self.coord))))
-            if self._pause_:
-                return
+                np.savetxt(self._file, rows, delimiter=",", fmt="%.6f")
+            self.n_rows += self._n
+            self._n = 0
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def load_record(filename):
+    """
+    Return the columns and the rows of a file written by Record.
+    """
+    if filename.lower().endswith(".bin"):
+        with open(filename + ".json") as f:
+            columns = json.load(f)["columns"]
+        rows = np.fromfile(filename, dtype=np.float64).reshape(-1, len(columns))
+    else:
+        with open(filename) as f:
+            columns = f.readline().strip().split(",")
+        rows = np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2)
+    return columns, rows
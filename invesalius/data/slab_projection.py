@@ -0,0 +1,162 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Thick slab projections (MaxIP, MinIP and MeanIP) of a volume, computed from
+views of the volume (no copy of the slab) and updated incrementally while the
+slab slides, e.g. when the user scrolls through the slices.
+"""
+
+import threading
+
+import numpy as np
+
+import invesalius.constants as const
+
+
+def get_slab(matrix, axis, start, stop):
+    """
+    Return the view of the slices from start to stop of matrix along axis.
+    """
+    slab = [slice(None)] * 3
+    slab[axis] = slice(start, stop)
+    return matrix[tuple(slab)]
+
+
+class _SlabState:
+    def __init__(self, matrix_id, version, mode, start, stop, acc):
+        self.matrix_id = matrix_id
+        self.version = version
+        self.mode = mode
+        self.start = start
+        self.stop = stop
+        # The max or min image, or the sum image for the mean.
+        self.acc = acc
+
+
+class SlabProjector:
+    """
+    Projects slabs of a volume keeping, per thread and axis, the last one
+    projected. When the next slab overlaps it (e.g. it slid a slice) only the
+    slices entering and leaving the slab are read:
+
+    - MeanIP keeps a running sum;
+    - MaxIP (MinIP) keeps the extreme image. Only the pixels where the
+      extreme left the slab, and the entering slices don't have a value as
+      extreme, are projected again.
+    """
+
+    MODES = {
+        const.PROJECTION_MaxIP: np.maximum,
+        const.PROJECTION_MinIP: np.minimum,
+        const.PROJECTION_MeanIP: np.add,
+    }
+
+    # Project the whole slab again if more than this fraction of its pixels
+    # would have to be projected again.
+    MAX_STALE_FRACTION = 0.25
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def project(self, matrix, axis, start, number_slices, mode, version=None):
+        """
+        Return the mode projection of the number_slices slices of matrix from
+        start on along axis. version identifies the matrix data, the last slab
+        is not reused if the matrix was changed since it was projected.
+        """
+        stop = min(start + number_slices, matrix.shape[axis])
+        try:
+            states = self._local.states
+        except AttributeError:
+            states = self._local.states = {}
+
+        state = states.get(axis)
+        acc = None
+        if (
+            state is not None
+            and state.matrix_id == id(matrix)
+            and state.version == version
+            and state.mode == mode
+        ):
+            acc = self._slide(matrix, axis, state, start, stop)
+        if acc is None:
+            acc = self._project(matrix, axis, start, stop, mode)
+        states[axis] = _SlabState(id(matrix), version, mode, start, stop, acc)
+
+        if mode == const.PROJECTION_MeanIP:
+            dtype = matrix.dtype if np.issubdtype(matrix.dtype, np.floating) else np.float64
+            return (acc / (stop - start)).astype(dtype, copy=False)
+        return acc
+
+    def _project(self, matrix, axis, start, stop, mode):
+        slab = get_slab(matrix, axis, start, stop)
+        if mode == const.PROJECTION_MeanIP:
+            return np.asarray(slab.sum(axis, dtype=np.float64))
+        return np.asarray(self.MODES[mode].reduce(slab, axis))
+
+    def _slide(self, matrix, axis, state, start, stop):
+        """
+        Return the projection from start to stop updated from the one of the
+        state, or None if it's cheaper to project the slab again.
+        """
+        overlap = min(stop, state.stop) - max(start, state.start)
+        leaving = [(state.start, min(state.stop, start)), (max(state.start, stop), state.stop)]
+        entering = [(start, min(stop, state.start)), (max(start, state.stop), stop)]
+        leaving = [(a, b) for a, b in leaving if a < b]
+        entering = [(a, b) for a, b in entering if a < b]
+        n_changed = sum(b - a for a, b in leaving + entering)
+        if overlap <= 0 or n_changed >= overlap:
+            return None
+        if not n_changed:
+            return state.acc
+
+        op = self.MODES[state.mode]
+        if state.mode == const.PROJECTION_MeanIP:
+            acc = state.acc.copy()
+            for a, b in entering:
+                acc += get_slab(matrix, axis, a, b).sum(axis, dtype=np.float64)
+            for a, b in leaving:
+                acc -= get_slab(matrix, axis, a, b).sum(axis, dtype=np.float64)
+            return acc
+
+        entering_extreme = None
+        for a, b in entering:
+            extreme = op.reduce(get_slab(matrix, axis, a, b), axis)
+            entering_extreme = (
+                extreme if entering_extreme is None else op(entering_extreme, extreme)
+            )
+        if entering_extreme is None:
+            acc = state.acc.copy()
+        else:
+            acc = np.asarray(op(state.acc, entering_extreme))
+
+        # The pixels whose extreme left the slab, unless the entering slices
+        # have one as good or better.
+        stale = np.zeros(acc.shape, dtype=bool)
+        for a, b in leaving:
+            stale |= op.reduce(get_slab(matrix, axis, a, b), axis) == state.acc
+        if entering_extreme is not None:
+            stale &= ~(op(entering_extreme, state.acc) == entering_extreme)
+        n_stale = np.count_nonzero(stale)
+        if n_stale > self.MAX_STALE_FRACTION * stale.size:
+            return None
+        if n_stale:
+            slab = np.moveaxis(get_slab(matrix, axis, start, stop), axis, 0)
+            acc[stale] = op.reduce(slab[:, stale], 0)
+        return acc
@@ -16,10 +16,11 @@
 #    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
 #    detalhes.
 # --------------------------------------------------------------------------
+import functools
 import os
 import tempfile
 import threading
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Literal, NamedTuple
 
 import numpy as np
 from vtkmodules.vtkCommonCore import vtkLookupTable
@@ -39,7 +40,11 @@ from vtkmodules.vtkRenderingCore import (
 import invesalius.constants as const
 import invesalius.data.converters as converters
 import invesalius.data.filters as filters
+import invesalius.data.image_versions as image_versions
 import invesalius.data.imagedata_utils as iu
+import invesalius.data.slab_projection as slab_projection
+import invesalius.data.slice_cache as sc
+import invesalius.data.threshold as thr
 import invesalius.session as ses
 import invesalius.style as st
 import invesalius.utils as utils
@@ -59,38 +64,88 @@ OTHER = 0
 PLIST = 1
 WIDGET = 2
 
+ORIENTATION_AXES = thr.ThresholdIndex.ORIENTATION_AXES
+
+
+class SliceView(NamedTuple):
+    """
+    What an image slice computed in background depends on, read when it was
+    requested.
+    """
+
+    matrix: np.ndarray
+    projection: int
+    q_orientation: np.ndarray
+    center: tuple
+    window_level: float
+    interp_method: int
+    spacing: tuple
+    # The minimum of the image, the background of the rotated slices.
+    scalar_min: "float | None"
+    # Of the slice cache.
+    generation: int
+
 
 class SliceBuffer:
     """
     This class is used as buffer that mantains the vtkImageData and numpy array
     from actual slices from each orientation.
+
+    The slices shown before are kept in cache, shared by the buffers of all
+    orientations. Discarding data from a buffer also discards it from the
+    cache, for all the orientations, since the image and the masks are
+    changed in 3D.
     """
 
-    def __init__(self):
+    def __init__(self, cache: sc.SliceCache | None = None):
         self.index: int = -1
         self.image: np.ndarray | None = None
         self.mask: np.ndarray | None = None
         self.vtk_image: vtkImageData | None = None
         self.vtk_mask: vtkImageData | None = None
+        # (image, mask, threshold range) of the last threshold preview.
+        self.threshold_preview: tuple | None = None
+        # If image is a low quality preview of a rotated slice.
+        self.preview: bool = False
+        self.cache = cache
+
+    def _discard_cache(self, *kinds: str) -> None:
+        if self.cache is not None:
+            self.cache.discard(*kinds)
 
     def discard_vtk_mask(self) -> None:
         self.vtk_mask = None
+        self._discard_cache(sc.VTK_MASK)
 
     def discard_vtk_image(self) -> None:
         self.vtk_image = None
+        self._discard_cache(sc.VTK_IMAGE)
 
     def discard_mask(self) -> None:
         self.mask = None
+        self._discard_cache(sc.VTK_MASK)
 
     def discard_image(self) -> None:
         self.image = None
+        self.preview = False
+        self._discard_cache(sc.IMAGE, sc.VTK_IMAGE)
 
-    def discard_buffer(self) -> None:
+    def discard_view(self) -> None:
+        """
+        Discard the slices of the buffer but not the cached ones, used when
+        only the view changed (e.g. it was rotated), not the image or masks.
+        """
         self.index = -1
         self.image = None
         self.mask = None
         self.vtk_image = None
         self.vtk_mask = None
+        self.threshold_preview = None
+        self.preview = False
+
+    def discard_buffer(self) -> None:
+        self.discard_view()
+        self._discard_cache()
 
 
 # Only one slice will be initialized per time (despite several viewers
@@ -103,6 +158,8 @@ class Slice(metaclass=utils.Singleton):
         self.current_mask: Mask | None = None
         self.blend_filter = None
         self.histogram: np.ndarray | None = None
+        self.value_index: thr.ThresholdIndex | None = None
+        self._value_index_matrix: np.ndarray | None = None
         self._matrix: np.ndarray | None = None
         self._affine: np.ndarray = np.identity(4)
         self._n_tracts: int = 0
@@ -128,11 +185,15 @@ class Slice(metaclass=utils.Singleton):
         self.hue_range = (0, 0)
         self.value_range = (0, 1)
 
-        self.buffer_slices = {
-            "AXIAL": SliceBuffer(),
-            "CORONAL": SliceBuffer(),
-            "SAGITAL": SliceBuffer(),
-        }
+        self.slice_cache = sc.SliceCache(const.SLICE_CACHE_MEMORY_BUDGET)
+        self.prefetcher = sc.SlicePrefetcher(self.slice_cache)
+        self.slab_projector = slab_projection.SlabProjector()
+        # While the view is being rotated, the rotated slices are shown as low
+        # quality previews and resliced in full quality in background.
+        self.interactive_reslice = False
+        self.reslicer = sc.SlicePrefetcher(self.slice_cache)
+        self._reslice_previews: dict[str, tuple] = {}
+        self.buffer_slices = self._create_slice_buffers()
 
         self.num_gradient = 0
         self.interaction_style = st.StyleStateManager()
@@ -140,20 +201,29 @@ class Slice(metaclass=utils.Singleton):
         self.values = None
         self.nodes = None
         self.current_image_label = "original"
+        # Incremented each time an image is set, so the results computed from
+        # the image of a version label can tell it was replaced.
+        self.image_revision = 0
 
         self.from_ = OTHER
         self.__bind_events()
         self.opacity: float = 0.8
 
+    def _create_slice_buffers(self) -> dict[str, SliceBuffer]:
+        return {
+            "AXIAL": SliceBuffer(self.slice_cache),
+            "CORONAL": SliceBuffer(self.slice_cache),
+            "SAGITAL": SliceBuffer(self.slice_cache),
+        }
+
     @property
     def matrix(self) -> np.ndarray | None:
         from invesalius.project import Project
 
         if hasattr(self, "current_image_label") and self.current_image_label != "original":
-            proj = Project()
-            for label, mat in proj.image_versions:
-                if label == self.current_image_label:
-                    return mat
+            mat = Project().image_versions.get(self.current_image_label)
+            if mat is not None:
+                return mat
         return self._matrix
 
     @property
@@ -161,11 +231,9 @@ class Slice(metaclass=utils.Singleton):
         from invesalius.project import Project
 
         if hasattr(self, "current_image_label") and self.current_image_label != "original":
-            proj = Project()
-            for label, mat in proj.image_versions:
-                if label == self.current_image_label:
-                    if hasattr(mat, "filename"):
-                        return mat.filename
+            mat = Project().image_versions.get(self.current_image_label)
+            if hasattr(mat, "filename"):
+                return mat.filename
         return self._matrix_filename
 
     @matrix_filename.setter
@@ -174,23 +242,79 @@ class Slice(metaclass=utils.Singleton):
 
     @matrix.setter
     def matrix(self, value: np.ndarray) -> None:
+        self.set_matrix(value)
+
+    def set_matrix(self, value: np.ndarray, statistics: thr.ImageStatistics | None = None) -> None:
+        """
+        Set the image matrix. statistics, the values of the image counted
+        while it was loaded, avoids scanning the image again to index it.
+        """
         # Don't overwrite the original CT image if we're just switching to a filtered version
         from invesalius.project import Project
 
         proj = Project()
-        is_filtered = False
-        for lbl, mat in proj.image_versions:
-            if mat is value and lbl != "original":
-                is_filtered = True
-                break
+        is_filtered = any(
+            mat is value and lbl != "original" for lbl, mat in proj.image_versions.computed()
+        )
 
         if not is_filtered and not getattr(self, "_is_filtering", False):
             self._matrix = value
+        self.image_revision += 1
 
-        i, e = value.min(), value.max()
-        r = int(e) - int(i)
-        self.histogram = np.histogram(value, r, (i, e))[0]
+        self.update_value_index(value, statistics)
         self.center = [(s * d / 2.0) for (d, s) in zip(value.shape[::-1], self.spacing)]
+        self.cancel_slice_tasks()
+
+    def update_value_index(
+        self, matrix: np.ndarray, statistics: thr.ImageStatistics | None = None
+    ) -> None:
+        """
+        Index the values of the given image, used as the histogram of the image
+        and to answer the threshold queries while the threshold is changing.
+        """
+        self._value_index_matrix = matrix
+        if np.issubdtype(matrix.dtype, np.integer):
+            if statistics is not None and statistics.min_value is not None:
+                self.value_index = thr.ThresholdIndex(
+                    matrix,
+                    const.THRESHOLD_SLAB_BYTES,
+                    value_range=statistics.scalar_range,
+                    counts=statistics.get_counts(),
+                )
+            else:
+                self.value_index = thr.ThresholdIndex(matrix, const.THRESHOLD_SLAB_BYTES)
+            if self.value_index.max_value > self.value_index.min_value:
+                self.histogram = self.value_index.get_histogram()
+        else:
+            self.value_index = None
+            i, e = matrix.min(), matrix.max()
+            r = int(e) - int(i)
+            if r > 0:
+                self.histogram = np.histogram(matrix, r, (i, e))[0]
+
+    def get_scalar_range(self) -> tuple[int, int]:
+        """
+        Return the minimum and maximum values of the image, from the value
+        index when it's the index of the current image.
+        """
+        matrix = self.matrix
+        if self.value_index is not None and self._value_index_matrix is matrix:
+            return self.value_index.min_value, self.value_index.max_value
+        return matrix.min(), matrix.max()
+
+    def count_voxels_in_threshold(self, threshold_range) -> tuple[int, float]:
+        """
+        Return the number of voxels of the image inside the threshold range and
+        their volume in mm³, using the value index when available.
+        """
+        thresh_min, thresh_max = threshold_range
+        if self.value_index is not None:
+            n_voxels = self.value_index.count_in_range(thresh_min, thresh_max)
+        else:
+            matrix = self.matrix
+            n_voxels = int(np.count_nonzero((matrix >= thresh_min) & (matrix <= thresh_max)))
+        sx, sy, sz = self.spacing
+        return n_voxels, n_voxels * sx * sy * sz
 
     @property
     def spacing(self) -> tuple[float, float, float]:
@@ -246,6 +370,7 @@ class Slice(metaclass=utils.Singleton):
         Publisher.subscribe(self.__hide_current_mask, "Hide current mask")
         Publisher.subscribe(self.__show_current_mask, "Show current mask")
         Publisher.subscribe(self.__apply_image_filter, "Apply image filter")
+        Publisher.subscribe(self.__cancel_image_filter, "Cancel image filter")
         Publisher.subscribe(self.__switch_active_image, "Switch active image")
         Publisher.subscribe(self.__switch_active_image_by_label, "Switch active image by label")
         Publisher.subscribe(self.__bake_masks_for_image, "Bake masks for image")
@@ -319,9 +444,28 @@ class Slice(metaclass=utils.Singleton):
         raise ValueError(f"Invalid orientation: {orientation}")
 
     def discard_all_buffers(self) -> None:
+        self.cancel_slice_tasks()
         for buffer_ in self.buffer_slices.values():
             buffer_.discard_buffer()  # resets index=-1 + clears all image/mask caches
 
+    def discard_mask_region(self, region) -> None:
+        """
+        Discard the mask slices (buffered and cached) showing region, the
+        (z, y, x) slices of the voxels of the current mask that were changed.
+        """
+        if np.any(self.q_orientation[1::]):
+            # The rotated slices don't line up with the indexes of region.
+            self.slice_cache.discard(sc.VTK_MASK)
+            self.discard_all_buffers()
+            return
+
+        for orientation, buffer_ in self.buffer_slices.items():
+            slices = region[ORIENTATION_AXES[orientation]]
+            self.slice_cache.discard_slices(sc.VTK_MASK, orientation, slices.start, slices.stop)
+            if slices.start <= buffer_.index < slices.stop:
+                buffer_.mask = None
+                buffer_.vtk_mask = None
+
     def get_world_to_invesalius_vtk_affine(
         self, inverse: bool = False
     ) -> tuple[np.ndarray, "vtkMatrix4x4", float]:
@@ -520,6 +664,7 @@ class Slice(metaclass=utils.Singleton):
         self.num_gradient += 1
         self.current_mask.matrix[:] = 0
         self.current_mask.clear_history()
+        self.__send_threshold_voxel_count(threshold_range)
 
         if self.current_mask.auto_update_mask and self.current_mask.volume is not None:
             to_reload = True
@@ -577,9 +722,14 @@ class Slice(metaclass=utils.Singleton):
                 orientation,
             )
         self.num_gradient += 1
+        self.__send_threshold_voxel_count(threshold_range)
 
         Publisher.sendMessage("Reload actual slice")
 
+    def __send_threshold_voxel_count(self, threshold_range):
+        n_voxels, volume = self.count_voxels_in_threshold(threshold_range)
+        Publisher.sendMessage("Update threshold voxel count", n_voxels=n_voxels, volume=volume)
+
     def __set_current_mask_colour(self, colour):
         # "if" is necessary because wx events are calling this before any mask
         # has been created
@@ -744,58 +894,55 @@ class Slice(metaclass=utils.Singleton):
         session.ChangeProject()
 
     def GetSlices(self, orientation, slice_number, number_slices, inverted=False, border_size=1.0):
-        if (
-            self.buffer_slices[orientation].index == slice_number
-            and self._type_projection == const.PROJECTION_NORMAL
-        ):
-            if self.buffer_slices[orientation].vtk_image:
-                image = self.buffer_slices[orientation].vtk_image
+        buffer_ = self.buffer_slices[orientation]
+        if buffer_.index == slice_number and self._type_projection == const.PROJECTION_NORMAL:
+            if buffer_.vtk_image:
+                image = buffer_.vtk_image
             else:
-                n_image = self.get_image_slice(
+                image = self._get_vtk_image_slice(
                     orientation, slice_number, number_slices, inverted, border_size
                 )
-                image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
-                ww_wl_image = self.do_ww_wl(image)
-                image = self.do_colour_image(ww_wl_image)
             if self.current_mask and self.current_mask.is_shown:
-                if self.buffer_slices[orientation].vtk_mask:
+                if buffer_.vtk_mask:
                     # Prints that during navigation causes delay in update
                     # print "Getting from buffer"
-                    mask = self.buffer_slices[orientation].vtk_mask
+                    mask = buffer_.vtk_mask
                 else:
                     # Prints that during navigation causes delay in update
                     # print "Do not getting from buffer"
                     n_mask = self.get_mask_slice(orientation, slice_number)
-                    mask = converters.to_vtk(n_mask, self.spacing, slice_number, orientation)
-                    mask = self.do_colour_mask(mask, self.opacity)
-                    self.buffer_slices[orientation].mask = n_mask
+                    mask = self._get_vtk_mask_slice(orientation, slice_number, n_mask)
+                    buffer_.mask = n_mask
                 final_image = self.do_blend(image, mask)
-                self.buffer_slices[orientation].vtk_mask = mask
+                buffer_.vtk_mask = mask
             else:
                 final_image = image
-            self.buffer_slices[orientation].vtk_image = image
+            buffer_.vtk_image = image
         else:
-            n_image = self.get_image_slice(
+            previous_index = buffer_.index
+            image = self._get_vtk_image_slice(
                 orientation, slice_number, number_slices, inverted, border_size
             )
-            image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
-            ww_wl_image = self.do_ww_wl(image)
-            image = self.do_colour_image(ww_wl_image)
 
             if self.current_mask and self.current_mask.is_shown:
                 n_mask = self.get_mask_slice(orientation, slice_number)
-                mask = converters.to_vtk(n_mask, self.spacing, slice_number, orientation)
-                mask = self.do_colour_mask(mask, self.opacity)
+                mask = self._get_vtk_mask_slice(orientation, slice_number, n_mask)
                 final_image = self.do_blend(image, mask)
             else:
                 n_mask = None
                 final_image = image
                 mask = None
 
-            self.buffer_slices[orientation].index = slice_number
-            self.buffer_slices[orientation].mask = n_mask
-            self.buffer_slices[orientation].vtk_image = image
-            self.buffer_slices[orientation].vtk_mask = mask
+            buffer_.index = slice_number
+            buffer_.mask = n_mask
+            buffer_.vtk_image = image
+            buffer_.vtk_mask = mask
+
+            if previous_index >= 0 and previous_index != slice_number:
+                direction = 1 if slice_number > previous_index else -1
+                self.prefetch_image_slices(
+                    orientation, slice_number, direction, number_slices, inverted, border_size
+                )
 
         if (
             self.to_show_aux == "watershed"
@@ -829,6 +976,109 @@ class Slice(metaclass=utils.Singleton):
             final_image = self.do_blend(final_image, aux_image)
         return final_image
 
+    def _get_image_slice_key(
+        self, kind, orientation, slice_number, number_slices, inverted, border_size
+    ):
+        """
+        Return the key of the image slice in the slice cache, with everything
+        the projected (and coloured) slice depends on.
+        """
+        if self._type_projection == const.PROJECTION_NORMAL:
+            number_slices, inverted, border_size = 1, False, None
+        # The rotation is around the center.
+        center = tuple(self.center) if np.any(self.q_orientation[1::]) else None
+        return (
+            kind,
+            orientation,
+            slice_number,
+            self._type_projection,
+            number_slices,
+            inverted,
+            border_size,
+            self.window_width,
+            self.window_level,
+            tuple(self.q_orientation),
+            center,
+            self.interp_method,
+            self.current_image_label,
+            tuple(self.spacing),
+        )
+
+    def _get_vtk_image_slice(self, orientation, slice_number, number_slices, inverted, border_size):
+        """
+        Return the coloured vtkImageData of the image slice, from the slice
+        cache when it was already shown.
+        """
+        key = self._get_image_slice_key(
+            sc.VTK_IMAGE, orientation, slice_number, number_slices, inverted, border_size
+        )
+        image = self.slice_cache.get(key)
+        if image is None:
+            n_image = self.get_image_slice(
+                orientation, slice_number, number_slices, inverted, border_size
+            )
+            image = converters.to_vtk(n_image, self.spacing, slice_number, orientation)
+            ww_wl_image = self.do_ww_wl(image)
+            image = self.do_colour_image(ww_wl_image)
+            if not self.buffer_slices[orientation].preview:
+                self.slice_cache.put(key, image, image.GetActualMemorySize() * 1024)
+        return image
+
+    def _get_vtk_mask_slice(self, orientation, slice_number, n_mask):
+        """
+        Return the coloured vtkImageData of the current mask slice n_mask,
+        from the slice cache when it was already shown.
+        """
+        key = (
+            sc.VTK_MASK,
+            orientation,
+            slice_number,
+            id(self.current_mask),
+            self.current_mask.index,
+            tuple(self.current_mask.colour[:3]),
+            self.opacity,
+            tuple(self.spacing),
+        )
+        mask = self.slice_cache.get(key)
+        if mask is None:
+            mask = converters.to_vtk(n_mask, self.spacing, slice_number, orientation)
+            mask = self.do_colour_mask(mask, self.opacity)
+            self.slice_cache.put(key, mask, mask.GetActualMemorySize() * 1024)
+        return mask
+
+    def prefetch_image_slices(
+        self, orientation, slice_number, direction, number_slices=1, inverted=False, border_size=1.0
+    ):
+        """
+        Compute in background the const.SLICE_PREFETCH_SLICES image slices
+        after slice_number in the scroll direction (1 or -1).
+        """
+        n_slices = self.matrix.shape[ORIENTATION_AXES[orientation]]
+        view = self._get_slice_view()
+        tasks = []
+        for i in range(1, const.SLICE_PREFETCH_SLICES + 1):
+            n = slice_number + direction * i
+            if not 0 <= n < n_slices:
+                break
+            key = self._get_image_slice_key(
+                sc.IMAGE, orientation, n, number_slices, inverted, border_size
+            )
+            tasks.append(
+                (
+                    key,
+                    functools.partial(
+                        self._compute_image_slice,
+                        orientation,
+                        n,
+                        number_slices,
+                        inverted,
+                        border_size,
+                        view=view,
+                    ),
+                )
+            )
+        self.prefetcher.request(tasks)
+
     def get_image_slice(
         self,
         orientation,
@@ -837,287 +1087,241 @@ class Slice(metaclass=utils.Singleton):
         inverted=False,
         border_size=1.0,
     ):
-        dz, dy, dx = self.matrix.shape
         if (
             self.buffer_slices[orientation].index == slice_number
             and self.buffer_slices[orientation].image is not None
         ):
             n_image = self.buffer_slices[orientation].image
         else:
-            if self._type_projection == const.PROJECTION_NORMAL:
-                number_slices = 1
-
-            if np.any(self.q_orientation[1::]):
-                cx, cy, cz = self.center
-                T0 = transformations.translation_matrix((-cz, -cy, -cx))
-                #  Rx = transformations.rotation_matrix(rx, (0, 0, 1))
-                #  Ry = transformations.rotation_matrix(ry, (0, 1, 0))
-                #  Rz = transformations.rotation_matrix(rz, (1, 0, 0))
-                #  #  R = transformations.euler_matrix(rz, ry, rx, 'rzyx')
-                #  R = transformations.concatenate_matrices(Rx, Ry, Rz)
-                R = transformations.quaternion_matrix(self.q_orientation)
-                T1 = transformations.translation_matrix((cz, cy, cx))
-                M = transformations.concatenate_matrices(T1, R.T, T0)
-
-            if orientation == "AXIAL":
-                tmp_array = np.array(self.matrix[slice_number : slice_number + number_slices])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
+            key = self._get_image_slice_key(
+                sc.IMAGE, orientation, slice_number, number_slices, inverted, border_size
+            )
+            n_image = self.slice_cache.get(key)
+            preview = False
+            if n_image is None:
+                preview = self.interactive_reslice and np.any(self.q_orientation[1::])
+                n_image = self._compute_image_slice(
+                    orientation, slice_number, number_slices, inverted, border_size, preview
+                )
+                if preview:
+                    self._request_full_reslice(
+                        key, orientation, slice_number, number_slices, inverted, border_size
                     )
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dy, dx)
                 else:
-                    if inverted:
-                        tmp_array = tmp_array[::-1]
-
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(0)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(0)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(0)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 0, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(
-                            tmp_array, 0, int(self.window_level), int(self.window_level), n_image
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[1], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            0,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[slice_number])
+                    self.slice_cache.put(key, n_image, n_image.nbytes)
+            self.buffer_slices[orientation].image = n_image
+            self.buffer_slices[orientation].preview = preview
+        return n_image
 
-            elif orientation == "CORONAL":
-                tmp_array = np.array(self.matrix[:, slice_number : slice_number + number_slices, :])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
-                    )
+    def _request_full_reslice(
+        self, key, orientation, slice_number, number_slices, inverted, border_size
+    ):
+        """
+        Reslice in background, in full quality, the rotated slice shown as a
+        preview, swapping it in the viewer when it's ready.
+        """
+        compute = functools.partial(
+            self._compute_image_slice,
+            orientation,
+            slice_number,
+            number_slices,
+            inverted,
+            border_size,
+            view=self._get_slice_view(),
+        )
+        # The last preview of each orientation, a request replaces the pending ones.
+        self._reslice_previews[orientation] = key, compute
+        self.reslicer.request(list(self._reslice_previews.values()), self._on_full_reslice)
 
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dz, dx)
-                else:
-                    # if slice_number == 0:
-                    # slice_number = 1
-                    # if slice_number - number_slices < 0:
-                    # number_slices = slice_number
-                    if inverted:
-                        tmp_array = tmp_array[:, ::-1, :]
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(1)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(1)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(1)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 1, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(
-                            tmp_array, 1, int(self.window_level), int(self.window_level), n_image
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[2]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            1,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[:, slice_number, :])
-            elif orientation == "SAGITAL":
-                tmp_array = np.array(self.matrix[:, :, slice_number : slice_number + number_slices])
-                if np.any(self.q_orientation[1::]):
-                    transforms.apply_view_matrix_transform(
-                        self.matrix,
-                        self.spacing,
-                        M,
-                        slice_number,
-                        orientation,
-                        self.interp_method,
-                        self.matrix.min(),
-                        tmp_array,
-                    )
+    def _on_full_reslice(self, key):
+        import wx
 
-                if self._type_projection == const.PROJECTION_NORMAL:
-                    n_image = tmp_array.reshape(dz, dy)
-                else:
-                    if inverted:
-                        tmp_array = tmp_array[:, :, ::-1]
-                    if self._type_projection == const.PROJECTION_MaxIP:
-                        n_image = np.array(tmp_array).max(2)
-                    elif self._type_projection == const.PROJECTION_MinIP:
-                        n_image = np.array(tmp_array).min(2)
-                    elif self._type_projection == const.PROJECTION_MeanIP:
-                        n_image = np.array(tmp_array).mean(2)
-                    elif self._type_projection == const.PROJECTION_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.lmip(tmp_array, 2, self.window_level, self.window_level, n_image)
-                    elif self._type_projection == const.PROJECTION_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.mida(
-                            tmp_array, 2, int(self.window_level), int(self.window_level), n_image
-                        )
-
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            0,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_LMIP:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            1,
-                            n_image,
-                        )
-                    elif self._type_projection == const.PROJECTION_CONTOUR_MIDA:
-                        n_image = np.empty(
-                            shape=(tmp_array.shape[0], tmp_array.shape[1]),
-                            dtype=tmp_array.dtype,
-                        )
-                        mips.fast_countour_mip(
-                            tmp_array,
-                            border_size,
-                            2,
-                            self.window_level,
-                            self.window_level,
-                            2,
-                            n_image,
-                        )
-                    else:
-                        n_image = np.array(self.matrix[:, :, slice_number])
+        wx.CallAfter(self._swap_in_full_reslice, key[1], key)
 
-            self.buffer_slices[orientation].image = n_image
+    def _swap_in_full_reslice(self, orientation, key):
+        preview = self._reslice_previews.get(orientation)
+        if preview is None or preview[0] != key:
+            # The view changed since, the preview isn't shown anymore.
+            return
+        kind, orientation, slice_number, _projection, number_slices, inverted, border_size = key[:7]
+        if key != self._get_image_slice_key(
+            kind, orientation, slice_number, number_slices, inverted, border_size
+        ):
+            # Rotated (or changed otherwise) since it was requested.
+            del self._reslice_previews[orientation]
+            return
+        del self._reslice_previews[orientation]
+        buffer_ = self.buffer_slices[orientation]
+        if buffer_.preview:
+            buffer_.discard_view()
+            Publisher.sendMessage(f"Reload actual slice {orientation}")
+
+    def _get_slice_view(self) -> SliceView:
+        """
+        Return the current view, to compute slices in background with the
+        view they were requested for.
+        """
+        rotated = np.any(self.q_orientation[1::])
+        return SliceView(
+            self.matrix,
+            self._type_projection,
+            np.array(self.q_orientation),
+            tuple(self.center),
+            self.window_level,
+            self.interp_method,
+            tuple(self.spacing),
+            self.get_scalar_range()[0] if rotated else None,
+            self.slice_cache.generation,
+        )
+
+    def cancel_slice_tasks(self) -> None:
+        """
+        Cancel the slices being prefetched and resliced in background, when
+        the view or the image change.
+        """
+        self.prefetcher.cancel()
+        self.reslicer.cancel()
+        self._reslice_previews.clear()
+
+    def _compute_image_slice(
+        self,
+        orientation,
+        slice_number,
+        number_slices,
+        inverted,
+        border_size,
+        preview=False,
+        view=None,
+    ):
+        """
+        Return the image slice of the given orientation, or the projection of
+        the number_slices slices from slice_number on, in view (the current
+        one if None). If preview, rotated slices are resliced fast, in low
+        resolution and without interpolation.
+        """
+        if view is None:
+            view = self._get_slice_view()
+        matrix = view.matrix
+        axis = ORIENTATION_AXES[orientation]
+        if view.projection == const.PROJECTION_NORMAL:
+            number_slices = 1
+
+        rotated = np.any(view.q_orientation[1::])
+        if not rotated and view.projection in slab_projection.SlabProjector.MODES:
+            return self.slab_projector.project(
+                matrix,
+                axis,
+                slice_number,
+                number_slices,
+                view.projection,
+                view.generation,
+            )
+
+        # A view of the slab, only copied for the normal projection.
+        tmp_array = slab_projection.get_slab(
+            matrix, axis, slice_number, slice_number + number_slices
+        )
+
+        if rotated:
+            tmp_array = np.empty(tmp_array.shape, dtype=matrix.dtype)
+            cx, cy, cz = view.center
+            T0 = transformations.translation_matrix((-cz, -cy, -cx))
+            #  Rx = transformations.rotation_matrix(rx, (0, 0, 1))
+            #  Ry = transformations.rotation_matrix(ry, (0, 1, 0))
+            #  Rz = transformations.rotation_matrix(rz, (1, 0, 0))
+            #  #  R = transformations.euler_matrix(rz, ry, rx, 'rzyx')
+            #  R = transformations.concatenate_matrices(Rx, Ry, Rz)
+            R = transformations.quaternion_matrix(view.q_orientation)
+            T1 = transformations.translation_matrix((cz, cy, cx))
+            M = transformations.concatenate_matrices(T1, R.T, T0)
+            if preview:
+                self._reslice_preview(view, M, slice_number, orientation, tmp_array)
+            else:
+                transforms.apply_view_matrix_transform(
+                    matrix,
+                    view.spacing,
+                    M,
+                    slice_number,
+                    orientation,
+                    view.interp_method,
+                    view.scalar_min,
+                    tmp_array,
+                )
+
+        # The slice shape, without the projected axis.
+        shape = tmp_array.shape[:axis] + tmp_array.shape[axis + 1 :]
+        if view.projection == const.PROJECTION_NORMAL:
+            return np.array(tmp_array).reshape(shape)
+
+        if inverted:
+            tmp_array = np.flip(tmp_array, axis)
+
+        contour_modes = {
+            const.PROJECTION_CONTOUR_MIP: 0,
+            const.PROJECTION_CONTOUR_LMIP: 1,
+            const.PROJECTION_CONTOUR_MIDA: 2,
+        }
+        if view.projection == const.PROJECTION_MaxIP:
+            n_image = tmp_array.max(axis)
+        elif view.projection == const.PROJECTION_MinIP:
+            n_image = tmp_array.min(axis)
+        elif view.projection == const.PROJECTION_MeanIP:
+            n_image = tmp_array.mean(axis)
+        elif view.projection == const.PROJECTION_LMIP:
+            n_image = np.empty(shape=shape, dtype=tmp_array.dtype)
+            mips.lmip(tmp_array, axis, view.window_level, view.window_level, n_image)
+        elif view.projection == const.PROJECTION_MIDA:
+            n_image = np.empty(shape=shape, dtype=tmp_array.dtype)
+            mips.mida(tmp_array, axis, int(view.window_level), int(view.window_level), n_image)
+        elif view.projection in contour_modes:
+            n_image = np.empty(shape=shape, dtype=tmp_array.dtype)
+            mips.fast_countour_mip(
+                tmp_array,
+                border_size,
+                axis,
+                view.window_level,
+                view.window_level,
+                contour_modes[view.projection],
+                n_image,
+            )
+        else:
+            n_image = np.array(tmp_array.take(0, axis))
         return n_image
 
+    def _reslice_preview(self, view, M, slice_number, orientation, out):
+        """
+        Reslice out with the nearest neighbour of the image downsampled (a
+        strided view, not a copy) to const.RESLICE_PREVIEW_SIZE voxels on
+        its largest side.
+        """
+        factor = max(1, -(-max(out.shape) // const.RESLICE_PREVIEW_SIZE))
+        if factor == 1:
+            transforms.apply_view_matrix_transform(
+                view.matrix,
+                view.spacing,
+                M,
+                slice_number,
+                orientation,
+                0,
+                view.scalar_min,
+                out,
+            )
+            return
+
+        preview = np.empty([-(-n // factor) for n in out.shape], dtype=out.dtype)
+        transforms.apply_view_matrix_transform(
+            view.matrix[::factor, ::factor, ::factor],
+            tuple(s * factor for s in view.spacing),
+            M,
+            slice_number // factor,
+            orientation,
+            0,
+            view.scalar_min,
+            preview,
+        )
+        dz, dy, dx = out.shape
+        out[:] = preview.repeat(factor, 0).repeat(factor, 1).repeat(factor, 2)[:dz, :dy, :dx]
+
     def get_mask_slice(self, orientation, slice_number):
         """
         It gets the from actual mask the given slice from given orientation
@@ -1133,44 +1337,26 @@ class Slice(metaclass=utils.Singleton):
         if self.current_mask:
             derived = getattr(self.current_mask, "derived_from", "original")
             if derived.lower() != "original":
-                proj = Project()
-                for lbl, mat in proj.image_versions:
-                    if lbl == derived:
-                        target_matrix = mat
-                        break
-
-        if orientation == "AXIAL":
-            if self.current_mask.matrix[n, 0, 0] == 0:
-                mask = self.current_mask.matrix[n, 1:, 1:]
-                image_slice = target_matrix[slice_number]
-                mask[:] = self.do_threshold_to_a_slice(image_slice, mask)
-                self.current_mask.matrix[n, 0, 0] = 1
-            n_mask = np.array(
-                self.current_mask.matrix[n, 1:, 1:],
-                dtype=self.current_mask.matrix.dtype,
-            )
-
-        elif orientation == "CORONAL":
-            if self.current_mask.matrix[0, n, 0] == 0:
-                mask = self.current_mask.matrix[1:, n, 1:]
-                image_slice = target_matrix[:, slice_number, :]
-                mask[:] = self.do_threshold_to_a_slice(image_slice, mask)
-                self.current_mask.matrix[0, n, 0] = 1
-            n_mask = np.array(
-                self.current_mask.matrix[1:, n, 1:],
-                dtype=self.current_mask.matrix.dtype,
-            )
-
-        elif orientation == "SAGITAL":
-            if self.current_mask.matrix[0, 0, n] == 0:
-                mask = self.current_mask.matrix[1:, 1:, n]
-                image_slice = target_matrix[:, :, slice_number]
-                mask[:] = self.do_threshold_to_a_slice(image_slice, mask)
-                self.current_mask.matrix[0, 0, n] = 1
-            n_mask = np.array(
-                self.current_mask.matrix[1:, 1:, n],
-                dtype=self.current_mask.matrix.dtype,
-            )
+                target_matrix = Project().image_versions.get(derived, target_matrix)
+
+        axis = ORIENTATION_AXES[orientation]
+        # mask[flag] tells if the slice was already thresholded, mask[index] is
+        # the slice itself (the mask has one extra slice, row and column).
+        flag = [0, 0, 0]
+        flag[axis] = n
+        flag = tuple(flag)
+        index = [slice(1, None)] * 3
+        index[axis] = n
+        index = tuple(index)
+
+        if self.current_mask.matrix[flag] == 0:
+            mask = self.current_mask.matrix[index]
+            image_index = [slice(None)] * 3
+            image_index[axis] = slice_number
+            image_slice = target_matrix[tuple(image_index)]
+            mask[:] = self.do_threshold_to_a_slice(image_slice, mask)
+            self.current_mask.matrix[flag] = 1
+        n_mask = np.array(self.current_mask.matrix[index], dtype=self.current_mask.matrix.dtype)
 
         return n_mask
 
@@ -1249,11 +1435,12 @@ class Slice(metaclass=utils.Singleton):
                 # threshold slider). Uses the currently-buffered image — this
                 # does NOT write to current_mask.matrix, so it does not cause
                 # the mask-modified-on-scroll bug (that is fixed in get_mask_slice).
-                slice_ = self.buffer_slices[orientation].image
+                buffer_ = self.buffer_slices[orientation]
+                slice_ = buffer_.image
                 if slice_ is not None:
-                    self.buffer_slices[orientation].mask = (
-                        255 * ((slice_ >= thresh_min) & (slice_ <= thresh_max))
-                    ).astype("uint8")
+                    buffer_.mask = self.get_threshold_preview(
+                        orientation, buffer_, (thresh_min, thresh_max)
+                    )
 
             # Update viewer
             # Publisher.sendMessage('Update slice viewer')
@@ -1266,6 +1453,43 @@ class Slice(metaclass=utils.Singleton):
             )
         proj.mask_dict[index].threshold_range = threshold_range
 
+    def get_threshold_preview(self, orientation, buffer_, threshold_range):
+        """
+        Return the threshold of the buffered image slice. The value index is
+        used to skip the voxels when the slice is all inside or outside the
+        threshold range, or when the slice can't change since the last preview.
+        """
+        thresh_min, thresh_max = threshold_range
+        slice_ = buffer_.image
+        if (
+            self.value_index is None
+            or self._type_projection != const.PROJECTION_NORMAL
+            or np.any(self.q_orientation[1::])
+        ):
+            return thr.threshold_to_mask(slice_, None, thresh_min, thresh_max)
+
+        last_preview = buffer_.threshold_preview
+        if (
+            last_preview is not None
+            and last_preview[0] is slice_
+            and last_preview[1] is buffer_.mask
+            and not self.value_index.slice_changes(
+                orientation, buffer_.index, last_preview[2], threshold_range
+            )
+        ):
+            mask = buffer_.mask
+        else:
+            state = self.value_index.get_slice_state(
+                orientation, buffer_.index, thresh_min, thresh_max
+            )
+            if state is None:
+                mask = thr.threshold_to_mask(slice_, None, thresh_min, thresh_max)
+            else:
+                mask = np.full(slice_.shape, state, dtype="uint8")
+
+        buffer_.threshold_preview = (slice_, mask, tuple(threshold_range))
+        return mask
+
     def ShowMask(self, index, value):
         "Show a mask given its index and 'show' value (0: hide, other: show)"
         proj = Project()
@@ -1313,11 +1537,8 @@ class Slice(metaclass=utils.Singleton):
             colour = future_mask.colour
             self.SetMaskColour(index, colour, update=True)
 
-            self.buffer_slices = {
-                "AXIAL": SliceBuffer(),
-                "CORONAL": SliceBuffer(),
-                "SAGITAL": SliceBuffer(),
-            }
+            self.slice_cache.discard(sc.VTK_MASK)
+            self.buffer_slices = self._create_slice_buffers()
 
             Publisher.sendMessage(
                 "Set mask threshold in notebook",
@@ -1482,6 +1703,7 @@ class Slice(metaclass=utils.Singleton):
                 Publisher.sendMessage("Show MIP interface", flag=True)
 
             self._type_projection = tprojection
+            self.cancel_slice_tasks()
             for buffer_ in self.buffer_slices.values():
                 buffer_.discard_buffer()
 
@@ -1490,6 +1712,7 @@ class Slice(metaclass=utils.Singleton):
     def SetInterpolationMethod(self, interp_method):
         if self.interp_method != interp_method:
             self.interp_method = interp_method
+            self.cancel_slice_tasks()
             for buffer_ in self.buffer_slices.values():
                 buffer_.discard_buffer()
             Publisher.sendMessage("Reload actual slice")
@@ -1497,6 +1720,7 @@ class Slice(metaclass=utils.Singleton):
     def UpdateWindowLevelBackground(self, window, level):
         self.window_width = window
         self.window_level = level
+        self.cancel_slice_tasks()
 
         for buffer_ in self.buffer_slices.values():
             if self._type_projection in (
@@ -1551,6 +1775,7 @@ class Slice(metaclass=utils.Singleton):
 
         self.window_width = pn - p0
         self.window_level = (pn + p0) / 2
+        self.cancel_slice_tasks()
 
         Publisher.sendMessage("Reload actual slice")
 
@@ -1729,14 +1954,11 @@ class Slice(metaclass=utils.Singleton):
         else:
             thresh_min, thresh_max = self.current_mask.threshold_range
 
-        m = ((slice_matrix >= thresh_min) & (slice_matrix <= thresh_max)) * 255
-        m[mask == 1] = 1
-        m[mask == 2] = 2
-        m[mask == 253] = 253
-        m[mask == 254] = 254
-        return m.astype("uint8")
+        return thr.threshold_to_mask(slice_matrix, mask, thresh_min, thresh_max)
 
-    def do_threshold_to_all_slices(self, mask=None, target_matrix=None):
+    def do_threshold_to_all_slices(
+        self, mask=None, target_matrix=None, n_threads=const.THRESHOLD_THREADS
+    ):
         """
         Apply threshold to all slices.
 
@@ -1745,6 +1967,7 @@ class Slice(metaclass=utils.Singleton):
               None, it'll be the current mask.
             - target_matrix: the image matrix to apply the threshold to. If None,
               it will try to look up the image the mask was derived from.
+            - n_threads: the number of threads thresholding the slices.
         """
         if mask is None:
             mask = self.current_mask
@@ -1752,19 +1975,17 @@ class Slice(metaclass=utils.Singleton):
         if target_matrix is None:
             target_matrix = self.matrix
             derived = getattr(mask, "derived_from", "Original")
-            proj = Project()
-            for lbl, mat in proj.image_versions:
-                if lbl == derived:
-                    target_matrix = mat
-                    break
-
-        for n in range(1, mask.matrix.shape[0]):
-            if mask.matrix[n, 0, 0] == 0:
-                m = mask.matrix[n, 1:, 1:]
-                mask.matrix[n, 1:, 1:] = self.do_threshold_to_a_slice(
-                    target_matrix[n - 1], m, mask.threshold_range
-                )
-                mask.matrix[n, 0, 0] = 1
+            target_matrix = Project().image_versions.get(derived, target_matrix)
+
+        thresh_min, thresh_max = mask.threshold_range
+        thr.threshold_volume_to_mask(
+            target_matrix,
+            mask.matrix,
+            thresh_min,
+            thresh_max,
+            n_threads=n_threads,
+            slab_bytes=const.THRESHOLD_SLAB_BYTES,
+        )
 
         mask.matrix.flush()
 
@@ -1774,7 +1995,7 @@ class Slice(metaclass=utils.Singleton):
         else:
             # map scalar values into colors
             _min, _max = iu.get_LUT_value_255(
-                np.array((self.matrix.min(), self.matrix.max())),
+                np.array(self.get_scalar_range()),
                 self.window_width,
                 self.window_level,
             )
@@ -2005,6 +2226,7 @@ class Slice(metaclass=utils.Singleton):
 
         self.q_orientation = np.array((1, 0, 0, 0))
         self.center = [(s * d / 2.0) for (d, s) in zip(self.matrix.shape[::-1], self.spacing)]
+        self.cancel_slice_tasks()
 
         proj = Project()
         new_shape = self.matrix.shape
@@ -2012,9 +2234,9 @@ class Slice(metaclass=utils.Singleton):
         # Update image_versions to point to the reoriented matrix
         if proj.image_versions:
             current_label = getattr(self, "current_image_label", "original")
-            for i, (label, mat) in enumerate(proj.image_versions):
+            for label, mat in proj.image_versions.computed():
                 if label == current_label or mat is self.matrix:
-                    proj.image_versions[i] = (label, self.matrix)
+                    proj.image_versions.set_matrix(label, self.matrix)
                     break
 
         for mask in proj.mask_dict.values():
@@ -2114,9 +2336,12 @@ class Slice(metaclass=utils.Singleton):
             self.matrix.flush()
 
         # Also flip every image version (filtered images) so that mask
-        # threshold evaluation always uses the correctly flipped data.
+        # threshold evaluation always uses the correctly flipped data. The
+        # versions computed from their recipe are just discarded, they are
+        # computed again from the flipped original when needed.
         proj = Project()
-        for i, (label, mat) in enumerate(proj.image_versions):
+        proj.image_versions.discard_computed(keep=(self.matrix,))
+        for label, mat in proj.image_versions.computed():
             if mat is not self.matrix:
                 if axis == 0:
                     mat[:] = mat[::-1]
@@ -2154,7 +2379,8 @@ class Slice(metaclass=utils.Singleton):
         # swapaxes() returns a view — the underlying memmap file is NOT updated.
         # We must write the swapped data back in-place so that surface workers
         # (which read the file directly) see the correct data.
-        swapped = np.array(self.matrix.swapaxes(axis0, axis1))  # contiguous copy
+        old_matrix = self.matrix
+        swapped = np.array(old_matrix.swapaxes(axis0, axis1))  # contiguous copy
         new_shape = swapped.shape
 
         # Reopen the memmap with the new shape and write the swapped data
@@ -2199,7 +2425,9 @@ class Slice(metaclass=utils.Singleton):
         proj.matrix_shape = new_shape
         proj.spacing = self.spacing
         # matrix_dtype stays the same
-        for i, (label, mat) in enumerate(proj.image_versions):
+        proj.image_versions.swap_axes(axis0, axis1)
+        proj.image_versions.discard_computed(keep=(old_matrix,))
+        for label, mat in proj.image_versions.computed():
             swapped_ver = np.array(mat.swapaxes(axis0, axis1))
             ver_fd, ver_filename = _tempfile.mkstemp()
             ver_mat = np.memmap(ver_filename, dtype=mat.dtype, mode="w+", shape=swapped_ver.shape)
@@ -2216,7 +2444,8 @@ class Slice(metaclass=utils.Singleton):
                     _os.remove(old_ver_filename)
                 except OSError:
                     pass
-            proj.image_versions[i] = (label, ver_mat)
+            proj.image_versions.replace_matrix(label, ver_mat)
+        del old_matrix
 
         # Update original_orientation so the volume viewer camera is
         # positioned correctly after the swap.
@@ -2347,7 +2576,7 @@ class Slice(metaclass=utils.Singleton):
             # is always valid when AI segmentation tools read it later.
             orig = self._matrix
             if isinstance(orig, np.memmap):
-                proj.image_versions.append(("original", orig))
+                proj.image_versions.add_original(orig)
             else:
                 # Fallback: write to a temp file for consistent memmap semantics
                 import os
@@ -2358,105 +2587,93 @@ class Slice(metaclass=utils.Singleton):
                 orig_mat = np.memmap(temp_o, shape=orig.shape, dtype=orig.dtype, mode="w+")
                 orig_mat[:] = orig[:]
                 orig_mat.flush()
-                proj.image_versions.append(("original", orig_mat))
+                proj.image_versions.add_original(orig_mat)
+
+        self._filter_cancel = threading.Event()
+        parent = getattr(self, "current_image_label", "original")
+        step = image_versions.FilterStep(filter_type, value, dimension, orientation)
+
+        def _progress(fraction):
+            import wx
+
+            wx.CallAfter(
+                Publisher.sendMessage, "Update image filter progress", value=int(100 * fraction)
+            )
 
         def _run_filter():
             # Use the current matrix to allow filter chaining
             matrix = self.matrix
-            dtype = matrix.dtype
 
+            # The filtered image is written directly to a temporary memmap disk
+            # file so that multi-core 3D surface generators can access it.
+            fd_v, temp_v = tempfile.mkstemp(suffix=".dat")
+            os.close(fd_v)
+            result = filtered_mat = None
             try:
-                if dimension == "3D":
-                    if filter_type == 0:  # Gaussian Blur
-                        result = filters.gaussian_blur_filter(matrix, sigma=value)
-                    elif filter_type == 1:  # Median Filter
-                        result = filters.median_blur_filter(matrix, value)
-                    elif filter_type == 2:  # Mean Filter
-                        result = filters.mean_blur_filter(matrix, value)
-                    elif filter_type == 3:  # Sharpening
-                        result = filters.sharpening_filter(matrix, value)
-                    elif filter_type == 4:  # Despeckle
-                        result = filters.despeckle_filter(matrix, value)
-                    elif filter_type == 5:  # Border Detection
-                        result = filters.border_detection_filter(matrix, value=value)
-                    else:
-                        return
-                else:  # 2D filtering
-                    axis_map = {"Axial": 0, "Coronal": 1, "Sagittal": 2}
-                    axis = axis_map.get(orientation, 0)
-
-                    result = np.zeros_like(matrix)
-                    for i in range(matrix.shape[axis]):
-                        # Extract the 2D slice
-                        if axis == 0:
-                            slice_2d = matrix[i, :, :]
-                        elif axis == 1:
-                            slice_2d = matrix[:, i, :]
-                        else:
-                            slice_2d = matrix[:, :, i]
-
-                        # Apply filter to the 2D slice
-                        if filter_type == 0:
-                            res_2d = filters.gaussian_blur_filter(slice_2d, sigma=value)
-                        elif filter_type == 1:
-                            res_2d = filters.median_blur_filter(slice_2d, value)
-                        elif filter_type == 2:
-                            res_2d = filters.mean_blur_filter(slice_2d, value)
-                        elif filter_type == 3:
-                            res_2d = filters.sharpening_filter(slice_2d, value)
-                        elif filter_type == 4:
-                            res_2d = filters.despeckle_filter(slice_2d, value)
-                        elif filter_type == 5:
-                            res_2d = filters.border_detection_filter(slice_2d, value=value)
-                        else:
-                            return
-
-                        # Place it back
-                        if axis == 0:
-                            result[i, :, :] = res_2d
-                        elif axis == 1:
-                            result[:, i, :] = res_2d
-                        else:
-                            result[:, :, i] = res_2d
-
-                # Don't set self.matrix here - that would overwrite self._matrix
-                # (the original image). Instead, stash the result for _after_filter.
-                self._pending_filter_result = result.astype(dtype)
+                if filter_type not in filters.FILTERS:
+                    return
+                filtered_mat = np.memmap(temp_v, shape=matrix.shape, dtype=matrix.dtype, mode="w+")
+                if step.apply(matrix, filtered_mat, progress=_progress, cancel=self._filter_cancel):
+                    filtered_mat.flush()
+                    result = filtered_mat
             finally:
-                import wx
-
-                wx.CallAfter(self._after_filter, filter_type, value, dimension, orientation)
+                try:
+                    if result is None:
+                        # Close the memmap first, Windows can't remove an open file.
+                        del filtered_mat
+                        try:
+                            os.remove(temp_v)
+                        except OSError:
+                            pass
+                finally:
+                    # Don't set self.matrix here - that would overwrite self._matrix
+                    # (the original image). Instead, stash the result for _after_filter.
+                    self._pending_filter_result = result
+                    import wx
+
+                    wx.CallAfter(
+                        self._after_filter, filter_type, value, dimension, orientation, parent
+                    )
 
         thread = threading.Thread(target=_run_filter, daemon=True)
         thread.start()
 
-    def _after_filter(self, filter_type=None, value=None, dimension="3D", orientation="Axial"):
+    def __cancel_image_filter(self):
+        cancel = getattr(self, "_filter_cancel", None)
+        if cancel is not None:
+            cancel.set()
+
+    def _after_filter(
+        self, filter_type=None, value=None, dimension="3D", orientation="Axial", parent="original"
+    ):
         """Called on the main thread after filter completes."""
         self._is_filtering = False
 
         # Add the new filtered version to the project
         proj = Project()
         filtered_label = _("Filtered")
-        n_filtered = sum(1 for lbl, _mat in proj.image_versions if lbl.startswith(filtered_label))
+        n_filtered = sum(
+            1 for lbl in proj.image_versions.labels() if lbl.startswith(filtered_label)
+        )
         label = f"{filtered_label} {n_filtered + 1}"
-        # Write the filtered data to a temporary memmap disk file so that multi-core
-        # 3D surface generators can access it instead of silently falling back.
-        import os
-        import tempfile
 
         # Get the result produced by the filter thread
-        result = getattr(self, "_pending_filter_result", None)
-        if result is None:
+        filtered_mat = getattr(self, "_pending_filter_result", None)
+        if filtered_mat is None:
+            # Cancelled or failed.
+            Publisher.sendMessage("Image filter done")
             return
         self._pending_filter_result = None
 
-        fd_v, temp_v = tempfile.mkstemp(suffix=".dat")
-        os.close(fd_v)
-        filtered_mat = np.memmap(temp_v, shape=result.shape, dtype=result.dtype, mode="w+")
-        filtered_mat[:] = result[:]
-        filtered_mat.flush()
-
-        proj.image_versions.append((label, filtered_mat))
+        # Only the recipe of the version is needed, the filtered matrix may be
+        # discarded to save disk space and computed again if it's used later.
+        proj.image_versions.add(
+            label,
+            parent,
+            image_versions.FilterStep(filter_type, value, dimension, orientation),
+            filtered_mat,
+            filtered_mat.filename,
+        )
 
         if filter_type is not None:
             # 0: Gaussian, 1: Median, 2: Mean, 3: Sharpen, 4: Despeckle, 5: Sobel
@@ -2471,11 +2688,10 @@ class Slice(metaclass=utils.Singleton):
             fname = filter_names.get(filter_type, "unknown")
             if not hasattr(proj, "image_versions_meta"):
                 proj.image_versions_meta = {}
-            derived_from = getattr(self, "current_image_label", "original")
             proj.image_versions_meta[label] = {
                 "applied_filter": fname,
                 "sigma_smooth": str(value),
-                "derived": derived_from,
+                "derived": parent,
                 "dimension": dimension,
                 "orientation": orientation,
             }
@@ -2487,15 +2703,13 @@ class Slice(metaclass=utils.Singleton):
             # Update histogram and center for the filtered image.
             # Previously this happened via the matrix setter in _run_filter, but now
             # we bypass the setter there to protect self._matrix (the original image).
-            i, e = filtered_mat.min(), filtered_mat.max()
-            r = int(e) - int(i)
-            if r > 0:
-                self.histogram = np.histogram(filtered_mat, r, (i, e))[0]
+            self.update_value_index(filtered_mat)
             self.center = [(s * d / 2.0) for (d, s) in zip(filtered_mat.shape[::-1], self.spacing)]
 
             # Fix 1: Switch to the newly created filtered image label FIRST, so that
             # any mask creation or viewer updates triggered below use the correct image matrix!
             self.current_image_label = label
+            proj.image_versions.active = label
 
             # Must discard cached VTK buffers so viewers re-read the updated matrix
             self.discard_all_buffers()
@@ -2597,39 +2811,39 @@ class Slice(metaclass=utils.Singleton):
         wx.BeginBusyCursor()
         try:
             proj = Project()
-            for lbl, mat in proj.image_versions:
-                if lbl == label:
-                    self.current_image_label = label
-                    if label == "original":
-                        # Restore _matrix to the original memmap stored in image_versions
-                        # (which is the same object as _matrix or a disk-backed copy).
-                        # Do NOT call the matrix setter — it would re-check is_filtered
-                        # and may overwrite _matrix with a plain ndarray losing .filename.
-                        self._matrix = mat
-                    else:
-                        # For filtered versions call the setter to update histograms.
-                        self.matrix = mat
-
-                    # Maintainer fix: synchronize mask with the newly selected image view.
-                    # If the currently active mask doesn't belong to this image version,
-                    # search for one that does and switch to it BEFORE re-evaluating the volume.
-                    # This prevents the previous image's mask (along with its manual edits)
-                    # from being incorrectly re-thresholded against the new image matrix.
-                    if (
-                        self.current_mask
-                        and getattr(self.current_mask, "derived_from", "Original") != label
-                    ):
-                        for mask_idx, mask in proj.mask_dict.items():
-                            if getattr(mask, "derived_from", "Original") == label:
-                                Publisher.sendMessage("Change mask selected", index=mask_idx)
-                                Publisher.sendMessage("Select mask name in combo", index=mask_idx)
-                                Publisher.sendMessage("Show mask", index=mask_idx, value=True)
-                                break
-
-                    self.__switch_active_image(mat)
-                    Publisher.sendMessage("Update image version selection", label=label)
-
-                    break
+            mat = proj.image_versions.get(label)
+            if mat is not None:
+                self.current_image_label = label
+                proj.image_versions.active = label
+                self.cancel_slice_tasks()
+                if label == "original":
+                    # Restore _matrix to the original memmap stored in image_versions
+                    # (which is the same object as _matrix or a disk-backed copy).
+                    # Do NOT call the matrix setter — it would re-check is_filtered
+                    # and may overwrite _matrix with a plain ndarray losing .filename.
+                    self._matrix = mat
+                else:
+                    # For filtered versions call the setter to update histograms.
+                    self.matrix = mat
+
+                # Maintainer fix: synchronize mask with the newly selected image view.
+                # If the currently active mask doesn't belong to this image version,
+                # search for one that does and switch to it BEFORE re-evaluating the volume.
+                # This prevents the previous image's mask (along with its manual edits)
+                # from being incorrectly re-thresholded against the new image matrix.
+                if (
+                    self.current_mask
+                    and getattr(self.current_mask, "derived_from", "Original") != label
+                ):
+                    for mask_idx, mask in proj.mask_dict.items():
+                        if getattr(mask, "derived_from", "Original") == label:
+                            Publisher.sendMessage("Change mask selected", index=mask_idx)
+                            Publisher.sendMessage("Select mask name in combo", index=mask_idx)
+                            Publisher.sendMessage("Show mask", index=mask_idx, value=True)
+                            break
+
+                self.__switch_active_image(mat)
+                Publisher.sendMessage("Update image version selection", label=label)
         finally:
             wx.EndBusyCursor()
 
@@ -0,0 +1,174 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Cache of the slices already computed (projected, coloured) by Slice, so
+scrolling back and forth doesn't compute them again, and the prefetch of the
+next slices in the scroll direction.
+"""
+
+import collections
+import threading
+
+from invesalius.utils import debug
+
+# Kinds of cached slices. The first item of the cache keys.
+IMAGE = "image"
+VTK_IMAGE = "vtk_image"
+VTK_MASK = "vtk_mask"
+
+
+class SliceCache:
+    """
+    LRU cache of slices bounded by memory_budget bytes. The keys are tuples
+    starting with the kind of the slice (IMAGE, VTK_IMAGE or VTK_MASK).
+
+    The generation is incremented each time entries are discarded, a slice
+    computed (e.g. by the prefetch thread) from data older than the discard
+    is not put in the cache.
+    """
+
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.generation = 0
+        self.nbytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """
+        Return the cached slice, or None if it's not cached.
+        """
+        with self._lock:
+            try:
+                value, nbytes = self._entries[key]
+            except KeyError:
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, nbytes, generation=None):
+        """
+        Cache value, evicting the least recently used slices. Nothing is done
+        if generation is given and entries were discarded since it was read.
+        """
+        if nbytes > self.memory_budget:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = value, nbytes
+            self.nbytes += nbytes
+            while self.nbytes > self.memory_budget:
+                _key, (_value, old_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= old_nbytes
+
+    def discard(self, *kinds):
+        """
+        Discard the cached slices of the given kinds (all if none is given).
+        """
+        with self._lock:
+            self.generation += 1
+            if not kinds:
+                self._entries.clear()
+                self.nbytes = 0
+                return
+            for key in [k for k in self._entries if k[0] in kinds]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def discard_slices(self, kind, orientation, start, stop):
+        """
+        Discard the cached slices of the kind and orientation numbered from
+        start to stop (not included).
+        """
+        with self._lock:
+            self.generation += 1
+            for key in [
+                k
+                for k in self._entries
+                if k[0] == kind and k[1] == orientation and start <= k[2] < stop
+            ]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+
+class SlicePrefetcher:
+    """
+    Computes slices in a background thread and puts them in the cache. Each
+    request replaces the pending ones, so only the slices ahead of the last
+    scroll are computed. The tasks requested before the cache discarded
+    entries are dropped, and their slices aren't cached.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._tasks = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def request(self, tasks, on_done=None):
+        """
+        Prefetch tasks, a list of (key, compute) in priority order, where
+        compute() returns the slice (a numpy array) to be cached with key.
+        on_done(key) is called, from the prefetch thread, after each slice is
+        cached. compute must not depend on what may change after the request
+        (the view is passed to it), as its slice is cached with key.
+        """
+        with self._condition:
+            generation = self.cache.generation
+            self._tasks = [(key, compute, on_done, generation) for key, compute in reversed(tasks)]
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="slice_prefetch", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self):
+        with self._condition:
+            self._tasks = []
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._tasks:
+                    self._condition.wait()
+                key, compute, on_done, generation = self._tasks.pop()
+
+            if generation != self.cache.generation:
+                continue
+            if key not in self.cache:
+                try:
+                    value = compute()
+                except Exception as err:
+                    debug(f"Could not prefetch slice {key}: {err}")
+                    continue
+                self.cache.put(key, value, value.nbytes, generation)
+                if key not in self.cache:
+                    continue
+            if on_done is not None:
+                on_done(key)
@@ -25,7 +25,6 @@ from concurrent import futures
 
 import numpy as np
 import wx
-from scipy import ndimage
 from scipy.ndimage import generate_binary_structure, watershed_ift
 
 try:
@@ -59,7 +58,7 @@ import invesalius.gui.dialogs as dialogs
 import invesalius.session as ses
 import invesalius.utils as utils
 import invesalius_rs as floodfill
-from invesalius.data.imagedata_utils import get_LUT_value, get_LUT_value_255
+from invesalius.data.imagedata_utils import get_LUT_value_255, get_LUT_value_255_range
 from invesalius.data.measures import CircleDensityMeasure, MeasureData, PolygonDensityMeasure
 from invesalius.i18n import tr
 from invesalius.i18n import tr as _
@@ -1632,6 +1631,10 @@ class WatershedConfig(metaclass=utils.Singleton):
         self.con_3d = 6
         self.mg_size = 3
         self.use_ww_wl = True
+        # Only segment around the markers, see const.WATERSHED_CROP_MARGIN.
+        # Off by default, as the regions may differ from the ones segmented in
+        # the whole image.
+        self.crop_to_markers = False
         self.operation = BRUSH_FOREGROUND
         self.cursor_type = const.BRUSH_CIRCLE
         self.cursor_size = const.BRUSH_SIZE
@@ -1644,6 +1647,7 @@ class WatershedConfig(metaclass=utils.Singleton):
         Publisher.subscribe(self.set_2dcon, "Set watershed 2d con")
         Publisher.subscribe(self.set_3dcon, "Set watershed 3d con")
         Publisher.subscribe(self.set_gaussian_size, "Set watershed gaussian size")
+        Publisher.subscribe(self.set_crop_to_markers, "Set watershed crop to markers")
 
     def set_operation(self, operation):
         self.operation = WATERSHED_OPERATIONS[operation]
@@ -1663,6 +1667,9 @@ class WatershedConfig(metaclass=utils.Singleton):
     def set_gaussian_size(self, size):
         self.mg_size = size
 
+    def set_crop_to_markers(self, crop_to_markers):
+        self.crop_to_markers = crop_to_markers
+
 
 WALGORITHM = {"Watershed": watershed, "Watershed IFT": watershed_ift}
 CON2D = {4: 1, 8: 2}
@@ -1681,6 +1688,11 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
 
         self.config = WatershedConfig()
 
+        # The image prepared by the last 2D and 3D watersheds, reused by the
+        # next strokes (see watershed_process.PreparedImage).
+        self._prepared_2d = None
+        self._prepared_3d = None
+
         self.picker = vtkWorldPointPicker()
 
         self.AddObserver("EnterEvent", self.OnEnterInteractor)
@@ -1699,6 +1711,8 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
         Publisher.subscribe(self.set_bsize, "Set watershed brush size")
         Publisher.subscribe(self.set_bunit, "Set watershed brush unit")
         Publisher.subscribe(self.set_bformat, "Set watershed brush format")
+        Publisher.subscribe(self._discard_prepared_images, "Flip volume")
+        Publisher.subscribe(self._discard_prepared_images, "Swap volume axes")
 
         self._set_cursor()
         self.viewer.slice_data.cursor.Show(0)
@@ -1733,6 +1747,55 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
         self.viewer.interactor.SetCursor(wx.Cursor(wx.CURSOR_DEFAULT))
         self.viewer.interactor.Render()
 
+        Publisher.unsubscribe(self._discard_prepared_images, "Flip volume")
+        Publisher.unsubscribe(self._discard_prepared_images, "Swap volume axes")
+        self._discard_prepared_images()
+
+    def _discard_prepared_images(self, **kwargs):
+        for prepared in (self._prepared_2d, self._prepared_3d):
+            if prepared is not None:
+                prepared.remove()
+        self._prepared_2d = self._prepared_3d = None
+
+    def _get_prepared_image(self, prepared, image, markers, key, in_file=False):
+        """
+        Return the image prepared to the watershed from markers: the last one
+        (prepared) if it covers the markers, else a new one not ready yet. It
+        covers only the markers if the watershed is cropped to them.
+        """
+        if self.config.crop_to_markers:
+            bbox = watershed_process.get_markers_bbox(markers, const.WATERSHED_CROP_MARGIN)
+        else:
+            bbox = tuple(slice(0, n) for n in image.shape)
+
+        if prepared is not None:
+            if prepared.covers(key, bbox):
+                return prepared
+            if prepared.ready and prepared.key == key:
+                # The markers grew, prepare the whole region drawn so far.
+                bbox = watershed_process.union_bbox(prepared.bbox, bbox)
+            prepared.remove()
+
+        filename = None
+        if in_file:
+            fd, filename = tempfile.mkstemp()
+            os.close(fd)
+        return watershed_process.PreparedImage(key, bbox, filename)
+
+    def _get_prepared_key(self, *args):
+        config = self.config
+        slice_ = self.viewer.slice_
+        key = (
+            slice_.current_image_label,
+            slice_.image_revision,
+            config.algorithm,
+            config.mg_size,
+            config.use_ww_wl,
+        )
+        if config.use_ww_wl:
+            key += (slice_.window_width, slice_.window_level)
+        return key + args
+
     def _create_mask(self):
         if self.matrix is None:
             try:
@@ -1948,44 +2011,31 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
         wl = self.viewer.slice_.window_level
 
         if BRUSH_BACKGROUND in markers and BRUSH_FOREGROUND in markers:
-            # w_algorithm = WALGORITHM[self.config.algorithm]
             bstruct = generate_binary_structure(2, CON2D[self.config.con_2d])
-            if self.config.use_ww_wl:
-                if self.config.algorithm == "Watershed":
-                    tmp_image = ndimage.morphological_gradient(
-                        get_LUT_value(image, ww, wl).astype("uint16"), self.config.mg_size
-                    )
-                    tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-                else:
-                    # tmp_image = ndimage.gaussian_filter(get_LUT_value(image, ww, wl).astype('uint16'), self.config.mg_size)
-                    # tmp_image = ndimage.morphological_gradient(
-                    # get_LUT_value(image, ww, wl).astype('uint16'),
-                    # self.config.mg_size)
-                    tmp_image = get_LUT_value(image, ww, wl).astype("uint16")
-                    # markers[markers == 2] = -1
-                    tmp_mask = watershed_ift(tmp_image, markers.astype("int16"), bstruct)
-                    # markers[markers == -1] = 2
-                    # tmp_mask[tmp_mask == -1]  = 2
+            key = self._get_prepared_key(self.orientation, n)
+            prepared = self._get_prepared_image(self._prepared_2d, image, markers, key)
+            self._prepared_2d = prepared
+            tmp_image = prepared.get_image()
+            if not prepared.ready:
+                watershed_process.prepare_image(
+                    image,
+                    prepared.bbox,
+                    tmp_image,
+                    self.config.algorithm,
+                    self.config.mg_size,
+                    self.config.use_ww_wl,
+                    wl,
+                    ww,
+                    self.viewer.slice_.get_scalar_range()[0],
+                )
+                prepared.ready = True
 
-            else:
-                if self.config.algorithm == "Watershed":
-                    tmp_image = ndimage.morphological_gradient(
-                        (image - image.min()).astype("uint16"), self.config.mg_size
-                    )
-                    tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-                else:
-                    # tmp_image = (image - image.min()).astype('uint16')
-                    # tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-                    # tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-                    tmp_image = image - image.min().astype("uint16")
-                    tmp_mask = watershed_ift(tmp_image, markers.astype("int16"), bstruct)
-
-            if self.viewer.overwrite_mask:
-                mask[:] = 0
-                mask[tmp_mask == 1] = 253
-            else:
-                mask[(tmp_mask == 2) & ((mask == 0) | (mask == 2) | (mask == 253))] = 2
-                mask[(tmp_mask == 1) & ((mask == 0) | (mask == 2) | (mask == 253))] = 253
+            tmp_mask = watershed_process.run_watershed(
+                tmp_image, markers[prepared.bbox], bstruct, self.config.algorithm
+            )
+            watershed_process.apply_watershed_to_mask(
+                mask, tmp_mask, prepared.bbox, self.viewer.overwrite_mask
+            )
 
             self.viewer.slice_.current_mask.was_edited = True
             self.viewer.slice_.current_mask.modified()
@@ -2078,6 +2128,11 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
         if BRUSH_BACKGROUND in markers and BRUSH_FOREGROUND in markers:
             # w_algorithm = WALGORITHM[self.config.algorithm]
             bstruct = generate_binary_structure(3, CON3D[self.config.con_3d])
+            key = self._get_prepared_key()
+            prepared = self._get_prepared_image(
+                self._prepared_3d, image, markers, key, in_file=True
+            )
+            self._prepared_3d = prepared
             fd, tfile = tempfile.mkstemp()
             tmp_mask = np.memmap(tfile, shape=mask.shape, dtype=mask.dtype, mode="w+")
             q = multiprocessing.Queue()
@@ -2095,6 +2150,9 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
                     wl,
                     ww,
                     q,
+                    prepared,
+                    self.viewer.slice_.get_scalar_range()[0],
+                    const.WATERSHED_THREADS,
                 ),
             )
 
@@ -2118,38 +2176,17 @@ class WaterShedInteractorStyle(DefaultInteractorStyle):
                 self.OnEnterInteractor(None, None)
 
             if q.empty():
+                # Close the memmap first, Windows can't remove an open file.
+                del tmp_mask
+                os.remove(tfile)
                 return
-            # do_watershed(image, markers, tmp_mask, bstruct, self.config.algorithm,
-            # self.config.mg_size, self.config.use_ww_wl, wl, ww)
-            # if self.config.use_ww_wl:
-            # if self.config.algorithm == 'Watershed':
-            # tmp_image = ndimage.morphological_gradient(
-            # get_LUT_value(image, ww, wl).astype('uint16'),
-            # self.config.mg_size)
-            # tmp_mask = watershed(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # tmp_image = get_LUT_value(image, ww, wl).astype('uint16')
-            ##tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            ##tmp_image = ndimage.morphological_gradient(
-            ##get_LUT_value(image, ww, wl).astype('uint16'),
-            ##self.config.mg_size)
-            # tmp_mask = watershed_ift(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # if self.config.algorithm == 'Watershed':
-            # tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            # tmp_mask = watershed(tmp_image, markers.astype('int16'), bstruct)
-            # else:
-            # tmp_image = (image - image.min()).astype('uint16')
-            ##tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            ##tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            # tmp_mask = watershed_ift(tmp_image, markers.astype('int8'), bstruct)
-
-            if self.viewer.overwrite_mask:
-                mask[:] = 0
-                mask[tmp_mask == 1] = 253
-            else:
-                mask[(tmp_mask == 2) & ((mask == 0) | (mask == 2) | (mask == 253))] = 2
-                mask[(tmp_mask == 1) & ((mask == 0) | (mask == 2) | (mask == 253))] = 253
+            prepared.ready = True
+
+            watershed_process.apply_watershed_to_mask(
+                mask, tmp_mask[prepared.bbox], prepared.bbox, self.viewer.overwrite_mask
+            )
+            del tmp_mask
+            os.remove(tfile)
 
             self.viewer.slice_.current_mask.modified(True)
 
@@ -2213,6 +2250,8 @@ class ReorientImageInteractorStyle(DefaultInteractorStyle):
         Publisher.sendMessage("Show current mask")
 
     def OnLeftClick(self, obj, evt):
+        # Show low quality previews of the slices while rotating or dragging.
+        self.viewer.slice_.interactive_reslice = True
         if self._over_center:
             self.dragging = True
         else:
@@ -2229,11 +2268,15 @@ class ReorientImageInteractorStyle(DefaultInteractorStyle):
             self.to_rot = True
 
     def OnLeftRelease(self, obj, evt):
-        self.dragging = False
+        self.viewer.slice_.interactive_reslice = False
 
-        if self.to_rot:
+        if self.to_rot or self.dragging:
+            # Swap the previews by the full quality slices.
+            self._discard_buffers()
             Publisher.sendMessage("Reload actual slice")
-            self.to_rot = False
+
+        self.dragging = False
+        self.to_rot = False
 
     def OnMouseMove(self, obj, evt):
         """
@@ -2416,11 +2459,12 @@ class ReorientImageInteractorStyle(DefaultInteractorStyle):
         self.line2 = self._create_line(0.5, 0, 0.5, 1, color2)
 
     def _discard_buffers(self):
+        # The rotated slices are cached by rotation and center, so the cache
+        # is kept, but the slices still being resliced for the previous
+        # rotation are cancelled.
+        self.viewer.slice_.cancel_slice_tasks()
         for buffer_ in self.viewer.slice_.buffer_slices.values():
-            buffer_.discard_vtk_image()
-            buffer_.discard_image()
-            buffer_.discard_vtk_mask()
-            buffer_.discard_mask()
+            buffer_.discard_view()
 
 
 class FFillConfig(metaclass=utils.Singleton):
@@ -3101,21 +3145,11 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
             out_mask = self.do_rg_confidence(image, mask, (x, y, 0), bstruct)
         else:
             if self.config.method == "threshold":
-                v = image[y, x]
                 t0 = self.config.t0
                 t1 = self.config.t1
 
             elif self.config.method == "dynamic":
-                if self.config.use_ww_wl:
-                    print("Using WW&WL")
-                    ww = self.viewer.slice_.window_width
-                    wl = self.viewer.slice_.window_level
-                    image = get_LUT_value_255(image, ww, wl)
-
-                v = image[y, x]
-
-                t0 = v - self.config.dev_min
-                t1 = v + self.config.dev_max
+                t0, t1 = self.get_dynamic_thresholds(image, image[y, x])
 
             if image[y, x] < t0 or image[y, x] > t1:
                 return
@@ -3159,21 +3193,11 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
 
         if self.config.method != "confidence":
             if self.config.method == "threshold":
-                v = image[z, y, x]
                 t0 = self.config.t0
                 t1 = self.config.t1
 
             elif self.config.method == "dynamic":
-                if self.config.use_ww_wl:
-                    print("Using WW&WL")
-                    ww = self.viewer.slice_.window_width
-                    wl = self.viewer.slice_.window_level
-                    image = get_LUT_value_255(image, ww, wl)
-
-                v = image[z, y, x]
-
-                t0 = v - self.config.dev_min
-                t1 = v + self.config.dev_max
+                t0, t1 = self.get_dynamic_thresholds(image, image[z, y, x])
 
             if image[z, y, x] < t0 or image[z, y, x] > t1:
                 return
@@ -3217,37 +3241,47 @@ class FloodFillSegmentInteractorStyle(DefaultInteractorStyle):
             0, "VOLUME", self.viewer.slice_.current_mask.matrix.copy(), cp_mask
         )
 
+    def get_dynamic_thresholds(self, image, v):
+        """
+        Return the threshold range around the value v of the clicked voxel.
+        With WW&WL the range is of the values shown (from 0 to 255), mapped
+        back to the image values so the image is not converted.
+        """
+        if not self.config.use_ww_wl:
+            return v - self.config.dev_min, v + self.config.dev_max
+
+        ww = self.viewer.slice_.window_width
+        wl = self.viewer.slice_.window_level
+        lut_v = get_LUT_value_255(np.array([v]), ww, wl)[0]
+        t0 = lut_v - self.config.dev_min
+        t1 = lut_v + self.config.dev_max
+        if np.issubdtype(image.dtype, np.integer):
+            value_range = self.viewer.slice_.get_scalar_range()
+            thresholds = get_LUT_value_255_range(t0, t1, ww, wl, value_range, image.dtype)
+            # The value of the clicked voxel is always inside.
+            return thresholds if thresholds is not None else (v, v)
+        else:
+            # Only ranges of integer values are mapped back.
+            lut = get_LUT_value_255(image, ww, wl)
+            inside = image[(lut >= t0) & (lut <= t1)]
+            return inside.min(), inside.max()
+
     def do_rg_confidence(self, image, mask, p, bstruct):
-        x, y, z = p
         if self.config.use_ww_wl:
-            ww = self.viewer.slice_.window_width
-            wl = self.viewer.slice_.window_level
-            image = get_LUT_value_255(image, ww, wl)
-        bool_mask = np.zeros_like(mask, dtype="bool")
+            window = (self.viewer.slice_.window_width, self.viewer.slice_.window_level)
+        else:
+            window = None
         out_mask = np.zeros_like(mask)
-
-        for k in range(int(z - 1), int(z + 2)):
-            if k < 0 or k >= bool_mask.shape[0]:
-                continue
-            for j in range(int(y - 1), int(y + 2)):
-                if j < 0 or j >= bool_mask.shape[1]:
-                    continue
-                for i in range(int(x - 1), int(x + 2)):
-                    if i < 0 or i >= bool_mask.shape[2]:
-                        continue
-                    bool_mask[k, j, i] = True
-
-        for i in range(self.config.confid_iters):
-            var = np.std(image[bool_mask])
-            mean = np.mean(image[bool_mask])
-
-            t0 = mean - var * self.config.confid_mult
-            t1 = mean + var * self.config.confid_mult
-
-            floodfill.floodfill_threshold(image, ((x, y, z),), t0, t1, 1, bstruct, out_mask)
-
-            bool_mask[out_mask == 1] = True
-
+        floodfill.floodfill_confidence(
+            image,
+            p,
+            self.config.confid_iters,
+            self.config.confid_mult,
+            1,
+            bstruct,
+            out_mask,
+            window,
+        )
         return out_mask
 
 
@@ -19,6 +19,7 @@
 
 import functools
 import gc
+import math
 import multiprocessing
 import os
 import plistlib
@@ -180,6 +181,67 @@ class Surface:
         Surface.general_index = index
 
 
+def get_surface_piece_size(shape, itemsize, n_processes):
+    """
+    Return the number of slices of the pieces the volume is split into to
+    create its surface. There are enough pieces to keep all the worker
+    processes busy, each one reading at most const.SURFACE_PIECE_MAX_BYTES.
+    """
+    n_slices, height, width = shape
+    max_size = max(
+        const.SURFACE_PIECE_MIN_SLICES, const.SURFACE_PIECE_MAX_BYTES // (height * width * itemsize)
+    )
+    piece_size = math.ceil(n_slices / (n_processes * const.SURFACE_PIECES_PER_PROCESS))
+    return int(min(max(piece_size, const.SURFACE_PIECE_MIN_SLICES), max_size))
+
+
+class SurfaceWorkerPool:
+    """
+    Long-lived pool of worker processes used to create the surfaces.
+
+    The workers are spawned, so each one has to import VTK and numpy before
+    running any task. The pool is started on first use and reused by the
+    following surface creations, paying that startup only once. It's
+    terminated when the project is closed or a surface creation is cancelled.
+    """
+
+    def __init__(self, processes=None):
+        if processes is None:
+            processes = min(multiprocessing.cpu_count(), const.SURFACE_POOL_MAX_PROCESSES)
+        self.processes = processes
+        self._pool = None
+        self._manager = None
+
+    @property
+    def is_running(self):
+        return self._pool is not None
+
+    def get_pool(self):
+        if self._pool is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._pool = ctx.Pool(processes=self.processes, initializer=surface_process.init_worker)
+            self._manager = ctx.Manager()
+        return self._pool
+
+    def new_queue(self, maxsize=1):
+        self.get_pool()
+        return self._manager.Queue(maxsize)
+
+    def terminate(self):
+        if self._pool is None:
+            return
+        self._pool.close()
+        try:
+            self._pool.terminate()
+        except AssertionError:
+            pass
+        # The manager is missing if it failed to start.
+        if self._manager is not None:
+            self._manager.shutdown()
+        self._pool = None
+        self._manager = None
+
+
 # TODO: will be initialized inside control as it is being done?
 class SurfaceManager:
     """
@@ -198,6 +260,7 @@ class SurfaceManager:
         self.actors_dict = {}
         self.last_surface_index = 0
         self.convert_to_inv = None
+        self.worker_pool = SurfaceWorkerPool()
         self.__bind_events()
 
         self._default_parameters = {
@@ -987,6 +1050,8 @@ class SurfaceManager:
         self.affine_vtk = None
         self.convert_to_inv = False
 
+        self.worker_pool.terminate()
+
     def OnSelectSurface(self, surface_index):
         # self.last_surface_index = surface_index
         # self.actors_dict.
@@ -1277,14 +1342,13 @@ class SurfaceManager:
         if hasattr(mask, "derived_from") and mask.derived_from != "original":
             proj = prj.Project()
             found = False
-            for label, mat in proj.image_versions:
-                if label == mask.derived_from:
-                    matrix = mat
-                    # Ensure filename_img points to the .dat file for the surface_process workers
-                    if hasattr(mat, "filename"):
-                        filename_img = mat.filename
-                    found = True
-                    break
+            mat = proj.image_versions.get(mask.derived_from)
+            if mat is not None:
+                matrix = mat
+                # Ensure filename_img points to the .dat file for the surface_process workers
+                if hasattr(mat, "filename"):
+                    filename_img = mat.filename
+                found = True
             if not found:
                 # The filtered image was deleted! We cannot use its image data for sub-voxel interpolation.
                 # We MUST force the surface generator to use the fully baked binary mask data instead.
@@ -1357,18 +1421,19 @@ class SurfaceManager:
             mask_shape = mask.shape
             mask_dtype = mask.dtype
 
-        n_processors = multiprocessing.cpu_count()
-
         o_piece = 1
-        piece_size = 20
+        piece_size = get_surface_piece_size(
+            matrix.shape, matrix.dtype.itemsize, self.worker_pool.processes
+        )
 
-        n_pieces = int(round(matrix.shape[0] / piece_size + 0.5, 0))
+        n_pieces = math.ceil(matrix.shape[0] / piece_size)
 
-        filenames = []
-        ctx = multiprocessing.get_context("spawn")
-        pool = ctx.Pool(processes=min(n_pieces, n_processors))
-        manager = multiprocessing.Manager()
-        msg_queue = manager.Queue(1)
+        pieces = []
+        t_pool = time.time()
+        pool_was_running = self.worker_pool.is_running
+        pool = self.worker_pool.get_pool()
+        msg_queue = self.worker_pool.new_queue(1)
+        t_pieces = time.time()
 
         print("Resolution", imagedata_resolution)
 
@@ -1403,16 +1468,17 @@ class SurfaceManager:
                         imagedata_resolution,
                         fill_border_holes,
                     ),
-                    callback=lambda x: filenames.append(x),
+                    callback=lambda x: pieces.append(x),
                 )
 
-            while len(filenames) != n_pieces:
+            while len(pieces) != n_pieces:
                 time.sleep(0.25)
 
+            t_join = time.time()
             f = pool.apply_async(
                 surface_process.join_process_surface,
                 args=(
-                    filenames,
+                    pieces,
                     algorithm,
                     smooth_iterations,
                     smooth_relaxation_factor,
@@ -1426,6 +1492,7 @@ class SurfaceManager:
 
             while not f.ready():
                 time.sleep(0.25)
+            t_end = time.time()
 
             try:
                 surface_filename, surface_measures = f.get()
@@ -1495,13 +1562,13 @@ class SurfaceManager:
                         imagedata_resolution,
                         fill_border_holes,
                     ),
-                    callback=lambda x: filenames.append(x),
+                    callback=lambda x: pieces.append(x),
                     error_callback=functools.partial(self._on_callback_error, dialog=sp)
                     if sp
                     else None,
                 )
 
-            while len(filenames) != n_pieces:
+            while len(pieces) != n_pieces:
                 if sp and (sp.WasCancelled() or not sp.running):
                     break
                 time.sleep(0.25)
@@ -1509,11 +1576,12 @@ class SurfaceManager:
                     sp.Update(_("Creating 3D surface..."))
                     wx.Yield()
 
+            t_join = time.time()
             if not sp or (not sp.WasCancelled() or sp.running):
                 f = pool.apply_async(
                     surface_process.join_process_surface,
                     args=(
-                        filenames,
+                        pieces,
                         algorithm,
                         smooth_iterations,
                         smooth_relaxation_factor,
@@ -1555,6 +1623,13 @@ class SurfaceManager:
             t_end = time.time()
             print(f"Elapsed time - {t_end - t_init}")
             if sp:
+                if sp.WasCancelled():
+                    # Stops the pieces still being processed, the pool is
+                    # started again on the next surface creation. The join
+                    # may have been stopped too, so the pieces are released
+                    # even if they were all created.
+                    self.worker_pool.terminate()
+                    surface_process.release_pieces(pieces)
                 sp.Close()
                 if sp.error:
                     dlg = GMD.GenericMessageDialog(
@@ -1563,13 +1638,16 @@ class SurfaceManager:
                     dlg.ShowModal()
                 del sp
 
-        pool.close()
-        try:
-            pool.terminate()
-        except AssertionError:
-            pass
+        print(
+            "Surface creation timings - "
+            f"preparation: {t_pool - t_init:.3f}s, "
+            f"worker pool {'reused' if pool_was_running else 'started'}: {t_pieces - t_pool:.3f}s, "
+            f"pieces: {t_join - t_pieces:.3f}s, "
+            f"join: {t_end - t_join:.3f}s, "
+            f"total: {t_end - t_init:.3f}s"
+        )
+
         del pool
-        del manager
         del msg_queue
         import gc
 
@@ -1,6 +1,7 @@
 import os
 import tempfile
 import time
+from multiprocessing import shared_memory
 
 try:
     import queue
@@ -8,9 +9,10 @@ except ImportError:
     import Queue as queue
 
 import numpy
-from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, vtk_to_numpy
+from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow, vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
 from vtkmodules.vtkFiltersCore import (
-    vtkAppendPolyData,
     vtkCleanPolyData,
     vtkContourFilter,
     vtkMassProperties,
@@ -21,7 +23,7 @@ from vtkmodules.vtkFiltersCore import (
 from vtkmodules.vtkFiltersModeling import vtkFillHolesFilter
 from vtkmodules.vtkImagingCore import vtkImageFlip, vtkImageResample
 from vtkmodules.vtkImagingGeneral import vtkImageGaussianSmooth
-from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
+from vtkmodules.vtkIOXML import vtkXMLPolyDataWriter
 
 import invesalius.data.converters as converters
 import invesalius_rs as cy_mesh
@@ -68,6 +70,185 @@ def pad_image(image, pad_value, pad_bottom, pad_top):
     return paded_image
 
 
+# The first bytes of the shared memory block of a piece, its first byte set
+# when the consumer attached to it. On Windows a block is destroyed when its
+# last handle is closed, so the process that creates it keeps its handle open
+# until then.
+PIECE_HEADER_SIZE = 8
+
+# The shared memory blocks created by this (worker) process whose consumer
+# may not have attached yet.
+_created_blocks = []
+
+
+def release_attached_blocks():
+    """
+    Close the handles of the shared memory blocks created by this process
+    that were already attached by their consumer.
+    """
+    for shm in list(_created_blocks):
+        if shm.buf[0]:
+            _created_blocks.remove(shm)
+            shm.close()
+
+
+def polydata_to_shared_memory(polydata, roi, z_range):
+    """
+    Copy the points and triangles of the polydata to a new shared memory
+    block and return the description of the piece needed to read them back
+    in another process (see shared_memory_to_arrays). After the header, the
+    triangles (int64) are stored first and then the points (float32).
+    """
+    release_attached_blocks()
+    n_points = polydata.GetNumberOfPoints()
+    n_triangles = polydata.GetNumberOfPolys()
+    piece = {
+        "name": None,
+        "n_points": n_points,
+        "n_triangles": n_triangles,
+        "roi": (roi.start, roi.stop),
+        "z_range": z_range,
+    }
+    if n_points == 0 or n_triangles == 0:
+        piece["n_points"] = piece["n_triangles"] = 0
+        return piece
+
+    points = vtk_to_numpy(polydata.GetPoints().GetData())
+    # Legacy layout: (3, id0, id1, id2) for each triangle.
+    triangles = vtk_to_numpy(polydata.GetPolys().GetData()).reshape(-1, 4)[:, 1:]
+
+    triangles_size = n_triangles * 3 * numpy.dtype(numpy.int64).itemsize
+    points_size = n_points * 3 * numpy.dtype(numpy.float32).itemsize
+    shm = shared_memory.SharedMemory(
+        create=True, size=PIECE_HEADER_SIZE + triangles_size + points_size
+    )
+    shm.buf[:PIECE_HEADER_SIZE] = bytes(PIECE_HEADER_SIZE)
+    shm_triangles = numpy.ndarray(
+        (n_triangles, 3), dtype=numpy.int64, buffer=shm.buf, offset=PIECE_HEADER_SIZE
+    )
+    shm_triangles[:] = triangles
+    shm_points = numpy.ndarray(
+        (n_points, 3),
+        dtype=numpy.float32,
+        buffer=shm.buf,
+        offset=PIECE_HEADER_SIZE + triangles_size,
+    )
+    shm_points[:] = points
+    piece["name"] = shm.name
+    del shm_triangles, shm_points
+    # Closed by release_attached_blocks once the consumer attached.
+    _created_blocks.append(shm)
+    return piece
+
+
+def shared_memory_to_arrays(piece):
+    """
+    Return copies of the (points, triangles) of a piece created by
+    polydata_to_shared_memory and release its shared memory block.
+    """
+    if piece["name"] is None:
+        return numpy.empty((0, 3), dtype=numpy.float32), numpy.empty((0, 3), dtype=numpy.int64)
+
+    n_points = piece["n_points"]
+    n_triangles = piece["n_triangles"]
+    triangles_size = n_triangles * 3 * numpy.dtype(numpy.int64).itemsize
+    shm = shared_memory.SharedMemory(name=piece["name"])
+    try:
+        # Let the creator close its handle.
+        shm.buf[0] = 1
+        triangles = numpy.ndarray(
+            (n_triangles, 3), dtype=numpy.int64, buffer=shm.buf, offset=PIECE_HEADER_SIZE
+        ).copy()
+        points = numpy.ndarray(
+            (n_points, 3),
+            dtype=numpy.float32,
+            buffer=shm.buf,
+            offset=PIECE_HEADER_SIZE + triangles_size,
+        ).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return points, triangles
+
+
+def release_pieces(pieces):
+    """
+    Release the shared memory of pieces that won't be joined (cancelled
+    surface creation).
+    """
+    for piece in pieces:
+        if piece["name"] is None:
+            continue
+        try:
+            shm = shared_memory.SharedMemory(name=piece["name"])
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+
+def merge_pieces(pieces):
+    """
+    Join the pieces (see create_surface_piece) in a single vtkPolyData.
+
+    Consecutive pieces overlap by one slice, so the points on the first slice
+    of a piece are also generated by the previous one, with exactly the same
+    coordinates. Only the points lying on these seam planes are compared,
+    in a single pass, and the duplicated ones are merged.
+    """
+    pieces = sorted(pieces, key=lambda piece: piece["roi"][0])
+    all_points = []
+    all_triangles = []
+    offset = 0
+    for piece in pieces:
+        points, triangles = shared_memory_to_arrays(piece)
+        all_points.append(points)
+        all_triangles.append(triangles + offset)
+        offset += len(points)
+    # The pieces created by this process too.
+    release_attached_blocks()
+    points = numpy.concatenate(all_points)
+    triangles = numpy.concatenate(all_triangles)
+    n_points = len(points)
+
+    seams_z = numpy.array(
+        [piece["z_range"][0] for piece in pieces[1:] if piece["n_points"]], dtype=numpy.float32
+    )
+    candidates = numpy.flatnonzero(numpy.isin(points[:, 2], seams_z))
+    if len(candidates):
+        keys = numpy.ascontiguousarray(points[candidates]).view(numpy.dtype((numpy.void, 12)))
+        _, first, inverse = numpy.unique(keys.ravel(), return_index=True, return_inverse=True)
+        remap = numpy.arange(n_points)
+        remap[candidates] = candidates[first[inverse.ravel()]]
+        keep = remap == numpy.arange(n_points)
+        new_ids = numpy.cumsum(keep) - 1
+        triangles = new_ids[remap[triangles]]
+        points = points[keep]
+
+    vtk_points = vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(points, deep=True))
+
+    connectivity = numpy.column_stack(
+        [numpy.full(len(triangles), 3, dtype=numpy.int64), triangles]
+    ).ravel()
+    cells = vtkCellArray()
+    cells.SetCells(len(triangles), numpy_to_vtkIdTypeArray(connectivity, deep=True))
+
+    polydata = vtkPolyData()
+    polydata.SetPoints(vtk_points)
+    polydata.SetPolys(cells)
+    return polydata
+
+
+def init_worker():
+    """
+    Initializer of the surface worker processes. The processes are spawned,
+    so just running it makes them import this module (and VTK) as soon as the
+    pool starts instead of on their first task.
+    """
+    pass
+
+
 def create_surface_piece(
     filename,
     shape,
@@ -185,24 +366,35 @@ def create_surface_piece(
     duration = time.perf_counter() - start
     print(f"[PERF] Extraction (vtkContourFilter): {duration:.4f}s")
 
+    z_range = image.GetBounds()[4:6]
     polydata = contour.GetOutput()
     del image
     del contour
 
-    fd, filename = tempfile.mkstemp(suffix="_%d_%d.vtp" % (roi.start, roi.stop))
-    writer = vtkXMLPolyDataWriter()
-    writer.SetInputData(polydata)
-    writer.SetFileName(filename)
-    writer.Write()
+    # Merges the coincident points inside the piece (and removes the
+    # triangles that become degenerate), so joining the pieces only needs to
+    # merge the points on the seams. It runs here to run in parallel.
+    clean = vtkCleanPolyData()
+    clean.SetInputData(polydata)
+    clean.PointMergingOn()
+    clean.ConvertPolysToLinesOff()
+    clean.ConvertLinesToPointsOff()
+    clean.ConvertStripsToPolysOff()
+    start = time.perf_counter()
+    clean.Update()
+    duration = time.perf_counter() - start
+    print(f"[PERF] Cleaning surface piece: {duration:.4f}s")
+    del polydata
+    polydata = clean.GetOutput()
+    del clean
 
-    print("Writing piece", roi, "to", filename)
-    print("MY PID MC", os.getpid())
-    os.close(fd)
-    return filename
+    piece = polydata_to_shared_memory(polydata, roi, z_range)
+    print("Sending piece", roi, "with", piece["n_triangles"], "triangles")
+    return piece
 
 
 def join_process_surface(
-    filenames,
+    pieces,
     algorithm,
     smooth_iterations,
     smooth_relaxation_factor,
@@ -226,46 +418,10 @@ def join_process_surface(
     os.close(log_fd)
 
     send_message("Joining surfaces ...")
-    polydata_append = vtkAppendPolyData()
-    for f in filenames:
-        reader = vtkXMLPolyDataReader()
-        reader.SetFileName(f)
-        reader.Update()
-
-        polydata = reader.GetOutput()
-
-        polydata_append.AddInputData(polydata)
-        del reader
-        del polydata
-
     start = time.perf_counter()
-    polydata_append.Update()
+    polydata = merge_pieces(pieces)
     duration = time.perf_counter() - start
     print(f"[PERF] Joining surface pieces: {duration:.4f}s")
-    #  polydata_append.GetOutput().ReleaseDataFlagOn()
-    polydata = polydata_append.GetOutput()
-    # polydata.Register(None)
-    #  polydata.SetSource(None)
-    del polydata_append
-
-    send_message("Cleaning surface ...")
-    clean = vtkCleanPolyData()
-    #  clean.ReleaseDataFlagOn()
-    #  clean.GetOutput().ReleaseDataFlagOn()
-    # clean_ref = weakref.ref(clean)
-    #  clean_ref().AddObserver("ProgressEvent", lambda obj,evt:
-    #  UpdateProgress(clean_ref(), _("Creating 3D surface...")))
-    clean.SetInputData(polydata)
-    clean.PointMergingOn()
-    start = time.perf_counter()
-    clean.Update()
-    duration = time.perf_counter() - start
-    print(f"[PERF] Cleaning merged surface: {duration:.4f}s")
-
-    del polydata
-    polydata = clean.GetOutput()
-    #  polydata.SetSource(None)
-    del clean
 
     if algorithm == "ca_smoothing":
         send_message("Calculating normals ...")
@@ -0,0 +1,333 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Threshold of images into InVesalius masks.
+
+The mask matrix has one extra slice, row and column: mask[n, 0, 0] tells if
+slice n was already thresholded and the image slice n - 1 is mask[n, 1:, 1:].
+Voxels edited by the user are marked with 1, 2, 253 and 254 in the mask and
+are kept when the threshold is (re)applied.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Mask values set by the edition tools, kept by the threshold.
+EDITED_VALUES = (1, 2, 253, 254)
+
+# Default amount of image data thresholded at once by each thread.
+SLAB_BYTES = 4 * 1024 * 1024
+
+
+def get_edited_voxels(mask):
+    """
+    Return a boolean array telling which voxels of mask have one of the
+    EDITED_VALUES.
+    """
+    # min(v, 255 - v) folds 253 and 254 into 2 and 1, so the edited voxels are
+    # the ones where it's 1 or 2. Faster than a lookup table or np.isin.
+    folded = np.invert(mask)
+    np.minimum(folded, mask, out=folded)
+    folded -= 1
+    return np.less_equal(folded, 1)
+
+
+def threshold_to_mask(image, mask, thresh_min, thresh_max, out=None):
+    """
+    Threshold image (a slice or a slab) into a uint8 array where the voxels in
+    [thresh_min, thresh_max] are 255, keeping the edited voxels of mask (an
+    array with the image shape, or None when there are no edited voxels).
+
+    out may be the mask itself, in that case it's updated in place.
+    """
+    selected = np.greater_equal(image, thresh_min)
+    selected &= np.less_equal(image, thresh_max)
+    result = selected.view(np.uint8)
+    result *= 255
+    if mask is not None:
+        np.copyto(result, mask, where=get_edited_voxels(mask))
+
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def _get_pending_slabs(mask_matrix, slab_size):
+    """
+    Return the (start, stop) mask slice ranges not thresholded yet, split in
+    slabs with at most slab_size slices.
+    """
+    pending = np.flatnonzero(mask_matrix[1:, 0, 0] == 0) + 1
+    slabs = []
+    if not len(pending):
+        return slabs
+
+    # Splits the pending slices in runs of consecutive slices.
+    breaks = np.flatnonzero(np.diff(pending) != 1) + 1
+    for run in np.split(pending, breaks):
+        for start in range(int(run[0]), int(run[-1]) + 1, slab_size):
+            slabs.append((start, min(start + slab_size, int(run[-1]) + 1)))
+    return slabs
+
+
+def threshold_volume_to_mask(
+    image, mask_matrix, thresh_min, thresh_max, n_threads=1, slab_bytes=SLAB_BYTES
+):
+    """
+    Threshold all the slices of image not yet thresholded in mask_matrix,
+    writing the result in place and marking them as thresholded.
+
+    The volume is processed in slabs of about slab_bytes of image, so the
+    temporary memory is bounded, by n_threads threads (numpy releases the
+    GIL while comparing and copying).
+    """
+    slice_bytes = image[0].nbytes
+    slab_size = max(1, slab_bytes // max(1, slice_bytes))
+    slabs = _get_pending_slabs(mask_matrix, slab_size)
+
+    def threshold_slab(slab):
+        start, stop = slab
+        out = mask_matrix[start:stop, 1:, 1:]
+        threshold_to_mask(image[start - 1 : stop - 1], out, thresh_min, thresh_max, out=out)
+        mask_matrix[start:stop, 0, 0] = 1
+
+    if n_threads <= 1 or len(slabs) <= 1:
+        for slab in slabs:
+            threshold_slab(slab)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="threshold") as executor:
+            # list() to raise the exceptions of the threads.
+            list(executor.map(threshold_slab, slabs))
+
+    return len(slabs)
+
+
+class ThresholdIndex:
+    """
+    Index of the voxel values of an integer volume, built once when the image
+    is loaded, to answer threshold queries without scanning the voxels:
+
+    - the cumulative histogram gives the number of voxels inside a threshold
+      range in O(1);
+    - for each slice, in the three orientations, the minimum and maximum
+      values and which of n_bins coarse value bins have voxels tell if the
+      slice is all inside or all outside a threshold range and if it can
+      change between two threshold ranges.
+
+    The scalar range and the counts of each value (from min to max) may be
+    given, e.g. accumulated by ImageStatistics while the image was loaded, to
+    not compute them again.
+    """
+
+    ORIENTATION_AXES = {"AXIAL": 0, "CORONAL": 1, "SAGITAL": 2}
+
+    def __init__(self, matrix, slab_bytes=SLAB_BYTES, n_bins=64, value_range=None, counts=None):
+        if not np.issubdtype(matrix.dtype, np.integer):
+            raise TypeError(f"Only integer images can be indexed, got {matrix.dtype}")
+
+        self.shape = matrix.shape
+        if value_range is None:
+            value_range = matrix.min(), matrix.max()
+        self.min_value = int(value_range[0])
+        self.max_value = int(value_range[1])
+
+        n_values = self.max_value - self.min_value + 1
+        if counts is not None and len(counts) != n_values:
+            raise ValueError(f"Expected the counts of {n_values} values, got {len(counts)}")
+        self.n_bins = n_bins = min(n_bins, n_values)
+        self.bin_size = -(-n_values // n_bins)
+
+        count_values = counts is None
+        if count_values:
+            counts = np.zeros(n_values, dtype=np.int64)
+        else:
+            counts = np.asarray(counts, dtype=np.int64)
+        self.slice_min = [np.full(n, self.max_value, dtype=np.int64) for n in self.shape]
+        self.slice_max = [np.full(n, self.min_value, dtype=np.int64) for n in self.shape]
+        self.slice_bins = [np.zeros((n, n_bins), dtype=bool) for n in self.shape]
+        axial_bins, coronal_bins, sagital_bins = self.slice_bins
+        coronal_index = np.arange(self.shape[1])[np.newaxis, :, np.newaxis]
+        sagital_index = np.arange(self.shape[2])[np.newaxis, np.newaxis, :]
+
+        slab_size = max(1, slab_bytes // max(1, matrix[0].nbytes))
+        for start in range(0, self.shape[0], slab_size):
+            stop = min(start + slab_size, self.shape[0])
+            slab = np.asarray(matrix[start:stop])
+            values = slab.astype(np.int64)
+            values -= self.min_value
+            if count_values:
+                counts += np.bincount(values.ravel(), minlength=n_values)
+
+            bins = values // self.bin_size
+            axial_index = np.arange(start, stop)[:, np.newaxis, np.newaxis]
+            axial_bins[axial_index, bins] = True
+            coronal_bins[coronal_index, bins] = True
+            sagital_bins[sagital_index, bins] = True
+
+            rows_min = slab.min(axis=2)
+            rows_max = slab.max(axis=2)
+            self.slice_min[0][start:stop] = rows_min.min(axis=1)
+            self.slice_max[0][start:stop] = rows_max.max(axis=1)
+            np.minimum(self.slice_min[1], rows_min.min(axis=0), out=self.slice_min[1])
+            np.maximum(self.slice_max[1], rows_max.max(axis=0), out=self.slice_max[1])
+            np.minimum(self.slice_min[2], slab.min(axis=(0, 1)), out=self.slice_min[2])
+            np.maximum(self.slice_max[2], slab.max(axis=(0, 1)), out=self.slice_max[2])
+
+        self.counts = counts
+        # cumulative[v] is the number of voxels with value < min_value + v.
+        self.cumulative = np.zeros(n_values + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.cumulative[1:])
+
+    def get_histogram(self):
+        """
+        Return the histogram with one bin per value, the same given by
+        np.histogram(matrix, max - min, (min, max)), where the last bin also
+        counts the max value.
+        """
+        if len(self.counts) < 2:
+            return self.counts.copy()
+        histogram = self.counts[:-1].copy()
+        histogram[-1] += self.counts[-1]
+        return histogram
+
+    def _get_value_offsets(self, thresh_min, thresh_max):
+        """
+        Return the [lo, hi) offsets from min_value of the integer values in
+        [thresh_min, thresh_max], clipped to the values of the image.
+        """
+        n_values = len(self.counts)
+        lo = int(np.clip(np.ceil(thresh_min) - self.min_value, 0, n_values))
+        hi = int(np.clip(np.floor(thresh_max) - self.min_value + 1, 0, n_values))
+        return lo, max(lo, hi)
+
+    def count_in_range(self, thresh_min, thresh_max):
+        """
+        Return the number of voxels with value in [thresh_min, thresh_max].
+        """
+        lo, hi = self._get_value_offsets(thresh_min, thresh_max)
+        return int(self.cumulative[hi] - self.cumulative[lo])
+
+    def _has_values(self, axis, slice_number, lo, hi):
+        """
+        Tell if the slice may have voxels with value offset in [lo, hi).
+        """
+        if hi <= lo:
+            return False
+        s_min = self.slice_min[axis][slice_number] - self.min_value
+        s_max = self.slice_max[axis][slice_number] - self.min_value
+        if s_max < lo or s_min >= hi:
+            return False
+        bins = self.slice_bins[axis][slice_number]
+        return bool(bins[lo // self.bin_size : (hi - 1) // self.bin_size + 1].any())
+
+    def get_slice_state(self, orientation, slice_number, thresh_min, thresh_max):
+        """
+        Return 255 if all the voxels of the slice are inside the threshold
+        range, 0 if all are outside it and None otherwise.
+        """
+        axis = self.ORIENTATION_AXES[orientation]
+        lo, hi = self._get_value_offsets(thresh_min, thresh_max)
+        if not self._has_values(axis, slice_number, lo, hi):
+            return 0
+        if not (
+            self._has_values(axis, slice_number, 0, lo)
+            or self._has_values(axis, slice_number, hi, len(self.counts))
+        ):
+            return 255
+        return None
+
+    def slice_changes(self, orientation, slice_number, old_range, new_range):
+        """
+        Tell if the threshold of the slice may be different using new_range
+        instead of old_range, that is, if the slice may have a value inside
+        one of the ranges but not inside the other.
+        """
+        axis = self.ORIENTATION_AXES[orientation]
+        old_lo, old_hi = self._get_value_offsets(*old_range)
+        new_lo, new_hi = self._get_value_offsets(*new_range)
+        if old_hi <= old_lo or new_hi <= new_lo:
+            return self._has_values(axis, slice_number, old_lo, old_hi) or self._has_values(
+                axis, slice_number, new_lo, new_hi
+            )
+        # The values which went to the other side of the threshold are between
+        # the two lower bounds and between the two upper bounds.
+        return self._has_values(
+            axis, slice_number, min(old_lo, new_lo), max(old_lo, new_lo)
+        ) or self._has_values(axis, slice_number, min(old_hi, new_hi), max(old_hi, new_hi))
+
+
+class ImageStatistics:
+    """
+    Scalar range and counts of each value of an int16 image, accumulated
+    slice by slice (by several threads) while the image is loaded, so the
+    image doesn't need to be scanned again.
+    """
+
+    OFFSET = -np.iinfo(np.int16).min
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.min_value = None
+        self.max_value = None
+        self._counts = np.zeros(np.iinfo(np.uint16).max + 1, dtype=np.int64)
+
+    def add(self, array):
+        """
+        Count the values of array (int16).
+        """
+        if not array.size:
+            return
+        lo = int(array.min())
+        hi = int(array.max())
+        counts = np.bincount(np.subtract(array, lo, dtype=np.int32).ravel(), minlength=hi - lo + 1)
+        with self._lock:
+            self._counts[lo + self.OFFSET : hi + self.OFFSET + 1] += counts
+            if self.min_value is None:
+                self.min_value, self.max_value = lo, hi
+            else:
+                self.min_value = min(self.min_value, lo)
+                self.max_value = max(self.max_value, hi)
+
+    @property
+    def scalar_range(self):
+        return self.min_value, self.max_value
+
+    def get_counts(self):
+        """
+        Return the counts of the values from min_value to max_value.
+        """
+        return self._counts[self.min_value + self.OFFSET : self.max_value + self.OFFSET + 1]
+
+    def get_percentile(self, q):
+        """
+        Return the q-th percentile of the values, the same given by
+        np.percentile (with linear interpolation).
+        """
+        cumulative = np.cumsum(self.get_counts())
+        position = q / 100.0 * (cumulative[-1] - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, int(cumulative[-1]) - 1)
+        v_lower, v_upper = np.searchsorted(cumulative, (lower, upper), side="right")
+        return self.min_value + v_lower + (position - lower) * (v_upper - v_lower)
@@ -1,9 +1,11 @@
+import os
 from typing import TYPE_CHECKING, Tuple
 
 import numpy as np
 from scipy import ndimage
 from scipy.ndimage import watershed_ift
 
+from invesalius.data import filters
 from invesalius.data.imagedata_utils import get_LUT_value
 
 try:
@@ -12,10 +14,140 @@ except ImportError:
     from skimage.morphology import watershed
 
 if TYPE_CHECKING:
-    import os
     from multiprocessing import Queue
 
 
+def get_markers_bbox(markers: np.ndarray, margin: int) -> "tuple[slice, ...] | None":
+    """
+    Return the bounding box (a tuple of slices) of the markers plus margin
+    voxels on each side, or None if there are no markers.
+    """
+    bbox = []
+    for axis in range(markers.ndim):
+        others = tuple(a for a in range(markers.ndim) if a != axis)
+        index = np.flatnonzero(markers.any(axis=others))
+        if not index.size:
+            return None
+        start = max(int(index[0]) - margin, 0)
+        stop = min(int(index[-1]) + 1 + margin, markers.shape[axis])
+        bbox.append(slice(start, stop))
+    return tuple(bbox)
+
+
+def grow_bbox(bbox: "tuple[slice, ...]", size: int, shape: Tuple[int, ...]) -> "tuple[slice, ...]":
+    return tuple(slice(max(s.start - size, 0), min(s.stop + size, n)) for s, n in zip(bbox, shape))
+
+
+def union_bbox(a: "tuple[slice, ...]", b: "tuple[slice, ...]") -> "tuple[slice, ...]":
+    return tuple(slice(min(sa.start, sb.start), max(sa.stop, sb.stop)) for sa, sb in zip(a, b))
+
+
+def bbox_contains(a: "tuple[slice, ...]", b: "tuple[slice, ...]") -> bool:
+    return all(sa.start <= sb.start and sb.stop <= sa.stop for sa, sb in zip(a, b))
+
+
+def relative_bbox(bbox: "tuple[slice, ...]", outer: "tuple[slice, ...]") -> "tuple[slice, ...]":
+    """
+    Return bbox relative to the start of outer (that contains it).
+    """
+    return tuple(slice(s.start - o.start, s.stop - o.start) for s, o in zip(bbox, outer))
+
+
+class PreparedImage:
+    """
+    The image prepared to the watershed (mapped to the window width and
+    level, and its gradient for the Watershed algorithm) in the region bbox.
+    It's reused by the next watersheds with the same parameters (key) whose
+    markers are inside the region, e.g. the next strokes of the user.
+
+    If filename is given the image is kept in that file, so it can be filled
+    by the watershed process.
+    """
+
+    def __init__(self, key, bbox, filename=None):
+        self.key = key
+        self.bbox = bbox
+        self.shape = tuple(s.stop - s.start for s in bbox)
+        self.filename = filename
+        self.ready = False
+        self._image = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_image"] = None
+        return state
+
+    def covers(self, key, bbox: "tuple[slice, ...]") -> bool:
+        return self.ready and key == self.key and bbox_contains(self.bbox, bbox)
+
+    def get_image(self) -> np.ndarray:
+        if self._image is None:
+            if self.filename is None:
+                self._image = np.empty(self.shape, dtype="uint16")
+            else:
+                mode = "r+" if self.ready else "w+"
+                self._image = np.memmap(self.filename, shape=self.shape, dtype="uint16", mode=mode)
+        return self._image
+
+    def remove(self) -> None:
+        self._image = None
+        if self.filename is not None:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
+
+
+def prepare_image(
+    image: np.ndarray,
+    bbox: "tuple[slice, ...]",
+    out: np.ndarray,
+    algorithm: str,
+    mg_size: "int | Tuple[int, ...]",
+    use_ww_wl: bool,
+    wl: int,
+    ww: int,
+    image_min: int,
+    n_workers: int = 1,
+) -> None:
+    """
+    Write into out the image prepared to the watershed in the region bbox.
+    The 3D images are prepared slab by slab by n_workers threads.
+    """
+    # The gradient of the region depends on the image around it.
+    halo = int(np.max(mg_size)) // 2 if algorithm == "Watershed" else 0
+    outer = grow_bbox(bbox, halo, image.shape)
+    inner = relative_bbox(bbox, outer)
+
+    def prepare(block):
+        if use_ww_wl:
+            block = get_LUT_value(block, ww, wl).astype("uint16")
+        else:
+            block = (block - image_min).astype("uint16")
+        if algorithm == "Watershed":
+            block = ndimage.morphological_gradient(block, mg_size)
+        return block
+
+    if image.ndim == 3 and n_workers > 1:
+        tmp_image = np.empty(tuple(s.stop - s.start for s in outer), dtype="uint16")
+        filters.apply_tiled(prepare, image[outer], tmp_image, halo=halo, n_workers=n_workers)
+    else:
+        tmp_image = prepare(np.asarray(image[outer]))
+    out[:] = tmp_image[inner]
+
+
+def run_watershed(
+    tmp_image: np.ndarray,
+    markers: np.ndarray,
+    bstruct: "int | np.ndarray | None",
+    algorithm: str,
+) -> np.ndarray:
+    if algorithm == "Watershed":
+        return watershed(tmp_image, markers.astype("int16"), bstruct)
+    else:
+        return watershed_ift(tmp_image, markers.astype("int16"), bstruct)
+
+
 def do_watershed(
     image: np.ndarray,
     markers: np.ndarray,
@@ -28,33 +160,56 @@ def do_watershed(
     wl: int,
     ww: int,
     q: "Queue[int]",
+    prepared: "PreparedImage | None" = None,
+    image_min: "int | None" = None,
+    n_workers: int = 1,
 ) -> None:
+    """
+    Watershed of the image from the markers into the tfile mask. Only the
+    region of the prepared image (the whole image if it's None) is segmented,
+    the rest of the mask is left 0. The prepared image is computed if it's not
+    ready.
+    """
     mask = np.memmap(tfile, shape=shape, dtype="uint8", mode="r+")
+    if image_min is None and not use_ww_wl:
+        image_min = image.min()
+    if prepared is None:
+        prepared = PreparedImage(None, tuple(slice(0, n) for n in image.shape))
 
-    if use_ww_wl:
-        if algorithm == "Watershed":
-            tmp_image = ndimage.morphological_gradient(
-                get_LUT_value(image, ww, wl).astype("uint16"), mg_size
-            )
-            tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-        else:
-            tmp_image = get_LUT_value(image, ww, wl).astype("uint16")
-            # tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            # tmp_image = ndimage.morphological_gradient(
-            # get_LUT_value(image, ww, wl).astype('uint16'),
-            # self.config.mg_size)
-            tmp_mask = watershed_ift(tmp_image, markers.astype("int16"), bstruct)
-    else:
-        if algorithm == "Watershed":
-            tmp_image = ndimage.morphological_gradient(
-                (image - image.min()).astype("uint16"), mg_size
-            )
-            tmp_mask = watershed(tmp_image, markers.astype("int16"), bstruct)
-        else:
-            tmp_image = (image - image.min()).astype("uint16")
-            # tmp_image = ndimage.gaussian_filter(tmp_image, self.config.mg_size)
-            # tmp_image = ndimage.morphological_gradient((image - image.min()).astype('uint16'), self.config.mg_size)
-            tmp_mask = watershed_ift(tmp_image, markers.astype("int8"), bstruct)
-    mask[:] = tmp_mask
+    tmp_image = prepared.get_image()
+    if not prepared.ready:
+        prepare_image(
+            image,
+            prepared.bbox,
+            tmp_image,
+            algorithm,
+            mg_size,
+            use_ww_wl,
+            wl,
+            ww,
+            image_min,
+            n_workers,
+        )
+        if hasattr(tmp_image, "flush"):
+            tmp_image.flush()
+
+    mask[prepared.bbox] = run_watershed(tmp_image, markers[prepared.bbox], bstruct, algorithm)
     mask.flush()
     q.put(1)
+
+
+def apply_watershed_to_mask(
+    mask: np.ndarray, tmp_mask: np.ndarray, bbox: "tuple[slice, ...]", overwrite: bool
+) -> None:
+    """
+    Set the mask from the watershed result tmp_mask (1 foreground and 2
+    background) of the region bbox of the mask.
+    """
+    if overwrite:
+        mask[:] = 0
+        mask[bbox][tmp_mask == 1] = 253
+    else:
+        mask = mask[bbox]
+        editable = (mask == 0) | (mask == 2) | (mask == 253)
+        mask[(tmp_mask == 2) & editable] = 2
+        mask[(tmp_mask == 1) & editable] = 253
@@ -2826,7 +2826,7 @@ class ImagePage(wx.Panel):
     def _on_get_image_labels(self):
         """Provide a list of current image labels and active index to the requester."""
         proj = Project()
-        labels = [lbl for lbl, _ in proj.image_versions]
+        labels = proj.image_versions.labels()
 
         # Find currently active index (the one with the visible eye icon)
         active_idx = 0
@@ -2852,12 +2852,13 @@ class ImagePage(wx.Panel):
         proj = Project()
         slc = slice_module.Slice()
 
-        # Ensure Original is present if loading a fresh project
-        if not proj.image_versions and slc.matrix is not None:
-            proj.image_versions.append(("original", slc.matrix.copy()))
+        # Ensure Original is present (the filtered versions opened from the
+        # project are computed from it when used)
+        if slc.matrix is not None:
+            proj.image_versions.add_original(slc.matrix)
 
         # Add all entries without auto-selecting (eye icons are reset in add_entry)
-        for label, matrix in proj.image_versions:
+        for label in proj.image_versions.labels():
             idx = self.list_ctrl.GetItemCount()
             info = _("Original") if idx == 0 else _("Filtered")
             self.list_ctrl.InsertItem(idx, "")
@@ -2934,7 +2935,7 @@ class ImagesListCtrl(InvListCtrl):
                 self.SetItemImage(i, 0)
             self.SetItemImage(idx, 1)
 
-            label, _ = proj.image_versions[idx]
+            label = proj.image_versions.labels()[idx]
             Publisher.sendMessage("Switch active image by label", label=label)
 
     def OnRightClick(self, evt):
@@ -2954,7 +2955,7 @@ class ImagesListCtrl(InvListCtrl):
         if not (0 <= self.right_clicked_idx < len(proj.image_versions)):
             return
 
-        label, _mat = proj.image_versions[self.right_clicked_idx]
+        label = proj.image_versions.labels()[self.right_clicked_idx]
 
         # Original image has no metadata
         if label == "original":
@@ -3026,8 +3027,8 @@ class ImagesListCtrl(InvListCtrl):
 
                 proj = Project()
                 if item_idx < len(proj.image_versions):
-                    old_label, mat = proj.image_versions[item_idx]
-                    proj.image_versions[item_idx] = (new_name, mat)
+                    old_label = proj.image_versions.labels()[item_idx]
+                    proj.image_versions.rename(old_label, new_name)
                     if old_label in proj.image_versions_meta:
                         proj.image_versions_meta[new_name] = proj.image_versions_meta.pop(old_label)
                     if proj.active_image_version == old_label:
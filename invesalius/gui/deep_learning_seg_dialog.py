@@ -102,9 +102,7 @@ class DeepLearningSegmenterDialog(wx.Dialog):
         from invesalius.project import Project
 
         proj = Project()
-        self.img_labels = (
-            [lbl for lbl, _ in proj.image_versions] if proj.image_versions else ["original"]
-        )
+        self.img_labels = proj.image_versions.labels() if proj.image_versions else ["original"]
         # Translate for display only — raw labels are stored in self.img_labels for pubsub
         display_labels = [_("Original") if lbl == "original" else lbl for lbl in self.img_labels]
 
@@ -2494,6 +2494,9 @@ class WatershedOptionsPanel(wx.Panel):
             self, -1, value=self.config.mg_size, min_value=1, max_value=10
         )
 
+        self.crop_to_markers = wx.CheckBox(self, -1, _("Segment only around the markers"))
+        self.crop_to_markers.SetValue(self.config.crop_to_markers)
+
         box_sizer = wx.StaticBoxSizer(wx.StaticBox(self, -1, "Conectivity"), wx.VERTICAL)
         box_sizer.Add(self.choice_2dcon, 0, wx.ALL, 5)
         box_sizer.Add(self.choice_3dcon, 0, wx.ALL, 5)
@@ -2506,6 +2509,7 @@ class WatershedOptionsPanel(wx.Panel):
         sizer.Add(self.choice_algorithm, 0, wx.ALL, 5)
         sizer.Add(box_sizer, 1, wx.EXPAND | wx.ALL, 5)
         sizer.Add(g_sizer, 0, wx.ALL, 5)
+        sizer.Add(self.crop_to_markers, 0, wx.ALL, 5)
 
         self.SetSizer(sizer)
         sizer.Fit(self)
@@ -2516,6 +2520,7 @@ class WatershedOptionsPanel(wx.Panel):
         self.config.con_2d = self.con2d_choices[self.choice_2dcon.GetSelection()]
         self.config.con_3d = self.con3d_choices[self.choice_3dcon.GetSelection()]
         self.config.mg_size = self.gaussian_size.GetValue()
+        self.config.crop_to_markers = self.crop_to_markers.GetValue()
 
 
 class WatershedOptionsDialog(wx.Dialog):
@@ -8053,6 +8058,7 @@ class ImageFilterDialog(wx.Dialog):
             _("Image Filters"),
             style=wx.DEFAULT_DIALOG_STYLE | wx.FRAME_FLOAT_ON_PARENT,
         )
+        self.is_applying = False
         self._init_gui()
         self._on_select_filter()
         self._bind_events()
@@ -8173,6 +8179,7 @@ class ImageFilterDialog(wx.Dialog):
         self.Bind(wx.EVT_CLOSE, self._on_close)
 
         Publisher.subscribe(self._on_filter_done, "Image filter done")
+        Publisher.subscribe(self._on_filter_progress, "Update image filter progress")
         Publisher.subscribe(self._on_update_combobox, "Update image filter combobox")
 
         # Request initial list of image labels to populate the cb_volume
@@ -8230,6 +8237,12 @@ class ImageFilterDialog(wx.Dialog):
         self.Fit()
 
     def _on_apply(self, evt):
+        if self.is_applying:
+            # While applying, the apply button cancels the filter.
+            self.btn_apply.Disable()
+            Publisher.sendMessage("Cancel image filter")
+            return
+
         sel = self.cb_filter.GetSelection()
         # 0->Despeckle(4), 1->BorderDetection(5), 2->Mean(2), 3->Median(1)
         filter_map = {0: 4, 1: 5, 2: 2, 3: 1}
@@ -8243,8 +8256,8 @@ class ImageFilterDialog(wx.Dialog):
         orientations = ["Axial", "Coronal", "Sagittal"]
         orientation = orientations[orientation_idx]
 
-        self.btn_apply.Disable()
-        self.btn_apply.SetLabel(_("Applying..."))
+        self.is_applying = True
+        self.btn_apply.SetLabel(_("Cancel"))
         Publisher.sendMessage(
             "Apply image filter",
             filter_type=filter_type,
@@ -8253,7 +8266,12 @@ class ImageFilterDialog(wx.Dialog):
             orientation=orientation,
         )
 
+    def _on_filter_progress(self, value):
+        if self.btn_apply and self.is_applying:
+            self.btn_apply.SetLabel(_("Cancel") + f" ({value}%)")
+
     def _on_filter_done(self):
+        self.is_applying = False
         if self.btn_apply:
             self.btn_apply.SetLabel(_("Apply"))
             self.btn_apply.Enable()
@@ -8263,6 +8281,7 @@ class ImageFilterDialog(wx.Dialog):
     def _on_close(self, evt):
         try:
             Publisher.unsubscribe(self._on_filter_done, "Image filter done")
+            Publisher.unsubscribe(self._on_filter_progress, "Update image filter progress")
             Publisher.unsubscribe(self._on_update_combobox, "Update image filter combobox")
         except Exception:
             pass
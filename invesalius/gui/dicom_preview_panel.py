@@ -550,7 +550,9 @@ class DicomPreviewSlice(wx.Panel):
         dicom_files = group.GetHandSortedList()
         n = 0
         for dicom in dicom_files:
-            if isinstance(dicom.image.thumbnail_path, list):
+            # Checking the number of frames instead of the type of
+            # thumbnail_path, which would create all the thumbnails now.
+            if dicom.image.number_of_frames > 1:
                 _slice = 0
                 for thumbnail in dicom.image.thumbnail_path:
                     print(thumbnail)
@@ -585,7 +587,9 @@ class DicomPreviewSlice(wx.Panel):
         dicom_files = group.GetHandSortedList()
         n = 0
         for dicom in dicom_files:
-            if isinstance(dicom.image.thumbnail_path, list):
+            # Checking the number of frames instead of the type of
+            # thumbnail_path, which would create all the thumbnails now.
+            if dicom.image.number_of_frames > 1:
                 _slice = 0
                 for thumbnail in dicom.image.thumbnail_path:
                     print(thumbnail)
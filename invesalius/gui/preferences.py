@@ -17,6 +17,7 @@ import invesalius.session as ses
 from invesalius import inv_paths, utils
 from invesalius.gui.language_dialog import ComboBoxLanguage
 from invesalius.i18n import tr as _
+from invesalius.navigation import latency
 from invesalius.navigation.navigation import Navigation
 from invesalius.navigation.robot import Robot, Robots
 from invesalius.navigation.tracker import Tracker
@@ -540,6 +541,9 @@ class NavigationTab(wx.Panel):
             ]
         )
 
+        pose_filter_sizer = self.InitPoseFilter()
+        latency_sizer = self.InitLatency()
+
         # Marker shape preferences
         bsizer_markers = wx.StaticBoxSizer(wx.HORIZONTAL, self, _("Marker Shapes"))
 
@@ -567,6 +571,8 @@ class NavigationTab(wx.Panel):
 
         main_sizer = wx.BoxSizer(wx.VERTICAL)
         main_sizer.Add(conf_sizer, 0, wx.ALL | wx.EXPAND, 10)
+        main_sizer.Add(pose_filter_sizer, 0, wx.ALL | wx.EXPAND, 10)
+        main_sizer.Add(latency_sizer, 0, wx.ALL | wx.EXPAND, 10)
         main_sizer.Add(bsizer_markers, 0, wx.ALL | wx.EXPAND, 10)
         # Creating MEP Mapping BoxSizer
         if self.mep_configuration.get("mep_enabled") is True:
@@ -576,6 +582,128 @@ class NavigationTab(wx.Panel):
         self.SetSizerAndFit(main_sizer)
         self.Layout()
 
+    def InitPoseFilter(self):
+        """
+        The smoothing of the tracked poses, and their prediction to the time
+        they are rendered to compensate the latency.
+        """
+        pose_filter_sizer = wx.StaticBoxSizer(wx.VERTICAL, self, _("Pose filter"))
+        box = pose_filter_sizer.GetStaticBox()
+
+        self.pose_filters = list(const.POSE_FILTERS)
+        lbl_pose_filter = wx.StaticText(box, -1, _("Smoothing:"))
+        self.choice_pose_filter = wx.Choice(box, -1, choices=list(const.POSE_FILTERS.values()))
+        pose_filter = self.navigation.pose_filter
+        if pose_filter not in self.pose_filters:
+            pose_filter = const.POSE_FILTER
+        self.choice_pose_filter.SetSelection(self.pose_filters.index(pose_filter))
+        self.choice_pose_filter.Bind(wx.EVT_CHOICE, self.OnSelectPoseFilter)
+
+        self.cb_pose_prediction = wx.CheckBox(box, -1, _("Predict the poses to the render time"))
+        self.cb_pose_prediction.SetValue(self.navigation.pose_prediction)
+        self.cb_pose_prediction.Bind(wx.EVT_CHECKBOX, self.OnSelectPoseFilter)
+
+        line_pose_filter = wx.BoxSizer(wx.HORIZONTAL)
+        line_pose_filter.AddMany(
+            [
+                (lbl_pose_filter, 1, wx.EXPAND | wx.GROW | wx.TOP | wx.RIGHT | wx.LEFT, 5),
+                (self.choice_pose_filter, 0, wx.ALL | wx.EXPAND | wx.GROW, 5),
+            ]
+        )
+        pose_filter_sizer.Add(line_pose_filter, 0, wx.GROW | wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+        pose_filter_sizer.Add(self.cb_pose_prediction, 0, wx.ALL, 10)
+
+        return pose_filter_sizer
+
+    def OnSelectPoseFilter(self, evt):
+        pose_filter = self.pose_filters[self.choice_pose_filter.GetSelection()]
+        pose_prediction = self.cb_pose_prediction.GetValue()
+        self.navigation.UpdatePoseFilter(pose_filter, pose_prediction)
+
+        self.session.SetConfig("pose_filter", pose_filter)
+        self.session.SetConfig("pose_prediction", pose_prediction)
+
+    def InitLatency(self):
+        """
+        The latency and rate of each navigation stage, updated every second, to
+        tune the sleep times.
+        """
+        latency_sizer = wx.StaticBoxSizer(wx.VERTICAL, self, _("Navigation latency"))
+        box = latency_sizer.GetStaticBox()
+
+        self.latency_list = wx.ListCtrl(box, -1, size=wx.Size(-1, 130), style=wx.LC_REPORT)
+        columns = [
+            _("Stage"),
+            _("Rate (Hz)"),
+            _("p50 (ms)"),
+            _("p95 (ms)"),
+            _("p99 (ms)"),
+            _("Total p95 (ms)"),
+            _("Dropped"),
+        ]
+        for n, column in enumerate(columns):
+            self.latency_list.InsertColumn(n, column)
+        for n, stage in enumerate(latency.STAGES):
+            self.latency_list.InsertItem(n, stage)
+
+        btn_reset = wx.Button(box, -1, _("Reset"))
+        btn_reset.Bind(wx.EVT_BUTTON, self.OnResetLatency)
+        btn_save = wx.Button(box, -1, _("Save..."))
+        btn_save.Bind(wx.EVT_BUTTON, self.OnSaveLatency)
+        line_buttons = wx.BoxSizer(wx.HORIZONTAL)
+        line_buttons.Add(btn_reset, 0, wx.RIGHT, 5)
+        line_buttons.Add(btn_save, 0)
+
+        latency_sizer.Add(self.latency_list, 0, wx.ALL | wx.EXPAND, 5)
+        latency_sizer.Add(line_buttons, 0, wx.ALL | wx.ALIGN_RIGHT, 5)
+
+        self.latency_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnUpdateLatency, self.latency_timer)
+        self.latency_timer.Start(1000)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy)
+        self.OnUpdateLatency(None)
+
+        return latency_sizer
+
+    def OnUpdateLatency(self, evt):
+        def fmt(value):
+            return "-" if value is None else f"{value:.1f}"
+
+        summary = latency.LatencyMonitor().summary()
+        for n, stage in enumerate(latency.STAGES):
+            values = summary[stage]
+            row = [
+                fmt(values["hz"]),
+                fmt(values["stage_p50_ms"]),
+                fmt(values["stage_p95_ms"]),
+                fmt(values["stage_p99_ms"]),
+                fmt(values["total_p95_ms"]),
+                str(values["dropped"]),
+            ]
+            for column, text in enumerate(row, start=1):
+                self.latency_list.SetItem(n, column, text)
+
+    def OnResetLatency(self, evt):
+        latency.LatencyMonitor().reset()
+        self.OnUpdateLatency(None)
+
+    def OnSaveLatency(self, evt):
+        dlg = wx.FileDialog(
+            self,
+            message=_("Save navigation latency"),
+            defaultFile="navigation_latency.csv",
+            wildcard=_("CSV files (*.csv)|*.csv|JSON files (*.json)|*.json"),
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+        )
+        if dlg.ShowModal() == wx.ID_OK:
+            latency.LatencyMonitor().dump(dlg.GetPath())
+        dlg.Destroy()
+
+    def OnDestroy(self, evt):
+        if evt.GetEventObject() is self:
+            self.latency_timer.Stop()
+        evt.Skip()
+
     def OnSelectNavSleep(self, evt, ctrl):
         self.sleep_nav = ctrl.GetValue()
         self.navigation.UpdateNavSleep(self.sleep_nav)
@@ -548,6 +548,10 @@ class MaskProperties(wx.Panel):
         gradient = grad.GradientCtrl(self, -1, -5000, 5000, 0, 5000, (0, 255, 0, 100))
         self.gradient = gradient
 
+        ## LINE 5
+        text_voxel_count = wx.StaticText(self, -1, "")
+        self.text_voxel_count = text_voxel_count
+
         # Add all lines into main sizer
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.AddSpacer(7)
@@ -560,6 +564,8 @@ class MaskProperties(wx.Panel):
 
         sizer.AddSpacer(5)
         sizer.Add(gradient, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+        sizer.AddSpacer(2)
+        sizer.Add(text_voxel_count, 0, wx.GROW | wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
         sizer.AddSpacer(7)
 
         sizer.Fit(self)
@@ -589,6 +595,7 @@ class MaskProperties(wx.Panel):
         Publisher.subscribe(self.OnRemoveMasks, "Remove masks")
         Publisher.subscribe(self.OnCloseProject, "Close project data")
         Publisher.subscribe(self.SetThresholdValues2, "Set threshold values")
+        Publisher.subscribe(self.SetVoxelCount, "Update threshold voxel count")
 
     def OnCloseProject(self):
         self.CloseProject()
@@ -600,6 +607,7 @@ class MaskProperties(wx.Panel):
         n = self.combo_thresh.GetCount()
         for i in range(n - 1, -1, -1):
             self.combo_thresh.Delete(i)
+        self.text_voxel_count.SetLabel("")
 
     def OnRemoveMasks(self, mask_indexes):
         self.combo_mask_name.Freeze()
@@ -666,6 +674,13 @@ class MaskProperties(wx.Panel):
             self.combo_thresh.SetSelection(index)
             Project().threshold_modes[_("Custom")] = (thresh_min, thresh_max)
 
+    def SetVoxelCount(self, n_voxels, volume):
+        self.text_voxel_count.SetLabel(
+            _("Voxels in threshold: {n_voxels} ({volume:.2f} mm³)").format(
+                n_voxels=n_voxels, volume=volume
+            )
+        )
+
     def SetItemsColour(self, colour):
         self.gradient.SetColour(colour)
         self.button_colour.SetColour(colour)
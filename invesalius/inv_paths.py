@@ -29,6 +29,7 @@ USER_PRESET_DIR = USER_INV_DIR.joinpath("presets")
 USER_LOG_DIR = USER_INV_DIR.joinpath("logs")
 USER_DL_WEIGHTS = USER_INV_DIR.joinpath("deep_learning/weights/")
 USER_RAYCASTING_PRESETS_DIRECTORY = USER_PRESET_DIR.joinpath("raycasting")
+USER_DICOM_INDEX_DIR = USER_INV_DIR.joinpath("dicom_index")
 TEMP_DIR = tempfile.gettempdir()
 
 USER_PLUGINS_DIRECTORY = USER_INV_DIR.joinpath("plugins")
@@ -98,6 +99,7 @@ def create_conf_folders() -> None:
     USER_LOG_DIR.mkdir(parents=True, exist_ok=True)
     USER_DL_WEIGHTS.mkdir(parents=True, exist_ok=True)
     USER_PLUGINS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    USER_DICOM_INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def copy_old_files() -> None:
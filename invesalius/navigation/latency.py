@@ -0,0 +1,161 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Latency and throughput of the navigation pipeline.
+
+Each tracker pose carries the times (time.perf_counter) it passed the stages
+of the pipeline, its stamps. When a stage handles a pose it records the time
+since the previous stage and since the tracker was read, and the poses it
+skipped because newer ones arrived. The last samples of each stage are kept
+to compute its rate and latency percentiles.
+"""
+
+import csv
+import json
+import threading
+from collections import deque
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import invesalius.constants as const
+from invesalius.utils import Singleton
+
+# The stages, in the order the poses pass them.
+STAGE_TRACKER = "tracker"
+STAGE_COREGISTRATION = "coregistration"
+STAGE_SCENE = "scene"
+STAGE_RENDER = "render"
+STAGE_E_FIELD = "e-field"
+STAGES = (STAGE_TRACKER, STAGE_COREGISTRATION, STAGE_SCENE, STAGE_RENDER, STAGE_E_FIELD)
+
+PERCENTILES = (50, 95, 99)
+
+Stamps = Tuple[Tuple[str, float], ...]
+
+
+class StageStats:
+    def __init__(self, size: int):
+        # (time, latency since the previous stage, latency since the tracker read)
+        self.samples: "deque[Tuple[float, float, float]]" = deque(maxlen=size)
+        self.count = 0
+        self.dropped = 0
+
+
+def summarize(count: int, dropped: int, samples: List[Tuple[float, float, float]]) -> dict:
+    summary = {"count": count, "dropped": dropped, "hz": 0.0}
+    times = np.array(samples, dtype=np.float64).reshape(-1, 3)
+    if len(times) > 1 and times[-1, 0] > times[0, 0]:
+        summary["hz"] = float((len(times) - 1) / (times[-1, 0] - times[0, 0]))
+    for name, column in (("stage", 1), ("total", 2)):
+        if len(times):
+            values = [float(v) for v in np.percentile(times[:, column], PERCENTILES) * 1000.0]
+        else:
+            values = [None] * len(PERCENTILES)
+        for p, value in zip(PERCENTILES, values):
+            summary[f"{name}_p{p}_ms"] = value
+    return summary
+
+
+class LatencyMonitor(metaclass=Singleton):
+    """
+    The latency and throughput statistics of the navigation stages, shared
+    by the navigation threads.
+    """
+
+    def __init__(self, size: int = const.NAVIGATION_LATENCY_SAMPLES):
+        self.size = size
+        self._lock = threading.Lock()
+        self._stats = {stage: StageStats(size) for stage in STAGES}
+
+    def record(self, stage: str, stamps: Stamps, now: Optional[float] = None) -> Stamps:
+        """
+        Record that stage handled the pose with stamps at now (the current time
+        if None), returning the stamps with this stage added.
+        """
+        if now is None:
+            now = perf_counter()
+        if stamps:
+            sample = (now, now - stamps[-1][1], now - stamps[0][1])
+        else:
+            sample = (now, 0.0, 0.0)
+        with self._lock:
+            stats = self._stats[stage]
+            stats.samples.append(sample)
+            stats.count += 1
+        return stamps + ((stage, now),)
+
+    def drop(self, stage: str, n: int = 1) -> None:
+        """
+        Count n poses that arrived at stage but were replaced by newer ones.
+        """
+        if n > 0:
+            with self._lock:
+                self._stats[stage].dropped += n
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {stage: StageStats(self.size) for stage in STAGES}
+
+    def latency(self, stage: str, percentile: float = 50) -> Optional[float]:
+        """
+        Return the percentile of the latency (seconds) since the tracker read
+        of the poses handled by stage, or None if it handled none.
+        """
+        with self._lock:
+            totals = [sample[2] for sample in self._stats[stage].samples]
+        if not totals:
+            return None
+        return float(np.percentile(totals, percentile))
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Return, by stage, the number of poses handled and dropped, the rate
+        (Hz) and the percentiles of the latencies (ms) since the previous
+        stage and since the tracker read.
+        """
+        with self._lock:
+            stats = {
+                stage: (s.count, s.dropped, list(s.samples)) for stage, s in self._stats.items()
+            }
+        return {stage: summarize(*values) for stage, values in stats.items()}
+
+    def rows(self) -> List[dict]:
+        return [{"stage": stage, **values} for stage, values in self.summary().items()]
+
+    def dump_csv(self, filename: str) -> None:
+        rows = self.rows()
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def dump_json(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def dump(self, filename: str) -> None:
+        """
+        Save the summary as JSON if filename ends with .json, as CSV otherwise.
+        """
+        if filename.lower().endswith(".json"):
+            self.dump_json(filename)
+        else:
+            self.dump_csv(filename)
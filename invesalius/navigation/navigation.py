@@ -20,16 +20,17 @@
 import queue
 import threading
 import time
-from time import sleep
 
 import numpy as np
 import wx
 
 import invesalius.constants as const
 import invesalius.data.bases as db
+import invesalius.data.coordinates as dco
 import invesalius.data.coregistration as dcr
 import invesalius.data.e_field as e_field
 import invesalius.data.polydata_utils as pu
+import invesalius.data.record_coords as record_coords
 import invesalius.data.serial_port_connection as spc
 import invesalius.data.slice_ as sl
 import invesalius.data.tractography as dti
@@ -42,6 +43,7 @@ from invesalius.data.visualization.mep_visualizer import MEPVisualizer
 from invesalius.i18n import tr as _
 from invesalius.navigation.image import Image
 from invesalius.navigation.iterativeclosestpoint import IterativeClosestPoint
+from invesalius.navigation.latency import STAGE_RENDER, STAGE_SCENE, LatencyMonitor
 from invesalius.navigation.markers import MarkersControl
 from invesalius.navigation.robot import Robots
 from invesalius.navigation.tracker import Tracker
@@ -108,15 +110,15 @@ class UpdateNavigationScene(threading.Thread):
     def __init__(self, vis_queues, vis_components, event, sle, neuronavigation_api):
         """Class (threading) to update the navigation scene with all graphical elements.
 
-        Sleep function in run method is used to avoid blocking GUI and more fluent, real-time navigation
+        The scene is updated as soon as a new pose is coregistered, at most once every sle seconds
 
         :param affine_vtk: Affine matrix in vtkMatrix4x4 instance to update objects position in 3D scene
         :type affine_vtk: vtkMatrix4x4
-        :param visualization_queue: Queue instance that manage coordinates to be visualized
-        :type visualization_queue: queue.Queue
+        :param vis_queues: The buffer of the coregistered poses and the queues of the other threads
+        :type vis_queues: list
         :param event: Threading event to coordinate when tasks as done and allow UI release
         :type event: threading.Event
-        :param sle: Sleep pause in seconds
+        :param sle: Minimum interval between scene updates in seconds
         :type sle: float
         :param neuronavigation_api: An API object for communicating the coil position.
         :type neuronavigation_api: invesalius.net.neuronavigation_api.NeuronavigationAPI
@@ -131,7 +133,7 @@ class UpdateNavigationScene(threading.Thread):
             self.plot_efield_vectors,
         ) = vis_components
         (
-            self.coord_queue,
+            self.coord_buffer,
             self.serial_port_queue,
             self.tracts_queue,
             self.e_field_norms_queue,
@@ -141,10 +143,11 @@ class UpdateNavigationScene(threading.Thread):
         self.event = event
         self.neuronavigation_api = neuronavigation_api
         self.navigation = Navigation()
+        self.monitor = LatencyMonitor()
         self._last_render = 0.0
         self._render_interval = max(self.sle, 1.0 / 100.0)
         self._slice_render_interval = max(self.sle, 1.0 / 10.0)
-        self._loop_sleep = max(self.sle, 1.0 / 120.0)
+        self._dispatch_interval = max(self.sle, 1.0 / 120.0)
         self._last_pose_update = 0.0
         self._last_dispatch = 0.0
         self._dispatch_pending = False
@@ -164,9 +167,12 @@ class UpdateNavigationScene(threading.Thread):
         main_coil,
         coords,
         m_imgs,
+        scene_coords,
+        scene_m_imgs,
         tracts_payload,
         trigger_on,
         enorm_data,
+        stamps=(),
     ):
         try:
             if tracts_payload is not None:
@@ -192,7 +198,9 @@ class UpdateNavigationScene(threading.Thread):
                 )
 
                 if coil_visible:
-                    Publisher.sendMessage("Update coil poses", m_imgs=m_imgs, coords=coords)
+                    Publisher.sendMessage(
+                        "Update coil poses", m_imgs=scene_m_imgs, coords=scene_coords
+                    )
                     Publisher.sendMessage(
                         "Update coil pose",
                         m_img=m_imgs[main_coil],
@@ -204,8 +212,8 @@ class UpdateNavigationScene(threading.Thread):
                     )
                     Publisher.sendMessage(
                         "Update object arrow matrix",
-                        m_img=m_imgs[main_coil],
-                        coord=coords[main_coil],
+                        m_img=scene_m_imgs[main_coil],
+                        coord=scene_coords[main_coil],
                         flag=self.peel_loaded,
                     )
 
@@ -235,107 +243,146 @@ class UpdateNavigationScene(threading.Thread):
                 Publisher.sendMessage("Render volume viewer")
                 if slice_render:
                     Publisher.sendMessage("Update slice viewer")
+                self.monitor.record(STAGE_RENDER, stamps)
         finally:
             self._dispatch_pending = False
 
     def run(self):
+        last_seq = 0
+        deferred = False
         while not self.event.is_set():
-            try:
-                coords, marker_visibilities, m_imgs = self.coord_queue.get_nowait()
-            except queue.Empty:
-                sleep(self._loop_sleep)
-                continue
-
-            probe_visible = marker_visibilities[0]
-            coil_visible = any(marker_visibilities[2:])  # is any coil visible?
-
-            main_coil = self.navigation.main_coil
-            track_this = main_coil if self.navigation.track_coil else "probe"
-            # choose which object to track in slices and viewer_volume pointer
-            coord = coords.get(track_this, None)
-            if coord is None:
-                self.coord_queue.task_done()
+            if deferred:
+                # The last pose was not shown yet, show it when it's due if
+                # no newer pose arrives before.
+                sample = self.coord_buffer.wait_newer(last_seq, self._dispatch_interval)
+                if sample is None:
+                    sample = self.coord_buffer.latest()
+            else:
+                sample = self.coord_buffer.wait_newer(last_seq, const.POSE_WAIT_TIMEOUT)
+            if sample is None:
+                deferred = False
                 continue
+            if last_seq and sample.seq != last_seq:
+                # The poses skipped, and the deferred one if it was not shown.
+                self.monitor.drop(STAGE_SCENE, sample.seq - last_seq - 1 + deferred)
+            last_seq = sample.seq
+            deferred = not self._update_scene(*sample.value, stamps=sample.stamps)
 
-            # Remove probe, so that coords/m_imgs only contain coils
-            probe_coord = coords.pop("probe")
-            probe_m_img = m_imgs.pop("probe")
+    def _update_scene(
+        self,
+        coords,
+        marker_visibilities,
+        m_imgs,
+        scene_coords=None,
+        scene_m_imgs=None,
+        stamps=(),
+    ):
+        """
+        Dispatch the scene updates due for the coregistered poses to the GUI
+        thread. Return False if they were deferred, because the last updates
+        are still pending or were dispatched less than the interval ago.
+        The objects and the pointer are shown at scene_coords and scene_m_imgs
+        (the poses predicted to when they are rendered) if given.
+        """
+        if scene_coords is None:
+            scene_coords, scene_m_imgs = coords, m_imgs
+        probe_visible = marker_visibilities[0]
+        coil_visible = any(marker_visibilities[2:])  # is any coil visible?
+
+        main_coil = self.navigation.main_coil
+        track_this = main_coil if self.navigation.track_coil else "probe"
+        # choose which object to track in slices and viewer_volume pointer
+        coord = scene_coords.get(track_this, None)
+        if coord is None:
+            return True
 
-            # use of CallAfter is mandatory otherwise crashes the wx interface
-            tracts_payload = None
-            if self.view_tracts:
-                try:
-                    if self.e_field_loaded:
-                        wx.CallAfter(
-                            Publisher.sendMessage,
-                            "Update tract seed based efield",
-                            coord_tracts_queue=self.navigation.coord_tracts_queue,
-                            fallback_m_img=m_imgs[main_coil],
-                            current_revision=self.navigation.e_field_revision,
-                        )
-                    bundle, affine_vtk, coord_offset, coord_offset_w = (
-                        self.tracts_queue.get_nowait()
-                    )
-                except queue.Empty:
-                    pass
-                else:
-                    tracts_payload = (bundle, affine_vtk, coord_offset, coord_offset_w)
-                    self.tracts_queue.task_done()
-
-            trigger_on = False
-            if self.serial_port_enabled:
-                try:
-                    trigger_on = self.serial_port_queue.get_nowait()
-                except queue.Empty:
-                    trigger_on = False
-                else:
-                    self.serial_port_queue.task_done()
-
-            now = time.monotonic()
-            update_pose = now - self._last_pose_update >= self._render_interval
-            render = now - self._last_render >= self._render_interval
-            slice_render = render and (now - self._last_slice_render >= self._slice_render_interval)
-            enorm_data = None
-            if update_pose and coil_visible and self.e_field_loaded:
-                try:
-                    enorm_data = self.e_field_norms_queue.get_nowait()
-                except queue.Empty:
-                    pass
-                else:
-                    self.e_field_norms_queue.task_done()
+        now = time.monotonic()
+        if self._dispatch_pending or now - self._last_dispatch < self._dispatch_interval:
+            return False
 
-            if update_pose:
-                self._last_pose_update = now
-            if render:
-                self._last_render = now
-            if slice_render:
-                self._last_slice_render = now
-
-            if update_pose or render or tracts_payload is not None or trigger_on:
-                if not self._dispatch_pending and now - self._last_dispatch >= self._loop_sleep:
-                    self._last_dispatch = now
-                    self._dispatch_pending = True
+        # Remove probe, so that coords/m_imgs only contain coils
+        coords = dict(coords)
+        m_imgs = dict(m_imgs)
+        scene_coords = dict(scene_coords)
+        scene_m_imgs = dict(scene_m_imgs)
+        del coords["probe"], m_imgs["probe"]
+        probe_coord = scene_coords.pop("probe")
+        probe_m_img = scene_m_imgs.pop("probe")
+
+        # use of CallAfter is mandatory otherwise crashes the wx interface
+        tracts_payload = None
+        if self.view_tracts:
+            try:
+                if self.e_field_loaded:
                     wx.CallAfter(
-                        self._dispatch_updates,
-                        update_pose=update_pose,
-                        render=render,
-                        slice_render=slice_render,
-                        coord=coord,
-                        probe_visible=probe_visible,
-                        probe_coord=probe_coord,
-                        probe_m_img=probe_m_img,
-                        coil_visible=coil_visible,
-                        main_coil=main_coil,
-                        coords=coords,
-                        m_imgs=m_imgs,
-                        tracts_payload=tracts_payload,
-                        trigger_on=trigger_on,
-                        enorm_data=enorm_data,
+                        Publisher.sendMessage,
+                        "Update tract seed based efield",
+                        coord_tracts_queue=self.navigation.coord_tracts_queue,
+                        fallback_m_img=m_imgs[main_coil],
+                        current_revision=self.navigation.e_field_revision,
                     )
+                bundle, affine_vtk, coord_offset, coord_offset_w = self.tracts_queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                tracts_payload = (bundle, affine_vtk, coord_offset, coord_offset_w)
+                self.tracts_queue.task_done()
+
+        trigger_on = False
+        if self.serial_port_enabled:
+            try:
+                trigger_on = self.serial_port_queue.get_nowait()
+            except queue.Empty:
+                trigger_on = False
+            else:
+                self.serial_port_queue.task_done()
+
+        update_pose = now - self._last_pose_update >= self._render_interval
+        render = now - self._last_render >= self._render_interval
+        slice_render = render and (now - self._last_slice_render >= self._slice_render_interval)
+        enorm_data = None
+        if update_pose and coil_visible and self.e_field_loaded:
+            try:
+                enorm_data = self.e_field_norms_queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self.e_field_norms_queue.task_done()
 
-            self.coord_queue.task_done()
+        if not (update_pose or render or tracts_payload is not None or trigger_on):
+            return False
 
-            sleep(self._loop_sleep)
+        if update_pose:
+            self._last_pose_update = now
+        if render:
+            self._last_render = now
+        if slice_render:
+            self._last_slice_render = now
+
+        self._last_dispatch = now
+        self._dispatch_pending = True
+        stamps = self.monitor.record(STAGE_SCENE, stamps)
+        wx.CallAfter(
+            self._dispatch_updates,
+            update_pose=update_pose,
+            render=render,
+            slice_render=slice_render,
+            coord=coord,
+            probe_visible=probe_visible,
+            probe_coord=probe_coord,
+            probe_m_img=probe_m_img,
+            coil_visible=coil_visible,
+            main_coil=main_coil,
+            coords=coords,
+            m_imgs=m_imgs,
+            scene_coords=scene_coords,
+            scene_m_imgs=scene_m_imgs,
+            tracts_payload=tracts_payload,
+            trigger_on=trigger_on,
+            enorm_data=enorm_data,
+            stamps=stamps,
+        )
+        return True
 
 
 class Navigation(metaclass=Singleton):
@@ -354,9 +401,10 @@ class Navigation(metaclass=Singleton):
 
         self.all_fiducials = np.zeros((6, 6))
         self.event = threading.Event()
-        self.coord_queue = QueueCustom(maxsize=1)
+        # The coregistered poses, for the scene and the e-field threads.
+        self.coord_buffer = dco.PoseRingBuffer()
         self.object_at_target_queue = QueueCustom(maxsize=1)
-        self.efield_queue = QueueCustom(maxsize=1)
+        self.efield_buffer = dco.PoseRingBuffer()
         self.e_field_norms_queue = QueueCustom(maxsize=1)
         self.e_field_IDs_queue = QueueCustom(maxsize=1)
         # self.visualization_queue = QueueCustom(maxsize=1)
@@ -387,6 +435,10 @@ class Navigation(metaclass=Singleton):
         sleep_nav = session.GetConfig("sleep_nav", const.SLEEP_NAVIGATION)
         self.sleep_nav = sleep_nav
 
+        # Filter and prediction of the coregistered poses
+        self.pose_filter = session.GetConfig("pose_filter", const.POSE_FILTER)
+        self.pose_prediction = session.GetConfig("pose_prediction", const.POSE_PREDICTION)
+
         self.seed_offset = const.SEED_OFFSET
         self.seed_radius = const.SEED_RADIUS
 
@@ -399,6 +451,7 @@ class Navigation(metaclass=Singleton):
         # During navigation
         self.lock_to_target = False
         self.coil_at_target = False
+        self.recorder = None
 
         self.LoadConfig()
 
@@ -486,6 +539,14 @@ class Navigation(metaclass=Singleton):
         self.sleep_nav = sleep
         # self.serial_port_connection.sleep_nav = sleep
 
+    def UpdatePoseFilter(self, pose_filter, pose_prediction):
+        """
+        Set the filter of the poses and whether they are predicted to the time
+        they are rendered, used from the next navigation.
+        """
+        self.pose_filter = pose_filter
+        self.pose_prediction = pose_prediction
+
     def UpdateSerialPort(self, serial_port_in_use, com_port=None, baud_rate=None):
         self.serial_port_in_use = serial_port_in_use
         self.com_port = com_port
@@ -593,6 +654,8 @@ class Navigation(metaclass=Singleton):
         if self.event.is_set():
             self.event.clear()
 
+        LatencyMonitor().reset()
+
         vis_components = [
             self.serial_port_in_use,
             self.view_tracts,
@@ -601,7 +664,7 @@ class Navigation(metaclass=Singleton):
             self.plot_efield_vectors,
         ]
         vis_queues = [
-            self.coord_queue,
+            self.coord_buffer,
             self.serial_port_queue,
             self.tracts_queue,
             self.e_field_norms_queue,
@@ -654,10 +717,10 @@ class Navigation(metaclass=Singleton):
             coreg_data = [self.m_change, self.r_stylus]
 
             queues = [
-                self.coord_queue,
+                self.coord_buffer,
                 self.coord_tracts_queue,
                 self.object_at_target_queue,
-                self.efield_queue,
+                self.efield_buffer,
             ]
             jobs_list.append(
                 dcr.CoordinateCorregistrate(
@@ -668,7 +731,6 @@ class Navigation(metaclass=Singleton):
                     self.view_tracts,
                     queues,
                     self.event,
-                    self.sleep_nav,
                     tracker.tracker_id,
                     self.target,
                     icp,
@@ -727,12 +789,11 @@ class Navigation(metaclass=Singleton):
                     )
 
             if self.e_field_loaded:
-                queues = [self.efield_queue, self.e_field_norms_queue, self.e_field_IDs_queue]
+                queues = [self.efield_buffer, self.e_field_norms_queue, self.e_field_IDs_queue]
                 jobs_list.append(
                     e_field.Visualize_E_field_Thread(
                         queues,
                         self.event,
-                        2 * self.sleep_nav,
                         self.neuronavigation_api,
                         self.debug_efield_enorm,
                         self.plot_efield_vectors,
@@ -756,13 +817,34 @@ class Navigation(metaclass=Singleton):
 
             self.pedal_connector.add_callback("navigation", self.PedalStateChanged)
 
+    def StartRecording(self, filename):
+        """
+        Record the poses of the probe and the coils into filename (CSV, or
+        binary if it ends with .bin) until StopRecording or the navigation
+        stops.
+        """
+        self.StopRecording()
+        objects = [("probe", 0)] + [
+            (coil_name, coil_registration["obj_id"])
+            for coil_name, coil_registration in self.coil_registrations.items()
+        ]
+        self.recorder = record_coords.Record(self.coord_buffer, filename, objects)
+        self.recorder.start()
+
+    def StopRecording(self):
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+
     def StopNavigation(self):
         self.event.set()
 
         self.pedal_connector.remove_callback("navigation")
+        self.StopRecording()
 
-        self.coord_queue.clear()
-        self.coord_queue.join()
+        # Wake the threads waiting for poses, so they stop.
+        self.coord_buffer.clear()
+        self.efield_buffer.clear()
 
         if self.serial_port_connection is not None:
             self.serial_port_connection.join()
@@ -779,9 +861,6 @@ class Navigation(metaclass=Singleton):
             self.tracts_queue.join()
 
         if self.e_field_loaded:
-            self.efield_queue.clear()
-            self.efield_queue.join()
-
             self.e_field_norms_queue.clear()
             self.e_field_norms_queue.join()
 
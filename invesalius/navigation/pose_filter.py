@@ -0,0 +1,237 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Smoothing and prediction of the coregistered poses.
+
+The poses of each tracked object are filtered at the tracker rate, in the
+coregistration thread, by a One-Euro filter (an adaptive low-pass filter that
+smooths the jitter when the object is still and follows it closely when it
+moves) or a constant velocity Kalman filter. Both estimate the velocity of the
+pose, used to predict it to the time it's expected to be rendered, so the
+rendered coil doesn't lag behind the real one.
+
+A pose is filtered as a vector of its position (mm) and its orientation
+quaternion scaled by const.POSE_FILTER_ROTATION_SCALE.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import invesalius.constants as const
+import invesalius.data.transformations as tr
+
+
+def smoothing_factor(cutoff, dt):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter of vectors: a low-pass filter whose cutoff frequency (Hz)
+    rises from min_cutoff with beta times the speed of each component,
+    estimated with a low-pass filter with cutoff d_cutoff. The speed is that
+    of the samples rather than of the filtered values, as it's also used to
+    predict them.
+    """
+
+    def __init__(
+        self,
+        min_cutoff: float = const.ONE_EURO_MIN_CUTOFF,
+        beta: float = const.ONE_EURO_BETA,
+        d_cutoff: float = const.ONE_EURO_D_CUTOFF,
+    ):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self) -> None:
+        self.x = None
+        self.dx = None
+        self.t = None
+        self._last = None
+
+    def __call__(self, x: np.ndarray, t: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filter the sample x taken at time t (seconds), returning the filtered
+        value and its velocity (per second).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.x is None:
+            self.x, self.dx, self.t, self._last = x, np.zeros_like(x), t, x
+            return self.x, self.dx
+
+        dt = t - self.t
+        if dt <= 0:
+            return self.x, self.dx
+
+        dx = (x - self._last) / dt
+        self._last = x
+        self.dx = self.dx + smoothing_factor(self.d_cutoff, dt) * (dx - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x = self.x + smoothing_factor(cutoff, dt) * (x - self.x)
+        self.t = t
+        return self.x, self.dx
+
+
+class KalmanFilter:
+    """
+    Constant velocity Kalman filter of vectors. The components are filtered
+    independently with the same process noise (the acceleration noise density)
+    and measurement noise (standard deviation), so they share the covariance.
+    """
+
+    def __init__(
+        self,
+        process_noise: float = const.KALMAN_PROCESS_NOISE,
+        measurement_noise: float = const.KALMAN_MEASUREMENT_NOISE,
+    ):
+        self.q = process_noise**2
+        self.r = measurement_noise**2
+        self.reset()
+
+    def reset(self) -> None:
+        # The position and velocity of each component, and their covariance.
+        self.state = None
+        self.P = None
+        self.t = None
+
+    def __call__(self, x: np.ndarray, t: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filter the sample x taken at time t (seconds), returning the filtered
+        value and its velocity (per second).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.state is None:
+            self.state = np.stack([x, np.zeros_like(x)])
+            # The velocity is unknown, up to a fast movement.
+            self.P = np.diag([self.r, self.q])
+            self.t = t
+            return self.state[0], self.state[1]
+
+        dt = t - self.t
+        if dt <= 0:
+            return self.state[0], self.state[1]
+
+        # Predict.
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        Q = self.q * np.array([[dt**3 / 3, dt**2 / 2], [dt**2 / 2, dt]])
+        state = F @ self.state
+        P = F @ self.P @ F.T + Q
+
+        # Update with the measured position.
+        K = P[:, 0] / (P[0, 0] + self.r)
+        self.state = state + np.outer(K, x - state[0])
+        self.P = P - np.outer(K, P[0])
+        self.t = t
+        return self.state[0], self.state[1]
+
+
+def matrix_to_vector(m: np.ndarray, previous: Optional[np.ndarray], scale: float) -> np.ndarray:
+    """
+    Return the position and the scaled quaternion of the matrix m, the
+    quaternion with the sign closer to the previous vector (q and -q are the
+    same orientation).
+    """
+    q = tr.quaternion_from_matrix(m) * scale
+    if previous is not None and np.dot(q, previous[3:]) < 0:
+        q = -q
+    return np.concatenate([m[:3, 3], q])
+
+
+def vector_to_matrix(v: np.ndarray) -> np.ndarray:
+    q = v[3:]
+    m = tr.quaternion_matrix(q / np.linalg.norm(q))
+    m[:3, 3] = v[:3]
+    return m
+
+
+class PoseFilter:
+    """
+    Filter and predictor of the poses of the tracked objects, by name.
+    method is const.POSE_FILTER_NONE, const.POSE_FILTER_ONE_EURO or
+    const.POSE_FILTER_KALMAN; params are passed to the filter of each object.
+    """
+
+    def __init__(
+        self,
+        method: str = const.POSE_FILTER,
+        predict: bool = const.POSE_PREDICTION,
+        max_prediction: float = const.POSE_PREDICTION_MAX,
+        rotation_scale: float = const.POSE_FILTER_ROTATION_SCALE,
+        reset_time: float = const.POSE_FILTER_RESET,
+        **params,
+    ):
+        if method not in const.POSE_FILTERS:
+            raise ValueError(f"Unknown pose filter: {method}")
+        self.method = method
+        self.predict = predict
+        self.max_prediction = max_prediction
+        self.rotation_scale = rotation_scale
+        self.reset_time = reset_time
+        self.params = params
+        self._filters: Dict[str, object] = {}
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._times: Dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.method != const.POSE_FILTER_NONE or self.predict
+
+    def reset(self) -> None:
+        self._filters.clear()
+        self._vectors.clear()
+        self._times.clear()
+
+    def _new_filter(self):
+        if self.method == const.POSE_FILTER_ONE_EURO:
+            return OneEuroFilter(**self.params)
+        if self.method == const.POSE_FILTER_KALMAN:
+            return KalmanFilter(**self.params)
+        # Only predict, with the velocity between the last two poses.
+        return OneEuroFilter(min_cutoff=np.inf, beta=0.0, d_cutoff=np.inf)
+
+    def filter(
+        self, name: str, m: np.ndarray, timestamp: float, horizon: float = 0.0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filter the pose (a 4x4 matrix) of the object name read at timestamp
+        (seconds), returning it filtered, and predicted horizon seconds ahead
+        (up to max_prediction) if predict is set.
+        """
+        if not self.enabled:
+            return m, m
+
+        last_time = self._times.get(name)
+        if last_time is None or not 0 <= timestamp - last_time <= self.reset_time:
+            self._filters[name] = self._new_filter()
+            self._vectors.pop(name, None)
+        self._times[name] = timestamp
+
+        vector = matrix_to_vector(m, self._vectors.get(name), self.rotation_scale)
+        self._vectors[name] = vector
+        value, velocity = self._filters[name](vector, timestamp)
+
+        smoothed = vector_to_matrix(value)
+        if not self.predict:
+            return smoothed, smoothed
+        horizon = min(max(horizon, 0.0), self.max_prediction)
+        return smoothed, vector_to_matrix(value + velocity * horizon)
@@ -17,13 +17,19 @@
 #    detalhes.
 # --------------------------------------------------------------------------
 
+import collections
 import datetime
+import gzip
+import io
 import os
 import plistlib
 import shutil
 import sys
 import tarfile
 import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, Dict, List, Union
 
 import numpy as np
@@ -33,6 +39,7 @@ import invesalius
 import invesalius.constants as const
 import invesalius.utils as utils
 from invesalius import inv_paths
+from invesalius.data.image_versions import FilterStep, ImageVersionStore
 from invesalius.gui.dialogs import ErrorMessageBox
 
 # from invesalius.data import imagedata_utils
@@ -93,13 +100,17 @@ class Project(metaclass=Singleton):
         self.raycasting_preset = ""
 
         # Image versions (labels and matrices for filtered images)
-        self.image_versions: list[tuple[str, np.ndarray | str]] = []
+        self.image_versions = ImageVersionStore()
         self.image_versions_meta: dict = {}
 
         # Image fiducials for navigation
         self.image_fiducials = np.full([3, 3], np.nan)
         self.active_image_version = "original"
 
+        # ArchiveIndex of the uncompressed archives saved, by their path, used
+        # by the incremental saves.
+        self.archive_indexes = {}
+
         # self.surface_quality_list = ["Low", "Medium", "High", "Optimal *",
         #                             "Custom"i]
 
@@ -216,7 +227,14 @@ class Project(metaclass=Singleton):
             measures[str(m.index)] = m.get_as_dict()
         return measures
 
-    def SavePlistProject(self, dir_, filename, compress=False):
+    def SavePlistProject(self, dir_, filename, compress=False, incremental=False):
+        """
+        Save the project to the .inv3 file filename in dir_.
+
+        When incremental is True and the file was the last uncompressed archive
+        saved there, only the changed chunks of the image and mask data files
+        are rewritten, with the other (small) files.
+        """
         import invesalius.data.slice_ as slice_
         dir_temp = decode(tempfile.mkdtemp(), const.FS_ENCODE)
 
@@ -266,28 +284,43 @@ class Project(metaclass=Singleton):
 
         # Saving the extra image versions (filtered versions)
         image_versions_plist = []
-        for i, (label, mat) in enumerate(self.image_versions):
-            v_filename = f"matrix_v{i}.dat"
-
-            if isinstance(mat, np.ndarray):
-                # mat is a numpy array or memmap
-                if hasattr(mat, "filename") and mat.filename:
-                    # It's a memmap already backed by a file: use its filename
-                    filelist[mat.filename] = v_filename
-                else:
-                    # It's an in-memory array: write it to a new temp file
-                    fd_v, temp_v = tempfile.mkstemp()
-                    m_v = np.memmap(temp_v, shape=mat.shape, dtype=mat.dtype, mode="w+")
-                    m_v[:] = mat
-                    del m_v
-                    os.close(fd_v)
-                    filelist[temp_v] = v_filename
-                    save_temp_files.add(temp_v)  # safe to delete after save
+        for i, label in enumerate(self.image_versions.labels()):
+            version = self.image_versions.get_version(label)
+            plist_entry = {"label": label}
+            if version.is_recomputable:
+                # Only the recipe is saved, the matrix is computed again when
+                # the project is opened and the version is used.
+                plist_entry["parent"] = version.parent
+                plist_entry["steps"] = [step.as_dict() for step in version.steps]
             else:
-                # mat is already a file path (string)
-                filelist[mat] = v_filename
+                mat = version.matrix
+                v_filename = f"matrix_v{i}.dat"
+                if (
+                    self.matrix_filename
+                    and getattr(mat, "filename", None)
+                    and os.path.abspath(mat.filename) == os.path.abspath(self.matrix_filename)
+                ):
+                    # The original image, already saved as matrix.dat
+                    v_filename = "matrix.dat"
+                elif isinstance(mat, np.ndarray):
+                    # mat is a numpy array or memmap
+                    if hasattr(mat, "filename") and mat.filename:
+                        # It's a memmap already backed by a file: use its filename
+                        filelist[mat.filename] = v_filename
+                    else:
+                        # It's an in-memory array: write it to a new temp file
+                        fd_v, temp_v = tempfile.mkstemp()
+                        m_v = np.memmap(temp_v, shape=mat.shape, dtype=mat.dtype, mode="w+")
+                        m_v[:] = mat
+                        del m_v
+                        os.close(fd_v)
+                        filelist[temp_v] = v_filename
+                        save_temp_files.add(temp_v)  # safe to delete after save
+                else:
+                    # mat is already a file path (string)
+                    filelist[mat] = v_filename
+                plist_entry["filename"] = v_filename
 
-            plist_entry = {"label": label, "filename": v_filename}
             if label in self.image_versions_meta:
                  plist_entry.update(self.image_versions_meta[label])
             image_versions_plist.append(plist_entry)
@@ -328,9 +361,27 @@ class Project(metaclass=Singleton):
         save_temp_files.add(temp_plist)  # safe to delete after save
         os.close(temp_fd)
 
+        # The masks may be changed without their files' modification time
+        # changing, so their modification time is part of their signature.
+        versions = {m.data_source: m.modified_time for m in self.mask_dict.values()}
+
         # Compressing and generating the .inv3 file
-        path = os.path.join(dir_, filename)
-        Compress(dir_temp, path, filelist, compress)
+        path = os.path.abspath(os.path.join(dir_, filename))
+        index = self.archive_indexes.pop(path, None)
+        updated = False
+        if incremental and not compress and index is not None:
+            try:
+                updated = UpdateArchive(dir_temp, index, filelist, versions)
+            except OSError as err:
+                debug(f"Incremental save of {path} failed: {err}")
+                updated = False
+        if updated:
+            self.archive_indexes[path] = index
+        else:
+            # Only the incremental saves (auto-backups) are updated later.
+            index = Compress(dir_temp, path, filelist, compress, versions, incremental)
+            if index is not None:
+                self.archive_indexes[path] = index
 
         # Removing the temp folder (only contains copies, not originals).
         shutil.rmtree(dir_temp)
@@ -366,16 +417,25 @@ class Project(metaclass=Singleton):
             if not progress_callback(15, _("Extracting files...")):
                 return False
 
-        filelist = Extract(filename, tempfile.mkdtemp())
-        dirpath = os.path.abspath(os.path.split(filelist[0])[0])
+        archive = None
+        if const.PROJECT_LAZY_OPEN:
+            archive = ProjectArchive.open(filename)
+
+        if archive is not None:
+            # The mask data files are memory-mapped from the archive, only
+            # the other files are extracted.
+            dirpath = archive.extract(tempfile.mkdtemp(), exclude=IsMaskDataFile)
+        else:
+            filelist = Extract(filename, tempfile.mkdtemp())
+            dirpath = os.path.abspath(os.path.split(filelist[0])[0])
 
         if progress_callback:
             if not progress_callback(25, _("Loading project data...")):
                 return False
 
-        return self.load_from_folder(dirpath, progress_callback)
+        return self.load_from_folder(dirpath, progress_callback, archive)
 
-    def load_from_folder(self, dirpath, progress_callback=None):
+    def load_from_folder(self, dirpath, progress_callback=None, archive=None):
         """
         Loads invesalius3 project files from dipath.
         
@@ -383,6 +443,8 @@ class Project(metaclass=Singleton):
             dirpath: Directory containing extracted project files
             progress_callback: Optional callback function(value, message) for progress updates
                               Should return False to cancel loading
+            archive: Optional ProjectArchive the files missing in dirpath
+                     (the mask data files) are memory-mapped from
         """
         import invesalius.data.mask as msk
         import invesalius.data.measures as ms
@@ -439,12 +501,11 @@ class Project(metaclass=Singleton):
                 return False
 
         # Opening image versions
-        self.image_versions = []
+        self.image_versions = ImageVersionStore()
         self.image_versions_meta = {}
         self.active_image_version = project.get("active_image_version", "original")
         for version in project.get("image_versions", []):
             label = version["label"]
-            v_filename = version["filename"]
 
             meta = {}
             if "applied_filter" in version:
@@ -455,6 +516,14 @@ class Project(metaclass=Singleton):
                  meta["derived"] = version["derived"]
             if meta:
                  self.image_versions_meta[label] = meta
+            if "steps" in version:
+                steps = [FilterStep(**step) for step in version["steps"]]
+                self.image_versions.add_recipe(label, version["parent"], steps)
+                continue
+            v_filename = version["filename"]
+            if v_filename == "matrix.dat":
+                # The original image, added when the project is shown.
+                continue
             v_filepath = os.path.join(dirpath, v_filename)
             # We store the filepath at first, or we can load it into memmap
             if os.path.exists(v_filepath):
@@ -478,7 +547,7 @@ class Project(metaclass=Singleton):
             m = msk.Mask()
             m.spacing = self.spacing
             try:
-                m.OpenPList(filepath)
+                m.OpenPList(filepath, archive)
             except FileNotFoundError as e:
                 import warnings
                 warnings.warn(
@@ -583,14 +652,77 @@ class Project(metaclass=Singleton):
         elif filename.lower().endswith(".nii") or filename.lower().endswith(".nii.gz"):
             self.export_project_to_nifti(filename, save_masks)
 
-    def export_project_to_hdf5(self, filename, save_masks=True):
+    def export_project_to_hdf5(
+        self,
+        filename,
+        save_masks=True,
+        chunks=None,
+        compression=const.HDF5_EXPORT_COMPRESSION,
+        compression_opts=None,
+        n_threads=const.HDF5_EXPORT_THREADS,
+        mask_workers=0,
+    ):
+        """
+        Export the image and the masks to filename in chunked and compressed
+        datasets, written slab by slab from the memmaps. chunks is the chunk
+        shape (const.HDF5_EXPORT_CHUNK_SHAPE if None), compression and
+        compression_opts are the ones of h5py (compression None to not
+        compress, compression_opts the gzip level, by default
+        const.HDF5_EXPORT_COMPRESSION_LEVEL). The gzip chunks are compressed by
+        n_threads threads.
+
+        If mask_workers is set, up to that many masks are thresholded while
+        the previous one is written, sharing the const.THRESHOLD_THREADS
+        threads. Otherwise each mask is thresholded by all of them and then
+        written.
+        """
         import h5py
 
+        import invesalius.data.hdf5_utils as hdf5_utils
         import invesalius.data.slice_ as slc
 
+        if chunks is None:
+            chunks = const.HDF5_EXPORT_CHUNK_SHAPE
+        n_threads = max(1, n_threads or 1)
+        if compression == "gzip" and compression_opts is None:
+            compression_opts = const.HDF5_EXPORT_COMPRESSION_LEVEL
+
+        def write_dataset(f, name, array):
+            hdf5_utils.write_dataset(
+                f,
+                name,
+                array,
+                chunks,
+                compression=compression,
+                compression_opts=compression_opts,
+                n_threads=n_threads,
+            )
+
         s = slc.Slice()
+        masks = list(self.mask_dict.items()) if save_masks else []
+
+        def thresholded_masks():
+            if not mask_workers:
+                for index, mask in masks:
+                    s.do_threshold_to_all_slices(mask)
+                    yield index, mask
+                return
+
+            threshold_threads = max(1, const.THRESHOLD_THREADS // mask_workers)
+            executor = ThreadPoolExecutor(max_workers=mask_workers, thread_name_prefix="threshold")
+            try:
+                futures = [
+                    executor.submit(s.do_threshold_to_all_slices, mask, n_threads=threshold_threads)
+                    for _, mask in masks
+                ]
+                for (index, mask), future in zip(masks, futures):
+                    future.result()
+                    yield index, mask
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
         with h5py.File(filename, "w") as f:
-            f["image"] = s.matrix
+            write_dataset(f, "image", s.matrix)
             f["spacing"] = s.spacing
 
             f["invesalius_version"] = invesalius.__version__
@@ -603,19 +735,16 @@ class Project(metaclass=Singleton):
             f["window_level"] = self.level
             f["scalar_range"] = self.threshold_range
 
-            if save_masks:
-                for index in self.mask_dict:
-                    mask = self.mask_dict[index]
-                    s.do_threshold_to_all_slices(mask)
-                    key = f"masks/{index}"
-                    f[key + "/name"] = mask.name
-                    f[key + "/matrix"] = mask.matrix[1:, 1:, 1:]
-                    f[key + "/colour"] = mask.colour[:3]
-                    f[key + "/opacity"] = mask.opacity
-                    f[key + "/threshold_range"] = mask.threshold_range
-                    f[key + "/edition_threshold_range"] = mask.edition_threshold_range
-                    f[key + "/visible"] = mask.is_shown
-                    f[key + "/edited"] = mask.was_edited
+            for index, mask in thresholded_masks():
+                key = f"masks/{index}"
+                f[key + "/name"] = mask.name
+                write_dataset(f, key + "/matrix", mask.matrix[1:, 1:, 1:])
+                f[key + "/colour"] = mask.colour[:3]
+                f[key + "/opacity"] = mask.opacity
+                f[key + "/threshold_range"] = mask.threshold_range
+                f[key + "/edition_threshold_range"] = mask.edition_threshold_range
+                f[key + "/visible"] = mask.is_shown
+                f[key + "/edited"] = mask.was_edited
 
     def export_project_to_nifti(self, filename, save_masks=True):
         import nibabel as nib
@@ -649,13 +778,113 @@ class Project(metaclass=Singleton):
                 nib.save(mask_nifti, f"{basename}_mask_{mask.index}_{mask.name}{ext}")
 
 
+def IsDataMember(name: str) -> bool:
+    """
+    Tell if the archive member is an image or mask data file. They are written
+    first in the archive and keep their offsets between incremental saves.
+    """
+    return name.endswith(".dat")
+
+
+class ArraySource:
+    """
+    An array, like a mask mapped from a project file, written to the archive
+    as a data file straight from memory instead of from a file. Sources of the
+    same array are equal.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        self.size = array.nbytes
+
+    def __eq__(self, other):
+        return isinstance(other, ArraySource) and other.array is self.array
+
+    def __hash__(self):
+        return id(self.array)
+
+    def open(self) -> io.BufferedReader:
+        return io.BufferedReader(_MemoryReader(memoryview(self.array).cast("B")))
+
+
+class _MemoryReader(io.RawIOBase):
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self.data) - self.position)
+        b[:n] = self.data[self.position : self.position + n]
+        self.position += n
+        return n
+
+
+def _open_source(name):
+    if isinstance(name, ArraySource):
+        return name.open()
+    return open(name, "rb")
+
+
+def _get_source_size(name):
+    if isinstance(name, ArraySource):
+        return name.size
+    return os.path.getsize(name)
+
+
+def _add_member(tar, name, arcname):
+    if isinstance(name, ArraySource):
+        info = tarfile.TarInfo(arcname)
+        info.size = name.size
+        info.mtime = int(time.time())
+        with name.open() as f:
+            tar.addfile(info, f)
+    else:
+        tar.add(name, arcname=arcname)
+
+
+def _get_archive_members(folder, filelist):
+    """
+    Return the (source, arcname) of the files to put in the archive, the data
+    files first.
+    """
+    tmpdir, tmpdir_ = os.path.split(folder)
+    members = []
+    for name in filelist:
+        sanit_name = os.path.normpath(filelist[name])  # Sanitizing path
+        if ".." in sanit_name or os.path.isabs(sanit_name):
+            continue
+
+        if not isinstance(name, ArraySource) and not os.path.exists(name):
+            if sanit_name == "matrix.dat" or sanit_name.startswith("matrix"):
+                raise FileNotFoundError(
+                    f"Critical project file missing during save: {name} "
+                    f"(target: {sanit_name}). The project cannot be saved without this file."
+                )
+            utils.debug(f"Warning: Skipping missing file during compression: {name}")
+            continue
+
+        members.append((name, os.path.join(tmpdir_, sanit_name)))
+    members.sort(key=lambda member: not IsDataMember(member[1]))
+    return members
+
+
 def Compress(
     folder: Union[str, os.PathLike],
     filename: Union[str, os.PathLike],
     filelist: Dict[Union[str, os.PathLike], Union[str, os.PathLike]],
     compress: bool = False,
-) -> None:
-    tmpdir, tmpdir_ = os.path.split(folder)
+    versions: Union[Dict, None] = None,
+    create_index: bool = False,
+) -> Union["ArchiveIndex", None]:
+    """
+    Write the files of filelist to the archive filename. When compress is
+    True the archive is gzip compressed in parallel blocks. Otherwise, if
+    create_index is True, the ArchiveIndex of the written archive is returned,
+    to update it later with UpdateArchive (it reads all the data files again).
+    """
     # current_dir = os.path.abspath(".")
     fd_inv3, temp_inv3 = tempfile.mkstemp()
     if _has_win32api:
@@ -664,31 +893,280 @@ def Compress(
     temp_inv3 = decode(temp_inv3, const.FS_ENCODE)
     # os.chdir(tmpdir)
     # file_list = glob.glob(os.path.join(tmpdir_,"*"))
+    members = _get_archive_members(folder, filelist)
     if compress:
-        tar = tarfile.open(temp_inv3, "w:gz")
+        with open(temp_inv3, "wb") as f:
+            gz = ParallelGzipFile(
+                f,
+                const.PROJECT_COMPRESSION_THREADS,
+                const.PROJECT_COMPRESSION_BLOCK_SIZE,
+                const.PROJECT_COMPRESSION_LEVEL,
+            )
+            tar = tarfile.open(fileobj=gz, mode="w")
+            for name, arcname in members:
+                _add_member(tar, name, arcname)
+            tar.close()
+            gz.close()
     else:
         tar = tarfile.open(temp_inv3, "w")
-    for name in filelist:
-        sanit_name = os.path.normpath(filelist[name])  # Sanitizing path
-        if ".." in sanit_name or os.path.isabs(sanit_name):
-            continue
-
-
-        if not os.path.exists(name):
-            if sanit_name == "matrix.dat" or sanit_name.startswith("matrix"):
-                raise FileNotFoundError(
-                    f"Critical project file missing during save: {name} "
-                    f"(target: {sanit_name}). The project cannot be saved without this file."
-                )
-            utils.debug(f"Warning: Skipping missing file during compression: {name}")
-            continue
-
-        tar.add(name, arcname=os.path.join(tmpdir_, sanit_name))
-    tar.close()
+        for name, arcname in members:
+            _add_member(tar, name, arcname)
+        tar.close()
     os.close(fd_inv3)
     shutil.move(temp_inv3, filename)
     # os.chdir(current_dir)
 
+    if compress or not create_index:
+        return None
+    return ArchiveIndex.create(filename, members, versions)
+
+
+class ParallelGzipFile:
+    """
+    Write-only file object which gzip compresses what is written to it in
+    blocks, in parallel threads. Each block is a gzip member, and their
+    concatenation is a valid gzip file (like the ones written by pigz).
+    """
+
+    def __init__(self, fileobj, n_threads=1, block_size=4 * 1024 * 1024, compresslevel=6):
+        self.fileobj = fileobj
+        self.block_size = block_size
+        self.compresslevel = compresslevel
+        self.n_threads = max(1, n_threads)
+        self.executor = ThreadPoolExecutor(max_workers=self.n_threads, thread_name_prefix="gzip")
+        self.pending = collections.deque()
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(gzip.compress, block, self.compresslevel, mtime=0))
+        # Bounds the memory used by the blocks waiting to be written.
+        while len(self.pending) > 2 * self.n_threads:
+            self.fileobj.write(self.pending.popleft().result())
+
+    def close(self):
+        try:
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer.clear()
+            while self.pending:
+                self.fileobj.write(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _get_source_signature(name, version=None):
+    if isinstance(name, ArraySource):
+        # The array is only changed with its mask, which changes the version.
+        return (hash(name), name.size, None, version)
+    st = os.stat(name)
+    return (os.path.abspath(name), st.st_size, st.st_mtime_ns, version)
+
+
+def _get_chunk_crcs(name, chunk_size):
+    crcs = []
+    with _open_source(name) as f:
+        while chunk := f.read(chunk_size):
+            crcs.append(zlib.crc32(chunk))
+    return crcs
+
+
+class ArchiveIndex:
+    """
+    Where each data file was written in an uncompressed project archive, with
+    the signature of its source and the crc32 of each chunk of its data, and
+    where the other (small) files start.
+    """
+
+    def __init__(self, filename, data_members, tail_offset):
+        self.filename = os.path.abspath(filename)
+        # arcname -> [offset, size, source signature, chunk crcs]
+        self.data_members = data_members
+        self.tail_offset = tail_offset
+        self.stat = self._get_stat()
+
+    def _get_stat(self):
+        st = os.stat(self.filename)
+        return (st.st_size, st.st_mtime_ns)
+
+    def is_valid(self):
+        try:
+            return self._get_stat() == self.stat
+        except OSError:
+            return False
+
+    @classmethod
+    def create(cls, filename, members, versions=None):
+        versions = versions or {}
+        sources = {arcname: name for name, arcname in members}
+        chunk_size = const.PROJECT_ARCHIVE_CHUNK_SIZE
+        data_members = {}
+        tail_offset = None
+        with tarfile.open(filename, "r:") as tar:
+            for member in tar.getmembers():
+                if IsDataMember(member.name) and member.name in sources:
+                    name = sources[member.name]
+                    data_members[member.name] = [
+                        member.offset_data,
+                        member.size,
+                        _get_source_signature(name, versions.get(name)),
+                        _get_chunk_crcs(name, chunk_size),
+                    ]
+                elif tail_offset is None:
+                    tail_offset = member.offset
+        if tail_offset is None:
+            return None
+        return cls(filename, data_members, tail_offset)
+
+
+def UpdateArchive(
+    folder: Union[str, os.PathLike],
+    index: ArchiveIndex,
+    filelist: Dict[Union[str, os.PathLike], Union[str, os.PathLike]],
+    versions: Union[Dict, None] = None,
+) -> bool:
+    """
+    Update in place the uncompressed archive written with the given index,
+    rewriting only the chunks of the data files which changed and then all the
+    other files. Returns False, without touching the archive, if it can't be
+    updated (it was changed, or data files were added, removed or resized).
+    """
+    versions = versions or {}
+    members = _get_archive_members(folder, filelist)
+    data = {arcname: name for name, arcname in members if IsDataMember(arcname)}
+    if not index.is_valid() or set(data) != set(index.data_members):
+        return False
+    for arcname, name in data.items():
+        if _get_source_size(name) != index.data_members[arcname][1]:
+            return False
+
+    chunk_size = const.PROJECT_ARCHIVE_CHUNK_SIZE
+    with open(index.filename, "r+b") as f:
+        for arcname, name in data.items():
+            data_member = index.data_members[arcname]
+            offset, size, signature, crcs = data_member
+            new_signature = _get_source_signature(name, versions.get(name))
+            if new_signature == signature:
+                continue
+            with _open_source(name) as src:
+                for n, crc in enumerate(crcs):
+                    chunk = src.read(chunk_size)
+                    new_crc = zlib.crc32(chunk)
+                    if new_crc != crc:
+                        f.seek(offset + n * chunk_size)
+                        f.write(chunk)
+                        crcs[n] = new_crc
+            data_member[2] = new_signature
+
+        f.seek(index.tail_offset)
+        f.truncate()
+        tar = tarfile.open(fileobj=f, mode="w")
+        for name, arcname in members:
+            if not IsDataMember(arcname):
+                _add_member(tar, name, arcname)
+        tar.close()
+        f.flush()
+        os.fsync(f.fileno())
+
+    index.stat = index._get_stat()
+    return True
+
+
+def IsMaskDataFile(name: str) -> bool:
+    return name.startswith("mask_") and name.endswith(".dat")
+
+
+class ProjectArchive:
+    """
+    An uncompressed .inv3 project file. Its data files are stored contiguously
+    in the tar file, so they can be memory-mapped at their offsets instead of
+    being extracted.
+    """
+
+    def __init__(self, filename: Union[str, os.PathLike], members: List[tarfile.TarInfo]):
+        self.filename = os.path.abspath(filename)
+        self.members = {}
+        for member in members:
+            if member.isreg() and not member.issparse():
+                self.members[os.path.basename(decode(member.name, "utf-8"))] = member
+
+    @classmethod
+    def open(cls, filename: Union[str, os.PathLike]) -> "ProjectArchive | None":
+        """
+        Return the ProjectArchive of filename or None if it is compressed.
+        """
+        try:
+            with tarfile.open(filename, "r:") as tar:
+                members = tar.getmembers()
+        except tarfile.ReadError:
+            return None
+        return cls(filename, members)
+
+    def get_offset(self, name: str) -> Union[int, None]:
+        """
+        Return the offset of the data of the file name inside the archive.
+        """
+        member = self.members.get(name)
+        if member is None:
+            return None
+        return member.offset_data
+
+    def extract(self, folder: Union[str, os.PathLike], exclude=None) -> str:
+        """
+        Copy the files of the archive, except the ones whose name exclude
+        returns True, to folder and return it.
+        """
+        folder = os.path.abspath(decode(folder, const.FS_ENCODE))
+        with open(self.filename, "rb") as src:
+            for name, member in self.members.items():
+                if exclude is not None and exclude(name):
+                    continue
+                with open(os.path.join(folder, name), "wb") as dst:
+                    CopyFileRange(src, dst, member.offset_data, member.size)
+        return folder
+
+
+def CopyFileRange(src, dst, offset: int, size: int) -> None:
+    """
+    Copy size bytes of the file object src starting at offset to dst, inside
+    the kernel when the platform supports it.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            copied = 0
+            while copied < size:
+                n = os.copy_file_range(src.fileno(), dst.fileno(), size - copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+            if copied == size:
+                return
+            dst.seek(0)
+            dst.truncate()
+        except OSError:
+            dst.seek(0)
+            dst.truncate()
+
+    src.seek(offset)
+    remaining = size
+    while remaining:
+        data = src.read(min(remaining, 1024 * 1024))
+        if not data:
+            break
+        dst.write(data)
+        remaining -= len(data)
+
 
 def custom_tar_filter(file: tarfile.TarInfo, path: Union[str, os.PathLike]):
     file.name = os.path.normpath(file.name).lstrip(os.sep)
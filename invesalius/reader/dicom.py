@@ -141,10 +141,13 @@ class Parser:
     # def GetImageData(self):
     #    return None#self.vtkgdcm_reader.GetOutput()
 
-    def SetDataImage(self, data_image, filename, thumbnail_path):
+    def SetDataImage(self, data_image, filename, thumbnail_path, thumbnail_loader=None):
         self.data_image = data_image
         self.filename = self.filepath = filename
         self.thumbnail_path = thumbnail_path
+        # Callable creating the thumbnail when thumbnail_path is None (the
+        # file was scanned without reading its pixel data).
+        self.thumbnail_loader = thumbnail_loader
 
     def __format_time(self, value):
         sp1 = value.split(".")
@@ -1875,7 +1878,8 @@ class Image:
         self.size = (parser.GetDimensionX(), parser.GetDimensionY())
         # self.imagedata = parser.GetImageData()
         self.bits_allocad = parser._GetBitsAllocated()
-        self.thumbnail_path = parser.thumbnail_path
+        self._thumbnail_path = parser.thumbnail_path
+        self._thumbnail_loader = parser.thumbnail_loader
 
         self.number_of_frames = parser.GetNumberOfFrames()
         self.samples_per_pixel = parser.GetImageSamplesPerPixel()
@@ -1884,3 +1888,10 @@ class Image:
             self.spacing.append(parser.GetImageThickness())
         else:
             self.spacing.append(1.0)
+
+    @property
+    def thumbnail_path(self):
+        if self._thumbnail_path is None and self._thumbnail_loader is not None:
+            self._thumbnail_path = self._thumbnail_loader()
+            self._thumbnail_loader = None
+        return self._thumbnail_path
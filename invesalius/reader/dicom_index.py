@@ -0,0 +1,113 @@
+# --------------------------------------------------------------------------
+# Software:     InVesalius - Software de Reconstrucao 3D de Imagens Medicas
+# Copyright:    (C) 2001  Centro de Pesquisas Renato Archer
+# Homepage:     http://www.softwarepublico.gov.br
+# Contact:      invesalius@cti.gov.br
+# License:      GNU - GPL 2 (LICENSE.txt/LICENCA.txt)
+# --------------------------------------------------------------------------
+#    Este programa e software livre; voce pode redistribui-lo e/ou
+#    modifica-lo sob os termos da Licenca Publica Geral GNU, conforme
+#    publicada pela Free Software Foundation; de acordo com a versao 2
+#    da Licenca.
+#
+#    Este programa eh distribuido na expectativa de ser util, mas SEM
+#    QUALQUER GARANTIA; sem mesmo a garantia implicita de
+#    COMERCIALIZACAO ou de ADEQUACAO A QUALQUER PROPOSITO EM
+#    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
+#    detalhes.
+# --------------------------------------------------------------------------
+"""
+Persistent per-directory index of the DICOM header metadata extracted when
+scanning a directory. Each entry is keyed by the file path and is only valid
+while the file has the same modification time and size, so re-scanning a
+directory only parses the files that were added or changed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from invesalius import inv_paths
+from invesalius.utils import debug
+
+INDEX_VERSION = 1
+
+# Returned by DicomIndex.get when the file has to be (re)parsed.
+MISSING = object()
+
+
+class DicomIndex:
+    def __init__(self, directory, index_dir=None):
+        self.directory = os.path.abspath(directory)
+        if index_dir is None:
+            index_dir = inv_paths.USER_DICOM_INDEX_DIR
+        key = hashlib.sha1(self.directory.encode("utf-8", "surrogateescape")).hexdigest()
+        self.filename = os.path.join(index_dir, key + ".json")
+        self._entries = {}
+        self._seen = set()
+        self._modified = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as err:
+            debug(f"Ignoring invalid DICOM index {self.filename}: {err}")
+            return
+
+        if index.get("version") != INDEX_VERSION or index.get("directory") != self.directory:
+            return
+        self._entries = index.get("files", {})
+
+    def save(self):
+        """
+        Write the index, keeping only the files seen since it was loaded.
+        """
+        with self._lock:
+            if not self._modified and len(self._seen) == len(self._entries):
+                return
+            files = {path: self._entries[path] for path in self._seen if path in self._entries}
+
+        index = {"version": INDEX_VERSION, "directory": self.directory, "files": files}
+        tmp_filename = self.filename + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(tmp_filename, "w", encoding="utf-8") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(tmp_filename, self.filename)
+        except OSError as err:
+            debug(f"Could not write DICOM index {self.filename}: {err}")
+
+    def get(self, filepath):
+        """
+        Return the cached data dict of the file (None if it isn't a DICOM
+        image) or MISSING if the file is not in the index or has changed.
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return MISSING
+
+        with self._lock:
+            self._seen.add(filepath)
+            entry = self._entries.get(filepath)
+
+        if entry is None or entry["mtime"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            return MISSING
+        return entry["data"]
+
+    def set(self, filepath, data_dict):
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return
+
+        entry = {"mtime": st.st_mtime_ns, "size": st.st_size, "data": data_dict}
+        with self._lock:
+            self._seen.add(filepath)
+            self._entries[filepath] = entry
+            self._modified = True
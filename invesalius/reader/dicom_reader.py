@@ -16,8 +16,12 @@
 #    PARTICULAR. Consulte a Licenca Publica Geral GNU para obter mais
 #    detalhes.
 # --------------------------------------------------------------------------
+import collections
+import functools
+import itertools
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import gdcm
 
@@ -34,6 +38,7 @@ from vtkmodules.vtkCommonCore import vtkFileOutputWindow, vtkOutputWindow
 import invesalius.constants as const
 import invesalius.reader.dicom as dicom
 import invesalius.reader.dicom_grouper as dicom_grouper
+import invesalius.reader.dicom_index as dicom_index
 import invesalius.utils as utils
 from invesalius import inv_paths
 from invesalius.data import imagedata_utils
@@ -82,219 +87,357 @@ tag_labels = {}
 main_dict = {}
 dict_file = {}
 
+PIXEL_DATA_TAG = gdcm.Tag(0x7FE0, 0x0010)
 
-class LoadDicom:
-    def __init__(self, grouper, filepath):
-        self.grouper = grouper
-        self.filepath = utils.decode(filepath, const.FS_ENCODE)
-        self.run()
 
-    def run(self):
-        grouper = self.grouper
-        reader = gdcm.ImageReader()
-        if _has_win32api:
-            try:
-                reader.SetFileName(
-                    utils.encode(win32api.GetShortPathName(self.filepath), const.FS_ENCODE)
-                )
-            except TypeError:
-                reader.SetFileName(win32api.GetShortPathName(self.filepath))
+def _set_reader_filename(reader, filepath):
+    if _has_win32api:
+        filepath = win32api.GetShortPathName(filepath)
+    try:
+        reader.SetFileName(utils.encode(filepath, const.FS_ENCODE))
+    except TypeError:
+        reader.SetFileName(filepath)
+
+
+def _get_data_dict(file):
+    """
+    Return the dictionary {group: {field: value}} with the header and data
+    set elements of the given gdcm.File.
+    """
+    # Retrieve data set
+    dataSet = file.GetDataSet()
+    # Retrieve header
+    header = file.GetHeader()
+    stf = gdcm.StringFilter()
+    stf.SetFile(file)
+
+    data_dict = {}
+
+    tag = gdcm.Tag(0x0008, 0x0005)
+    ds = dataSet
+    image_helper = gdcm.ImageHelper()
+    data_dict["spacing"] = image_helper.GetSpacingValue(file)
+    if ds.FindDataElement(tag):
+        data_element = ds.GetDataElement(tag)
+        if data_element.IsEmpty():
+            encoding_value = "ISO_IR 100"
+        else:
+            encoding_value = str(ds.GetDataElement(tag).GetValue()).split("\\")[0]
+
+        if encoding_value.startswith("Loaded"):
+            encoding = "ISO_IR 100"
         else:
             try:
-                reader.SetFileName(utils.encode(self.filepath, const.FS_ENCODE))
-            except TypeError:
-                reader.SetFileName(self.filepath)
-        if reader.Read():
-            file = reader.GetFile()
-            # Retrieve data set
-            dataSet = file.GetDataSet()
-            # Retrieve header
-            header = file.GetHeader()
-            stf = gdcm.StringFilter()
-            stf.SetFile(file)
-
-            data_dict = {}
-
-            tag = gdcm.Tag(0x0008, 0x0005)
-            ds = reader.GetFile().GetDataSet()
-            image_helper = gdcm.ImageHelper()
-            data_dict["spacing"] = image_helper.GetSpacingValue(reader.GetFile())
-            if ds.FindDataElement(tag):
-                data_element = ds.GetDataElement(tag)
-                if data_element.IsEmpty():
-                    encoding_value = "ISO_IR 100"
-                else:
-                    encoding_value = str(ds.GetDataElement(tag).GetValue()).split("\\")[0]
-
-                if encoding_value.startswith("Loaded"):
-                    encoding = "ISO_IR 100"
-                else:
-                    try:
-                        encoding = const.DICOM_ENCODING_TO_PYTHON[encoding_value]
-                    except KeyError:
-                        encoding = "ISO_IR 100"
-            else:
+                encoding = const.DICOM_ENCODING_TO_PYTHON[encoding_value]
+            except KeyError:
                 encoding = "ISO_IR 100"
+    else:
+        encoding = "ISO_IR 100"
 
-            # Iterate through the Header
-            iterator = header.GetDES().begin()
-            while not iterator.equal(header.GetDES().end()):
-                dataElement = iterator.next()
-                if not dataElement.IsUndefinedLength():
-                    tag = dataElement.GetTag()
-                    data = stf.ToStringPair(tag)
-                    stag = tag.PrintAsPipeSeparatedString()
+    # Iterate through the Header
+    iterator = header.GetDES().begin()
+    while not iterator.equal(header.GetDES().end()):
+        dataElement = iterator.next()
+        if not dataElement.IsUndefinedLength():
+            tag = dataElement.GetTag()
+            data = stf.ToStringPair(tag)
+            stag = tag.PrintAsPipeSeparatedString()
 
-                    group = str(tag.GetGroup())
-                    field = str(tag.GetElement())
+            group = str(tag.GetGroup())
+            field = str(tag.GetElement())
 
-                    tag_labels[stag] = data[0]
+            tag_labels[stag] = data[0]
 
-                    if group not in data_dict.keys():
-                        data_dict[group] = {}
+            if group not in data_dict.keys():
+                data_dict[group] = {}
 
-                    if not (utils.VerifyInvalidPListCharacter(data[1])):
-                        data_dict[group][field] = utils.decode(data[1], encoding)
-                    else:
-                        data_dict[group][field] = "Invalid Character"
+            if not (utils.VerifyInvalidPListCharacter(data[1])):
+                data_dict[group][field] = utils.decode(data[1], encoding)
+            else:
+                data_dict[group][field] = "Invalid Character"
+
+    # Iterate through the Data set
+    iterator = dataSet.GetDES().begin()
+    while not iterator.equal(dataSet.GetDES().end()):
+        dataElement = iterator.next()
+        if not dataElement.IsUndefinedLength():
+            tag = dataElement.GetTag()
+            #  if (tag.GetGroup() == 0x0009 and tag.GetElement() == 0x10e3) \
+            #  or (tag.GetGroup() == 0x0043 and tag.GetElement() == 0x1027):
+            #  continue
+            data = stf.ToStringPair(tag)
+            stag = tag.PrintAsPipeSeparatedString()
+
+            group = str(tag.GetGroup())
+            field = str(tag.GetElement())
+
+            tag_labels[stag] = data[0]
+
+            if group not in data_dict.keys():
+                data_dict[group] = {}
+
+            if not (utils.VerifyInvalidPListCharacter(data[1])):
+                data_dict[group][field] = utils.decode(data[1], encoding, "replace")
+            else:
+                data_dict[group][field] = "Invalid Character"
 
-            # Iterate through the Data set
-            iterator = dataSet.GetDES().begin()
-            while not iterator.equal(dataSet.GetDES().end()):
-                dataElement = iterator.next()
-                if not dataElement.IsUndefinedLength():
-                    tag = dataElement.GetTag()
-                    #  if (tag.GetGroup() == 0x0009 and tag.GetElement() == 0x10e3) \
-                    #  or (tag.GetGroup() == 0x0043 and tag.GetElement() == 0x1027):
-                    #  continue
-                    data = stf.ToStringPair(tag)
-                    stag = tag.PrintAsPipeSeparatedString()
+    return data_dict
 
-                    group = str(tag.GetGroup())
-                    field = str(tag.GetElement())
 
-                    tag_labels[stag] = data[0]
+def _get_window_level(data_dict):
+    try:
+        data = data_dict[str(0x028)][str(0x1050)]
+        level = [float(value) for value in data.split("\\")][0]
+        data = data_dict[str(0x028)][str(0x1051)]
+        window = [float(value) for value in data.split("\\")][0]
+    except (KeyError, ValueError):
+        level = None
+        window = None
+    return window, level
+
+
+def _get_orientation_label(direc_cosines):
+    orientation = gdcm.Orientation()
+    try:
+        _type = orientation.GetType(tuple(direc_cosines))
+    except TypeError:
+        _type = orientation.GetType(direc_cosines)
+    return orientation.GetLabel(_type)
 
-                    if group not in data_dict.keys():
-                        data_dict[group] = {}
 
-                    if not (utils.VerifyInvalidPListCharacter(data[1])):
-                        data_dict[group][field] = utils.decode(data[1], encoding, "replace")
-                    else:
-                        data_dict[group][field] = "Invalid Character"
+def _is_dicom_dir(data_dict):
+    try:
+        return data_dict[str(0x002)][str(0x002)] == "1.2.840.10008.1.3.10"  # DICOMDIR
+    except KeyError:
+        return False
 
-            # -------------- To Create DICOM Thumbnail -----------
 
-            try:
-                data = data_dict[str(0x028)][str(0x1050)]
-                level = [float(value) for value in data.split("\\")][0]
-                data = data_dict[str(0x028)][str(0x1051)]
-                window = [float(value) for value in data.split("\\")][0]
-            except (KeyError, ValueError):
-                level = None
-                window = None
+def _get_number_of_frames(data_dict):
+    try:
+        return int(data_dict[str(0x028)][str(0x008)])
+    except (KeyError, ValueError):
+        return 1
 
-            img = reader.GetImage()
-            thumbnail_path = imagedata_utils.create_dicom_thumbnails(img, window, level)
 
-            # ------ Verify the orientation --------------------------------
+def CreateDicomThumbnail(filepath, window=None, level=None):
+    """
+    Read the image of the given DICOM file and return the path of its
+    thumbnail (a list of paths if it's a multi-frame image).
+    """
+    reader = gdcm.ImageReader()
+    _set_reader_filename(reader, filepath)
+    if not reader.Read():
+        return None
+    return imagedata_utils.create_dicom_thumbnails(reader.GetImage(), window, level)
 
-            direc_cosines = img.GetDirectionCosines()
-            orientation = gdcm.Orientation()
-            try:
-                _type = orientation.GetType(tuple(direc_cosines))
-            except TypeError:
-                _type = orientation.GetType(direc_cosines)
-            label = orientation.GetLabel(_type)
 
-            # ----------   Refactory --------------------------------------
-            data_dict["invesalius"] = {"orientation_label": label}
+def ReadDicomHeader(filepath):
+    """
+    Read only the elements before the Pixel Data of the given file and
+    return its data dict (the same one built by LoadDicom), or None if it
+    isn't a DICOM image or is a DICOMDIR.
+    """
+    reader = gdcm.Reader()
+    _set_reader_filename(reader, filepath)
+    if not reader.ReadUpToTag(PIXEL_DATA_TAG, gdcm.TagSetType((PIXEL_DATA_TAG,))):
+        return None
 
-            # -------------------------------------------------------------
-            dict_file[self.filepath] = data_dict
+    file = reader.GetFile()
+    # Without pixel data gdcm.ImageReader would fail, here the image is
+    # recognized by its dimensions.
+    ds = file.GetDataSet()
+    rows, columns = gdcm.Tag(0x0028, 0x0010), gdcm.Tag(0x0028, 0x0011)
+    if not (ds.FindDataElement(rows) and ds.FindDataElement(columns)):
+        return None
 
-            # ----------  Verify is DICOMDir -------------------------------
-            is_dicom_dir = 1
-            try:
-                if data_dict[str(0x002)][str(0x002)] != "1.2.840.10008.1.3.10":  # DICOMDIR
-                    is_dicom_dir = 0
-            except KeyError:
-                is_dicom_dir = 0
+    data_dict = _get_data_dict(file)
+    if _is_dicom_dir(data_dict):
+        return None
 
-            if not (is_dicom_dir):
-                parser = dicom.Parser()
-                parser.SetDataImage(dict_file[self.filepath], self.filepath, thumbnail_path)
+    direc_cosines = gdcm.ImageHelper.GetDirectionCosinesValue(file)
+    data_dict["invesalius"] = {"orientation_label": _get_orientation_label(direc_cosines)}
+    return data_dict
 
-                dcm = dicom.Dicom()
-                # self.l.acquire()
-                dcm.SetParser(parser)
-                grouper.AddFile(dcm)
 
-                # self.l.release()
+class LoadDicom:
+    """
+    Parses one file and, if it's a DICOM image, adds it to the grouper. The
+    grouper may be None, in that case the parsed file is only kept in
+    self.dcm so it can be grouped later by another thread.
 
-        # ==========  used in test =======================================
-        # print dict_file
-        # main_dict = dict(
-        #                data  = dict_file,
-        #                labels  = tag_labels)
-        # print main_dict
-        # print "\n"
-        # plistlib.writePlist(main_dict, ".//teste.plist")
+    With header_only the pixel data is not read: the metadata comes from
+    ReadDicomHeader (or from index, a DicomIndex, if the file didn't change)
+    and the thumbnail is only created when it's first shown.
+    """
 
+    def __init__(self, grouper, filepath, header_only=False, index=None):
+        self.grouper = grouper
+        self.filepath = utils.decode(filepath, const.FS_ENCODE)
+        self.header_only = header_only
+        self.index = index
+        self.dcm = None
+        self.run()
+
+    def run(self):
+        if self.header_only:
+            data_dict, thumbnail_path, thumbnail_loader = self.read_header()
+        else:
+            data_dict, thumbnail_path, thumbnail_loader = self.read_image()
+
+        if data_dict is None:
+            return
+
+        dict_file[self.filepath] = data_dict
+
+        parser = dicom.Parser()
+        parser.SetDataImage(data_dict, self.filepath, thumbnail_path, thumbnail_loader)
+
+        dcm = dicom.Dicom()
+        dcm.SetParser(parser)
+        self.dcm = dcm
+        if self.grouper is not None:
+            self.grouper.AddFile(dcm)
+
+    def read_header(self):
+        data_dict = dicom_index.MISSING
+        if self.index is not None:
+            data_dict = self.index.get(self.filepath)
+        if data_dict is dicom_index.MISSING:
+            data_dict = ReadDicomHeader(self.filepath)
+            if self.index is not None:
+                self.index.set(self.filepath, data_dict)
+        if data_dict is None:
+            return None, None, None
+
+        window, level = _get_window_level(data_dict)
+        thumbnail_loader = functools.partial(CreateDicomThumbnail, self.filepath, window, level)
+        # The preview lists one thumbnail per frame, so those are needed
+        # right away.
+        if _get_number_of_frames(data_dict) > 1:
+            return data_dict, thumbnail_loader(), None
+        return data_dict, None, thumbnail_loader
+
+    def read_image(self):
+        reader = gdcm.ImageReader()
+        _set_reader_filename(reader, self.filepath)
+        if not reader.Read():
+            return None, None, None
+
+        data_dict = _get_data_dict(reader.GetFile())
+
+        # -------------- To Create DICOM Thumbnail -----------
+        window, level = _get_window_level(data_dict)
+        img = reader.GetImage()
+        thumbnail_path = imagedata_utils.create_dicom_thumbnails(img, window, level)
 
-def yGetDicomGroups(directory, recursive=True, gui=True):
+        # ------ Verify the orientation --------------------------------
+        label = _get_orientation_label(img.GetDirectionCosines())
+
+        # ----------   Refactory --------------------------------------
+        data_dict["invesalius"] = {"orientation_label": label}
+
+        # ----------  Verify is DICOMDir -------------------------------
+        if _is_dicom_dir(data_dict):
+            return None, None, None
+
+        return data_dict, thumbnail_path, None
+
+
+def ListFiles(directory, recursive=True):
     """
-    Return all full paths to DICOM files inside given directory.
+    Return the full paths of the files inside the given directory, walking it
+    only once.
     """
-    nfiles = 0
-    # Find total number of files
     if recursive:
-        for dirpath, dirnames, filenames in os.walk(directory):
-            nfiles += len(filenames)
-    else:
-        dirpath, dirnames, filenames = os.walk(directory)
-        nfiles = len(filenames)
+        return [
+            os.path.join(dirpath, name)
+            for dirpath, dirnames, filenames in os.walk(directory)
+            for name in filenames
+        ]
+    dirpath, dirnames, filenames = next(os.walk(directory), (directory, [], []))
+    return [os.path.join(dirpath, name) for name in filenames]
+
+
+def _parse_dicom_file(filepath, header_only=False, index=None):
+    return LoadDicom(None, filepath, header_only, index).dcm
+
+
+def yParseDicomFiles(filepaths, n_workers=1, header_only=False, index=None):
+    """
+    Yield the parsed dicom.Dicom (or None if the file isn't a DICOM image) of
+    each file, in the same order as filepaths. With more than one worker the
+    files are parsed by a thread pool, keeping a bounded number of files in
+    flight ahead of the consumer.
+    """
+    parse = functools.partial(_parse_dicom_file, header_only=header_only, index=index)
+    if n_workers <= 1:
+        for filepath in filepaths:
+            yield parse(filepath)
+        return
+
+    filepaths = iter(filepaths)
+    pending = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="dicom_scan")
+    try:
+        for filepath in itertools.islice(filepaths, n_workers * const.DICOM_SCAN_QUEUE_FACTOR):
+            pending.append(executor.submit(parse, filepath))
+        while pending:
+            dcm = pending.popleft().result()
+            for filepath in itertools.islice(filepaths, 1):
+                pending.append(executor.submit(parse, filepath))
+            yield dcm
+    finally:
+        # Also reached when the consumer stops early (user canceled the load).
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def yGetDicomGroups(directory, recursive=True, gui=True, n_workers=None, header_only=None):
+    """
+    Return all full paths to DICOM files inside given directory.
+
+    The files are parsed by n_workers threads (const.DICOM_SCAN_WORKERS if
+    None, serially if 1) while this generator alone feeds the grouper, in the
+    walk order, so the groups are the same as the ones from a serial scan.
+
+    With header_only (const.DICOM_SCAN_HEADER_ONLY if None) the pixel data is
+    not read and the metadata is kept in a per-directory DicomIndex, so only
+    new or changed files are parsed when the directory is scanned again.
+    """
+    if n_workers is None:
+        n_workers = const.DICOM_SCAN_WORKERS
+    if header_only is None:
+        header_only = const.DICOM_SCAN_HEADER_ONLY
+
+    filepaths = ListFiles(directory, recursive)
+    nfiles = len(filepaths)
+
+    index = None
+    if header_only:
+        index = dicom_index.DicomIndex(directory)
+        index.load()
 
-    counter = 0
     grouper = dicom_grouper.DicomPatientGrouper()
-    # q = Queue.Queue()
-    # l = threading.Lock()
-    # threads = []
-    # for i in xrange(cpu_count()):
-    #    t = LoadDicom(grouper, q, l)
-    #    t.start()
-    #    threads.append(t)
     # Retrieve only DICOM files, splited into groups
-    if recursive:
-        for dirpath, dirnames, filenames in os.walk(directory):
-            for name in filenames:
-                filepath = os.path.join(dirpath, name)
-                counter += 1
-                if gui:
-                    yield (counter, nfiles)
-                LoadDicom(grouper, filepath)
-    else:
-        dirpath, dirnames, filenames = os.walk(directory)
-        for name in filenames:
-            filepath = str(os.path.join(dirpath, name))
-            counter += 1
-            if gui:
-                yield (counter, nfiles)
-            # q.put(filepath)
-
-    # for t in threads:
-    #    q.put(0)
+    for counter, dcm in enumerate(yParseDicomFiles(filepaths, n_workers, header_only, index), 1):
+        if dcm is not None:
+            grouper.AddFile(dcm)
+        if gui:
+            yield (counter, nfiles)
 
-    # for t in threads:
-    #    t.join()
+    if index is not None:
+        index.save()
 
     # TODO: Is this commented update necessary?
     # grouper.Update()
     yield grouper.GetPatientsGroups()
 
 
-def GetDicomGroups(directory, recursive=True):
-    return next(yGetDicomGroups(directory, recursive, gui=False))
+def GetDicomGroups(directory, recursive=True, n_workers=None, header_only=None):
+    return next(
+        yGetDicomGroups(
+            directory, recursive, gui=False, n_workers=n_workers, header_only=header_only
+        )
+    )
 
 
 class ProgressDicomReader:
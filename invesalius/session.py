@@ -385,9 +385,9 @@ class Session(metaclass=Singleton):
 
     def CreateAutoBackup(self) -> bool:
         """
-        Create (or overwrite) the auto-backup of the current project.
-        Uses an atomic write pattern (write to temp file, then os.replace)
-        so a crash mid-write never corrupts the last good backup.
+        Create (or update) the auto-backup of the current project.
+        Alternates between two backup files, so a crash mid-write never
+        corrupts the last good backup.
         Returns True if backup was created successfully.
         """
         import invesalius.project as prj
@@ -402,25 +402,23 @@ class Session(metaclass=Singleton):
             backup_dir = Path(inv_paths.USER_INV_DIR) / "temp_backup"
             backup_dir.mkdir(parents=True, exist_ok=True)
 
-            # Write to a staging file first so that a crash mid-write never
-            # corrupts the last good backup (auto_backup.inv3).
-            staging_filename = "auto_backup_staging.inv3"
-            staging_path = backup_dir / staging_filename
-            final_filename = "auto_backup.inv3"
-            final_path = backup_dir / final_filename
-
-            # Save current project to the staging location.
+            # The backup alternates between two files and is only pointed to
+            # the file written after it's complete, so a crash mid-write never
+            # corrupts the last good backup. Each file is updated in place,
+            # rewriting only what changed since it was last written.
             # compress=False: uncompressed tar writes ~110MB in <0.5s on NVMe.
             # Gzip compression (compress=True) was causing the multi-second UI
             # freeze — it provides no real benefit for crash-recovery backups
             # where write speed is critical. Manual saves still use their own
             # compression setting.
-            proj = prj.Project()
-            proj.SavePlistProject(str(backup_dir), staging_filename, compress=False)
+            final_path = backup_dir / "auto_backup.inv3"
+            if str(final_path) == self._auto_backup_path:
+                final_path = backup_dir / "auto_backup_1.inv3"
 
-            # Atomically promote staging → final (old backup preserved if
-            # SavePlistProject raised an exception above)
-            os.replace(str(staging_path), str(final_path))
+            proj = prj.Project()
+            proj.SavePlistProject(
+                str(backup_dir), final_path.name, compress=False, incremental=True
+            )
 
             self._auto_backup_path = str(final_path)
             self.SetState("auto_backup_path", str(final_path))
@@ -433,14 +431,22 @@ class Session(metaclass=Singleton):
             return False
 
     def RemoveAutoBackup(self) -> None:
-        """Remove the auto-backup file if it exists."""
-        if self._auto_backup_path and os.path.exists(self._auto_backup_path):
-            try:
-                os.remove(self._auto_backup_path)
-                debug(f"Auto-backup removed: {self._auto_backup_path}")
-            except Exception as e:
-                debug(f"Failed to remove auto-backup: {e}")
-        
+        """Remove the auto-backup files if they exist."""
+        backup_dir = Path(inv_paths.USER_INV_DIR) / "temp_backup"
+        backup_paths = {
+            str(backup_dir / "auto_backup.inv3"),
+            str(backup_dir / "auto_backup_1.inv3"),
+        }
+        if self._auto_backup_path:
+            backup_paths.add(self._auto_backup_path)
+        for backup_path in backup_paths:
+            if os.path.exists(backup_path):
+                try:
+                    os.remove(backup_path)
+                    debug(f"Auto-backup removed: {backup_path}")
+                except Exception as e:
+                    debug(f"Failed to remove auto-backup: {e}")
+
         self._auto_backup_path = None
         self.SetState("auto_backup_path", None)
 
@@ -12,6 +12,9 @@ floodfill = _native.floodfill
 _native_floodfill_threshold = _native.floodfill_threshold
 _native_floodfill_threshold_inplace = _native.floodfill_threshold_inplace
 _native_floodfill_auto_threshold = _native.floodfill_auto_threshold
+# Missing from the native modules built before it was added, see
+# _floodfill_confidence_py.
+_native_floodfill_confidence = getattr(_native, "floodfill_confidence", None)
 fill_holes_automatically = _native.fill_holes_automatically
 _native_floodfill_voronoi_inplace = _native.floodfill_voronoi_inplace
 _native_jump_flooding = _native.jump_flooding
@@ -65,6 +68,83 @@ def floodfill_auto_threshold(data, seeds, p, fill, out):
     return _native_floodfill_auto_threshold(data, tuple_seeds, p, fill, out)
 
 
+def floodfill_confidence(data, seed, iterations, multiplier, fill, strct, out, window=None):
+    """
+    Confidence connected region growing from seed (x, y, z): at each
+    iteration the region grows to the connected voxels inside mean +-
+    multiplier * std of the region. If window (width, level) is given the
+    values shown with it (from 0 to 255) are used.
+
+    The region is set to fill in out, which must be 0 where it can grow.
+    """
+    seed = tuple(int(i) for i in seed)
+    strct_u8 = np.ascontiguousarray(strct, dtype=np.uint8)
+    if window is not None:
+        window = (float(window[0]), float(window[1]))
+    if _native_floodfill_confidence is None:
+        return _floodfill_confidence_py(
+            data, seed, int(iterations), float(multiplier), int(fill), strct_u8, out, window
+        )
+    return _native_floodfill_confidence(
+        data, seed, int(iterations), float(multiplier), int(fill), strct_u8, out, window
+    )
+
+
+def _window_value_255(values, ww, wl, truncate):
+    """
+    The values shown with the window width ww and level wl, from 0 to 255
+    (like get_LUT_value_255), truncated for integer images.
+    """
+    shown = ((values - (wl - 0.5)) / (ww - 1.0) + 0.5) * 255.0
+    if truncate:
+        shown = np.trunc(shown)
+    shown[values <= wl - 0.5 - (ww - 1.0) / 2.0] = 0.0
+    shown[values > wl - 0.5 + (ww - 1.0) / 2.0] = 255.0
+    return shown
+
+
+def _floodfill_confidence_py(data, seed, iterations, multiplier, fill, strct, out, window):
+    """
+    Python version of the native floodfill_confidence, with the same result,
+    used when the native module doesn't have it. Each iteration labels the
+    whole image, so its cost is proportional to the image.
+    """
+    from scipy import ndimage
+
+    x, y, z = seed
+    dz, dy, dx = data.shape
+    if not (0 <= x < dx and 0 <= y < dy and 0 <= z < dz) or fill == 0:
+        return
+
+    values = data.astype(np.float64)
+    if window is not None:
+        values = _window_value_255(values, *window, np.issubdtype(data.dtype, np.integer))
+
+    # The 3x3x3 voxels around the seed are always part of the statistics.
+    cube = tuple(slice(max(c - 1, 0), c + 2) for c in (z, y, x))
+    in_cube = np.zeros(data.shape, dtype=bool)
+    in_cube[cube] = True
+    cube_values = values[cube].ravel()
+
+    free = out == 0
+    region = np.zeros(data.shape, dtype=bool)
+    for _ in range(iterations):
+        region_values = np.concatenate([cube_values, values[region & ~in_cube]])
+        mean = region_values.sum() / region_values.size
+        std = np.sqrt(max((region_values**2).sum() / region_values.size - mean**2, 0.0))
+        t0 = mean - std * multiplier
+        t1 = mean + std * multiplier
+
+        # The region only grows, to the voxels in range connected to it.
+        inside = region | (free & (values >= t0) & (values <= t1))
+        labels, _ = ndimage.label(inside, strct)
+        if labels[z, y, x] == 0:
+            break
+        region = labels == labels[z, y, x]
+
+    out[region] = fill
+
+
 def floodfill_voronoi(data, seeds, strct, distance_fn):
     """
     Floodfill with voronoi distance constraints.
@@ -1,5 +1,5 @@
 use ndarray::{Array3, ArrayView2, ArrayView3, ArrayViewMut3, Zip};
-use num_traits::NumCast;
+use num_traits::{NumCast, ToPrimitive};
 use std::collections::VecDeque;
 
 pub fn floodfill_internal<T: PartialOrd + Copy, U: PartialOrd + Copy>(
@@ -165,6 +165,177 @@ pub fn generic_floodfill_threshold<T: PartialOrd + Copy>(
     }
 }
 
+/// The value shown of v with the window width ww and level wl, from 0 to 255
+/// (like get_LUT_value_255). It's truncated for integer images.
+fn window_value_255(v: f64, ww: f64, wl: f64, truncate: bool) -> f64 {
+    if v <= wl - 0.5 - (ww - 1.0) / 2.0 {
+        0.0
+    } else if v > wl - 0.5 + (ww - 1.0) / 2.0 {
+        255.0
+    } else {
+        let value = ((v - (wl - 0.5)) / (ww - 1.0) + 0.5) * 255.0;
+        if truncate {
+            value.trunc()
+        } else {
+            value
+        }
+    }
+}
+
+/// Confidence connected region growing. The region starts at the seed and, at
+/// each iteration, grows to the voxels connected to it (by strct) whose values
+/// are inside mean +- multiplier * std of the region (plus the 3x3x3 voxels
+/// around the seed).
+///
+/// The region only grows: each iteration continues from the frontier left by
+/// the previous one (the voxels rejected by its range) and the mean and
+/// variance are kept as running sums, so the cost is proportional to the
+/// region and its frontier, not to the image. If window is given (the width
+/// and level) the values are the ones shown with it, computed on the fly.
+///
+/// out must be 0 where the region can grow, the region is set to fill.
+pub fn generic_floodfill_confidence<T: Copy + ToPrimitive>(
+    data: ArrayView3<T>,
+    seed: (usize, usize, usize),
+    iterations: usize,
+    multiplier: f64,
+    window: Option<(f64, f64)>,
+    truncate: bool,
+    fill: u8,
+    strct: ArrayView3<u8>,
+    mut out: ArrayViewMut3<u8>,
+) {
+    let data_dims = data.shape();
+    let dz = data_dims[0];
+    let dy = data_dims[1];
+    let dx = data_dims[2];
+
+    let strct_dims = strct.shape();
+    let odz = strct_dims[0];
+    let ody = strct_dims[1];
+    let odx = strct_dims[2];
+
+    let offset_z = odz / 2;
+    let offset_y = ody / 2;
+    let offset_x = odx / 2;
+
+    let (sx, sy, sz) = seed;
+    if sx >= dx || sy >= dy || sz >= dz || fill == 0 {
+        return;
+    }
+
+    // Marks the frontier voxels, rejected by the range of the last iteration.
+    let rejected_mark: u8 = if fill == 255 { 254 } else { fill + 1 };
+
+    let value = |z: usize, y: usize, x: usize| -> f64 {
+        let v = data[[z, y, x]].to_f64().unwrap_or(0.0);
+        match window {
+            Some((ww, wl)) => window_value_255(v, ww, wl, truncate),
+            None => v,
+        }
+    };
+    let in_seed_cube = |z: usize, y: usize, x: usize| -> bool {
+        z.abs_diff(sz) <= 1 && y.abs_diff(sy) <= 1 && x.abs_diff(sx) <= 1
+    };
+
+    let mut n = 0.0f64;
+    let mut sum = 0.0f64;
+    let mut sum_sq = 0.0f64;
+    for z in sz.saturating_sub(1)..(sz + 2).min(dz) {
+        for y in sy.saturating_sub(1)..(sy + 2).min(dy) {
+            for x in sx.saturating_sub(1)..(sx + 2).min(dx) {
+                let v = value(z, y, x);
+                n += 1.0;
+                sum += v;
+                sum_sq += v * v;
+            }
+        }
+    }
+
+    let mut frontier: Vec<(usize, usize, usize)> = vec![(sx, sy, sz)];
+    let mut stack: Vec<(usize, usize, usize)> = Vec::new();
+
+    for _ in 0..iterations {
+        let mean = sum / n;
+        let std = (sum_sq / n - mean * mean).max(0.0).sqrt();
+        let t0 = mean - std * multiplier;
+        let t1 = mean + std * multiplier;
+
+        let candidates = std::mem::take(&mut frontier);
+        for (x, y, z) in candidates {
+            if out[[z, y, x]] == fill {
+                continue;
+            }
+            let v = value(z, y, x);
+            if v >= t0 && v <= t1 {
+                out[[z, y, x]] = fill;
+                if !in_seed_cube(z, y, x) {
+                    n += 1.0;
+                    sum += v;
+                    sum_sq += v * v;
+                }
+                stack.push((x, y, z));
+            } else {
+                out[[z, y, x]] = rejected_mark;
+                frontier.push((x, y, z));
+            }
+        }
+
+        while let Some((x, y, z)) = stack.pop() {
+            for kk in 0..odz {
+                let zo = z as isize + kk as isize - offset_z as isize;
+                if zo < 0 || zo >= dz as isize {
+                    continue;
+                }
+                let zo = zo as usize;
+
+                for jj in 0..ody {
+                    let yo = y as isize + jj as isize - offset_y as isize;
+                    if yo < 0 || yo >= dy as isize {
+                        continue;
+                    }
+                    let yo = yo as usize;
+
+                    for ii in 0..odx {
+                        if strct[[kk, jj, ii]] == 0 {
+                            continue;
+                        }
+                        let xo = x as isize + ii as isize - offset_x as isize;
+                        if xo < 0 || xo >= dx as isize {
+                            continue;
+                        }
+                        let xo = xo as usize;
+
+                        let o = out[[zo, yo, xo]];
+                        if o != 0 {
+                            continue;
+                        }
+                        let v = value(zo, yo, xo);
+                        if v >= t0 && v <= t1 {
+                            out[[zo, yo, xo]] = fill;
+                            if !in_seed_cube(zo, yo, xo) {
+                                n += 1.0;
+                                sum += v;
+                                sum_sq += v * v;
+                            }
+                            stack.push((xo, yo, zo));
+                        } else {
+                            out[[zo, yo, xo]] = rejected_mark;
+                            frontier.push((xo, yo, zo));
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    for (x, y, z) in frontier {
+        if out[[z, y, x]] == rejected_mark {
+            out[[z, y, x]] = 0;
+        }
+    }
+}
+
 pub fn generic_floodfill_threshold_inplace<T: PartialOrd + Copy>(
     mut data: ndarray::ArrayViewMut3<T>,
     seeds: Vec<(usize, usize, usize)>,
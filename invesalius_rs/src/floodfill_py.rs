@@ -4,8 +4,9 @@ use pyo3::prelude::*;
 use std::collections::VecDeque;
 
 use crate::floodfill::{
-    fill_holes_automatically_internal, floodfill_internal, generic_floodfill_threshold,
-    generic_floodfill_threshold_inplace, floodfill_voronoi_inplace_internal, jump_flooding_internal,
+    fill_holes_automatically_internal, floodfill_internal, floodfill_voronoi_inplace_internal,
+    generic_floodfill_confidence, generic_floodfill_threshold, generic_floodfill_threshold_inplace,
+    jump_flooding_internal,
 };
 use crate::types::{ImageTypes3, ImageTypesMut3, MaskTypesMut3};
 
@@ -184,6 +185,64 @@ pub fn floodfill_threshold<'py>(
     }
 }
 
+#[pyfunction]
+#[pyo3(signature = (data, seed, iterations, multiplier, fill, strct, out, window=None))]
+pub fn floodfill_confidence<'py>(
+    data: ImageTypes3<'py>,
+    seed: (usize, usize, usize),
+    iterations: usize,
+    multiplier: f64,
+    fill: u8,
+    strct: PyReadonlyArray3<u8>,
+    out: MaskTypesMut3<'py>,
+    window: Option<(f64, f64)>,
+) -> PyResult<()> {
+    match (data, out) {
+        (ImageTypes3::I16(data), MaskTypesMut3::U8(mut out)) => {
+            generic_floodfill_confidence(
+                data.as_array(),
+                seed,
+                iterations,
+                multiplier,
+                window,
+                true,
+                fill,
+                strct.as_array(),
+                out.as_array_mut(),
+            );
+            Ok(())
+        }
+        (ImageTypes3::U8(data), MaskTypesMut3::U8(mut out)) => {
+            generic_floodfill_confidence(
+                data.as_array(),
+                seed,
+                iterations,
+                multiplier,
+                window,
+                true,
+                fill,
+                strct.as_array(),
+                out.as_array_mut(),
+            );
+            Ok(())
+        }
+        (ImageTypes3::F64(data), MaskTypesMut3::U8(mut out)) => {
+            generic_floodfill_confidence(
+                data.as_array(),
+                seed,
+                iterations,
+                multiplier,
+                window,
+                false,
+                fill,
+                strct.as_array(),
+                out.as_array_mut(),
+            );
+            Ok(())
+        }
+    }
+}
+
 #[pyfunction]
 pub fn floodfill_threshold_inplace<'py>(
     data: ImageTypesMut3<'py>,
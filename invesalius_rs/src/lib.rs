@@ -30,6 +30,7 @@ fn _native(m: &Bound<'_, PyModule>) -> PyResult<()> {
         m
     )?)?;
     m.add_function(wrap_pyfunction!(floodfill_py::floodfill_auto_threshold, m)?)?;
+    m.add_function(wrap_pyfunction!(floodfill_py::floodfill_confidence, m)?)?;
     m.add_function(wrap_pyfunction!(floodfill_py::fill_holes_automatically, m)?)?;
     m.add_function(wrap_pyfunction!(floodfill_py::jump_flooding, m)?)?;
 
@@ -0,0 +1,41 @@
+import threading
+import time
+
+from invesalius.data.coordinates import PoseRingBuffer
+
+
+def test_pose_ring_buffer_keeps_last_samples():
+    buffer = PoseRingBuffer(size=3)
+    assert buffer.latest() is None
+    for n in range(5):
+        buffer.put(n, timestamp=float(n))
+
+    assert [sample.value for sample in buffer.samples()] == [2, 3, 4]
+    latest = buffer.latest()
+    assert (latest.seq, latest.timestamp, latest.value) == (5, 4.0, 4)
+    assert buffer.wait_newer(4, timeout=0) is latest
+    assert buffer.wait_newer(5, timeout=0.01) is None
+
+
+def test_pose_ring_buffer_wakes_consumer():
+    buffer = PoseRingBuffer()
+    received = []
+
+    def consume():
+        received.append(buffer.wait_newer(0, timeout=5))
+        received.append(buffer.wait_newer(received[0].seq, timeout=5))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    time.sleep(0.05)
+    buffer.put("pose")
+    start = time.perf_counter()
+    time.sleep(0.05)
+    buffer.clear()
+    consumer.join(timeout=5)
+
+    # Woken by the sample, then by the clear instead of waiting the timeout.
+    assert not consumer.is_alive()
+    assert received[0].value == "pose" and received[1] is None
+    assert time.perf_counter() - start < 1
+    assert buffer.put("next").seq == 2
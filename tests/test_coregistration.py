@@ -0,0 +1,126 @@
+import queue
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+import invesalius.data.coregistration as dcr
+import invesalius.data.transformations as tr
+from invesalius.data.coordinates import PoseRingBuffer, PoseSample
+from invesalius.data.record_coords import Record, load_record
+
+rng = np.random.default_rng(0)
+
+
+def random_matrix():
+    m = tr.euler_matrix(*rng.uniform(-3, 3, 3))
+    m[:3, 3] = rng.uniform(-50, 50, 3)
+    return m
+
+
+def test_marker_transformations():
+    coord_raw = np.hstack([rng.uniform(-100, 100, (4, 3)), rng.uniform(-180, 180, (4, 3))])
+    markers = dcr.marker_transformations(coord_raw)
+    for n in range(4):
+        np.testing.assert_allclose(markers[n], dcr.compute_marker_transformation(coord_raw, n))
+
+    coords = dcr.matrices_to_coordinates(markers)
+    for n in range(4):
+        angles = np.degrees(tr.euler_from_matrix(markers[n], axes="sxyz"))
+        np.testing.assert_allclose(coords[n], np.r_[coord_raw[n, :3], angles])
+
+
+@pytest.mark.parametrize("ref_mode_id", [0, 1])
+@pytest.mark.parametrize("use_icp", [False, True])
+def test_batch_corregistration(ref_mode_id, use_icp):
+    obj_datas = {f"coil {n}": (2 + n,) + tuple(random_matrix() for _ in range(6)) for n in range(3)}
+    coord_raw = np.hstack([rng.uniform(-100, 100, (5, 3)), rng.uniform(-180, 180, (5, 3))])
+    m_change = random_matrix()
+    icp = (use_icp, random_matrix())
+
+    batch = dcr.BatchCorregistration(m_change, None, obj_datas, ref_mode_id, icp)
+    coords, m_imgs = batch.corregistrate(coord_raw, ["coil 0", "coil 2"])
+    assert sorted(coords) == ["coil 0", "coil 2", "probe"]
+
+    coord, m_img = dcr.corregistrate_probe(m_change, None, coord_raw, ref_mode_id, list(icp))
+    np.testing.assert_allclose(coords["probe"], coord)
+    np.testing.assert_allclose(m_imgs["probe"], m_img)
+    if ref_mode_id:
+        corregistrate_object = dcr.corregistrate_object_dynamic
+    else:
+        corregistrate_object = dcr.corregistrate_object_static
+    for coil_name in ("coil 0", "coil 2"):
+        coord, m_img = corregistrate_object(m_change, obj_datas[coil_name], coord_raw, icp)
+        np.testing.assert_allclose(coords[coil_name], coord)
+        np.testing.assert_allclose(m_imgs[coil_name], m_img)
+
+
+class MovingPoses:
+    """
+    Coregistration whose objects move 10 mm along x per sample.
+    """
+
+    def __init__(self):
+        self.n = 0
+
+    def corregistrate(self, coord_raw, coil_names):
+        m_img = tr.translation_matrix((10.0 * self.n, 0, 0))
+        self.n += 1
+        names = ["probe"] + coil_names
+        coords = {name: (m_img[0, 3], 0.0, 0.0, 0.0, 0.0, 0.0) for name in names}
+        return coords, {name: m_img.copy() for name in names}
+
+
+def test_recorded_poses_are_not_predicted(tmp_path):
+    event = threading.Event()
+    samples = iter(
+        [PoseSample(n + 1, n * 0.01, (np.zeros((4, 6)), [True, True, True])) for n in range(5)]
+    )
+
+    def wait_coordinates(seq, timeout):
+        sample = next(samples, None)
+        if sample is None:
+            event.set()
+        return sample
+
+    coord_buffer = PoseRingBuffer()
+    navigation = SimpleNamespace(
+        main_coil="coil",
+        pose_filter=const.POSE_FILTER_NONE,
+        pose_prediction=True,
+        e_field_revision=0,
+    )
+    thread = dcr.CoordinateCorregistrate(
+        1,
+        SimpleNamespace(TrackerCoordinates=SimpleNamespace(WaitCoordinates=wait_coordinates)),
+        [random_matrix(), None],
+        {"coil": (2,) + tuple(random_matrix() for _ in range(6))},
+        False,
+        [coord_buffer, queue.Queue(maxsize=1), queue.Queue(), None],
+        event,
+        const.DEBUGTRACKRANDOM,
+        None,
+        SimpleNamespace(use_icp=False, m_icp=None),
+        False,
+        navigation,
+    )
+    thread.corregistration = MovingPoses()
+    # Predict the poses 50 ms ahead.
+    thread.horizon = 0.05
+    thread._horizon_time = float("inf")
+
+    filename = str(tmp_path / "coords.csv")
+    record = Record(coord_buffer, filename, [("probe", 0), ("coil", 2)])
+    thread.run()
+    record.stop()
+
+    columns, rows = load_record(filename)
+    np.testing.assert_allclose(rows[:, columns.index("coil_x")], 10.0 * np.arange(5), atol=1e-9)
+    np.testing.assert_allclose(rows[:, columns.index("probe_x")], 10.0 * np.arange(5), atol=1e-9)
+
+    # The scene shows the coil where it's predicted to be when rendered.
+    coords, _, _, scene_coords, _ = coord_buffer.latest().value
+    assert coords["coil"][0] == pytest.approx(40.0)
+    assert scene_coords["coil"][0] == pytest.approx(40.0 + 1000.0 * 0.05)
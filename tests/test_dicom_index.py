@@ -0,0 +1,62 @@
+import os
+
+from invesalius.reader.dicom_index import MISSING, DicomIndex
+
+
+def test_dicom_index_roundtrip(tmp_path):
+    dicom_dir = tmp_path / "dicom"
+    dicom_dir.mkdir()
+    filepath = str(dicom_dir / "slice.dcm")
+    with open(filepath, "wb") as f:
+        f.write(b"header")
+
+    data_dict = {"spacing": [0.5, 0.5, 1.0], "16": {"16": "Patient"}}
+    index = DicomIndex(str(dicom_dir), index_dir=str(tmp_path / "index"))
+    index.load()
+    assert index.get(filepath) is MISSING
+    index.set(filepath, data_dict)
+    index.save()
+
+    index = DicomIndex(str(dicom_dir), index_dir=str(tmp_path / "index"))
+    index.load()
+    assert index.get(filepath) == data_dict
+
+
+def test_dicom_index_changed_file_is_missing(tmp_path):
+    filepath = str(tmp_path / "slice.dcm")
+    with open(filepath, "wb") as f:
+        f.write(b"header")
+
+    index = DicomIndex(str(tmp_path), index_dir=str(tmp_path / "index"))
+    index.set(filepath, None)
+    assert index.get(filepath) is None
+
+    with open(filepath, "ab") as f:
+        f.write(b"more data")
+    assert index.get(filepath) is MISSING
+
+
+def test_dicom_index_drops_removed_files(tmp_path):
+    index_dir = str(tmp_path / "index")
+    filepaths = []
+    for i in range(2):
+        filepath = str(tmp_path / f"slice{i}.dcm")
+        with open(filepath, "wb") as f:
+            f.write(b"header")
+        filepaths.append(filepath)
+
+    index = DicomIndex(str(tmp_path), index_dir=index_dir)
+    for filepath in filepaths:
+        index.set(filepath, {})
+    index.save()
+
+    os.remove(filepaths[1])
+    index = DicomIndex(str(tmp_path), index_dir=index_dir)
+    index.load()
+    assert index.get(filepaths[0]) == {}
+    assert index.get(filepaths[1]) is MISSING
+    index.save()
+
+    index = DicomIndex(str(tmp_path), index_dir=index_dir)
+    index.load()
+    assert list(index._entries) == [filepaths[0]]
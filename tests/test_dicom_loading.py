@@ -59,3 +59,21 @@ def test_dicom_loading():
             dicom.image.orientation_label == "AXIAL"
         ), f"Expected orientation label 'AXIAL', got '{dicom.image.orientation_label}'"
         assert os.path.exists(dicom.image.file)
+
+
+@pytest.mark.skipif(not has_internet(), reason="No internet connection required to download the DICOM test data")
+def test_dicom_parallel_scan_matches_serial():
+    with tempfile.TemporaryDirectory() as dicom_dir:
+        zip_path, dicom_data_dir = download_and_extract_dicom_zip(dicom_dir)
+        serial = dicom_reader.GetDicomGroups(dicom_data_dir, recursive=True, n_workers=1)
+        parallel = dicom_reader.GetDicomGroups(dicom_data_dir, recursive=True, n_workers=4)
+        assert [p.key for p in serial] == [p.key for p in parallel]
+        for serial_patient, parallel_patient in zip(serial, parallel):
+            serial_groups = serial_patient.GetGroups()
+            parallel_groups = parallel_patient.GetGroups()
+            assert [g.key for g in serial_groups] == [g.key for g in parallel_groups]
+            for serial_group, parallel_group in zip(serial_groups, parallel_groups):
+                assert serial_group.nslices == parallel_group.nslices
+                assert list(serial_group.GetFilenameList()) == list(
+                    parallel_group.GetFilenameList()
+                )
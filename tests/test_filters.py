@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+import pytest
+
+from invesalius.data import filters
+
+
+@pytest.fixture
+def matrix():
+    return np.random.default_rng(0).integers(-1000, 2000, (23, 17, 19), dtype=np.int16)
+
+
+@pytest.mark.parametrize(
+    "filter_type,value", [(0, 1.5), (1, 2), (2, 1), (3, 2.0), (4, 0.8), (5, 1.0)]
+)
+def test_tiled_filter_equals_whole_volume(matrix, filter_type, value, monkeypatch):
+    function, _ = filters.FILTERS[filter_type]
+    expected = function(matrix, value)
+
+    # A few slices per slab, so the halos matter.
+    monkeypatch.setattr(filters.const, "IMAGE_FILTER_SLAB_BYTES", 3 * matrix[0].nbytes)
+    out = np.empty_like(matrix)
+    progress = []
+    assert filters.apply_filter(
+        filter_type, matrix, value, out, n_workers=3, progress=progress.append
+    )
+    np.testing.assert_array_equal(out, expected)
+    assert progress == sorted(progress) and progress[-1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_tiled_filter_2d(matrix, axis):
+    expected = np.empty_like(matrix)
+    for n in range(matrix.shape[axis]):
+        index = [slice(None)] * 3
+        index[axis] = n
+        expected[tuple(index)] = filters.border_detection_filter(matrix[tuple(index)], value=1.0)
+
+    out = np.empty_like(matrix)
+    assert filters.apply_filter(5, matrix, 1.0, out, "2D", axis)
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_tiled_filter_cancel(matrix):
+    cancel = threading.Event()
+    cancel.set()
+    out = np.zeros_like(matrix)
+    assert not filters.apply_filter(1, matrix, 1, out, cancel=cancel)
+    assert not out.any()
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import h5py
+import numpy as np
+import pytest
+
+from invesalius.data.hdf5_utils import get_chunk_shape, write_dataset
+from invesalius.data.slice_ import Slice
+from invesalius.project import Project
+
+
+def test_get_chunk_shape():
+    assert get_chunk_shape((10, 512, 512), (16, 128, 128)) == (10, 128, 128)
+    assert get_chunk_shape((0, 5, 5), (16, 128, 128)) == (1, 5, 5)
+
+
+@pytest.mark.parametrize(
+    "compression,n_threads",
+    [("gzip", 1), ("gzip", 4), ("lzf", 1), (None, 1)],
+)
+@pytest.mark.parametrize("dtype", [np.int16, np.uint8])
+def test_write_dataset_from_memmap(tmp_path, compression, n_threads, dtype):
+    shape = (37, 70, 45)
+    array = np.memmap(str(tmp_path / "volume.dat"), dtype=dtype, mode="w+", shape=shape)
+    rng = np.random.default_rng(0)
+    array[:] = rng.integers(0, 100, size=shape)
+    array[10:20] = 0
+
+    filename = str(tmp_path / "volume.hdf5")
+    with h5py.File(filename, "w") as f:
+        write_dataset(
+            f, "group/data", array[1:, 1:, 1:], (8, 32, 32), compression, n_threads=n_threads
+        )
+
+    with h5py.File(filename, "r") as f:
+        dataset = f["group/data"]
+        assert dataset.chunks == (8, 32, 32)
+        assert dataset.compression == compression
+        assert dataset.shuffle == (compression is not None and dtype == np.int16)
+        np.testing.assert_array_equal(dataset[()], array[1:, 1:, 1:])
+
+
+@pytest.mark.parametrize("compression", [None, "lzf"])
+def test_level_ignored_without_gzip(tmp_path, compression):
+    array = np.arange(4 * 10 * 10, dtype=np.int16).reshape(4, 10, 10)
+    with h5py.File(str(tmp_path / "volume.hdf5"), "w") as f:
+        dataset = write_dataset(f, "data", array, (2, 8, 8), compression, compression_opts=4)
+        assert dataset.compression == compression
+        assert dataset.compression_opts is None
+        np.testing.assert_array_equal(dataset[()], array)
+
+
+@pytest.fixture
+def project_with_masks():
+    slc = Slice()
+    image = np.random.default_rng(1).integers(0, 1000, size=(12, 20, 18)).astype(np.int16)
+    with patch("numpy.histogram", return_value=(np.array([0]), np.array([0, 1]))):
+        slc.matrix = image
+    slc.spacing = (1.0, 1.0, 1.0)
+
+    project = Project()
+    project.name = "test"
+    project.modality = "CT"
+    project.original_orientation = "AXIAL"
+    project.window = 400
+    project.level = 40
+    project.threshold_range = (0, 999)
+    project.compress = False
+    indexes = []
+    for n in range(3):
+        mask = slc.create_new_mask(
+            name=f"mask {n}",
+            threshold_range=(n * 300, n * 300 + 200),
+            add_to_project=False,
+            show=False,
+        )
+        indexes.append(project.AddMask(mask))
+    yield project, image
+    for index in indexes:
+        project.RemoveMask(index)
+
+
+@pytest.mark.parametrize("mask_workers", [0, 2])
+def test_export_project_masks(tmp_path, project_with_masks, mask_workers):
+    project, image = project_with_masks
+    filename = str(tmp_path / "project.hdf5")
+    project.export_project_to_hdf5(filename, chunks=(4, 8, 8), mask_workers=mask_workers)
+
+    with h5py.File(filename, "r") as f:
+        np.testing.assert_array_equal(f["image"][()], image)
+        for index, mask in project.mask_dict.items():
+            t0, t1 = mask.threshold_range
+            expected = np.where((image >= t0) & (image <= t1), 255, 0)
+            np.testing.assert_array_equal(f[f"masks/{index}/matrix"][()], expected)
+            assert f[f"masks/{index}/name"][()].decode() == mask.name
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from invesalius.data import filters
+from invesalius.data.image_versions import FilterStep, ImageVersionStore
+
+
+@pytest.fixture
+def original():
+    return np.random.default_rng(0).integers(-1000, 2000, (12, 10, 11), dtype=np.int16)
+
+
+def filtered(matrix, filter_type, value, dimension="3D", axis=0):
+    out = np.empty_like(matrix)
+    filters.apply_filter(filter_type, matrix, value, out, dimension, axis)
+    return out
+
+
+def test_version_computed_from_recipe(original):
+    store = ImageVersionStore()
+    store.add_original(original)
+    store.add_recipe("Filtered 1", "original", [FilterStep(1, 2)])
+    store.add("Filtered 2", "Filtered 1", FilterStep(0, 1.0, "2D", "Coronal"))
+    assert store.labels() == ["original", "Filtered 1", "Filtered 2"]
+    assert not store.is_computed("Filtered 2")
+
+    expected = filtered(filtered(original, 1, 2), 0, 1.0, "2D", axis=1)
+    np.testing.assert_array_equal(store.get("Filtered 2"), expected)
+    assert store.is_computed("Filtered 1")
+    assert store.get("Filtered 3") is None
+
+
+def test_least_recently_used_discarded(original):
+    store = ImageVersionStore(budget=2 * original.nbytes)
+    store.add_original(original)
+    for n in range(1, 4):
+        store.add_recipe(f"Filtered {n}", "original", [FilterStep(2, n)])
+
+    files = [store.get(f"Filtered {n}").filename for n in range(1, 4)]
+    assert [store.is_computed(f"Filtered {n}") for n in range(1, 4)] == [False, True, True]
+    assert not os.path.exists(files[0])
+
+    # Computed again when needed, discarding the least recently used.
+    np.testing.assert_array_equal(store.get("Filtered 1"), filtered(original, 2, 1))
+    assert not store.is_computed("Filtered 2")
+
+    store.active = "Filtered 3"
+    store.get("Filtered 2")
+    assert store.is_computed("Filtered 3")
+
+    store.clear()
+    assert not any(os.path.exists(f) for f in files)
+
+
+def test_versions_without_recipe_kept(original):
+    store = ImageVersionStore(budget=0)
+    store.add_original(original)
+    store.append(("Opened", original + 1))
+    store.add("Filtered 1", "Opened", FilterStep(2, 1), original + 2)
+    store.add_recipe("Filtered 2", "original", [FilterStep(2, 1)])
+    store.get("Filtered 2")
+
+    assert store.is_computed("Opened") and store.is_computed("Filtered 1")
+    store.rename("Opened", "Renamed")
+    assert store.get_version("Filtered 1").parent == "Renamed"
+
+
+def test_swap_axes_updates_recipe(original):
+    store = ImageVersionStore()
+    store.add_original(original)
+    store.add_recipe("Filtered 1", "original", [FilterStep(5, 1.0, "2D", "Axial")])
+    store.add("Filtered 2", "Filtered 1", FilterStep(5, 1.0, "2D", "Sagittal"))
+
+    store.swap_axes(2, 0)
+    steps = store.get_version("Filtered 2").steps
+    assert [step.orientation for step in steps] == ["Sagittal", "Axial"]
@@ -0,0 +1,54 @@
+import csv
+import json
+
+import pytest
+
+from invesalius.navigation import latency
+
+
+@pytest.fixture
+def monitor():
+    monitor = latency.LatencyMonitor()
+    monitor.reset()
+    yield monitor
+    monitor.reset()
+
+
+def test_latency_recorded_by_stage(monitor):
+    for n in range(11):
+        t = n * 0.1
+        stamps = monitor.record(latency.STAGE_TRACKER, (("read", t),), t + 0.002)
+        stamps = monitor.record(latency.STAGE_COREGISTRATION, stamps, t + 0.005)
+        assert [stage for stage, _ in stamps] == ["read", "tracker", "coregistration"]
+    monitor.drop(latency.STAGE_COREGISTRATION, 2)
+    monitor.drop(latency.STAGE_SCENE, 0)
+
+    summary = monitor.summary()
+    coregistration = summary[latency.STAGE_COREGISTRATION]
+    assert coregistration["count"] == 11 and coregistration["dropped"] == 2
+    assert coregistration["hz"] == pytest.approx(10)
+    assert coregistration["stage_p50_ms"] == pytest.approx(3)
+    assert coregistration["total_p99_ms"] == pytest.approx(5)
+    assert summary[latency.STAGE_SCENE]["dropped"] == 0
+    assert summary[latency.STAGE_SCENE]["stage_p95_ms"] is None
+
+
+def test_latency_dump(monitor, tmp_path):
+    monitor.record(latency.STAGE_TRACKER, (("read", 1.0),), 1.004)
+    monitor.dump(str(tmp_path / "latency.csv"))
+    monitor.dump(str(tmp_path / "latency.json"))
+
+    with open(tmp_path / "latency.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["stage"] for row in rows] == list(latency.STAGES)
+    assert float(rows[0]["stage_p50_ms"]) == pytest.approx(4)
+    with open(tmp_path / "latency.json") as f:
+        assert json.load(f)[latency.STAGE_TRACKER]["count"] == 1
+
+
+def test_latency_percentile(monitor):
+    assert monitor.latency(latency.STAGE_RENDER) is None
+    for n in range(5):
+        monitor.record(latency.STAGE_RENDER, (("read", float(n)),), n + 0.01 * (n + 1))
+    assert monitor.latency(latency.STAGE_RENDER) == pytest.approx(0.03)
+    assert monitor.latency(latency.STAGE_RENDER, 100) == pytest.approx(0.05)
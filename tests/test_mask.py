@@ -1,6 +1,11 @@
+import os
+import plistlib
+import tarfile
+
 import numpy as np
 from invesalius.data.slice_ import Slice
-from invesalius.project import Project
+from invesalius.data.mask import Mask
+from invesalius.project import Compress, IsMaskDataFile, Project, ProjectArchive
 from unittest.mock import patch
 
 def test_create_new_mask() -> None:
@@ -63,3 +68,146 @@ def test_set_mask_name() -> None:
     slc.SetMaskName(mask_index, new_name)
     proj: Project = Project()
     assert proj.mask_dict[mask_index].name == new_name
+
+
+def test_edition_history_undo_redo_with_spill() -> None:
+    from invesalius.data.mask import EditionHistory
+
+    rng = np.random.default_rng(0)
+    mvolume = np.zeros((6, 9, 9), dtype=np.uint8)
+    history = EditionHistory(memory_budget=0)
+    states = [mvolume.copy()]
+    for n in range(4):
+        p_array = np.array(mvolume[n + 1, 1:, 1:])
+        array = p_array.copy()
+        array[2:5, 3:7] = rng.choice(np.array([0, 254, 255], dtype=np.uint8), size=(3, 4))
+        mvolume[n + 1, 1:, 1:] = array
+        history.new_node(n, "AXIAL", array, p_array, False)
+        states.append(mvolume.copy())
+
+    # Only the last edition is kept in memory.
+    assert all(node.filename is not None for node in history.history[:-2])
+    assert all(node.filename is None for node in history.history[-2:])
+
+    # Each edition has a node for the previous state and one for the new state.
+    for n, state in enumerate(states[1:]):
+        assert history.history[2 * n].get_array().tolist() == states[n][n + 1, 1:, 1:].tolist()
+        assert history.history[2 * n + 1].get_array().tolist() == state[n + 1, 1:, 1:].tolist()
+
+    while history.index > 0:
+        history.undo(mvolume)
+    np.testing.assert_array_equal(mvolume, states[0])
+    while history.index < len(history.history) - 1:
+        history.redo(mvolume)
+    np.testing.assert_array_equal(mvolume, states[-1])
+
+
+def make_project_archive(tmp_path, matrix, compress=False):
+    mask_plist = {
+        "index": 0,
+        "name": "Mask 1",
+        "colour": [1.0, 0.0, 0.0],
+        "opacity": 0.5,
+        "threshold_range": [100, 200],
+        "edition_threshold_range": [0, 5000],
+        "visible": False,
+        "mask_file": "mask_0.dat",
+        "mask_shape": list(matrix.shape),
+    }
+    files = {
+        "mask_0.plist": plistlib.dumps(mask_plist),
+        "mask_0.dat": matrix.tobytes(),
+        "main.plist": plistlib.dumps({"name": "test"}),
+    }
+    src = tmp_path / "src"
+    src.mkdir()
+    filename = str(tmp_path / "project.inv3")
+    with tarfile.open(filename, "w:gz" if compress else "w") as tar:
+        for name, data in files.items():
+            (src / name).write_bytes(data)
+            tar.add(src / name, arcname=os.path.join("tmpproject", name))
+    return filename
+
+
+def test_mask_is_mapped_from_uncompressed_project(tmp_path):
+    matrix = np.random.default_rng(1).integers(0, 256, size=(4, 6, 5), dtype=np.uint8)
+    filename = make_project_archive(tmp_path, matrix)
+    with open(filename, "rb") as f:
+        original = f.read()
+
+    archive = ProjectArchive.open(filename)
+    folder = tmp_path / "extracted"
+    folder.mkdir()
+    dirpath = archive.extract(str(folder), exclude=IsMaskDataFile)
+    assert sorted(os.listdir(dirpath)) == ["main.plist", "mask_0.plist"]
+
+    mask = Mask()
+    mask.OpenPList(os.path.join(dirpath, "mask_0.plist"), archive)
+    np.testing.assert_array_equal(mask.matrix, matrix)
+
+    # Changes don't touch the project file until the mask gets a temp file.
+    mask.matrix[1, 2, 3] = 254
+    matrix[1, 2, 3] = 254
+    with open(filename, "rb") as f:
+        assert f.read() == original
+
+    temp_file = mask.temp_file
+    assert temp_file != filename
+    saved = np.fromfile(temp_file, dtype=np.uint8).reshape(matrix.shape)
+    np.testing.assert_array_equal(saved, matrix)
+    np.testing.assert_array_equal(mask.matrix, matrix)
+
+
+def open_mapped_mask(tmp_path, matrix):
+    filename = make_project_archive(tmp_path, matrix)
+    archive = ProjectArchive.open(filename)
+    folder = tmp_path / "extracted"
+    folder.mkdir()
+    dirpath = archive.extract(str(folder), exclude=IsMaskDataFile)
+    mask = Mask()
+    mask.OpenPList(os.path.join(dirpath, "mask_0.plist"), archive)
+    return mask
+
+
+def test_mapped_mask_is_saved_without_temp_file(tmp_path):
+    matrix = np.random.default_rng(2).integers(0, 256, size=(4, 6, 5), dtype=np.uint8)
+    mask = open_mapped_mask(tmp_path, matrix)
+    mask.matrix[2, 1, 0] = 7
+    matrix[2, 1, 0] = 7
+
+    filelist = {}
+    save_temp_files = set()
+    folder = tmp_path / "save"
+    folder.mkdir()
+    mask.SavePlist(str(folder), filelist, save_temp_files)
+    filename = str(tmp_path / "saved.inv3")
+    Compress(str(folder), filename, filelist)
+
+    assert mask._archive_filename is not None
+    assert mask._temp_file is None
+    with tarfile.open(filename) as tar:
+        member = tar.getmember(os.path.join("save", "mask_0.dat"))
+        saved = np.frombuffer(tar.extractfile(member).read(), dtype=np.uint8)
+    np.testing.assert_array_equal(saved.reshape(matrix.shape), matrix)
+    for f in save_temp_files:
+        os.remove(f)
+
+
+def test_copy_to_temp_file_rebuilds_imagedata(tmp_path):
+    matrix = np.zeros((4, 6, 5), dtype=np.uint8)
+    mask = open_mapped_mask(tmp_path, matrix)
+    mask.imagedata = mask.as_vtkimagedata()
+    old_imagedata = mask.imagedata
+
+    mask.temp_file
+    assert mask.imagedata is not old_imagedata
+
+    mask.matrix[1, 1, 1] = 255
+    scalars = mask.imagedata.GetPointData().GetScalars()
+    assert scalars.GetValue(np.ravel_multi_index((1, 1, 1), matrix.shape)) == 255
+
+
+def test_compressed_project_is_not_mapped(tmp_path):
+    matrix = np.zeros((2, 2, 2), dtype=np.uint8)
+    filename = make_project_archive(tmp_path, matrix, compress=True)
+    assert ProjectArchive.open(filename) is None
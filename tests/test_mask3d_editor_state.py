@@ -0,0 +1,75 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from invesalius.data import mask3d_editor_state
+from invesalius.data.mask3d_editor_state import Mask3DEditorState, get_brush_bbox
+from invesalius.data.slice_ import Slice
+
+
+def sphere(shape, spacing, center, radius):
+    sx, sy, sz = spacing
+    cx, cy, cz = center
+    z, y, x = np.indices(shape)
+    return (x * sx - cx) ** 2 + (y * sy - cy) ** 2 + (z * sz - cz) ** 2 <= radius**2
+
+
+def erase_brush(out, orig, spacing, center, radius, edit_mode):
+    out[sphere(out.shape, spacing, center, radius)] = 0
+
+
+@pytest.mark.parametrize(
+    "center,radius", [((3.0, 4.5, 2.0), 2.5), ((0.0, 0.0, 0.0), 1.0), ((15.0, 2.0, 7.5), 4.0)]
+)
+def test_brush_bbox(center, radius):
+    shape, spacing = (10, 12, 14), (1.0, 0.5, 2.0)
+    inside = sphere(shape, spacing, center, radius)
+    bbox = get_brush_bbox(shape, spacing, center, radius)
+    outside = np.ones(shape, dtype=bool)
+    outside[bbox] = False
+    assert inside.any() and not inside[outside].any()
+
+    assert get_brush_bbox(shape, spacing, (-10.0, 0.0, 0.0), radius) is None
+
+
+@pytest.fixture
+def mask():
+    slc = Slice()
+    with patch("numpy.histogram", return_value=(np.array([0]), np.array([0, 1]))):
+        slc.matrix = np.ones((8, 9, 10), dtype=np.int16)
+    slc.spacing = (1.0, 1.0, 1.0)
+    mask = slc.create_new_mask(name="Mask3D", add_to_project=False, show=False)
+    mask.matrix[1:, 1:, 1:] = 255
+    slc.current_mask = mask
+    yield mask
+    slc.current_mask = None
+
+
+def test_brush_stroke_history(mask, monkeypatch):
+    monkeypatch.setattr(mask3d_editor_state, "brush_mask_rs", erase_brush)
+    state = Mask3DEditorState(MagicMock(GetSize=lambda: (100, 100)))
+    state.edit_mode = 1
+    state.brush_size = 3.0
+    state.setup_state()
+    before = mask.matrix[1:, 1:, 1:].copy()
+
+    state.start_brush_stroke()
+    # world coordinates, the y axis is flipped by the 3D view.
+    for x in range(2, 6):
+        state.brush_stroke((x, -5.0, 3.0))
+    state.end_brush_stroke()
+
+    expected = before.copy()
+    for x in range(2, 6):
+        expected[sphere(expected.shape, (1.0, 1.0, 1.0), (x + 1, 4.0, 4.0), 1.5)] = 0
+    np.testing.assert_array_equal(mask.matrix[1:, 1:, 1:], expected)
+
+    # Only the edited region is saved in the history.
+    node = mask.history.history[-1]
+    assert node.region == (slice(3, 8), slice(3, 8), slice(2, 10))
+
+    mask.undo_history(None)
+    np.testing.assert_array_equal(mask.matrix[1:, 1:, 1:], before)
+    mask.redo_history(None)
+    np.testing.assert_array_equal(mask.matrix[1:, 1:, 1:], expected)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+import invesalius.data.transformations as tr
+from invesalius.navigation import pose_filter as pf
+
+RATE = 100.0
+
+
+def pose(position, angles):
+    m = tr.euler_matrix(*np.radians(angles))
+    m[:3, 3] = position
+    return m
+
+
+def rotation_error(a, b):
+    # The angle (degrees) of the rotation between a and b.
+    cos = (np.trace(a[:3, :3].T @ b[:3, :3]) - 1) / 2
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+
+@pytest.mark.parametrize("method", [const.POSE_FILTER_ONE_EURO, const.POSE_FILTER_KALMAN])
+def test_still_pose_smoothed(method):
+    rng = np.random.default_rng(0)
+    pose_filter = pf.PoseFilter(method)
+    angles = np.array([20.0, -30.0, 170.0])
+    truth = pose([10.0, -20.0, 30.0], angles)
+    raw_errors, errors = [], []
+    for n in range(300):
+        noisy = pose(truth[:3, 3] + rng.normal(0, 0.3, 3), angles + rng.normal(0, 0.3, 3))
+        smoothed, predicted = pose_filter.filter("coil", noisy, n / RATE)
+        assert predicted is smoothed
+        if n >= 100:
+            raw_errors.append(
+                [np.linalg.norm(noisy[:3, 3] - truth[:3, 3]), rotation_error(noisy, truth)]
+            )
+            errors.append(
+                [np.linalg.norm(smoothed[:3, 3] - truth[:3, 3]), rotation_error(smoothed, truth)]
+            )
+    assert (np.mean(errors, axis=0) < 0.75 * np.mean(raw_errors, axis=0)).all()
+
+
+@pytest.mark.parametrize(
+    "method, tolerance",
+    [
+        (const.POSE_FILTER_NONE, 0.01),
+        (const.POSE_FILTER_KALMAN, 0.05),
+        # The One-Euro filter still lags behind the moving poses.
+        (const.POSE_FILTER_ONE_EURO, 0.75),
+    ],
+)
+def test_moving_pose_predicted(method, tolerance):
+    pose_filter = pf.PoseFilter(method, predict=True)
+    speed = np.array([50.0, -20.0, 10.0])  # mm/s
+    turn = 30.0  # degrees/s
+    horizon = 0.05
+    for n in range(200):
+        t = n / RATE
+        raw = pose(speed * t, [0.0, 0.0, turn * t])
+        smoothed, predicted = pose_filter.filter("coil", raw, t, horizon)
+    expected = pose(speed * (t + horizon), [0.0, 0.0, turn * (t + horizon)])
+    lag = np.linalg.norm(raw[:3, 3] - expected[:3, 3])
+    assert np.linalg.norm(predicted[:3, 3] - expected[:3, 3]) < tolerance * lag
+    assert rotation_error(predicted, expected) < tolerance * rotation_error(raw, expected)
+
+    # The prediction is limited to max_prediction.
+    raw = pose(speed * 2, [0.0, 0.0, turn * 2])
+    _, predicted = pose_filter.filter("coil", raw, 2.0, 10.0)
+    max_lead = np.linalg.norm(speed) * const.POSE_PREDICTION_MAX
+    assert np.linalg.norm(predicted[:3, 3] - raw[:3, 3]) < max_lead * 1.1
+
+
+def test_objects_filtered_separately():
+    pose_filter = pf.PoseFilter(const.POSE_FILTER_ONE_EURO)
+    a = pose([0.0, 0.0, 0.0], [0.0, 0.0, 179.0])
+    b = pose([100.0, 0.0, 0.0], [0.0, 0.0, -179.0])
+    pose_filter.filter("probe", a, 0.0)
+    pose_filter.filter("coil", b, 0.0)
+    # The quaternion of the orientation changes sign from 179 to -179 degrees.
+    smoothed, _ = pose_filter.filter("probe", b, 0.01)
+    assert rotation_error(smoothed, a) < 2.0 and rotation_error(smoothed, b) < 2.0
+    np.testing.assert_allclose(pose_filter.filter("coil", b, 0.01)[0], b, atol=1e-9)
+
+    # The filter restarts when the object wasn't seen for a while.
+    smoothed, _ = pose_filter.filter("coil", a, 0.01 + 2 * const.POSE_FILTER_RESET)
+    np.testing.assert_allclose(smoothed, a, atol=1e-9)
+
+
+def test_disabled_filter():
+    m = pose([1.0, 2.0, 3.0], [10.0, 20.0, 30.0])
+    assert pf.PoseFilter().filter("coil", m, 0.0) == (m, m)
+    with pytest.raises(ValueError):
+        pf.PoseFilter("median")
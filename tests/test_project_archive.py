@@ -0,0 +1,85 @@
+import gzip
+import os
+import tarfile
+
+import numpy as np
+
+import invesalius.data.slice_  # noqa: F401 (imports invesalius.project avoiding an import cycle)
+from invesalius import project as prj
+
+
+def make_files(folder, rng):
+    files = {
+        "matrix.dat": rng.integers(-1000, 3000, size=(20, 64, 64), dtype=np.int16).tobytes(),
+        "mask_0.dat": np.zeros((21, 65, 65), dtype=np.uint8).tobytes(),
+        "mask_0.plist": b"<plist>mask 0</plist>",
+        "main.plist": b"<plist>main</plist>",
+    }
+    filelist = {}
+    for name, data in files.items():
+        path = os.path.join(folder, "src_" + name)
+        with open(path, "wb") as f:
+            f.write(data)
+        filelist[path] = name
+    return filelist
+
+
+def read_archive(filename, mode="r:"):
+    with tarfile.open(filename, mode) as tar:
+        return {os.path.basename(m.name): tar.extractfile(m).read() for m in tar.getmembers()}
+
+
+def read_sources(filelist):
+    sources = {}
+    for path, name in filelist.items():
+        with open(path, "rb") as f:
+            sources[name] = f.read()
+    return sources
+
+
+def test_compressed_archive_is_gzip_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(prj.const, "PROJECT_COMPRESSION_BLOCK_SIZE", 64 * 1024)
+    filelist = make_files(str(tmp_path), np.random.default_rng(0))
+    filename = str(tmp_path / "project.inv3")
+    folder = str(tmp_path / "tmpproject")
+
+    assert prj.Compress(folder, filename, filelist, compress=True) is None
+
+    with open(filename, "rb") as f:
+        data = f.read()
+    # Several gzip members, readable as one gzip stream.
+    assert data.count(b"\x1f\x8b\x08") > 1
+    assert len(gzip.decompress(data)) % tarfile.RECORDSIZE == 0
+    assert read_archive(filename, "r:gz") == read_sources(filelist)
+
+
+def test_incremental_update_rewrites_changed_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(prj.const, "PROJECT_ARCHIVE_CHUNK_SIZE", 4096)
+    filelist = make_files(str(tmp_path), np.random.default_rng(1))
+    mask_file, plist_file = [p for p, name in filelist.items() if name.startswith("mask_0")]
+    filename = str(tmp_path / "project.inv3")
+    folder = str(tmp_path / "tmpproject")
+
+    assert prj.Compress(folder, filename, filelist, versions={mask_file: 0}) is None
+    index = prj.Compress(folder, filename, filelist, versions={mask_file: 0}, create_index=True)
+    assert read_archive(filename) == read_sources(filelist)
+
+    # Paint some voxels and change the (small) plist.
+    mask = np.memmap(mask_file, dtype=np.uint8, mode="r+", shape=(21, 65, 65))
+    mask[5, 10:20, 10:20] = 255
+    mask.flush()
+    del mask
+    with open(plist_file, "wb") as f:
+        f.write(b"<plist>mask 0 renamed</plist>")
+
+    assert prj.UpdateArchive(folder, index, filelist, versions={mask_file: 1})
+    assert read_archive(filename) == read_sources(filelist)
+
+    # Nothing changed, the data isn't rewritten.
+    assert prj.UpdateArchive(folder, index, filelist, versions={mask_file: 1})
+    assert read_archive(filename) == read_sources(filelist)
+
+    # Resized data files need a full save.
+    with open(mask_file, "ab") as f:
+        f.write(b"\0")
+    assert not prj.UpdateArchive(folder, index, filelist, versions={mask_file: 2})
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from invesalius.data.coordinates import PoseRingBuffer
+from invesalius.data.record_coords import Record, load_record
+
+OBJECTS = [("probe", 0), ("coil", 2)]
+
+
+def put_pose(buffer, n, with_coil=True):
+    coords = {"probe": np.arange(6) + n}
+    if with_coil:
+        coords["coil"] = np.arange(6) * 10.0 + n
+    buffer.put([coords, [True, True, with_coil], {}], timestamp=n * 0.01)
+
+
+@pytest.mark.parametrize("extension", ["csv", "bin"])
+def test_record_all_poses(tmp_path, extension):
+    buffer = PoseRingBuffer(size=4)
+    put_pose(buffer, 0)
+    filename = str(tmp_path / f"coords.{extension}")
+    record = Record(buffer, filename, OBJECTS, chunk_size=3)
+    record._start_time = 0.0
+    for n in range(1, 6):
+        put_pose(buffer, n, with_coil=n != 4)
+        record.record(buffer.samples(record._last_seq))
+    # Full chunks are already on disk.
+    assert record.n_rows == 3
+    put_pose(buffer, 6)
+    record.stop()
+
+    columns, rows = load_record(filename)
+    assert columns[:4] == ["time", "seq", "probe_x", "probe_y"]
+    assert columns[-1] == "coil_visible"
+    assert rows.shape == (6, 2 + 2 * 7)
+    np.testing.assert_allclose(rows[:, 0], np.arange(1, 7) * 0.01)
+    np.testing.assert_array_equal(rows[:, 1], np.arange(2, 8))
+    np.testing.assert_array_equal(rows[:, 2:8], np.arange(6) + np.arange(1, 7)[:, None])
+    assert np.isnan(rows[3, 9:15]).all() and rows[3, 15] == 0
+    assert rows[4, 15] == 1 and record.lost == 0
+
+
+def test_record_thread_counts_lost_poses(tmp_path):
+    buffer = PoseRingBuffer(size=2)
+    filename = str(tmp_path / "coords.csv")
+    record = Record(buffer, filename, OBJECTS)
+    record.start()
+    put_pose(buffer, 0)
+    record.stop()
+    assert load_record(filename)[1].shape[0] == 1
+
+    record = Record(buffer, filename, OBJECTS)
+    for n in range(1, 5):
+        put_pose(buffer, n)
+    record.record(buffer.samples(record._last_seq))
+    record.stop()
+    assert record.lost == 2 and record.n_rows == 2
@@ -8,6 +8,7 @@ from scipy import ndimage
 from scipy.ndimage import generate_binary_structure
 
 from invesalius.data import watershed_process
+from invesalius.data.imagedata_utils import get_LUT_value_255, get_LUT_value_255_range
 from invesalius.data.mask import Mask
 from invesalius.data.slice_ import Slice
 from invesalius.data.styles import WaterShedInteractorStyle
@@ -102,6 +103,75 @@ def test_region_growing_strct_disconnected():
     )
 
 
+def test_region_growing_confidence():
+    # A region of 100s and 101s in a background of 0s, and an isolated one.
+    image = np.zeros((7, 8, 9), dtype=np.int16)
+    image[1:6, 1:6, 1:7] = 100 + np.indices((5, 5, 6)).sum(0) % 2
+    image[3, 7, 8] = 100
+    bstruct = generate_binary_structure(3, 1)
+    out_mask = np.zeros(image.shape, dtype=np.uint8)
+    floodfill.floodfill_confidence(image, (3, 3, 3), 4, 2.5, 1, bstruct, out_mask)
+    expected = np.zeros(image.shape, dtype=np.uint8)
+    expected[1:6, 1:6, 1:7] = 1
+    np.testing.assert_array_equal(out_mask, expected)
+
+    # With WW&WL the 100s and 101s are shown equal.
+    out_mask[:] = 0
+    floodfill.floodfill_confidence(image, (3, 3, 3), 4, 0.5, 1, bstruct, out_mask, (1000, 0))
+    np.testing.assert_array_equal(out_mask, expected)
+
+
+@pytest.mark.parametrize("window", [None, (1000, 0)])
+def test_region_growing_confidence_python(window):
+    image = np.zeros((7, 8, 9), dtype=np.int16)
+    image[1:6, 1:6, 1:7] = 100 + np.indices((5, 5, 6)).sum(0) % 2
+    image[3, 7, 8] = 100
+    bstruct = generate_binary_structure(3, 1).astype(np.uint8)
+    out_mask = np.zeros(image.shape, dtype=np.uint8)
+    multiplier = 2.5 if window is None else 0.5
+    floodfill._floodfill_confidence_py(image, (3, 3, 3), 4, multiplier, 1, bstruct, out_mask, window)
+    expected = np.zeros(image.shape, dtype=np.uint8)
+    expected[1:6, 1:6, 1:7] = 1
+    np.testing.assert_array_equal(out_mask, expected)
+
+
+def test_window_value_255():
+    values = np.arange(-1000, 3000, dtype=np.int16)
+    np.testing.assert_array_equal(
+        floodfill._window_value_255(values.astype(np.float64), 400, 40, True),
+        get_LUT_value_255(values, 400, 40),
+    )
+
+
+@pytest.mark.skipif(
+    floodfill._native_floodfill_confidence is None,
+    reason="invesalius_rs was built without floodfill_confidence",
+)
+@pytest.mark.parametrize("window", [None, (300, 60)])
+def test_region_growing_confidence_native(window):
+    rng = np.random.default_rng(0)
+    image = ndimage.gaussian_filter(rng.normal(0, 100, (20, 24, 24)), 2).astype(np.int16)
+    bstruct = generate_binary_structure(3, 1)
+    native = np.zeros(image.shape, dtype=np.uint8)
+    native[0, 0, :5] = 3
+    python = native.copy()
+    floodfill.floodfill_confidence(image, (12, 12, 10), 5, 1.5, 1, bstruct, native, window)
+    floodfill._floodfill_confidence_py(
+        image, (12, 12, 10), 5, 1.5, 1, bstruct.astype(np.uint8), python, window
+    )
+    assert (native == 1).any()
+    np.testing.assert_array_equal(native, python)
+
+
+def test_LUT_value_255_range():
+    values = np.arange(-1000, 3000, dtype=np.int16)
+    lut = get_LUT_value_255(values, 400, 40)
+    t0, t1 = get_LUT_value_255_range(20, 100, 400, 40, (-1000, 2999))
+    np.testing.assert_array_equal(values[(lut >= 20) & (lut <= 100)], np.arange(t0, t1 + 1))
+    assert get_LUT_value_255_range(0, 0, 400, 40, (-1000, 2999))[0] == -1000
+    assert get_LUT_value_255_range(300, 400, 400, 40, (-1000, 2999)) is None
+
+
 def test_fill_holes_automatically():
     mask_2d = np.ones((7, 7), dtype=np.uint8)
     mask_2d[3, 3] = 0  # single-pixel hole
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+from invesalius.data.slab_projection import SlabProjector
+
+REDUCTIONS = {
+    const.PROJECTION_MaxIP: lambda slab, axis: slab.max(axis),
+    const.PROJECTION_MinIP: lambda slab, axis: slab.min(axis),
+    const.PROJECTION_MeanIP: lambda slab, axis: slab.mean(axis),
+}
+
+
+@pytest.mark.parametrize("mode", list(REDUCTIONS))
+@pytest.mark.parametrize("axis", [0, 1, 2])
+def test_sliding_projection(mode, axis):
+    rng = np.random.default_rng(axis)
+    # Few values, so there are ties between the slices.
+    matrix = rng.integers(-3, 4, (20, 16, 12), dtype=np.int16)
+    projector = SlabProjector()
+    reduce = REDUCTIONS[mode]
+
+    # Scroll forward past the end (truncated slabs), back, and jump.
+    starts = list(range(0, 12)) + list(range(11, 2, -1)) + [5, 7, 0, 6]
+    for start in starts:
+        image = projector.project(matrix, axis, start, 4, mode)
+        slab = np.moveaxis(matrix, axis, 0)[start : start + 4]
+        expected = reduce(slab, 0)
+        assert image.dtype == expected.dtype
+        np.testing.assert_allclose(image, expected)
+
+
+def test_projection_version():
+    matrix = np.zeros((10, 4, 4), dtype=np.int16)
+    projector = SlabProjector()
+    np.testing.assert_array_equal(projector.project(matrix, 0, 0, 3, const.PROJECTION_MaxIP, 0), 0)
+
+    # Changed in place, the last slab can't be reused.
+    matrix[1] = 5
+    image = projector.project(matrix, 0, 1, 3, const.PROJECTION_MaxIP, 1)
+    np.testing.assert_array_equal(image, 5)
+
+
+@pytest.mark.parametrize("mode", [const.PROJECTION_MaxIP, const.PROJECTION_MinIP])
+def test_entering_extreme_replaces_leaving_one(mode, monkeypatch):
+    sign = 1 if mode == const.PROJECTION_MaxIP else -1
+    matrix = np.zeros((10, 4, 4), dtype=np.int16)
+    matrix[0] = 5 * sign
+    matrix[4] = 9 * sign
+    projector = SlabProjector()
+    np.testing.assert_array_equal(projector.project(matrix, 0, 0, 4, mode), 5 * sign)
+
+    # The extreme of every pixel leaves the slab, but a better one enters it,
+    # so none have to be projected again.
+    def project(*args):
+        raise AssertionError("The slab was projected again")
+
+    monkeypatch.setattr(projector, "_project", project)
+    np.testing.assert_array_equal(projector.project(matrix, 0, 1, 4, mode), 9 * sign)
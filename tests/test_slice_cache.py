@@ -0,0 +1,222 @@
+import threading
+
+import numpy as np
+import pytest
+
+import invesalius.constants as const
+import invesalius.data.transformations as tr
+from invesalius.data import slice_cache as sc
+from invesalius.data.slice_ import Slice
+
+
+def test_slice_cache_lru_eviction():
+    cache = sc.SliceCache(memory_budget=300)
+    for n in range(3):
+        cache.put((sc.IMAGE, "AXIAL", n), n, 100)
+    assert cache.get((sc.IMAGE, "AXIAL", 0)) == 0
+
+    cache.put((sc.IMAGE, "AXIAL", 3), 3, 100)
+    assert cache.get((sc.IMAGE, "AXIAL", 1)) is None
+    assert cache.get((sc.IMAGE, "AXIAL", 0)) == 0
+    assert cache.nbytes == 300
+
+    # Larger than the budget, not cached.
+    cache.put((sc.IMAGE, "AXIAL", 4), 4, 301)
+    assert (sc.IMAGE, "AXIAL", 4) not in cache
+    assert len(cache) == 3
+
+
+def test_slice_cache_discard():
+    cache = sc.SliceCache(memory_budget=1000)
+    cache.put((sc.IMAGE, "AXIAL", 0), "image", 10)
+    cache.put((sc.VTK_IMAGE, "AXIAL", 0), "vtk image", 10)
+    cache.put((sc.VTK_MASK, "AXIAL", 0), "vtk mask", 10)
+
+    generation = cache.generation
+    cache.discard(sc.VTK_MASK)
+    assert (sc.VTK_MASK, "AXIAL", 0) not in cache
+    assert (sc.IMAGE, "AXIAL", 0) in cache
+    assert cache.nbytes == 20
+
+    # Computed before the discard.
+    cache.put((sc.VTK_MASK, "AXIAL", 0), "old vtk mask", 10, generation)
+    assert (sc.VTK_MASK, "AXIAL", 0) not in cache
+
+    cache.discard()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_slice_prefetcher():
+    cache = sc.SliceCache(memory_budget=1000)
+    prefetcher = sc.SlicePrefetcher(cache)
+    done = threading.Event()
+
+    def compute(n):
+        if n == 2:
+            done.set()
+        return np.full(4, n, dtype=np.uint8)
+
+    prefetcher.request([((sc.IMAGE, n), lambda n=n: compute(n)) for n in range(3)])
+    assert done.wait(5)
+    for _ in range(100):
+        if (sc.IMAGE, 2) in cache:
+            break
+        threading.Event().wait(0.01)
+    np.testing.assert_array_equal(cache.get((sc.IMAGE, 2)), [2, 2, 2, 2])
+
+
+def test_slice_prefetcher_drops_discarded_tasks():
+    cache = sc.SliceCache(memory_budget=1000)
+    prefetcher = sc.SlicePrefetcher(cache)
+    started, resume, finished = threading.Event(), threading.Event(), threading.Event()
+    computed = []
+
+    def compute(n):
+        computed.append(n)
+        if n == 0:
+            started.set()
+            resume.wait(5)
+        return np.full(4, n, dtype=np.uint8)
+
+    prefetcher.request(
+        [((sc.IMAGE, n), lambda n=n: compute(n)) for n in range(3)],
+        on_done=lambda key: finished.set(),
+    )
+    assert started.wait(5)
+    # The view changed while the first slice was computed.
+    cache.discard()
+    resume.set()
+    prefetcher.request([((sc.IMAGE, 3), lambda: compute(3))], on_done=lambda key: finished.set())
+    assert finished.wait(5)
+    assert computed == [0, 3]
+    assert (sc.IMAGE, 0) not in cache
+
+
+@pytest.fixture
+def slice_():
+    slice_ = Slice()
+    slice_.matrix = np.random.default_rng(0).integers(0, 1000, (6, 7, 8), dtype=np.int16)
+    slice_.spacing = (1.0, 1.0, 1.0)
+    slice_.window_width, slice_.window_level = 1000, 500
+    yield slice_
+    slice_._type_projection = const.PROJECTION_NORMAL
+    slice_._matrix = None
+    slice_.discard_all_buffers()
+
+
+@pytest.mark.parametrize(
+    "orientation,get_slab",
+    [
+        ("AXIAL", lambda m, n: m[n : n + 3]),
+        ("CORONAL", lambda m, n: m[:, n : n + 3, :].transpose(1, 0, 2)),
+        ("SAGITAL", lambda m, n: m[:, :, n : n + 3].transpose(2, 0, 1)),
+    ],
+)
+def test_image_slices(slice_, orientation, get_slab):
+    matrix = slice_.matrix
+    slice_._type_projection = const.PROJECTION_NORMAL
+    np.testing.assert_array_equal(slice_.get_image_slice(orientation, 2), get_slab(matrix, 2)[0])
+
+    slice_.discard_all_buffers()
+    slice_._type_projection = const.PROJECTION_MaxIP
+    np.testing.assert_array_equal(
+        slice_.get_image_slice(orientation, 2, 3), get_slab(matrix, 2).max(0)
+    )
+    assert len(slice_.slice_cache) == 1
+
+    # From the cache, after the buffer moved to another slice.
+    slice_.get_image_slice(orientation, 1, 3)
+    slice_.buffer_slices[orientation].index = 1
+    np.testing.assert_array_equal(
+        slice_.get_image_slice(orientation, 2, 3), get_slab(matrix, 2).max(0)
+    )
+    assert len(slice_.slice_cache) == 2
+
+    slice_.buffer_slices[orientation].discard_image()
+    assert len(slice_.slice_cache) == 0
+
+
+def test_prefetch_computed_in_requested_view(slice_, monkeypatch):
+    requests = []
+    monkeypatch.setattr(slice_.prefetcher, "request", lambda tasks: requests.append(tasks))
+    slice_._type_projection = const.PROJECTION_MaxIP
+    slice_.prefetch_image_slices("AXIAL", 1, 1, 3)
+    (key, compute), *_ = requests[0]
+    assert key == slice_._get_image_slice_key(sc.IMAGE, "AXIAL", 2, 3, False, 1.0)
+
+    # The projection changed before the prefetch ran.
+    slice_._type_projection = const.PROJECTION_MinIP
+    np.testing.assert_array_equal(compute(), slice_.matrix[2:5].max(0))
+
+
+def test_progressive_reslice(slice_, monkeypatch):
+    calls = []
+
+    def apply_view_matrix_transform(volume, spacing, M, n, orientation, interp, cval, out):
+        calls.append((volume.shape, tuple(spacing), n, interp, out.shape))
+        out[:] = len(calls)
+
+    monkeypatch.setattr(
+        "invesalius.data.slice_.transforms.apply_view_matrix_transform",
+        apply_view_matrix_transform,
+    )
+    monkeypatch.setattr(const, "RESLICE_PREVIEW_SIZE", 4)
+    swapped = threading.Event()
+    monkeypatch.setattr(slice_, "_on_full_reslice", lambda key: swapped.set())
+    monkeypatch.setattr(slice_, "interactive_reslice", True)
+    monkeypatch.setattr(slice_, "q_orientation", np.array((1, 0, 0, 0)))
+    slice_.q_orientation = np.array((0.9, 0.1, 0.0, 0.0))
+    slice_.center = (4.0, 3.5, 3.0)
+
+    # Nearest neighbour of the image downsampled by 2, upsampled to the slice shape.
+    preview = slice_.get_image_slice("AXIAL", 2)
+    assert calls[0] == ((3, 4, 4), (2.0, 2.0, 2.0), 1, 0, (1, 4, 4))
+    assert preview.shape == (7, 8)
+    assert slice_.buffer_slices["AXIAL"].preview
+
+    # The full quality slice is resliced in background and cached.
+    assert swapped.wait(5)
+    assert calls[1] == ((6, 7, 8), (1.0, 1.0, 1.0), 2, slice_.interp_method, (1, 7, 8))
+    slice_.buffer_slices["AXIAL"].discard_view()
+    assert len(slice_.slice_cache) == 1
+    slice_.interactive_reslice = False
+    assert (slice_.get_image_slice("AXIAL", 2) == 2).all()
+    assert len(calls) == 2
+
+    # Another center is another slice.
+    slice_.buffer_slices["AXIAL"].discard_view()
+    slice_.center = (4.0, 3.5, 2.0)
+    assert (slice_.get_image_slice("AXIAL", 2) == 3).all()
+
+
+def test_full_reslice_of_previous_rotation(slice_, monkeypatch):
+    rotations = []
+
+    def apply_view_matrix_transform(volume, spacing, M, n, orientation, interp, cval, out):
+        rotations.append(np.array(M[:3, :3]))
+        out[:] = 0
+
+    monkeypatch.setattr(
+        "invesalius.data.slice_.transforms.apply_view_matrix_transform",
+        apply_view_matrix_transform,
+    )
+    requests = []
+    monkeypatch.setattr(slice_.reslicer, "request", lambda tasks, on_done: requests.append(tasks))
+    monkeypatch.setattr(slice_, "interactive_reslice", True)
+    monkeypatch.setattr(slice_, "q_orientation", np.array((1, 0, 0, 0)))
+    q_a = np.array((0.9, 0.1, 0.0, 0.0)) / np.linalg.norm((0.9, 0.1))
+    slice_.q_orientation = q_a
+    slice_.get_image_slice("AXIAL", 2)
+    (key, compute), *_ = requests[-1]
+
+    # Rotated again before the full quality slice was resliced.
+    slice_.q_orientation = np.array((0.9, 0.0, 0.1, 0.0)) / np.linalg.norm((0.9, 0.1))
+    compute()
+    np.testing.assert_allclose(rotations[-1], tr.quaternion_matrix(q_a)[:3, :3].T, atol=1e-12)
+
+    reloads = []
+    monkeypatch.setattr(
+        "invesalius.data.slice_.Publisher.sendMessage", lambda *args, **kw: reloads.append(args)
+    )
+    slice_._swap_in_full_reslice("AXIAL", key)
+    assert not reloads and "AXIAL" not in slice_._reslice_previews
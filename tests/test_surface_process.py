@@ -0,0 +1,185 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, vtk_to_numpy
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+
+import invesalius.constants as const
+from invesalius.data import surface_process
+from invesalius.data.surface import get_surface_piece_size
+
+
+def sphere_polydata():
+    sphere = vtkSphereSource()
+    sphere.SetRadius(5.0)
+    sphere.Update()
+    return sphere.GetOutput()
+
+
+def polydata_arrays(polydata):
+    points = vtk_to_numpy(polydata.GetPoints().GetData())
+    triangles = vtk_to_numpy(polydata.GetPolys().GetData()).reshape(-1, 4)[:, 1:]
+    return points, triangles
+
+
+def triangle_set(points, triangles):
+    """
+    The triangles as sorted tuples of the coordinates of their points, which
+    don't depend on the order of the points.
+    """
+    return sorted(tuple(sorted(map(tuple, points[triangle]))) for triangle in triangles)
+
+
+def test_piece_shared_memory_round_trip():
+    polydata = sphere_polydata()
+    piece = surface_process.polydata_to_shared_memory(polydata, slice(2, 7), (2.0, 6.0))
+    assert piece["roi"] == (2, 7) and piece["z_range"] == (2.0, 6.0)
+    assert piece["n_points"] == polydata.GetNumberOfPoints()
+
+    # The creator keeps its handle until the consumer attaches.
+    shm = surface_process._created_blocks[-1]
+    assert shm.name == piece["name"] and shm.buf[0] == 0
+    surface_process.release_attached_blocks()
+    assert shm in surface_process._created_blocks
+
+    points, triangles = surface_process.shared_memory_to_arrays(piece)
+    expected_points, expected_triangles = polydata_arrays(polydata)
+    np.testing.assert_array_equal(points, expected_points)
+    np.testing.assert_array_equal(triangles, expected_triangles)
+
+    assert shm.buf[0] == 1
+    surface_process.release_attached_blocks()
+    assert shm not in surface_process._created_blocks
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=piece["name"])
+
+
+def test_empty_piece_has_no_shared_memory():
+    n_blocks = len(surface_process._created_blocks)
+    piece = surface_process.polydata_to_shared_memory(vtkPolyData(), slice(0, 5), (0.0, 4.0))
+    assert piece["name"] is None
+    assert piece["n_points"] == piece["n_triangles"] == 0
+    assert len(surface_process._created_blocks) == n_blocks
+
+    points, triangles = surface_process.shared_memory_to_arrays(piece)
+    assert points.shape == (0, 3) and points.dtype == np.float32
+    assert triangles.shape == (0, 3) and triangles.dtype == np.int64
+
+
+def test_release_pieces():
+    piece = surface_process.polydata_to_shared_memory(sphere_polydata(), slice(0, 5), (0.0, 4.0))
+    empty = surface_process.polydata_to_shared_memory(vtkPolyData(), slice(4, 9), (4.0, 8.0))
+    surface_process.release_pieces([piece, empty])
+    # Releasing them again (the join was stopped after it) does nothing.
+    surface_process.release_pieces([piece, empty])
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=piece["name"])
+    surface_process._created_blocks.pop().close()
+
+
+def test_merge_pieces_welds_seams():
+    # Two squares sharing the edge on the plane z = 1, made of two triangles
+    # each, in separate pieces.
+    polydatas = []
+    for z0, z1 in ((0.0, 1.0), (1.0, 2.0)):
+        points = np.array([[0, 0, z0], [1, 0, z0], [0, 0, z1], [1, 0, z1]], dtype=np.float32)
+        triangles = np.array([[0, 1, 2], [1, 3, 2]])
+        polydatas.append((points, triangles))
+
+    pieces = []
+    for n, (points, triangles) in enumerate(polydatas):
+        polydata = vtkPolyData()
+        vtk_points = vtkPoints()
+        vtk_points.SetData(numpy_to_vtk(points, deep=True))
+        cells = vtkCellArray()
+        connectivity = np.column_stack([np.full(len(triangles), 3), triangles]).ravel()
+        cells.SetCells(len(triangles), numpy_to_vtkIdTypeArray(connectivity, deep=True))
+        polydata.SetPoints(vtk_points)
+        polydata.SetPolys(cells)
+        pieces.append(
+            surface_process.polydata_to_shared_memory(
+                polydata, slice(n, n + 2), (points[0, 2], points[-1, 2])
+            )
+        )
+
+    # The pieces are sorted by their position before merging.
+    merged = surface_process.merge_pieces(pieces[::-1])
+    points, triangles = polydata_arrays(merged)
+    assert len(points) == 6
+    assert len(triangles) == 4
+    expected = [triangle_set(*polydata) for polydata in polydatas]
+    assert triangle_set(points, triangles) == sorted(expected[0] + expected[1])
+    assert not surface_process._created_blocks
+
+
+@pytest.mark.parametrize(
+    "shape, n_processes",
+    [((500, 512, 512), 4), ((20, 64, 64), 8), ((2000, 512, 512), 1)],
+)
+def test_get_surface_piece_size(shape, n_processes):
+    piece_size = get_surface_piece_size(shape, 2, n_processes)
+    assert piece_size >= const.SURFACE_PIECE_MIN_SLICES
+    max_slices = const.SURFACE_PIECE_MAX_BYTES // (shape[1] * shape[2] * 2)
+    assert piece_size <= max(const.SURFACE_PIECE_MIN_SLICES, max_slices)
+    n_pieces = -(-shape[0] // piece_size)
+    if piece_size > const.SURFACE_PIECE_MIN_SLICES and piece_size < max_slices:
+        # Enough pieces to keep all the processes busy.
+        assert n_pieces >= n_processes * const.SURFACE_PIECES_PER_PROCESS - 1
+
+
+def create_pieces(tmp_path, mask, piece_size):
+    mask_filename = str(tmp_path / "mask.dat")
+    mask_matrix = np.memmap(
+        mask_filename, mode="w+", dtype=np.uint8, shape=tuple(s + 1 for s in mask.shape)
+    )
+    mask_matrix[1:, 1:, 1:] = mask
+    mask_matrix.flush()
+
+    pieces = []
+    for init in range(0, mask.shape[0], piece_size):
+        roi = slice(init, init + piece_size + 1)
+        pieces.append(
+            surface_process.create_surface_piece(
+                None,
+                mask.shape,
+                np.int16,
+                mask_filename,
+                mask_matrix.shape,
+                mask_matrix.dtype,
+                roi,
+                (1.0, 1.0, 1.0),
+                "CONTOUR",
+                0,
+                255,
+                0,
+                0,
+                0,
+                "en",
+                False,
+                True,
+                "Default",
+                None,
+                False,
+            )
+        )
+    return pieces
+
+
+def test_split_surface_equals_single_piece(tmp_path):
+    z, y, x = np.mgrid[:24, :20, :20]
+    mask = np.where((z - 11.5) ** 2 + (y - 9.5) ** 2 + (x - 9.5) ** 2 < 64, 255, 0).astype(np.uint8)
+
+    single = surface_process.merge_pieces(create_pieces(tmp_path, mask, mask.shape[0]))
+    split = surface_process.merge_pieces(create_pieces(tmp_path, mask, 5))
+
+    single_points, single_triangles = polydata_arrays(single)
+    split_points, split_triangles = polydata_arrays(split)
+    assert len(split_points) == len(single_points)
+    assert len(split_triangles) == len(single_triangles)
+    np.testing.assert_array_equal(np.unique(split_points, axis=0), np.unique(single_points, axis=0))
+    assert triangle_set(split_points, split_triangles) == triangle_set(
+        single_points, single_triangles
+    )
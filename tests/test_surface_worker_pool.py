@@ -0,0 +1,34 @@
+import os
+
+import invesalius.constants as const
+from invesalius.data.surface import SurfaceWorkerPool
+
+
+def test_worker_pool_is_reused_and_restarted(monkeypatch):
+    monkeypatch.setattr(const, "SURFACE_POOL_MAX_PROCESSES", 1)
+    worker_pool = SurfaceWorkerPool()
+    assert worker_pool.processes == 1
+    assert not worker_pool.is_running
+    try:
+        pool = worker_pool.get_pool()
+        assert worker_pool.is_running
+        pid = pool.apply(os.getpid)
+        assert pid != os.getpid()
+
+        # The next surface creations use the same worker.
+        assert worker_pool.get_pool() is pool
+        assert worker_pool.get_pool().apply(os.getpid) == pid
+        queue = worker_pool.new_queue(1)
+        queue.put("progress")
+        assert queue.get() == "progress"
+
+        # Cancelling a surface creation terminates it, it's started again
+        # when needed.
+        worker_pool.terminate()
+        assert not worker_pool.is_running
+        worker_pool.terminate()
+        new_pool = worker_pool.get_pool()
+        assert new_pool is not pool
+        assert new_pool.apply(os.getpid) not in (pid, os.getpid())
+    finally:
+        worker_pool.terminate()
@@ -0,0 +1,125 @@
+import numpy as np
+
+from invesalius.data import threshold
+
+
+def threshold_slice_by_slice(image, mask_matrix, thresh_min, thresh_max):
+    for n in range(1, mask_matrix.shape[0]):
+        if mask_matrix[n, 0, 0] == 0:
+            mask = mask_matrix[n, 1:, 1:]
+            m = ((image[n - 1] >= thresh_min) & (image[n - 1] <= thresh_max)) * 255
+            for value in threshold.EDITED_VALUES:
+                m[mask == value] = value
+            mask_matrix[n, 1:, 1:] = m
+            mask_matrix[n, 0, 0] = 1
+
+
+def make_volume(shape=(23, 17, 19)):
+    rng = np.random.default_rng(42)
+    image = rng.integers(-1024, 3000, size=shape, dtype=np.int16)
+    mask_matrix = np.zeros((shape[0] + 1, shape[1] + 1, shape[2] + 1), dtype=np.uint8)
+    mask_matrix[1:, 1:, 1:] = rng.choice(
+        np.array([0, 1, 2, 127, 253, 254, 255], dtype=np.uint8), size=shape
+    )
+    # Some slices already thresholded must not be touched.
+    mask_matrix[[3, 4, 10, 23], 0, 0] = 1
+    return image, mask_matrix
+
+
+def test_threshold_to_mask_keeps_edited_voxels():
+    image, mask_matrix = make_volume()
+    mask = mask_matrix[1, 1:, 1:]
+    expected = ((image[0] >= 200) & (image[0] <= 1500)) * 255
+    for value in threshold.EDITED_VALUES:
+        expected[mask == value] = value
+
+    result = threshold.threshold_to_mask(image[0], mask, 200, 1500)
+    assert result.dtype == np.uint8
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_threshold_volume_matches_slice_by_slice():
+    image, mask_matrix = make_volume()
+    expected = mask_matrix.copy()
+    threshold_slice_by_slice(image, expected, 200, 1500)
+
+    slice_bytes = image[0].nbytes
+    for n_threads, slab_bytes in ((1, slice_bytes), (4, 3 * slice_bytes), (4, 1 << 30)):
+        result = mask_matrix.copy()
+        threshold.threshold_volume_to_mask(
+            image, result, 200, 1500, n_threads=n_threads, slab_bytes=slab_bytes
+        )
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_threshold_index_matches_voxels():
+    rng = np.random.default_rng(7)
+    image = rng.integers(-1024, 3000, size=(21, 13, 17), dtype=np.int16)
+    # Slices with narrow ranges of values, so they can be skipped.
+    image[:, 3, :] = rng.integers(100, 200, size=(21, 17))
+    image[5] = 40
+    index = threshold.ThresholdIndex(image, slab_bytes=image[0].nbytes * 4, n_bins=16)
+
+    i, e = image.min(), image.max()
+    np.testing.assert_array_equal(
+        index.get_histogram(), np.histogram(image, int(e) - int(i), (i, e))[0]
+    )
+
+    ranges = [(-5000, 5000), (-1024, -1024), (0, 50), (40, 40), (120, 180), (226, 3071), (3000, 10)]
+    slices = {
+        "AXIAL": lambda n: image[n],
+        "CORONAL": lambda n: image[:, n, :],
+        "SAGITAL": lambda n: image[:, :, n],
+    }
+    for t_min, t_max in ranges:
+        selected = (image >= t_min) & (image <= t_max)
+        assert index.count_in_range(t_min, t_max) == np.count_nonzero(selected)
+
+        for orientation, get_slice in slices.items():
+            for n in range(image.shape[threshold.ThresholdIndex.ORIENTATION_AXES[orientation]]):
+                slice_ = get_slice(n)
+                in_range = (slice_ >= t_min) & (slice_ <= t_max)
+                state = index.get_slice_state(orientation, n, t_min, t_max)
+                if state == 255:
+                    assert in_range.all()
+                elif state == 0:
+                    assert not in_range.any()
+
+                for old_min, old_max in ranges:
+                    old_in_range = (slice_ >= old_min) & (slice_ <= old_max)
+                    if not index.slice_changes(orientation, n, (old_min, old_max), (t_min, t_max)):
+                        np.testing.assert_array_equal(old_in_range, in_range)
+
+    assert index.get_slice_state("AXIAL", 5, 0, 50) == 255
+    assert index.get_slice_state("AXIAL", 5, 41, 3000) == 0
+    assert not index.slice_changes("CORONAL", 3, (-5000, 500), (-5000, 3000))
+
+
+def test_image_statistics_build_the_same_index():
+    rng = np.random.default_rng(3)
+    image = rng.integers(-1024, 3000, size=(9, 13, 17), dtype=np.int16)
+    image[4] = -2000
+
+    statistics = threshold.ImageStatistics()
+    for slice_ in image[::-1]:
+        statistics.add(slice_)
+    assert statistics.scalar_range == (image.min(), image.max())
+
+    index = threshold.ThresholdIndex(image, n_bins=16)
+    streamed = threshold.ThresholdIndex(
+        image, n_bins=16, value_range=statistics.scalar_range, counts=statistics.get_counts()
+    )
+    np.testing.assert_array_equal(streamed.get_histogram(), index.get_histogram())
+    assert streamed.count_in_range(0, 100) == index.count_in_range(0, 100)
+    for axis in range(3):
+        np.testing.assert_array_equal(streamed.slice_bins[axis], index.slice_bins[axis])
+
+
+def test_image_statistics_percentile():
+    rng = np.random.default_rng(5)
+    image = rng.integers(-300, 2000, size=(7, 31, 29), dtype=np.int16)
+    statistics = threshold.ImageStatistics()
+    for slice_ in image:
+        statistics.add(slice_)
+    for q in (0, 2, 37.5, 50, 98, 100):
+        assert np.isclose(statistics.get_percentile(q), np.percentile(image, q))
@@ -0,0 +1,84 @@
+import queue
+
+import numpy as np
+import pytest
+from scipy.ndimage import generate_binary_structure
+
+from invesalius.data import watershed_process as wp
+
+
+@pytest.fixture
+def image():
+    # A bright ball in a dark noisy volume.
+    z, y, x = np.mgrid[:30, :32, :34]
+    ball = (z - 15) ** 2 + (y - 16) ** 2 + (x - 17) ** 2 < 36
+    noise = np.random.default_rng(0).integers(-20, 20, ball.shape)
+    return (np.where(ball, 400, -100) + noise).astype(np.int16)
+
+
+@pytest.fixture
+def markers(image):
+    markers = np.zeros(image.shape, dtype=np.uint8)
+    markers[15, 15:18, 16:19] = 1
+    markers[15, 7, 8:26] = 2
+    return markers
+
+
+def test_markers_bbox(markers):
+    assert wp.get_markers_bbox(markers, 2) == (slice(13, 18), slice(5, 20), slice(6, 28))
+    assert wp.get_markers_bbox(markers, 100) == tuple(slice(0, n) for n in markers.shape)
+    assert wp.get_markers_bbox(np.zeros_like(markers), 2) is None
+
+
+@pytest.mark.parametrize("algorithm", ["Watershed", "Watershed IFT"])
+@pytest.mark.parametrize("use_ww_wl", [True, False])
+def test_prepared_region_equals_whole_image(image, algorithm, use_ww_wl):
+    whole = tuple(slice(0, n) for n in image.shape)
+    expected = np.empty(image.shape, dtype="uint16")
+    wp.prepare_image(image, whole, expected, algorithm, 3, use_ww_wl, 150, 500, image.min())
+
+    bbox = (slice(4, 20), slice(0, 9), slice(10, 34))
+    out = np.empty((16, 9, 24), dtype="uint16")
+    wp.prepare_image(image, bbox, out, algorithm, 3, use_ww_wl, 150, 500, image.min(), n_workers=3)
+    np.testing.assert_array_equal(out, expected[bbox])
+
+
+def test_watershed_cropped_to_markers(image, markers, tmp_path):
+    bstruct = generate_binary_structure(3, 1)
+    whole = np.zeros(image.shape, dtype="uint8")
+    whole.tofile(tmp_path / "whole.dat")
+    whole.tofile(tmp_path / "cropped.dat")
+    q = queue.Queue()
+    args = (bstruct, "Watershed", 3, True, 150, 500, q)
+    wp.do_watershed(image, markers, tmp_path / "whole.dat", image.shape, *args)
+
+    bbox = wp.get_markers_bbox(markers, 4)
+    prepared = wp.PreparedImage("key", bbox, str(tmp_path / "prepared.dat"))
+    wp.do_watershed(image, markers, tmp_path / "cropped.dat", image.shape, *args, prepared)
+    assert q.qsize() == 2
+
+    whole = np.fromfile(tmp_path / "whole.dat", dtype="uint8").reshape(image.shape)
+    cropped = np.fromfile(tmp_path / "cropped.dat", dtype="uint8").reshape(image.shape)
+    assert not cropped[: bbox[0].start].any() and not cropped[bbox[0].stop :].any()
+    # The core of the ball is inside the region, segmented as in the whole image.
+    z, y, x = np.mgrid[:30, :32, :34]
+    core = (z - 15) ** 2 + (y - 16) ** 2 + (x - 17) ** 2 < 9
+    assert (whole[core] == 1).all() and (cropped[core] == 1).all()
+
+    prepared.ready = True
+    assert prepared.covers("key", wp.get_markers_bbox(markers, 2))
+    assert not prepared.covers("other key", bbox)
+
+
+def test_apply_watershed_to_mask():
+    mask = np.array([[0, 2, 253, 254], [255, 0, 0, 0]], dtype=np.uint8)
+    bbox = (slice(0, 2), slice(1, 4))
+    tmp_mask = np.array([[1, 2, 1], [1, 1, 2]], dtype=np.uint8)
+
+    result = mask.copy()
+    wp.apply_watershed_to_mask(result, tmp_mask, bbox, overwrite=False)
+    np.testing.assert_array_equal(result, [[0, 253, 2, 254], [255, 253, 253, 2]])
+
+    result = mask.copy()
+    wp.apply_watershed_to_mask(result, tmp_mask, bbox, overwrite=True)
+    np.testing.assert_array_equal(result, [[0, 253, 0, 253], [0, 253, 253, 0]])
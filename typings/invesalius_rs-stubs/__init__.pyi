@@ -39,6 +39,16 @@ def floodfill_auto_threshold(
     fill: int,
     out: NDArray[np.uint8],
 ) -> None: ...
+def floodfill_confidence(
+    data: NDArray[np.int16],
+    seed: tuple[int, int, int],
+    iterations: int,
+    multiplier: float,
+    fill: int,
+    strct: NDArray[np.uint8],
+    out: NDArray[np.uint8],
+    window: tuple[float, float] | None = None,
+) -> None: ...
 def fill_holes_automatically(
     mask: NDArray[np.uint8],
     labels: NDArray[np.uint16],